@@ -5,22 +5,94 @@ Should be used in replay and undo features.
 """
 
 from dataclasses import dataclass, field
-from layer_util import Layer
-from grid import Grid
+from typing import TYPE_CHECKING
+import numpy as np
+from layer_util import Layer, get_layers
+if TYPE_CHECKING:
+    from grid import Grid   # Only for annotations, since grid imports this module
+    from selection import Block
 
-@dataclass
+@dataclass(slots=True)
 class PaintStep:
 
     affected_grid_square: tuple[int, int]
     affected_layer: Layer
 
     def undo_apply(self, grid: Grid):
-        sq = grid[self.affected_grid_square[0]][self.affected_grid_square[1]]
-        sq.erase(self.affected_layer)
+        grid.erase_square(self.affected_layer, self.affected_grid_square[0], self.affected_grid_square[1])
+
+    def redo_apply(self, grid: Grid):
+        grid.paint_square(self.affected_layer, self.affected_grid_square[0], self.affected_grid_square[1])
+
+
+@dataclass(slots=True)
+class EraseStep:
+
+    affected_grid_square: tuple[int, int]
+    affected_layer: Layer
+
+    def undo_apply(self, grid: Grid):
+        grid.paint_square(self.affected_layer, self.affected_grid_square[0], self.affected_grid_square[1])
+
+    def redo_apply(self, grid: Grid):
+        grid.erase_square(self.affected_layer, self.affected_grid_square[0], self.affected_grid_square[1])
+
+
+@dataclass(slots=True)
+class PaintSpanStep:
+
+    affected_row: int
+    affected_columns: range     # A run of consecutive columns
+    affected_layer: Layer
+
+    def undo_apply(self, grid: Grid):
+        grid.erase_span(self.affected_layer, self.affected_row, self.affected_columns.start, self.affected_columns.stop - 1)
+
+    def redo_apply(self, grid: Grid):
+        grid.paint_span(self.affected_layer, self.affected_row, self.affected_columns.start, self.affected_columns.stop - 1)
+
+
+@dataclass(slots=True)
+class MaskStep:
+
+    affected_corner: tuple[int, int]
+    affected_mask: np.ndarray
+    affected_layer: Layer
+
+    def undo_apply(self, grid: Grid):
+        grid.erase_masked(self.affected_layer, self.affected_mask, self.affected_corner[0], self.affected_corner[1])
+
+    def redo_apply(self, grid: Grid):
+        grid.paint_masked(self.affected_layer, self.affected_mask, self.affected_corner[0], self.affected_corner[1])
+
+
+@dataclass(slots=True)
+class MaskEraseStep:
+
+    affected_corner: tuple[int, int]
+    affected_layers: np.ndarray     # The index of the layer erased from each square, -1 where none was
+
+    def undo_apply(self, grid: Grid):
+        for index in np.unique(self.affected_layers[self.affected_layers >= 0]).tolist():
+            grid.paint_masked(get_layers()[index], self.affected_layers == index, self.affected_corner[0], self.affected_corner[1])
+
+    def redo_apply(self, grid: Grid):
+        for index in np.unique(self.affected_layers[self.affected_layers >= 0]).tolist():
+            grid.erase_masked(get_layers()[index], self.affected_layers == index, self.affected_corner[0], self.affected_corner[1])
+
+
+@dataclass(slots=True)
+class BlockStep:
+
+    affected_corner: tuple[int, int]
+    before: Block
+    after: Block
+
+    def undo_apply(self, grid: Grid):
+        grid.write_block(self.affected_corner[0], self.affected_corner[1], self.before)
 
     def redo_apply(self, grid: Grid):
-        sq = grid[self.affected_grid_square[0]][self.affected_grid_square[1]]
-        sq.add(self.affected_layer)
+        grid.write_block(self.affected_corner[0], self.affected_corner[1], self.after)
 
 
 @dataclass
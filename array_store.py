@@ -0,0 +1,1022 @@
+"""
+Array-backed layer stores.
+
+Instead of one LayerStore object per grid square, a LayerArray keeps the layers of
+every square of a grid in a few compact arrays:
+- SetLayerArray: the active layer of each square as a uint8 (0 for none, otherwise
+  layer index + 1), and whether special is active as a bool.
+- SequenceLayerArray: the enabled layers of each square as a uint32 bitmask, where
+  bit i enables LAYERS[i], the same bits as SequenceLayerStore's BSet.
+- AdditiveLayerArray: the layer sequence of each non-empty square as a bytearray of
+  layer indices, front first. Empty squares are not stored at all.
+
+Indexing a LayerArray as array[x][y] returns a LayerCell, a lightweight proxy that
+behaves like the LayerStore of that square, so code written against the object
+per square layout keeps working. Whole-grid operations such as special work on the
+arrays directly instead of visiting every square.
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import numpy as np
+from layer_util import Layer, get_layers
+from layer_store import LayerStore, AdditiveLayerStore, SequenceLayerStore
+from pipeline import Pipeline, PipelineCache
+from selection import Block, SetBlock, SequenceBlock, AdditiveBlock
+import layers
+
+class LayerArray(ABC):
+    """
+    The layers of every square of a width x height grid.
+    Subclasses store them compactly and implement the LayerStore operations for a single square.
+    - replaces: True if add replaces what a square held (as SetLayerStore does) rather than adding to it.
+    - block_type: The Block type squares are copied to and from (see selection).
+    """
+
+    replaces = False
+    block_type = None
+
+    def __init__(self, width: int, height: int) -> None:
+        """
+        Records the size of the grid, subclasses allocate their arrays.
+
+        Args:
+        - width: The number of columns
+            Type: Integer
+        - height: The number of rows
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.width = width                                                                  # O(1)
+        self.height = height                                                                # O(1)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of columns, as len(grid) does for a list of columns.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.width                                                                   # O(1)
+
+    def __getitem__(self, x: int) -> LayerColumn:
+        """
+        Returns a column of the grid, which can be indexed by y to get a LayerCell.
+        """
+        if not 0 <= x < self.width:
+            raise IndexError(x)
+        return LayerColumn(self, x)
+
+    @abstractmethod
+    def add(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        LayerStore.add for the square at (x, y).
+        """
+        pass
+
+    @abstractmethod
+    def erase(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        LayerStore.erase for the square at (x, y).
+        """
+        pass
+
+    def add_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        LayerStore.add for every square selected by the mask, placed with its square (0, 0) at (x, y).
+        Subclasses override it to add to all of them in a few operations over their arrays.
+
+        Args:
+        - mask: Array of shape (width, height), no larger than the squares from (x, y) onwards, True for the squares to add the layer to
+            Type: numpy.ndarray of bool
+        - layer: The layer to add
+            Type: Layer Object
+        - x: The x coordinate of the square the mask's square (0, 0) selects
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+
+        Returns:
+        - A mask of the squares that changed, and unless replaces is False an array of the same shape
+          holding the index of the layer each of them replaced, -1 where none was (None if replaces is False)
+            Type: Tuple of a numpy.ndarray of bool and a numpy.ndarray of int16
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        changed = np.zeros(mask.shape, dtype=bool)                                          # O(mn)
+        replaced = np.full(mask.shape, -1, dtype=np.int16) if self.replaces == True else None   # O(mn)
+        for dx, dy in zip(*(axis.tolist() for axis in np.nonzero(mask))):                   # O(k), Where k is the number of squares selected
+            before = self.erase_target(x + dx, y + dy, layer) if self.replaces == True else None   # O(1)
+            if self.add(x + dx, y + dy, layer) == True:                                     # O(1)
+                changed[dx, dy] = True                                                      # O(1)
+                if before is not None:                                                      # O(1)
+                    replaced[dx, dy] = before.index                                         # O(1)
+        return changed, replaced                                                            # O(1)
+
+    def erase_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        LayerStore.erase for every square selected by the mask, placed with its square (0, 0) at (x, y).
+        Subclasses override it to erase from all of them in a few operations over their arrays.
+
+        Returns:
+        - A mask of the squares that changed, and an array of the same shape holding the index of the layer
+          erased from each of them (see erase_target), -1 where nothing was
+            Type: Tuple of a numpy.ndarray of bool and a numpy.ndarray of int16
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        changed = np.zeros(mask.shape, dtype=bool)                                          # O(mn)
+        erased = np.full(mask.shape, -1, dtype=np.int16)                                    # O(mn)
+        for dx, dy in zip(*(axis.tolist() for axis in np.nonzero(mask))):                   # O(k), Where k is the number of squares selected
+            target = self.erase_target(x + dx, y + dy, layer)                               # O(1)
+            if self.erase(x + dx, y + dy, layer) == True:                                   # O(1)
+                changed[dx, dy] = True                                                      # O(1)
+                erased[dx, dy] = target.index                                               # O(1)
+        return changed, erased                                                              # O(1)
+
+    @abstractmethod
+    def erase_target(self, x: int, y: int, layer: Layer) -> Layer | None:
+        """
+        LayerStore.erase_target for the square at (x, y).
+        """
+        pass
+
+    @abstractmethod
+    def special_square(self, x: int, y: int) -> None:
+        """
+        LayerStore.special for the square at (x, y).
+        """
+        pass
+
+    @abstractmethod
+    def special(self) -> None:
+        """
+        LayerStore.special for every square of the grid.
+        """
+        pass
+
+    @abstractmethod
+    def applied_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        LayerStore.applied_layers for the square at (x, y).
+        """
+        pass
+
+    def visible_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        LayerStore.visible_layers for the square at (x, y).
+        """
+        return self.applied_layers(x, y)
+
+    @abstractmethod
+    def pipeline(self, x: int, y: int) -> Pipeline:
+        """
+        Returns the compiled visible layers of the square at (x, y).
+        """
+        pass
+
+    @abstractmethod
+    def state_labels(self, ids: dict) -> np.ndarray:
+        """
+        Returns an array of shape (width, height) labelling the state of every square,
+        where two squares have the same label exactly when their LayerStores would be equal.
+        Labels are the same across arrays of the same type, so the chunks of a grid can be labelled separately.
+
+        Args:
+        - ids: Maps the states that have no integer of their own to the labels given to them, shared between the arrays labelled together
+            Type: Dictionary
+        """
+        pass
+
+    @abstractmethod
+    def read_block(self, x: int, y: int, width: int, height: int) -> Block:
+        """
+        Returns a copy of the width x height squares starting at (x, y), which must be inside the grid.
+        """
+        pass
+
+    @abstractmethod
+    def write_block(self, x: int, y: int, block: Block) -> None:
+        """
+        Sets the squares starting at (x, y) to the states of the block, which must fit inside the grid.
+        """
+        pass
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes held by the arrays.
+        """
+        return 0
+
+class LayerColumn:
+    """
+    A column of a LayerArray, returned by array[x].
+    """
+
+    __slots__ = ("array", "x")
+
+    def __init__(self, array: LayerArray, x: int) -> None:
+        """
+        Initialises the column x of the array.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.array = array                                                                  # O(1)
+        self.x = x                                                                          # O(1)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of rows, the length of the column.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.array.height                                                            # O(1)
+
+    def __getitem__(self, y: int) -> LayerCell:
+        """
+        Returns the LayerCell of the square at (x, y), raising IndexError if y is outside the grid.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if not 0 <= y < self.array.height:                                                  # O(1)
+            raise IndexError(y)
+        return LayerCell(self.array, self.x, y)                                             # O(1)
+
+class LayerCell(LayerStore):
+    """
+    The LayerStore of a single square of a LayerArray, returned by array[x][y].
+    Holds no layers itself, every operation reads or writes the arrays.
+    """
+
+    def __init__(self, array: LayerArray, x: int, y: int) -> None:
+        """
+        Initialises the store of the square at (x, y) of the array.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.array = array                                                                  # O(1)
+        self.x = x                                                                          # O(1)
+        self.y = y                                                                          # O(1)
+
+    def add(self, layer: Layer) -> bool:
+        """
+        LayerArray.add for this square.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.array.add(self.x, self.y, layer)                                        # O(1)
+
+    def erase(self, layer: Layer) -> bool:
+        """
+        LayerArray.erase for this square.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.array.erase(self.x, self.y, layer)                                      # O(1)
+
+    def erase_target(self, layer: Layer) -> Layer | None:
+        """
+        LayerArray.erase_target for this square.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.array.erase_target(self.x, self.y, layer)                               # O(1)
+
+    def special(self) -> None:
+        """
+        LayerArray.special_square for this square, so special applies to it alone.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.array.special_square(self.x, self.y)                                           # O(1)
+
+    def get_color(self, start: tuple[int, int, int], timestamp: float, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Applies the compiled visible layers of this square to the start colour.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers of the square
+            Happens when its layers have not been compiled yet
+        - Best case: O(s), Where s is the number of steps in the compiled pipeline
+        """
+        return self.array.pipeline(self.x, self.y)(start, timestamp, x, y)                  # O(n)
+
+    def applied_layers(self) -> list[Layer]:
+        """
+        LayerArray.applied_layers for this square.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers of the square
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        return self.array.applied_layers(self.x, self.y)                                    # O(n)
+
+    def visible_layers(self) -> list[Layer]:
+        """
+        LayerArray.visible_layers for this square.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers of the square
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        return self.array.visible_layers(self.x, self.y)                                    # O(n)
+
+class SetLayerArray(LayerArray):
+    """
+    SetLayerStore for every square of a grid.
+    - active: Array of shape (width, height), 0 for no layer, otherwise the active layer's index + 1.
+    - special_status: Array of shape (width, height), True where special applied to that square alone is active.
+    - parity: Whether special has been applied to the whole grid an odd number of times.
+      Special is active on a square when its special_status differs from parity.
+    """
+
+    pipelines = PipelineCache()
+    replaces = True
+    block_type = SetBlock
+
+    def __init__(self, width: int, height: int) -> None:
+        """
+        Initialises every square with no active layer and special inactive.
+
+        Args:
+        - width: The number of columns
+            Type: Integer
+        - height: The number of rows
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        super().__init__(width, height)                                                     # O(1)
+        if len(get_layers()) > 255:                                                         # O(1)
+            raise ValueError("SetLayerArray holds at most 255 layers.")
+        self.active = np.zeros((width, height), dtype=np.uint8)                             # O(mn)
+        self.special_status = np.zeros((width, height), dtype=bool)                         # O(mn)
+        self.parity = False                                                                 # O(1)
+
+    def add(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Sets the active layer of the square at (x, y), returning False if it was already active.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.active[x, y] == layer.index + 1:                                            # O(1)
+            return False                                                                    # O(1)
+        self.active[x, y] = layer.index + 1                                                 # O(1)
+        return True                                                                         # O(1)
+
+    def add_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Sets the active layer of every selected square at once (see LayerArray.add_mask).
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+            A few numpy operations over the squares under the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        width, height = mask.shape                                                          # O(1)
+        active = self.active[x:x + width, y:y + height]                                     # O(1), A view
+        changed = mask & (active != layer.index + 1)                                        # O(mn)
+        replaced = np.where(changed, active.astype(np.int16) - 1, np.int16(-1))             # O(mn), 0 for no layer becomes -1
+        active[changed] = layer.index + 1                                                   # O(mn)
+        return changed, replaced                                                            # O(1)
+
+    def erase_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Removes the active layer of every selected square at once (see LayerArray.erase_mask).
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        width, height = mask.shape                                                          # O(1)
+        active = self.active[x:x + width, y:y + height]                                     # O(1), A view
+        changed = mask & (active != 0)                                                      # O(mn)
+        erased = np.where(changed, active.astype(np.int16) - 1, np.int16(-1))               # O(mn)
+        active[changed] = 0                                                                 # O(mn)
+        return changed, erased                                                              # O(1)
+
+    def erase(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Removes the active layer of the square at (x, y), returning False if there was none.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.active[x, y] == 0:                                                          # O(1)
+            return False                                                                    # O(1)
+        self.active[x, y] = 0                                                               # O(1)
+        return True                                                                         # O(1)
+
+    def erase_target(self, x: int, y: int, layer: Layer) -> Layer | None:
+        """
+        Returns the active layer of the square at (x, y), None if there is none.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        active = int(self.active[x, y])                                                     # O(1)
+        return None if active == 0 else get_layers()[active - 1]                            # O(1)
+
+    def special_square(self, x: int, y: int) -> None:
+        """
+        Toggles special for the square at (x, y).
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.special_status[x, y] = not self.special_status[x, y]                           # O(1)
+
+    def special(self) -> None:
+        """
+        Toggles special for every square, by toggling the parity.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.parity = not self.parity                                                       # O(1)
+
+    def applied_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        Returns the active layer followed by invert when special is active, or black when special is active without a layer.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        active = int(self.active[x, y])                                                     # O(1)
+        special = bool(self.special_status[x, y]) != self.parity                            # O(1)
+        if active == 0:                                                                     # O(1)
+            return [layers.black] if special == True else []                                # O(1)
+        if special == True:                                                                 # O(1)
+            return [get_layers()[active - 1], layers.invert]                                # O(1)
+        return [get_layers()[active - 1]]                                                   # O(1)
+
+    def pipeline(self, x: int, y: int) -> Pipeline:
+        """
+        Returns the compiled layers of the square at (x, y), shared through SetLayerArray.pipelines.
+
+        Complexity:
+        - Worst case: O(1)
+            At most two layers are applied
+        - Best case: O(1)
+            At most two layers are applied
+        """
+        return self.pipelines.get_stack(self.applied_layers(x, y))                          # O(1)
+
+    def state_labels(self, ids: dict) -> np.ndarray:
+        """
+        Labels every square with its active layer and whether special is active (see LayerArray.state_labels).
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        return self.active.astype(np.int64) * 2 + (self.special_status != self.parity)     # O(mn)
+
+    def read_block(self, x: int, y: int, width: int, height: int) -> SetBlock:
+        """
+        Copies the slices of the arrays, with special made independent of parity.
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        return SetBlock(width, height,
+            active=self.active[x:x + width, y:y + height].copy(),                           # O(mn)
+            special=self.special_status[x:x + width, y:y + height] != self.parity,          # O(mn)
+        )
+
+    def write_block(self, x: int, y: int, block: SetBlock) -> None:
+        """
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        self.active[x:x + block.width, y:y + block.height] = block.active                   # O(mn)
+        self.special_status[x:x + block.width, y:y + block.height] = block.special != self.parity   # O(mn)
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes held by the active layer and special status arrays.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.active.nbytes + self.special_status.nbytes                              # O(1)
+
+class SequenceLayerArray(LayerArray):
+    """
+    SequenceLayerStore for every square of a grid.
+    - masks: Array of shape (width, height), where bit i of a square is set if LAYERS[i] is enabled there.
+    Pipelines are shared with SequenceLayerStore through SequenceLayerStore.pipelines,
+    and special looks bitmasks up in SequenceLayerStore.special_table.
+    """
+
+    pipelines = SequenceLayerStore.pipelines
+    special_table = SequenceLayerStore.special_table
+    block_type = SequenceBlock
+
+    def __init__(self, width: int, height: int) -> None:
+        """
+        Initialises every square with no layers enabled.
+
+        Args:
+        - width: The number of columns
+            Type: Integer
+        - height: The number of rows
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        super().__init__(width, height)                                                     # O(1)
+        if len(get_layers()) > 32:                                                          # O(1)
+            raise ValueError("SequenceLayerArray holds at most 32 layers.")
+        self.masks = np.zeros((width, height), dtype=np.uint32)                             # O(mn)
+
+    def add(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Enables the layer in the square at (x, y), returning False if it was enabled already.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        mask = int(self.masks[x, y])                                                        # O(1)
+        if (mask >> layer.index) & 1:                                                       # O(1)
+            return False                                                                    # O(1)
+        self.masks[x, y] = mask | (1 << layer.index)                                        # O(1)
+        return True                                                                         # O(1)
+
+    def add_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, None]:
+        """
+        Enables the layer in every selected square at once (see LayerArray.add_mask).
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        width, height = mask.shape                                                          # O(1)
+        bit = np.uint32(1 << layer.index)                                                   # O(1)
+        masks = self.masks[x:x + width, y:y + height]                                       # O(1), A view
+        changed = mask & ((masks & bit) == 0)                                               # O(mn)
+        np.bitwise_or(masks, bit, out=masks, where=changed)                                 # O(mn)
+        return changed, None                                                                # O(1)
+
+    def erase_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Disables the layer in every selected square at once (see LayerArray.erase_mask).
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        width, height = mask.shape                                                          # O(1)
+        bit = np.uint32(1 << layer.index)                                                   # O(1)
+        masks = self.masks[x:x + width, y:y + height]                                       # O(1), A view
+        changed = mask & ((masks & bit) != 0)                                               # O(mn)
+        np.bitwise_and(masks, ~bit, out=masks, where=changed)                               # O(mn)
+        return changed, np.where(changed, np.int16(layer.index), np.int16(-1))              # O(mn)
+
+    def erase(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Disables the layer in the square at (x, y), returning False if it was not enabled.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        mask = int(self.masks[x, y])                                                        # O(1)
+        if not (mask >> layer.index) & 1:                                                   # O(1)
+            return False                                                                    # O(1)
+        self.masks[x, y] = mask & ~(1 << layer.index)                                       # O(1)
+        return True                                                                         # O(1)
+
+    def erase_target(self, x: int, y: int, layer: Layer) -> Layer | None:
+        """
+        Returns the layer if it is enabled in the square at (x, y), None otherwise.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return layer if (int(self.masks[x, y]) >> layer.index) & 1 else None                # O(1)
+
+    def special_square(self, x: int, y: int) -> None:
+        """
+        Disables the middle-most enabled layer, by name, of the square at (x, y).
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.masks[x, y] = self.special_table[int(self.masks[x, y])]                        # O(1)
+
+    def special(self) -> None:
+        """
+        Disables the middle-most enabled layer of every square, with a single gather from the transition table.
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        self.masks = self.special_table.table[self.masks]                                   # O(mn)
+
+    def applied_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        Returns the enabled layers of the square at (x, y), in the order they were registered.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of enabled layers
+        - Best case: O(1)
+            Happens when the bitmask has been compiled already and no layer is enabled
+        """
+        return list(self.pipelines.get(int(self.masks[x, y])).layers)                      # O(n)
+
+    def visible_mask(self, x: int, y: int) -> int:
+        """
+        Returns the bitmask of the enabled layers of the square at (x, y), from the topmost constant layer upwards.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        mask = int(self.masks[x, y])                                                        # O(1)
+        top = int.bit_length(mask & self.pipelines.constant_mask)                           # O(1)
+        if top == 0:                                                                        # O(1)
+            return mask                                                                     # O(1)
+        return mask >> (top - 1) << (top - 1)                                               # O(1)
+
+    def visible_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        Returns the enabled layers of the square at (x, y), from the topmost constant layer upwards.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of visible layers
+        - Best case: O(1)
+            Happens when no layer is visible
+        """
+        return list(self.pipeline(x, y).layers)                                            # O(n)
+
+    def pipeline(self, x: int, y: int) -> Pipeline:
+        """
+        Returns the compiled visible layers of the square at (x, y).
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers in the program
+            Happens when the bitmask has not been compiled yet
+        - Best case: O(1)
+            Happens when the bitmask has been compiled already
+        """
+        return self.pipelines.get(self.visible_mask(x, y))                                  # O(1)
+
+    def state_labels(self, ids: dict) -> np.ndarray:
+        """
+        Labels every square with its bitmask (see LayerArray.state_labels).
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        return self.masks.astype(np.int64)                                                  # O(mn)
+
+    def read_block(self, x: int, y: int, width: int, height: int) -> SequenceBlock:
+        """
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        return SequenceBlock(width, height, masks=self.masks[x:x + width, y:y + height].copy())   # O(mn)
+
+    def write_block(self, x: int, y: int, block: SequenceBlock) -> None:
+        """
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        self.masks[x:x + block.width, y:y + block.height] = block.masks                     # O(mn)
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes held by the bitmask array.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.masks.nbytes                                                            # O(1)
+
+class AdditiveLayerArray(LayerArray):
+    """
+    AdditiveLayerStore for every square of a grid.
+    - sequences: Maps x * height + y to the layer sequence of that square, as a bytearray of layer indices, front first.
+      Squares with no layers have no entry.
+    - reversed: Whether special has been applied to the whole grid an odd number of times. If so every
+      bytearray holds its sequence back to front, so layers are added at its start and erased from its end.
+    - capacity: The most layers a square can hold, the same as AdditiveLayerStore.
+    Pipelines are shared with AdditiveLayerStore through AdditiveLayerStore.pipelines.
+    """
+
+    pipelines = AdditiveLayerStore.pipelines
+    block_type = AdditiveBlock
+
+    def __init__(self, width: int, height: int) -> None:
+        """
+        Initialises every square with an empty layer sequence.
+
+        Args:
+        - width: The number of columns
+            Type: Integer
+        - height: The number of rows
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            Empty squares are not stored
+        - Best case: O(1)
+            Empty squares are not stored
+        """
+        super().__init__(width, height)                                                     # O(1)
+        if len(get_layers()) > 256:                                                         # O(1)
+            raise ValueError("AdditiveLayerArray holds at most 256 layers.")
+        self.capacity = len(get_layers()) * 100                                             # O(1)
+        self.sequences = {}                                                                 # O(1)
+        self.reversed = False                                                               # O(1)
+
+    def add(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Appends the layer to the layer sequence of the square at (x, y), returning False if it is full.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the sequence
+            Happens when the grid is reversed, so the layer is inserted at the start of the bytearray (a single memmove)
+        - Best case: O(1)
+            Appending to a bytearray is amortised constant time
+        """
+        sequence = self.sequences.get(x * self.height + y)                                  # O(1)
+        if sequence is None:                                                                # O(1)
+            sequence = self.sequences[x * self.height + y] = bytearray()                    # O(1)
+        if len(sequence) >= self.capacity:                                                  # O(1)
+            return False                                                                    # O(1)
+        if self.reversed == True:                                                           # O(1)
+            sequence.insert(0, layer.index)                                                 # O(m)
+        else:                                                                               # O(1)
+            sequence.append(layer.index)                                                    # O(1)
+        return True                                                                         # O(1)
+
+    def erase(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        Removes the first layer of the layer sequence of the square at (x, y), returning False if it is empty.
+
+        Complexity:
+        - Worst case: O(1)
+            Deleting from either end of a bytearray only moves its start or end
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        sequence = self.sequences.get(x * self.height + y)                                  # O(1)
+        if sequence is None:                                                                # O(1)
+            return False                                                                    # O(1)
+        if self.reversed == True:                                                           # O(1)
+            del sequence[-1]                                                                # O(1)
+        else:                                                                               # O(1)
+            del sequence[0]                                                                 # O(1)
+        if len(sequence) == 0:                                                              # O(1)
+            del self.sequences[x * self.height + y]                                         # O(1)
+        return True                                                                         # O(1)
+
+    def erase_target(self, x: int, y: int, layer: Layer) -> Layer | None:
+        """
+        Returns the first layer of the layer sequence of the square at (x, y), None if it is empty.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        sequence = self.sequences.get(x * self.height + y)                                  # O(1)
+        if sequence is None:                                                                # O(1)
+            return None                                                                     # O(1)
+        return get_layers()[sequence[-1] if self.reversed == True else sequence[0]]         # O(1)
+
+    def special_square(self, x: int, y: int) -> None:
+        """
+        Reverses the layer sequence of the square at (x, y).
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the sequence
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        sequence = self.sequences.get(x * self.height + y)                                  # O(1)
+        if sequence is not None:                                                            # O(1)
+            sequence.reverse()                                                              # O(m)
+
+    def special(self) -> None:
+        """
+        Reverses the layer sequence of every square, by toggling the direction every bytearray is read in.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.reversed = not self.reversed                                                   # O(1)
+
+    def applied_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        Returns the layer sequence of the square at (x, y), front first.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the sequence
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        layer_list = get_layers()                                                           # O(1)
+        sequence = self.sequences.get(x * self.height + y, b"")                             # O(1)
+        if self.reversed == True:                                                           # O(1)
+            sequence = reversed(sequence)                                                   # O(1)
+        return [layer_list[index] for index in sequence]                                    # O(m)
+
+    def visible_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        Returns the layer sequence of the square at (x, y) from its last constant layer onwards.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the sequence
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        applied = self.applied_layers(x, y)                                                 # O(m)
+        for i in range(len(applied) - 1, -1, -1):                                           # O(m)
+            if applied[i].is_constant == True:                                              # O(1)
+                return applied[i:]                                                          # O(m)
+        return applied                                                                      # O(1)
+
+    def pipeline(self, x: int, y: int) -> Pipeline:
+        """
+        Returns the compiled visible layers of the square at (x, y).
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the sequence
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        return self.pipelines.get_stack(self.visible_layers(x, y))                          # O(m)
+
+    def state_labels(self, ids: dict) -> np.ndarray:
+        """
+        Labels every empty square 0, and every other square the id of its layer sequence in ids (see LayerArray.state_labels).
+
+        Complexity:
+        - Worst case: O(mn + kd), Where m is the number of rows, n is the number of columns,
+          k is the number of non-empty squares and d is the number of layers in a sequence
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+            Happens when every square is empty
+        """
+        labels = np.zeros((self.width, self.height), dtype=np.int64)                        # O(mn)
+        flat = labels.reshape(-1)                                                           # O(1), A view, indexed by x * height + y like sequences
+        for key, sequence in self.sequences.items():                                        # O(k)
+            if len(sequence) > 0:                                                           # O(1)
+                state = bytes(reversed(sequence)) if self.reversed == True else bytes(sequence)     # O(d), Front first
+                flat[key] = ids.setdefault(state, len(ids) + 1)                             # O(d), Hashing the sequence
+        return labels                                                                       # O(1)
+
+    def read_block(self, x: int, y: int, width: int, height: int) -> AdditiveBlock:
+        """
+        Copies the sequences of the non-empty squares of the block, front first.
+
+        Complexity:
+        - Worst case: O(mn + kd), Where m and n are the height and width of the block,
+          k is the number of non-empty squares in it and d is the number of layers in a sequence
+        - Best case: O(mn), Where m and n are the height and width of the block
+            Happens when every square is empty
+        """
+        stacks = {}                                                                         # O(1)
+        for dx in range(width):                                                             # O(n)
+            for dy in range(height):                                                        # O(m)
+                sequence = self.sequences.get((x + dx) * self.height + y + dy)              # O(1)
+                if sequence is not None and len(sequence) > 0:                              # O(1)
+                    stacks[(dx, dy)] = bytes(reversed(sequence)) if self.reversed == True else bytes(sequence)   # O(d)
+        return AdditiveBlock(width, height, stacks)                                         # O(1)
+
+    def write_block(self, x: int, y: int, block: AdditiveBlock) -> None:
+        """
+        Complexity:
+        - Worst case: O(mn + kd), Where m and n are the height and width of the block,
+          k is the number of non-empty squares in it and d is the number of layers in a sequence
+        - Best case: O(mn), Where m and n are the height and width of the block
+            Happens when every square of the block is empty
+        """
+        for dx in range(block.width):                                                       # O(n)
+            for dy in range(block.height):                                                  # O(m)
+                self.sequences.pop((x + dx) * self.height + y + dy, None)                   # O(1)
+        for (dx, dy), stack in block.stacks.items():                                        # O(k)
+            sequence = bytearray(reversed(stack)) if self.reversed == True else bytearray(stack)   # O(d)
+            self.sequences[(x + dx) * self.height + y + dy] = sequence                      # O(1)
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes held by the layer sequences, one per layer.
+
+        Complexity:
+        - Worst case: O(k), Where k is the number of squares with a layer sequence
+        - Best case: O(k), Where k is the number of squares with a layer sequence
+        """
+        return sum(len(sequence) for sequence in self.sequences.values())                   # O(k)
@@ -0,0 +1,40 @@
+"""
+Benchmark: the memory and construction time of AdditiveLayerStore.
+
+Reports the memory of an empty store, of a store holding a few layers, and the time
+to construct Grid(DRAW_STYLE_ADD, ...) with the object per square layout.
+
+Usage: python -m benchmarks.additive_store
+"""
+
+import time
+import tracemalloc
+from grid import Grid
+from layer_store import AdditiveLayerStore
+from layers import red, lighten, rainbow
+
+SIZES = [32, 64, 128]
+STORES = 1000
+
+def store_memory(layer_count: int) -> float:
+    tracemalloc.start()
+    stores = []
+    for _ in range(STORES):
+        store = AdditiveLayerStore()
+        for i in range(layer_count):
+            store.add((red, lighten, rainbow)[i % 3])
+        stores.append(store)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory / STORES
+
+def main():
+    for layer_count in [0, 3, 50]:
+        print(f"Store with {layer_count:3d} layers: {store_memory(layer_count):10.0f} bytes")
+    for size in SIZES:
+        start = time.perf_counter()
+        Grid(Grid.DRAW_STYLE_ADD, size, size, Grid.LAYOUT_OBJECTS)
+        print(f"Grid(DRAW_STYLE_ADD, {size}, {size}): {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+if __name__ == "__main__":
+    main()
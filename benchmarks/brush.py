@@ -0,0 +1,42 @@
+"""
+Benchmark: paint throughput against brush radius.
+
+For each brush shape and radius, paints PAINTS strokes centred at random squares of a
+SIZE x SIZE grid (alternating two layers, so every square under the brush changes) and
+reports the time per paint and the number of squares painted per second.
+
+Usage: python -m benchmarks.brush
+"""
+
+import random
+import time
+from grid import Grid
+from layers import red, blue
+
+SIZE = 512
+RADII = [1, 2, 5, 10, 25, 50, 100, 200]
+PAINTS = 20
+
+def measure(layout: str, shape: str, radius: int) -> tuple[float, float]:
+    grid = Grid(Grid.DRAW_STYLE_SET, SIZE, SIZE, layout)
+    grid.brush_shape = shape
+    grid.brush_size = radius
+    rng = random.Random(radius)
+    centres = [(rng.randrange(SIZE), rng.randrange(SIZE)) for _ in range(PAINTS)]
+    squares = 0
+    start = time.perf_counter()
+    for i, (x, y) in enumerate(centres):
+        squares += sum(int(step.affected_mask.sum()) for step in grid.paint((red, blue)[i % 2], x, y).steps)
+    elapsed = time.perf_counter() - start
+    return elapsed / PAINTS, squares / elapsed
+
+def main():
+    print(f"{'layout':8} {'shape':8} {'radius':>6} {'ms/paint':>10} {'squares/s':>12}")
+    for layout in [Grid.LAYOUT_OBJECTS, Grid.LAYOUT_ARRAYS]:
+        for shape in Grid.BRUSH_SHAPE_OPTIONS:
+            for radius in RADII:
+                per_paint, rate = measure(layout, shape, radius)
+                print(f"{layout:8} {shape:8} {radius:6} {per_paint * 1000:10.2f} {rate:12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark: recompositing only the changed grid squares.
+
+Compares a full Compositor.composite against Compositor.update after painting
+a varying number of grid squares, which should scale with the number of changes.
+
+Usage: python -m benchmarks.dirty_cells
+"""
+
+import random
+import time
+from compositor import Compositor
+from grid import Grid
+from layers import red, lighten, black
+
+SIZE = 256
+CHANGED = [0, 16, 256, 4096, 65536]
+BG = (255, 255, 255)
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    grid = Grid(Grid.DRAW_STYLE_SET, SIZE, SIZE)
+    compositor = Compositor(grid, BG)
+    print(f"Full composite of {SIZE}x{SIZE}: {timed(compositor.composite, 0) * 1000:8.2f} ms")
+    compositor.update(0)
+    rng = random.Random(1)
+    squares = [(x, y) for x in range(SIZE) for y in range(SIZE)]
+    for changed in CHANGED:
+        for i, (x, y) in enumerate(rng.sample(squares, changed)):
+            grid.paint_square((red, lighten, black)[i % 3], x, y)
+        elapsed = timed(compositor.update, 0)
+        print(f"update after {changed:6d} changed squares: {elapsed * 1000:8.2f} ms")
+        grid.mark_all_changed()
+        compositor.update(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: the scanline region search of Grid.flood_fill against a fill that visits one square at a time
+with a queue, and the time of whole fills.
+
+Usage: python -m benchmarks.fill
+"""
+
+import time
+import numpy as np
+import fill
+from grid import Grid
+from layers import red
+
+# The per-square search is skipped on the largest size, where it would take minutes.
+SIZES = [256, 1024, 4096]
+PER_SQUARE_MAX = 1024
+
+def per_square_region(same, x, y):
+    height, width = same.shape
+    region = np.zeros_like(same)
+    region[y, x] = True
+    queue = [(x, y)]
+    while queue:
+        cx, cy = queue.pop()
+        for nx, ny in ((cx - 1, cy), (cx + 1, cy), (cx, cy - 1), (cx, cy + 1)):
+            if 0 <= nx < width and 0 <= ny < height and same[ny, nx] and not region[ny, nx]:
+                region[ny, nx] = True
+                queue.append((nx, ny))
+    return region
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    print(f"{'size':>6} {'labels ms':>10} {'scanline ms':>12} {'per square ms':>14} {'whole fill ms':>14}")
+    for size in SIZES:
+        grid = Grid(Grid.DRAW_STYLE_SET, size, size, Grid.LAYOUT_ARRAYS)
+        # A wall down the middle, with a gap, so the region is not the whole grid.
+        for y in range(size - size // 8):
+            grid.paint_square(red, size // 2, y)
+        x, y = size // 4, size // 4
+        label_time, labels = timed(grid.state_labels)
+        same = np.ascontiguousarray((labels == labels[x, y]).T)
+        scan_time, spans = timed(lambda: fill.region_spans(same, x, y))
+        line = f"{size:>6} {label_time * 1000:>10.1f} {scan_time * 1000:>12.1f}"
+        if size <= PER_SQUARE_MAX:
+            square_time, region = timed(lambda: per_square_region(same, x, y))
+            assert int(region.sum()) == sum(end - start + 1 for _, start, end in spans)
+            line += f" {square_time * 1000:>14.1f}"
+        else:
+            line += f" {'-':>14}"
+        fill_time, action = timed(lambda: grid.flood_fill(red, x, y))
+        # The region is every square but the wall, painted red too.
+        assert grid.coverage.count(red) == size - size // 8 + sum(end - start + 1 for _, start, end in spans)
+        line += f" {fill_time * 1000:>14.1f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: the object per square grid layout against the array layout.
+
+For each draw style and grid size, reports the memory taken by the grid, the time to
+construct it, the throughput of paint_square, and the time of a grid-wide special.
+The object layout is skipped (with its memory extrapolated from the smallest grid)
+when it would need more than MEMORY_LIMIT bytes.
+
+Usage: python -m benchmarks.grid_layout
+"""
+
+import random
+import time
+import tracemalloc
+from grid import Grid
+from layers import red, lighten, black, rainbow
+
+SIZES = [32, 512, 4096]
+PAINTS = 100000
+MEMORY_LIMIT = 1 << 30
+
+def measure(draw_style: str, size: int, layout: str) -> tuple[int, float, float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    grid = Grid(draw_style, size, size, layout)
+    built = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    rng = random.Random(1)
+    squares = [(rng.randrange(size), rng.randrange(size)) for _ in range(PAINTS)]
+    start = time.perf_counter()
+    for i, (x, y) in enumerate(squares):
+        grid.paint_square((red, lighten, black, rainbow)[i % 4], x, y)
+    paints = PAINTS / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    grid.special()
+    special = time.perf_counter() - start
+    return memory, built, paints, special
+
+def main():
+    print(f"{'style':9} {'size':>5} {'layout':8} {'memory':>12} {'build':>10} {'paints/s':>12} {'special':>10}")
+    for draw_style in Grid.DRAW_STYLE_OPTIONS:
+        per_square = None
+        for size in SIZES:
+            for layout in Grid.LAYOUT_OPTIONS:
+                if layout == Grid.LAYOUT_OBJECTS and per_square is not None and per_square * size * size > MEMORY_LIMIT:
+                    estimate = per_square * size * size / (1 << 20)
+                    print(f"{draw_style:9} {size:5} {layout:8} {f'~{estimate:.0f} MB':>12} {'skipped':>10}")
+                    continue
+                memory, built, paints, special = measure(draw_style, size, layout)
+                if layout == Grid.LAYOUT_OBJECTS and per_square is None:
+                    per_square = memory / (size * size)
+                print(f"{draw_style:9} {size:5} {layout:8} {memory / (1 << 20):9.2f} MB {built * 1000:7.1f} ms {paints:12.0f} {special * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
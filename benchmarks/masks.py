@@ -0,0 +1,40 @@
+"""
+Benchmark: Grid.paint_mask, which adds a layer to every square of a mask in a few operations over the
+layer arrays, against calling paint_square for each selected square, for each layout.
+
+Usage: python -m benchmarks.masks
+"""
+
+import time
+import masks
+from grid import Grid
+from layers import red
+
+SIZES = [256, 1024]
+
+def per_square(grid, mask):
+    for x in range(grid.x):
+        for y in range(grid.y):
+            if mask[x, y]:
+                grid.paint_square(red, x, y)
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    print(f"{'size':>6} {'layout':>8} {'paint_mask ms':>14} {'per square ms':>14}")
+    for size in SIZES:
+        mask = masks.checkerboard(size, size, 4) | masks.noise(size, size, 0.2, 0)
+        for layout in Grid.LAYOUT_OPTIONS:
+            if layout == Grid.LAYOUT_OBJECTS and size > 256:
+                continue
+            grid = Grid(Grid.DRAW_STYLE_SEQUENCE, size, size, layout)
+            mask_time, action = timed(lambda: grid.paint_mask(red, mask))
+            grid = Grid(Grid.DRAW_STYLE_SEQUENCE, size, size, layout)
+            square_time, _ = timed(lambda: per_square(grid, mask))
+            print(f"{size:>6} {layout:>8} {mask_time * 1000:>14.1f} {square_time * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    main()
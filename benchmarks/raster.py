@@ -0,0 +1,72 @@
+"""
+Benchmark: the Amanatides-Woo traversal every stroke uses (the window between pointer positions,
+Grid.paint_polyline between cell centres) against the original pointer interpolation, which sampled
+the segment every 0.5 pixels in floating point and bucketed the samples into cells, and against the
+8-connected line rasterizer of the line shape tool, which snaps both ends to cells first.
+The traversal finds every cell the segment crosses, the line rasterizer one per step along the major axis.
+
+Usage: python -m benchmarks.raster
+"""
+
+import math
+import time
+import raster
+
+# Pixel size of a grid square, as in MyWindow with a 32x32 grid.
+SQ_WIDTH = 700 / 32
+SQ_HEIGHT = 700 / 32
+# Long diagonal strokes in pixels, from corner to corner and at shallow angles.
+STROKES = [
+    ((0, 0), (699, 699)),
+    ((699, 0), (0, 699)),
+    ((0, 100), (699, 350)),
+    ((10, 0), (200, 699)),
+]
+REPEATS = 200
+
+def sampled_cells(start, end):
+    # The original interpolation, including the filtering of repeated cells against the previous one.
+    mhat_dist = abs(end[0] - start[0]) + abs(end[1] - start[1])
+    increment = 0.5
+    cells = []
+    prev_drawn = None
+    for d in range(1, math.ceil(mhat_dist/increment)+1):
+        distance = min(d * increment / mhat_dist, 1)
+        nx = distance * (end[0] - start[0]) + start[0]
+        ny = distance * (end[1] - start[1]) + start[1]
+        cell = (int(nx // SQ_WIDTH), int(ny // SQ_HEIGHT))
+        if cell != prev_drawn:
+            cells.append(cell)
+            prev_drawn = cell
+    return cells
+
+def rasterized_cells(start, end):
+    return raster.line_cells(
+        int(start[0] // SQ_WIDTH), int(start[1] // SQ_HEIGHT),
+        int(end[0] // SQ_WIDTH), int(end[1] // SQ_HEIGHT),
+    )[1:]
+
+def traversed_cells(start, end):
+    return raster.segment_cells(
+        start[0] / SQ_WIDTH, start[1] / SQ_HEIGHT,
+        end[0] / SQ_WIDTH, end[1] / SQ_HEIGHT,
+    )[1:]
+
+def timed(func):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = [func(start_pos, end_pos) for start_pos, end_pos in STROKES]
+    return (time.perf_counter() - start) / REPEATS, result
+
+def main():
+    sampled_time, sampled = timed(sampled_cells)
+    raster_time, rasterized = timed(rasterized_cells)
+    traverse_time, traversed = timed(traversed_cells)
+    print(f"{len(STROKES)} strokes")
+    print(f"{'':12} {'cells':>6} {'us/stroke':>10}")
+    print(f"{'sampled':12} {sum(map(len, sampled)):>6} {sampled_time * 1e6 / len(STROKES):>10.1f}")
+    print(f"{'rasterized':12} {sum(map(len, rasterized)):>6} {raster_time * 1e6 / len(STROKES):>10.1f}")
+    print(f"{'traversed':12} {sum(map(len, traversed)):>6} {traverse_time * 1e6 / len(STROKES):>10.1f}")
+
+if __name__ == "__main__":
+    main()
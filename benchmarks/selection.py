@@ -0,0 +1,50 @@
+"""
+Benchmark: Grid.paste, which writes a copied block in bulk, against pasting it one square at a time
+by erasing each square's layers and adding the copied layers back, for each draw style and layout.
+
+Usage: python -m benchmarks.selection
+"""
+
+import time
+import random
+from grid import Grid
+from layers import lighten, red, green, blue
+
+SIZE = 256
+BLOCK = 128
+LAYERS = [lighten, red, green, blue]
+
+def scribble(grid, rng):
+    for _ in range(SIZE * SIZE // 2):
+        grid.paint_square(rng.choice(LAYERS), rng.randrange(SIZE), rng.randrange(SIZE))
+
+def per_square_paste(grid, source, x, y):
+    for dx in range(BLOCK):
+        for dy in range(BLOCK):
+            held = grid[x + dx][y + dy].applied_layers()
+            while len(held) > 0:
+                grid.erase_square(held[0], x + dx, y + dy)
+                held = grid[x + dx][y + dy].applied_layers()
+            for layer in source[dx][dy]:
+                grid.paint_square(layer, x + dx, y + dy)
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    print(f"{'style':>9} {'layout':>8} {'copy ms':>8} {'paste ms':>9} {'per square ms':>14}")
+    for draw_style in Grid.DRAW_STYLE_OPTIONS:
+        for layout in Grid.LAYOUT_OPTIONS:
+            grid = Grid(draw_style, SIZE, SIZE, layout)
+            scribble(grid, random.Random(0))
+            copy_time, block = timed(lambda: grid.copy(0, 0, BLOCK - 1, BLOCK - 1))
+            source = [[grid[x][y].applied_layers() for y in range(BLOCK)] for x in range(BLOCK)]
+            paste_time, action = timed(lambda: grid.paste(block, BLOCK, BLOCK))
+            action.undo_apply(grid)
+            square_time, _ = timed(lambda: per_square_paste(grid, source, BLOCK, BLOCK))
+            print(f"{draw_style:>9} {layout:>8} {copy_time * 1000:>8.1f} {paste_time * 1000:>9.1f} {square_time * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark: the sparkle layer's generator jump-ahead against the original loop.
+
+Usage: python -m benchmarks.sparkle
+"""
+
+import time
+import numpy as np
+from layers import sparkle, lighten, darken
+
+SIZE = 128
+TIMESTAMP = 12.3
+COLOR = (100, 100, 100)
+
+def sparkle_loop(color, timestamp, x, y):
+    # The original sparkle, which steps the generator one iteration at a time.
+    ts = int((timestamp + x/3 + y/5) * 3)
+    other = x
+    for _ in range(10 + (ts * 31 % 17)):
+        other = (1103515245 * other + 12345) % (1 << 31)
+    other += y
+    for _ in range(10 + (ts * 31 % 17)):
+        other = (1103515245 * other + 12345) % (1 << 31)
+    other = (other & ((1 << 31)-1)) >> 16
+    if other/(1 << 15) < 0.1:
+        return lighten.apply(color, timestamp, x, y)
+    return darken.apply(color, timestamp, x, y)
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    squares = [(x, y) for x in range(SIZE) for y in range(SIZE)]
+    loop_time, expected = timed(lambda: [sparkle_loop(COLOR, TIMESTAMP, x, y) for x, y in squares])
+    jump_time, scalar = timed(lambda: [sparkle.apply(COLOR, TIMESTAMP, x, y) for x, y in squares])
+    xs = np.array([x for x, _ in squares])
+    ys = np.array([y for _, y in squares])
+    colors = np.tile(np.array(COLOR), (len(squares), 1))
+    batch_time, batched = timed(lambda: sparkle.apply_batch(colors, TIMESTAMP, xs, ys))
+    assert scalar == expected and batched.tolist() == [list(c) for c in expected]
+    print(f"{len(squares)} squares")
+    print(f"original loop:    {loop_time * 1000:8.2f} ms")
+    print(f"jump-ahead:       {jump_time * 1000:8.2f} ms")
+    print(f"jump-ahead batch: {batch_time * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: symmetric painting against painting every copy separately.
+
+For each symmetry, paints STROKES random strokes of POINTS points on a SIZE x SIZE grid, once with
+the grid's symmetry, which copies the stroke's footprint and paints the union once, and once by
+painting the stroke at every mirrored or rotated set of centres with paint_stroke, the way symmetry
+would work without symmetry.py. The strokes wander around the centre of the grid, where the copies overlap,
+so painting the copies separately paints the overlaps again. The time per stroke both ways, the squares
+each way paints and the squares painted per second with the grid's symmetry are reported.
+
+Usage: python -m benchmarks.symmetry
+"""
+
+import math
+import random
+import time
+import symmetry
+from grid import Grid
+from layers import red, blue
+
+SIZE = 512
+RADII = [2, 10, 25]
+STROKES = 10
+POINTS = 40
+MODES = [
+    (Grid.SYMMETRY_BOTH, 2),
+    (Grid.SYMMETRY_RADIAL, 6),
+    (Grid.SYMMETRY_RADIAL, 12),
+]
+
+def strokes(radius: int) -> list[list[tuple[int, int]]]:
+    rng = random.Random(radius)
+    result = []
+    for _ in range(STROKES):
+        x, y = rng.randrange(SIZE // 2 - 64, SIZE // 2 + 64), rng.randrange(SIZE // 2 - 64, SIZE // 2 + 64)
+        points = []
+        for _ in range(POINTS):
+            x = min(max(x + rng.randint(-3, 3), 0), SIZE - 1)
+            y = min(max(y + rng.randint(-3, 3), 0), SIZE - 1)
+            points.append((x, y))
+        result.append(points)
+    return result
+
+def moved_centres(points: list[tuple[int, int]], mode: str, folds: int) -> list[list[tuple[int, int]]]:
+    centre = (SIZE - 1) / 2
+    copies = []
+    for matrix in symmetry.transforms(mode, folds):
+        copies.append([
+            (
+                math.floor(matrix[0][0] * (x - centre) + matrix[0][1] * (y - centre) + centre + 0.5),
+                math.floor(matrix[1][0] * (x - centre) + matrix[1][1] * (y - centre) + centre + 0.5),
+            )
+            for x, y in points
+        ])
+    return copies
+
+def measure(mode: str, folds: int, radius: int, combined: bool) -> tuple[float, int, float]:
+    grid = Grid(Grid.DRAW_STYLE_SET, SIZE, SIZE, Grid.LAYOUT_ARRAYS)
+    grid.brush_size = radius
+    grid.brush_shape = Grid.BRUSH_SHAPE_CIRCLE
+    squares = 0
+    start = time.perf_counter()
+    for i, points in enumerate(strokes(radius)):
+        layer = (red, blue)[i % 2]
+        if combined:
+            grid.symmetry, grid.symmetry_folds = mode, folds
+            squares += len(grid.paint_stroke(layer, points).steps)
+        else:
+            for copy in moved_centres(points, mode, folds):
+                squares += len(grid.paint_stroke(layer, copy).steps)
+    elapsed = time.perf_counter() - start
+    return elapsed / STROKES, squares, squares / elapsed
+
+def main():
+    print(f"{'symmetry':10} {'folds':>5} {'radius':>6} {'copies ms':>10} {'squares':>9} {'union ms':>10} {'squares':>9} {'squares/s':>11}")
+    for mode, folds in MODES:
+        for radius in RADII:
+            separate, separate_squares, _ = measure(mode, folds, radius, False)
+            combined, squares, rate = measure(mode, folds, radius, True)
+            print(f"{mode:10} {folds:5} {radius:6} {separate * 1000:10.2f} {separate_squares:9} {combined * 1000:10.2f} {squares:9} {rate:11.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Brush stencils.
+
+A stencil is the set of squares a brush of a given shape and radius covers, relative to
+its centre, stored as one horizontal span per row: (dy, dx_start, dx_end), inclusive.
+Stencils are computed once per shape and radius and cached, and painting only clips each
+span to the grid, so no square outside the brush is ever tested.
+- DIAMOND: |dx| + |dy| <= radius, the original brush.
+- SQUARE: |dx| <= radius and |dy| <= radius.
+- CIRCLE: dx^2 + dy^2 <= radius^2.
+"""
+
+from __future__ import annotations
+import math
+
+DIAMOND = "DIAMOND"
+SQUARE = "SQUARE"
+CIRCLE = "CIRCLE"
+SHAPES = (
+    DIAMOND,
+    SQUARE,
+    CIRCLE
+)
+
+_stencils = {}
+
+def stencil(shape: str, radius: int) -> tuple[tuple[int, int, int], ...]:
+    """
+    Returns the spans of a brush, computing them on first use.
+
+    Args:
+    - shape: One of SHAPES
+        Type: String
+    - radius: The brush size, at least 0
+        Type: Integer
+
+    Returns:
+    - One (dy, dx_start, dx_end) span per row, from dy = -radius to dy = radius
+        Type: Tuple of tuples of 3 integers
+
+    Complexity:
+    - Worst case: O(r), Where r is the radius
+        Happens the first time the stencil is used
+    - Best case: O(1)
+        Happens when the stencil has been computed already
+    """
+    key = (shape, radius)                                                                   # O(1)
+    spans = _stencils.get(key)                                                              # O(1)
+    if spans is None:                                                                       # O(1)
+        if shape not in SHAPES:                                                             # O(1)
+            raise ValueError(f"Unknown brush shape {shape}.")
+        rows = []                                                                           # O(1)
+        for dy in range(-radius, radius + 1):                                               # O(r)
+            if shape == DIAMOND:                                                            # O(1)
+                half = radius - abs(dy)                                                     # O(1)
+            elif shape == SQUARE:                                                           # O(1)
+                half = radius                                                               # O(1)
+            else:                                                                           # O(1)
+                half = math.isqrt(radius * radius - dy * dy)                                # O(1)
+            rows.append((dy, -half, half))                                                  # O(1)
+        spans = _stencils[key] = tuple(rows)                                                # O(r)
+    return spans                                                                            # O(1)
+
+def clipped_spans(shape: str, radius: int, x: int, y: int, width: int, height: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the spans of a brush centred on (x, y), clipped to a width x height grid.
+
+    Args:
+    - shape: One of SHAPES
+        Type: String
+    - radius: The brush size
+        Type: Integer
+    - x: The x coordinate of the centre
+        Type: Integer
+    - y: The y coordinate of the centre
+        Type: Integer
+    - width: The number of columns of the grid
+        Type: Integer
+    - height: The number of rows of the grid
+        Type: Integer
+
+    Returns:
+    - One (y, x_start, x_end) span, inclusive, per row the brush covers inside the grid
+        Type: List of tuples of 3 integers
+
+    Complexity:
+    - Worst case: O(r), Where r is the radius
+    - Best case: O(r), Where r is the radius
+    """
+    spans = []                                                                              # O(1)
+    for dy, start, end in stencil(shape, radius):                                           # O(r)
+        row = y + dy                                                                        # O(1)
+        if 0 <= row < height:                                                               # O(1)
+            start = max(x + start, 0)                                                       # O(1)
+            end = min(x + end, width - 1)                                                   # O(1)
+            if start <= end:                                                                # O(1)
+                spans.append((row, start, end))                                             # O(1)
+    return spans                                                                            # O(1)
+
+def stroke_spans(shape: str, radius: int, points: list[tuple[int, int]], width: int, height: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the union of the footprints of a brush centred on each of the points, clipped to a width x height grid.
+    The spans of every footprint are gathered per row, sorted and merged, so overlapping footprints cover each square once.
+
+    Args:
+    - shape: One of SHAPES
+        Type: String
+    - radius: The brush size
+        Type: Integer
+    - points: The (x, y) centres of the footprints, in any order, repeats allowed
+        Type: List of tuples of 2 integers
+    - width: The number of columns of the grid
+        Type: Integer
+    - height: The number of rows of the grid
+        Type: Integer
+
+    Returns:
+    - Disjoint, non adjacent (y, x_start, x_end) spans, inclusive, sorted by row then by x_start
+        Type: List of tuples of 3 integers
+
+    Complexity:
+    - Worst case: O(pr log(pr)), Where p is the number of points and r is the radius
+        Happens when the footprints share rows, so every row has many spans to sort
+    - Best case: O(pr), Where p is the number of points and r is the radius
+        Happens when there is a single point, since each row then holds one span
+    """
+    rows = {}                                                                               # O(1), Maps a row to the spans of every footprint in it
+    for x, y in points:                                                                     # O(p)
+        for row, start, end in clipped_spans(shape, radius, x, y, width, height):           # O(r)
+            rows.setdefault(row, []).append((start, end))                                   # O(1)
+    spans = []                                                                              # O(1)
+    for row in sorted(rows):                                                                # O(h log h), Where h is the number of rows the stroke reaches
+        merged_start, merged_end = None, None                                               # O(1)
+        for start, end in sorted(rows[row]):                                                # O(k log k), Where k is the number of spans in the row
+            if merged_end is not None and start <= merged_end + 1:                          # O(1), Overlaps or touches the span being merged
+                merged_end = max(merged_end, end)                                           # O(1)
+            else:                                                                           # O(1)
+                if merged_end is not None:                                                  # O(1)
+                    spans.append((row, merged_start, merged_end))                           # O(1)
+                merged_start, merged_end = start, end                                       # O(1)
+        spans.append((row, merged_start, merged_end))                                       # O(1)
+    return spans                                                                            # O(1)
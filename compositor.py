@@ -0,0 +1,264 @@
+"""
+Grid compositor.
+
+Evaluates every grid square into a single HxWx3 uint8 framebuffer, which the
+window uploads to the GPU as one texture instead of drawing a rectangle per square.
+The framebuffer can cover a viewport of the grid rather than all of it, so a large tiled
+canvas only costs memory for the part on screen.
+Does not depend on a window, so it can be used (and tested) headless.
+"""
+
+from __future__ import annotations
+import numpy as np
+from grid import Grid
+from pipeline import Pipeline
+
+def composite_reference(grid: Grid, bg: tuple[int, int, int], timestamp: float) -> np.ndarray:
+    """
+    Reference implementation of the compositor, which calls LayerStore.get_color once per grid square.
+
+    Args:
+    - grid: The grid to be evaluated
+        Type: Grid Object
+    - bg: The colour underneath every grid square
+        Type: Tuple of 3 integers
+    - timestamp: Used for layers that change over time (Such as rainbow and sparkle)
+        Type: Float
+
+    Returns:
+    - An array of shape (grid.y, grid.x, 3) where buffer[y, x] is the colour of grid[x][y]
+        Type: numpy.ndarray of uint8
+
+    Complexity:
+    - Worst case: O(mnp), Where m is the number of rows, n is the number of columns and p is the cost of get_color
+    - Best case: O(mnp), Where m is the number of rows, n is the number of columns and p is the cost of get_color
+    """
+    buffer = np.zeros((grid.y, grid.x, 3), dtype=np.uint8)                                  # O(mn)
+    for x in range(grid.x):                                                                 # O(n), Where n is the number of columns
+        for y in range(grid.y):                                                             # O(m), Where m is the number of rows
+            buffer[y, x] = grid[x][y].get_color(tuple(bg), timestamp, x, y)                 # O(p)
+    return buffer                                                                           # O(1)
+
+class Compositor:
+    """
+    Composites a viewport of a grid into a framebuffer that is reused between frames.
+    - viewport: The (x, y, width, height) of the grid squares the framebuffer covers.
+    - buffer: Array of shape (height, width, 3), where buffer[y - viewport y, x - viewport x] is the colour of grid[x][y].
+      Row 0 is the bottom row of the viewport, flip it vertically before handing it to an image library.
+    - animated: The grid squares whose layers depend on the timestamp, grouped by their stack of layers.
+      Every other square keeps its cached colour in the buffer until the grid reports that it changed.
+
+    Squares with the same stack of layers are evaluated together with the layers' batch kernels,
+    or just once when the stack depends on neither the timestamp nor the position.
+    A stack only holds the layers a square's store reports as visible, so an animated layer
+    hidden under a constant one does not keep its square animated.
+    For a grid with LAYOUT_TILES, the squares that were never painted are filled in all at once.
+    Changes outside the viewport are skipped, and every square of the viewport is evaluated again when it moves.
+    """
+
+    def __init__(self, grid: Grid, bg: tuple[int, int, int], viewport: tuple[int, int, int, int] = None) -> None:
+        """
+        Initialises the compositor for the given grid.
+
+        Args:
+        - grid: The grid to be evaluated
+            Type: Grid Object
+        - bg: The colour underneath every grid square
+            Type: Tuple of 3 integers
+        - viewport: The (x, y, width, height) of the squares to composite, the whole grid if not given
+            Type: Tuple of 4 integers
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the viewport
+        - Best case: O(mn), Where m and n are the height and width of the viewport
+        """
+        self.grid = grid                                                                    # O(1)
+        self.bg = tuple(bg)                                                                 # O(1)
+        self.stacks = {}                                                                    # O(1), Stack key -> compiled Pipeline
+        self.buffer = None                                                                  # O(1), Allocated by set_viewport
+        self.set_viewport(*((0, 0, grid.x, grid.y) if viewport is None else viewport))      # O(mn)
+
+    def set_viewport(self, x: int, y: int, width: int, height: int) -> None:
+        """
+        Moves the framebuffer to cover the width x height grid squares starting at (x, y),
+        so the next update evaluates every square of it again.
+
+        Args:
+        - x: The x coordinate of the viewport's bottom left square
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+        - width: The number of columns of the viewport
+            Type: Integer
+        - height: The number of rows of the viewport
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the viewport
+            Happens when the size of the viewport changes, so the framebuffer is allocated again
+        - Best case: O(1)
+            Happens when the viewport keeps its size
+        """
+        self.viewport = (x, y, width, height)                                               # O(1)
+        if self.buffer is None or self.buffer.shape[:2] != (height, width):                 # O(1)
+            self.buffer = np.zeros((height, width, 3), dtype=np.uint8)                     # O(mn)
+        self.epoch = -1                                                                     # O(1), Every square is older than this, so the next update is a full one
+        self.animated = {}                                                                  # O(1), Stack key -> set of squares
+        self.animated_positions = {}                                                        # O(1), Stack key -> (xs, ys) arrays of the squares in animated
+        self.square_stacks = {}                                                             # O(1), Animated square -> its stack key
+
+    def composite(self, timestamp: float) -> np.ndarray:
+        """
+        Brings the whole framebuffer up to date for the given timestamp.
+        Only squares that changed since the last call, or whose layers depend on the timestamp, are evaluated.
+
+        Args:
+        - timestamp: Used for layers that change over time (Such as rainbow and sparkle)
+            Type: Float
+
+        Returns:
+        - The framebuffer, which is overwritten by the next call
+            Type: numpy.ndarray of uint8
+
+        Complexity:
+        - Worst case: O(mnd), Where m and n are the height and width of the viewport and d is the number of layers in a stack
+            Happens on the first call, after the whole grid changed, or when every square is animated
+        - Best case: O(kd), Where k is the number of changed and animated squares and d is the number of layers in a stack
+        """
+        self.update(timestamp)                                                              # O(kd)
+        for key in self.animated:                                                           # O(s), Where s is the number of distinct animated stacks
+            if key not in self.animated_positions:                                          # O(1)
+                squares = np.array(list(self.animated[key]), dtype=np.int64).reshape(-1, 2)      # O(a), Where a is the number of squares in the group
+                self.animated_positions[key] = (squares[:, 0], squares[:, 1])               # O(1)
+            xs, ys = self.animated_positions[key]                                           # O(1)
+            self.evaluate(self.stacks[key], timestamp, xs, ys)                              # O(ad)
+        return self.buffer                                                                  # O(1)
+
+    def update(self, timestamp: float) -> np.ndarray:
+        """
+        Recomposites only the grid squares changed since the previous update, leaving the rest of the framebuffer as it was.
+        Squares holding animated layers are not refreshed unless they changed, so this suits exporters and autosave rather than the window.
+
+        Args:
+        - timestamp: Used for layers that change over time (Such as rainbow and sparkle)
+            Type: Float
+
+        Returns:
+        - The framebuffer, which is overwritten by the next call
+            Type: numpy.ndarray of uint8
+
+        Complexity:
+        - Worst case: O(mnd), Where m and n are the height and width of the viewport and d is the number of layers in a stack
+            Happens on the first update, after the whole grid changed, or after the viewport moved
+        - Best case: O(kd), Where k is the number of changed squares and d is the number of layers in a stack
+        """
+        grid = self.grid                                                                    # O(1)
+        if grid.untouched_changed_since(self.epoch) == True:                                # O(1)
+            self.fill_untouched(timestamp)                                                  # O(mn)
+        groups = {}                                                                         # O(1)
+        for x, y in grid.changes_since(self.epoch, self.viewport):                          # O(k)
+            layers = grid[x][y].visible_layers()                                            # O(d)
+            key = tuple(layer.index for layer in layers)                                    # O(d)
+            if key not in self.stacks:                                                      # O(d)
+                self.stacks[key] = Pipeline(layers)                                         # O(d)
+            self.set_animated((x, y), key, any(layer.time_dependent for layer in layers))   # O(d)
+            groups.setdefault(key, []).append((x, y))                                       # O(1)
+        self.epoch = grid.epoch                                                             # O(1)
+
+        for key, squares in groups.items():                                                 # O(s), Where s is the number of distinct stacks changed
+            squares = np.array(squares, dtype=np.int64)                                     # O(a), Where a is the number of squares in the group
+            self.evaluate(self.stacks[key], timestamp, squares[:, 0], squares[:, 1])        # O(ad)
+        return self.buffer                                                                  # O(1)
+
+    def fill_untouched(self, timestamp: float) -> None:
+        """
+        Fills the whole framebuffer, so every square of the viewport, with the colour of the squares that were never painted.
+        The painted squares are reported as changed at the same time, so they are evaluated again afterwards.
+
+        Args:
+        - timestamp: Used for layers that change over time (Such as rainbow and sparkle)
+            Type: Float
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mnd), Where m and n are the height and width of the viewport and d is the number of untouched layers
+            Happens when the untouched layers depend on the timestamp or position
+        - Best case: O(mn), Where m and n are the height and width of the viewport
+        """
+        pipeline = Pipeline(self.grid.untouched_layers())                                   # O(d)
+        if pipeline.uniform == True:                                                        # O(1)
+            self.buffer[:] = pipeline(self.bg, timestamp, 0, 0)                             # O(mn)
+        else:                                                                               # O(1)
+            x, y, width, height = self.viewport                                             # O(1)
+            ys, xs = np.indices((height, width)).reshape(2, -1)                             # O(mn)
+            self.evaluate(pipeline, timestamp, xs + x, ys + y)                              # O(mnd)
+
+    def set_animated(self, square: tuple[int, int], key: tuple[int, ...], animated: bool) -> None:
+        """
+        Moves a square into the animated group of its stack, or out of the animated groups altogether.
+
+        Args:
+        - square: The (x, y) coordinates of the square
+            Type: Tuple of 2 integers
+        - key: The layer indices of the square's stack
+            Type: Tuple of integers
+        - animated: Whether the stack depends on the timestamp
+            Type: Boolean
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        old_key = self.square_stacks.pop(square, None)                                      # O(1)
+        if old_key is not None:                                                             # O(1)
+            self.animated[old_key].discard(square)                                          # O(1)
+            self.animated_positions.pop(old_key, None)                                      # O(1)
+            if len(self.animated[old_key]) == 0:                                            # O(1)
+                del self.animated[old_key]                                                  # O(1)
+        if animated == True:                                                                # O(1)
+            self.square_stacks[square] = key                                                # O(1)
+            self.animated.setdefault(key, set()).add(square)                                # O(1)
+            self.animated_positions.pop(key, None)                                          # O(1)
+
+    def evaluate(self, pipeline: Pipeline, timestamp: float, xs: np.ndarray, ys: np.ndarray) -> None:
+        """
+        Evaluates one stack of layers over many squares of the viewport and writes the colours into the framebuffer.
+
+        Args:
+        - pipeline: The compiled stack of layers to apply
+            Type: Pipeline Object
+        - timestamp: Used for layers that change over time (Such as rainbow and sparkle)
+            Type: Float
+        - xs: The x coordinates of the squares
+            Type: numpy.ndarray of integers
+        - ys: The y coordinates of the squares
+            Type: numpy.ndarray of integers
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(ad), Where a is the number of squares and d is the number of steps in the pipeline
+        - Best case: O(a + d), Where a is the number of squares and d is the number of steps in the pipeline
+            Happens when the pipeline is uniform, so it is evaluated once for every square
+        """
+        rows, columns = ys - self.viewport[1], xs - self.viewport[0]                        # O(a), Where the squares are in the framebuffer
+        if pipeline.uniform == True:                                                        # O(1)
+            self.buffer[rows, columns] = pipeline(self.bg, timestamp, 0, 0)                 # O(a + d)
+            return                                                                          # O(1)
+        colors = np.tile(np.array(self.bg, dtype=np.int64), (len(xs), 1))                  # O(a)
+        colors = pipeline.apply_batch(colors, timestamp, xs, ys)                            # O(ad)
+        self.buffer[rows, columns] = colors                                                 # O(a)
@@ -100,6 +100,123 @@ class CircularQueue(Queue[T]):
         self.rear = 0
 
 
+class GrowableCircularQueue(CircularQueue[T]):
+    """ Circular queue that starts small and resizes its array as it is used.
+
+    Attributes:
+         max_capacity (int): most elements the queue can hold
+         (plus those of CircularQueue)
+
+    The array doubles when an append finds it full, up to max_capacity, and
+    halves when serving leaves it a quarter full, down to INITIAL_CAPACITY.
+    Both keep append and serve amortised O(1).
+    """
+    INITIAL_CAPACITY = 2
+
+    def __init__(self, max_capacity: int) -> None:
+        self.max_capacity = max(self.MIN_CAPACITY, max_capacity)
+        CircularQueue.__init__(self, min(self.INITIAL_CAPACITY, self.max_capacity))
+
+    def append(self, item: T) -> None:
+        """ Adds an element to the rear of the queue, growing the array if it is full.
+        :pre: queue is not full
+        :raises Exception: if the queue is full
+        :complexity: O(1) amortised, O(n) when the array grows, where n is the length of the queue
+        """
+        if len(self) == len(self.array) and len(self.array) < self.max_capacity:
+            self.resize(min(2 * len(self.array), self.max_capacity))
+        CircularQueue.append(self, item)
+
+    def serve(self) -> T:
+        """ Deletes and returns the element at the queue's front, shrinking the array if it is mostly empty.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        :complexity: O(1) amortised, O(n) when the array shrinks, where n is the length of the queue
+        """
+        item = CircularQueue.serve(self)
+        if len(self) <= len(self.array) // 4 and len(self.array) > self.INITIAL_CAPACITY:
+            self.resize(max(len(self.array) // 2, self.INITIAL_CAPACITY))
+        return item
+
+    def is_full(self) -> bool:
+        """ True if the queue holds max_capacity elements and no element can be appended. """
+        return len(self) == self.max_capacity
+
+    def resize(self, capacity: int) -> None:
+        """ Moves the elements, front first, into a new array of the given capacity.
+        :pre: capacity is at least the length of the queue
+        :complexity: O(capacity)
+        """
+        array = ArrayR(capacity)
+        for i in range(len(self)):
+            array[i] = self.array[(self.front + i) % len(self.array)]
+        self.array = array
+        self.front = 0
+        self.rear = len(self) % capacity
+
+    def clear(self) -> None:
+        """ Clears all elements from the queue and shrinks the array back to its initial capacity. """
+        CircularQueue.clear(self)
+        self.array = ArrayR(min(self.INITIAL_CAPACITY, self.max_capacity))
+
+
+class GrowableCircularDeque(GrowableCircularQueue[T]):
+    """ Growable circular queue that can also be appended to at the front and served from the rear.
+
+    Used by stores whose order can be reversed in constant time: they keep the
+    elements as they are and swap which end is the front.
+    """
+
+    def append_front(self, item: T) -> None:
+        """ Adds an element to the front of the queue, growing the array if it is full.
+        :pre: queue is not full
+        :raises Exception: if the queue is full
+        :complexity: O(1) amortised, O(n) when the array grows, where n is the length of the queue
+        """
+        if len(self) == len(self.array) and len(self.array) < self.max_capacity:
+            self.resize(min(2 * len(self.array), self.max_capacity))
+        if self.is_full():
+            raise Exception("Queue is full")
+
+        self.front = (self.front - 1) % len(self.array)
+        self.array[self.front] = item
+        self.length += 1
+
+    def serve_rear(self) -> T:
+        """ Deletes and returns the element at the queue's rear, shrinking the array if it is mostly empty.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        :complexity: O(1) amortised, O(n) when the array shrinks, where n is the length of the queue
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+
+        self.length -= 1
+        self.rear = (self.rear - 1) % len(self.array)
+        item = self.array[self.rear]
+        if len(self) <= len(self.array) // 4 and len(self.array) > self.INITIAL_CAPACITY:
+            self.resize(max(len(self.array) // 2, self.INITIAL_CAPACITY))
+        return item
+
+    def peek(self) -> T:
+        """ Returns the element at the queue's front without removing it.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        return self.array[self.front]
+
+    def peek_rear(self) -> T:
+        """ Returns the element at the queue's rear without removing it.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        return self.array[(self.rear - 1) % len(self.array)]
+
+
 class TestQueue(unittest.TestCase):
     """ Tests for the above class."""
     EMPTY = 0
@@ -184,6 +301,76 @@ class TestQueue(unittest.TestCase):
             self.assertEqual(len(queue), 0)
             self.assertTrue(queue.is_empty())
 
+class TestGrowableQueue(TestQueue):
+    """ Runs the tests above against GrowableCircularQueue, plus its resizing."""
+
+    def setUp(self):
+        self.lengths = [self.EMPTY, self.ROOMY, self.LARGE, 0, 0]
+        self.queues = [GrowableCircularQueue(self.CAPACITY) for i in range(len(self.lengths))]
+        for queue, length in zip(self.queues, [self.EMPTY, self.ROOMY, self.LARGE, self.ROOMY, self.LARGE]):
+            for i in range(length):
+                queue.append(i)
+        self.empty_queue = self.queues[0]
+        self.roomy_queue = self.queues[1]
+        self.large_queue = self.queues[2]
+        self.clear_queue = self.queues[3]
+        self.clear_queue.clear()
+        self.queues[4].clear()
+
+    def test_resize(self):
+        queue = GrowableCircularQueue(self.CAPACITY)
+        self.assertEqual(len(queue.array), GrowableCircularQueue.INITIAL_CAPACITY)
+        for i in range(self.CAPACITY):
+            queue.append(i)
+        self.assertTrue(queue.is_full())
+        self.assertEqual(len(queue.array), self.CAPACITY)
+        self.assertRaises(Exception, queue.append, self.CAPACITY)
+        for i in range(self.CAPACITY - 1):
+            self.assertEqual(queue.serve(), i)
+            queue.append(self.CAPACITY + i)
+        for i in range(self.CAPACITY):
+            self.assertEqual(queue.serve(), self.CAPACITY - 1 + i)
+        self.assertEqual(len(queue.array), GrowableCircularQueue.INITIAL_CAPACITY)
+
+class TestGrowableDeque(TestGrowableQueue):
+    """ Runs the tests above against GrowableCircularDeque, plus its operations at the other ends."""
+
+    def setUp(self):
+        TestGrowableQueue.setUp(self)
+        self.queues = [GrowableCircularDeque(self.CAPACITY) for i in range(len(self.lengths))]
+        for queue, length in zip(self.queues, self.lengths):
+            for i in range(length):
+                queue.append(i)
+        self.empty_queue = self.queues[0]
+        self.roomy_queue = self.queues[1]
+        self.large_queue = self.queues[2]
+        self.clear_queue = self.queues[3]
+
+    def test_both_ends(self):
+        deque = GrowableCircularDeque(self.CAPACITY)
+        expected = []
+        for i in range(self.CAPACITY):
+            if i % 2 == 0:
+                deque.append(i)
+                expected.append(i)
+            else:
+                deque.append_front(i)
+                expected.insert(0, i)
+        self.assertTrue(deque.is_full())
+        self.assertRaises(Exception, deque.append_front, self.CAPACITY)
+        for i in range(self.CAPACITY):
+            if i % 3 == 0:
+                self.assertEqual(deque.serve_rear(), expected.pop())
+            else:
+                self.assertEqual(deque.peek(), expected[0])
+                self.assertEqual(deque.serve(), expected.pop(0))
+            if len(expected) > 0:
+                self.assertEqual(deque.peek_rear(), expected[-1])
+        self.assertTrue(deque.is_empty())
+        self.assertRaises(Exception, deque.serve_rear)
+        self.assertEqual(len(deque.array), GrowableCircularDeque.INITIAL_CAPACITY)
+
+
 if __name__ == '__main__':
     testtorun = TestQueue()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
@@ -0,0 +1,165 @@
+"""
+Scanline flood fill.
+
+The region is found over runs rather than squares: each row of the grid is split into runs,
+the maximal horizontal spans of squares that match the seed, all found at once with numpy.
+Two runs in neighbouring rows are connected when they share a column, so the region is the set
+of runs reachable from the run holding the seed, found with an explicit stack (no recursion)
+and a binary search for the overlapping runs of each neighbouring row.
+The work is proportional to the number of runs, which is the number of rows for a region without holes.
+
+On a tiled grid the region is found a chunk at a time instead (see chunked_region), so only the chunks
+it reaches are ever labelled, however large the canvas is.
+"""
+
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from typing import Callable
+import numpy as np
+
+def region_spans(inside: np.ndarray, x: int, y: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the 4-connected region of matching squares holding (x, y), as horizontal spans.
+
+    Args:
+    - inside: Array of shape (height, width), True where a square matches the seed
+        Type: numpy.ndarray of bool
+    - x: The x coordinate of the seed
+        Type: Integer
+    - y: The y coordinate of the seed
+        Type: Integer
+
+    Returns:
+    - One (y, x_start, x_end) span, inclusive, per run of the region, sorted by row then by x_start.
+      Empty if the seed does not match
+        Type: List of tuples of 3 integers
+
+    Complexity:
+    - Worst case: O(mn + r log r), Where m is the number of rows, n is the number of columns and r is the number of runs
+        Finding the runs is a few numpy operations over the grid, then every run is visited once
+    - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        Happens when the seed does not match
+    """
+    return seeded_spans(inside, [(x, y)])                                                   # O(mn + r log r)
+
+def seeded_spans(inside: np.ndarray, seeds: list[tuple[int, int]]) -> list[tuple[int, int, int]]:
+    """
+    region_spans for several seeds at once: the union of the regions of the seeds that match.
+
+    Args:
+    - inside: Array of shape (height, width), True where a square matches
+        Type: numpy.ndarray of bool
+    - seeds: The (x, y) coordinates of the seeds
+        Type: List of tuples of 2 integers
+
+    Returns:
+    - One (y, x_start, x_end) span, inclusive, per run of the regions, sorted by row then by x_start
+        Type: List of tuples of 3 integers
+
+    Complexity:
+    - Worst case: O(mn + r log r + s log r), Where m is the number of rows, n is the number of columns,
+      r is the number of runs and s is the number of seeds
+    - Best case: O(s), Where s is the number of seeds
+        Happens when no seed matches
+    """
+    height = inside.shape[0]                                                                # O(1)
+    seeds = [(x, y) for x, y in seeds if inside[y, x]]                                      # O(s)
+    if len(seeds) == 0:                                                                     # O(1)
+        return []                                                                           # O(1)
+    edges = np.diff(inside.view(np.int8), axis=1, prepend=0, append=0)                     # O(mn), 1 where a run starts, -1 one past where it ends
+    rows, starts = np.nonzero(edges == 1)                                                   # O(mn), Row-major, so sorted by row then column
+    ends = np.nonzero(edges == -1)[1]                                                       # O(mn), Exclusive, in the same order as starts
+    row_first = np.searchsorted(rows, np.arange(height + 1)).tolist()                       # O(m log r), The runs of row i are row_first[i] to row_first[i + 1]
+    rows, starts, ends = rows.tolist(), starts.tolist(), ends.tolist()                      # O(r)
+
+    visited = [False] * len(starts)                                                         # O(r)
+    stack = []                                                                              # O(1)
+    for x, y in seeds:                                                                      # O(s)
+        seed = bisect_right(starts, x, row_first[y], row_first[y + 1]) - 1                  # O(log r), The last run of the row starting at or before x
+        if visited[seed] == False:                                                          # O(1)
+            visited[seed] = True                                                            # O(1)
+            stack.append(seed)                                                              # O(1)
+    spans = []                                                                              # O(1)
+    while len(stack) > 0:                                                                   # O(r), Every run is pushed at most once
+        run = stack.pop()                                                                   # O(1)
+        row, start, end = rows[run], starts[run], ends[run]                                 # O(1)
+        spans.append((row, start, end - 1))                                                 # O(1)
+        for neighbour in (row - 1, row + 1):                                                # O(1)
+            if 0 <= neighbour < height:                                                     # O(1)
+                lo, hi = row_first[neighbour], row_first[neighbour + 1]                     # O(1)
+                first = bisect_right(ends, start, lo, hi)                                   # O(log r), The first run ending after start
+                last = bisect_left(starts, end, first, hi)                                  # O(log r), One past the last run starting before end
+                for other in range(first, last):                                            # O(k), Where k is the number of overlapping runs
+                    if visited[other] == False:                                             # O(1)
+                        visited[other] = True                                               # O(1)
+                        stack.append(other)                                                 # O(1)
+    spans.sort()                                                                            # O(r log r)
+    return spans                                                                            # O(1)
+
+
+def chunked_region(labels_of: Callable[[int, int, int, int], np.ndarray], width: int, height: int, chunk_size: int,
+                   x: int, y: int) -> dict[tuple[int, int], np.ndarray]:
+    """
+    Returns the 4-connected region of squares labelled like (x, y), found one chunk_size x chunk_size chunk at a time,
+    so only the chunks the region reaches are labelled. A chunk's part of the region is grown with seeded_spans
+    from the squares it is entered through, and the squares that part has on a chunk border seed the chunk
+    across that border in turn. A chunk is entered again whenever a new part of it is reached.
+
+    Args:
+    - labels_of: Returns the labels of the w x h squares starting at (x, y) as an array of shape (w, h), given x, y, w and h.
+      Two squares match when their labels are equal
+        Type: Function
+    - width: The number of columns of the grid
+        Type: Integer
+    - height: The number of rows of the grid
+        Type: Integer
+    - chunk_size: The width and height of a chunk
+        Type: Integer
+    - x: The x coordinate of the seed
+        Type: Integer
+    - y: The y coordinate of the seed
+        Type: Integer
+
+    Returns:
+    - Maps the (x, y) of the first square of every chunk the region reaches to a mask of shape (w, h) of that chunk,
+      True for the squares of the region
+        Type: Dictionary
+
+    Complexity:
+    - Worst case: O(kc^2 + e), Where k is the number of chunks the region reaches, c is the chunk size
+      and e is the number of times a chunk is entered
+        Every chunk reached is labelled once, and searched again each time it is entered
+    - Best case: O(c^2), Where c is the chunk size
+        Happens when the region stays inside the chunk of the seed
+    """
+    seed_label = labels_of(x, y, 1, 1)[0, 0]                                                # O(1)
+    inside = {}                                                                             # O(1), Chunk -> (h, w) array, True where a square matches
+    found = {}                                                                              # O(1), Chunk -> (h, w) array of the squares of the region found so far
+    first = (x - x % chunk_size, y - y % chunk_size)                                        # O(1)
+    pending = {first: [(x - first[0], y - first[1])]}                                       # O(1), Chunk -> the squares it is entered through
+    while len(pending) > 0:                                                                 # O(e)
+        chunk, seeds = pending.popitem()                                                    # O(1)
+        left, bottom = chunk                                                                # O(1)
+        if chunk not in inside:                                                             # O(1)
+            w, h = min(chunk_size, width - left), min(chunk_size, height - bottom)          # O(1), Clipped to the grid
+            inside[chunk] = np.ascontiguousarray((labels_of(left, bottom, w, h) == seed_label).T)   # O(c^2), Indexed [y, x] like region_spans
+            found[chunk] = np.zeros_like(inside[chunk])                                     # O(c^2)
+        reached = found[chunk]                                                              # O(1)
+        seeds = [(sx, sy) for sx, sy in seeds if not reached[sy, sx]]                       # O(s), Where s is the number of seeds
+        grown = np.zeros_like(reached)                                                      # O(c^2)
+        for row, start, end in seeded_spans(inside[chunk], seeds):                          # O(c^2)
+            grown[row, start:end + 1] = True                                                # O(c)
+        if not grown.any():                                                                 # O(c^2)
+            continue                                                                        # O(1)
+        reached |= grown                                                                    # O(c^2)
+        h, w = grown.shape                                                                  # O(1)
+        borders = [                                                                         # O(c), The neighbouring chunk, and where the squares on the border enter it
+            (left > 0, (left - chunk_size, bottom), [(chunk_size - 1, int(row)) for row in np.flatnonzero(grown[:, 0])]),
+            (left + w < width, (left + chunk_size, bottom), [(0, int(row)) for row in np.flatnonzero(grown[:, -1])]),
+            (bottom > 0, (left, bottom - chunk_size), [(int(column), chunk_size - 1) for column in np.flatnonzero(grown[0])]),
+            (bottom + h < height, (left, bottom + chunk_size), [(int(column), 0) for column in np.flatnonzero(grown[-1])]),
+        ]
+        for exists, neighbour, entries in borders:                                          # O(1)
+            if exists == True and len(entries) > 0:                                         # O(1)
+                pending.setdefault(neighbour, []).extend(entries)                           # O(c)
+    return {chunk: mask.T for chunk, mask in found.items() if mask.any()}                   # O(kc^2)
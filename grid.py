@@ -1,7 +1,19 @@
 from __future__ import annotations
-from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore, LayerStore
+import numpy as np
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore, LayerStore, SpecialParity
+from layer_coverage import CoverageIndex
+from action import PaintStep, EraseStep, PaintSpanStep, MaskStep, MaskEraseStep, BlockStep, PaintAction
+import brush
+import raster
+import symmetry
+import fill
+import masks
+from array_store import SetLayerArray, AdditiveLayerArray, SequenceLayerArray
+from tiles import TiledLayerArray, TileVersions, CHUNK_SIZE
+from shared_store import SharedLayerArray, store_key, store_from_key
+from selection import Block, SetBlock, AdditiveBlock, SequenceBlock
 from data_structures.referential_array import ArrayR
-from layer_util import Layer
+from layer_util import Layer, get_layers
 
 class Grid:
     DRAW_STYLE_SET = "SET"
@@ -13,11 +25,57 @@ class Grid:
         DRAW_STYLE_SEQUENCE
     )
 
+    # LAYOUT_OBJECTS keeps a LayerStore object per grid square, LAYOUT_ARRAYS keeps
+    # every square in a LayerArray (see array_store.py), and LAYOUT_TILES keeps them
+    # in lazily created chunks, so only the painted area costs memory (see tiles.py).
+    # LAYOUT_SHARED keeps one LayerStore per distinct state, shared by every square
+    # in that state (see shared_store.py).
+    LAYOUT_OBJECTS = "OBJECTS"
+    LAYOUT_ARRAYS = "ARRAYS"
+    LAYOUT_TILES = "TILES"
+    LAYOUT_SHARED = "SHARED"
+    LAYOUT_OPTIONS = (
+        LAYOUT_OBJECTS,
+        LAYOUT_ARRAYS,
+        LAYOUT_TILES,
+        LAYOUT_SHARED
+    )
+    DEFAULT_LAYOUT = LAYOUT_OBJECTS
+
     DEFAULT_BRUSH_SIZE = 2
-    MAX_BRUSH = 5
+    MAX_BRUSH = 500
     MIN_BRUSH = 0
 
-    def __init__(self, draw_style: DRAW_STYLE_OPTIONS, x: int, y: int) -> None:
+    # The shape of the area paint and erase cover around the brush centre (see brush.py).
+    BRUSH_SHAPE_DIAMOND = brush.DIAMOND
+    BRUSH_SHAPE_SQUARE = brush.SQUARE
+    BRUSH_SHAPE_CIRCLE = brush.CIRCLE
+    BRUSH_SHAPE_OPTIONS = brush.SHAPES
+    DEFAULT_BRUSH_SHAPE = BRUSH_SHAPE_DIAMOND
+
+    # Where else paint and paint_stroke copy what they paint: mirrored about the middle column, the middle row
+    # or both, or rotated symmetry_folds times about the centre of the grid (see symmetry.py).
+    SYMMETRY_NONE = symmetry.NONE
+    SYMMETRY_HORIZONTAL = symmetry.HORIZONTAL
+    SYMMETRY_VERTICAL = symmetry.VERTICAL
+    SYMMETRY_BOTH = symmetry.BOTH
+    SYMMETRY_RADIAL = symmetry.RADIAL
+    SYMMETRY_OPTIONS = symmetry.MODES
+    DEFAULT_SYMMETRY = SYMMETRY_NONE
+    DEFAULT_SYMMETRY_FOLDS = 6
+    MIN_SYMMETRY_FOLDS = 2
+    MAX_SYMMETRY_FOLDS = 12
+
+    # What flood_fill compares to decide which squares belong to the region: the LayerStore state
+    # of each square, or the colour each square is composited to.
+    FILL_MATCH_STATE = "STATE"
+    FILL_MATCH_COLOR = "COLOR"
+    FILL_MATCH_OPTIONS = (
+        FILL_MATCH_STATE,
+        FILL_MATCH_COLOR
+    )
+
+    def __init__(self, draw_style: DRAW_STYLE_OPTIONS, x: int, y: int, layout: LAYOUT_OPTIONS = None) -> None:
         """
         Initialise the grid object and the brush size to the DEFAULT provided as a class variable.
 
@@ -28,30 +86,83 @@ class Grid:
             Type: Integer
         - y: The width of the grid
             Type: Integer
+        - layout: How the grid squares are stored, DEFAULT_LAYOUT if not given.
+            Either way grid[x][y] behaves as the LayerStore of the square.
+            Type: LAYOUT_OPTIONS
 
         Returns:
         - None
 
         Complexity:
-        - Worst case: O(mno), Where m is the length, n is the width and o is the length of the queue to be initialised in the Additive layer store
-            Will only occur when the layer store being used is AdditiveLayerStore
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+            Every layer store starts with a constant capacity
         - Best case: O(mn), Where m is the number of rows and n is the number of columns
-            Will only occur when the layer store being used is the SetLayerStore or SequenceLayerStore
+            Every layer store starts with a constant capacity
+        - With LAYOUT_TILES: O(1), No grid square is allocated until it is painted
         """
         self.special_status = False                                         # O(1)
+        self.parity = SpecialParity()                                       # O(1), Shared by every SET and ADD store of the grid
         self.draw_style = draw_style                                        # O(1)
+        self.layout = self.DEFAULT_LAYOUT if layout is None else layout     # O(1)
         self.x = x                                                          # O(1)
         self.y = y                                                          # O(1)
         self.brush_size = self.DEFAULT_BRUSH_SIZE                           # O(1)
+        self.brush_shape = self.DEFAULT_BRUSH_SHAPE                         # O(1)
+        self.symmetry = self.DEFAULT_SYMMETRY                               # O(1)
+        self.symmetry_folds = self.DEFAULT_SYMMETRY_FOLDS                   # O(1)
+
+        # Change tracking: every mutation bumps the epoch and stamps the square it touched.
+        self.epoch = 0                                                      # O(1)
+        if self.layout == self.LAYOUT_TILES:                                # O(1)
+            self.versions = TileVersions(self.x, self.y)                    # O(1)
+        else:                                                               # O(1)
+            self.versions = np.zeros((self.x, self.y), dtype=np.int64)      # O(mn)
+        self.changed_all = 0                                                # O(1), Every square has changed at this epoch, whatever versions holds
+        self.change_feed = []                                               # O(1), squares changed after feed_start, in epoch order, each as x * self.y + y
+        self.feed_start = 0                                                 # O(1)
+        self.drained_epoch = 0                                              # O(1)
+        self.coverage = CoverageIndex(                                      # O(1), Which squares hold each layer, see layer_coverage.py
+            self.x, self.y,
+            CHUNK_SIZE,                                                     # Tiled on every layout, so it grows with the painted area
+            np.uint16 if self.draw_style == self.DRAW_STYLE_ADD else np.uint8,  # A square of an ADD grid can hold a layer many times
+        )
+        self.block_type = {                                                 # O(1), What copy returns and paste takes, see selection.py
+            self.DRAW_STYLE_SET: SetBlock,
+            self.DRAW_STYLE_ADD: AdditiveBlock,
+            self.DRAW_STYLE_SEQUENCE: SequenceBlock,
+        }[self.draw_style]
+
+        if self.layout == self.LAYOUT_SHARED:                               # O(1)
+            if self.draw_style == self.DRAW_STYLE_SET:                      # O(1)
+                store_type = SetLayerStore                                  # O(1)
+            elif self.draw_style == self.DRAW_STYLE_ADD:                    # O(1)
+                store_type = AdditiveLayerStore                             # O(1)
+            elif self.draw_style == self.DRAW_STYLE_SEQUENCE:               # O(1)
+                store_type = SequenceLayerStore                             # O(1)
+            self.grid = SharedLayerArray(store_type, self.x, self.y)        # O(mn)
+            return                                                          # O(1)
+
+        if self.layout != self.LAYOUT_OBJECTS:                              # O(1)
+            if self.draw_style == self.DRAW_STYLE_SET:                      # O(1)
+                layer_array = SetLayerArray                                 # O(1)
+            elif self.draw_style == self.DRAW_STYLE_ADD:                    # O(1)
+                layer_array = AdditiveLayerArray                            # O(1)
+            elif self.draw_style == self.DRAW_STYLE_SEQUENCE:               # O(1)
+                layer_array = SequenceLayerArray                            # O(1)
+            if self.layout == self.LAYOUT_TILES:                            # O(1)
+                self.grid = TiledLayerArray(layer_array, self.x, self.y)    # O(1)
+            else:                                                           # O(1)
+                self.grid = layer_array(self.x, self.y)                     # O(mn)
+            return                                                          # O(1)
 
         self.grid = ArrayR(self.x)                                          # O(n), Where n is the number of rows
         for length in range(self.x):                                        # O(n), Where n is the number of rows
             self.grid[length] = ArrayR(self.y)                              # O(m), Where m is the number of columns
             for width in range(self.y):                                     # O(m), Where m is the number of columns
                 if self.draw_style == self.DRAW_STYLE_SET:                  # O(1)
-                    self.grid[length][width] = SetLayerStore()              # O(1)
+                    self.grid[length][width] = SetLayerStore(self.parity)   # O(1)
                 elif self.draw_style == self.DRAW_STYLE_ADD:                # O(1)
-                    self.grid[length][width] = AdditiveLayerStore()         # O(o), Where o is the length of the queue to be initialised
+                    self.grid[length][width] = AdditiveLayerStore(self.parity)  # O(1)
                 elif self.draw_style == self.DRAW_STYLE_SEQUENCE:           # O(1)
                     self.grid[length][width] = SequenceLayerStore()         # O(1)
 
@@ -101,14 +212,29 @@ class Grid:
         - None
 
         Complexity:
-        - Worst case: O(mno log p), Where m is the number of rows, n is the number of columns, o is the number of layers in the program and p is the number of layers in the temporary sorted list array for SequenceLayerStore
-            Will only occur when the layer store being used is the SequenceLayerStore and there is at least one layer in the set
-        - Best case: O(mn), Where m is the number of rows and n is the number of columns
-            Will only occur when the layer store being used is the SetLayerStore
+        - Worst case: O(mn + lpt), Where m is the number of rows, n is the number of columns, l is the number of layers held,
+          p is the number of tiles of the coverage index and t is the number of squares of a tile
+            Will only occur when the layer store being used is the SequenceLayerStore, where each square's bitmask is looked up
+            in SequenceLayerStore.special_table, in O(1) per store or in a single numpy gather over the layer array,
+            and the layers disabled are removed from the coverage index (see special_coverage)
+        - Best case: O(1)
+            Will only occur when the layer store being used is the SetLayerStore or AdditiveLayerStore with LAYOUT_OBJECTS or LAYOUT_ARRAYS,
+            where special is its own inverse, so only the grid's parity is toggled (see SpecialParity). Recording
+            the change only moves the changed_all watermark (see mark_all_changed).
+
+        With any other layout than LAYOUT_OBJECTS the layer array handles every square at once instead (see LayerArray.special).
         """
-        for length in range(self.x):                                        # O(n), Where n is the number of rows
-            for width in range(self.y):                                     # O(m), Where m is the number of columns
-                self.grid[length][width].special()                          # Best Case: O(1) Worst Case (n log m) Where n is number of layers in the program and m is the number of layers in the sorted list array
+        if self.draw_style == self.DRAW_STYLE_SEQUENCE:                     # O(1)
+            self.special_coverage()                                         # O(lpt)
+        if self.layout != self.LAYOUT_OBJECTS:                              # O(1)
+            self.grid.special()                                             # O(mn), O(1) for SET and ADD with LAYOUT_ARRAYS
+        elif self.draw_style != self.DRAW_STYLE_SEQUENCE:                   # O(1)
+            self.parity.toggle()                                            # O(1)
+        else:                                                               # O(1)
+            for length in range(self.x):                                    # O(n), Where n is the number of rows
+                for width in range(self.y):                                 # O(m), Where m is the number of columns
+                    self.grid[length][width].special()                      # O(1), A lookup in SequenceLayerStore.special_table
+        self.mark_all_changed()                                             # O(1)
 
         return self.add_action_grid(origin = 'special')                          # O(1)
     
@@ -147,32 +273,1166 @@ class Grid:
             Type: Integer
 
         Returns:
-        - PaintAction: The paint action that was performed
+        - PaintAction: The paint action that was performed, with a MaskStep holding the squares that changed if any did
             Type: PaintAction Object
 
+        The squares covered are those of the brush_shape stencil of radius brush_size, clipped to the grid.
+        Its spans are turned into a mask of the box around them and painted in bulk, like paint_mask.
+        With a symmetry other than SYMMETRY_NONE they are painted like paint_stroke paints a single point.
+
         Complexity:
         - Worst case: O(n^2), Where n is the brush size
-            Since during the loops, the number of operations depends on the brush size
+            A few numpy operations over the box around the brush, except for LAYOUT_OBJECTS where every square covered is visited
+        - Best case: O(n), Where n is the brush size
+            Happens when the brush is outside the grid, since every span is still clipped
+        """
+        if self.symmetry != self.SYMMETRY_NONE:                                                         # O(1)
+            return self.paint_stroke(layer, [(x, y)])                                                   # O(fn^2 log(fn^2)), Where f is the number of copies
+        paint_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        spans = brush.clipped_spans(self.brush_shape, self.brush_size, x, y, self.x, self.y)            # O(n), One span per row
+        if len(spans) > 0:                                                                              # O(1)
+            self.paint_mask_step(paint_action, layer, *masks.from_spans(spans))                         # O(n^2)
+
+        return paint_action                                                                             # O(1)
+
+    def paint_stroke(self, layer: Layer, points: list[tuple[int, int]]) -> PaintAction:
+        """
+        Paint a stroke: the brush footprints centred on each of the points, as a single action.
+        The union of the footprints is computed first (see brush.stroke_spans), so each grid square is painted
+        at most once however many footprints overlap it, and is then painted in bulk as a mask of the box around it.
+
+        With DRAW_STYLE_SET and DRAW_STYLE_SEQUENCE adding a layer twice is the same as adding it once, so the grid
+        ends up exactly as if paint had been called on each point in turn, and the steps are the same squares.
+        With DRAW_STYLE_ADD the layer is added once to every square the stroke covers, where painting each point
+        separately would add it once per footprint covering the square.
+
+        With a symmetry other than SYMMETRY_NONE the union of the footprints is copied by every transform of the
+        symmetry (see symmetry.symmetric_spans), and the union of the copies is painted the same way, in the same action,
+        so squares where copies overlap are painted once too.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - points: The (x, y) centres of the brush along the stroke
+            Type: List of tuples of 2 integers
+
+        Returns:
+        - PaintAction: The paint action that was performed, with a MaskStep holding the squares that changed if any did
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(pn log(pn) + b), Where p is the number of points, n is the brush size and b is the number of squares
+          of the box around the stroke
+            Happens when the footprints overlap, so their spans have to be sorted and merged
         - Best case: O(n^2), Where n is the brush size
-            The worst and best case are both since during the loops, the number of operations depends on the brush size
+            Happens when there is a single point, which paints like paint
+        - With a symmetry: O(pn log(pn) + fc log(fc) + b), Where f is the number of copies and c is the number of squares of the footprints
+        """
+        paint_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        spans = brush.stroke_spans(self.brush_shape, self.brush_size, points, self.x, self.y)           # O(pn log(pn))
+        if self.symmetry != self.SYMMETRY_NONE:                                                         # O(1)
+            spans = symmetry.symmetric_spans(spans, self.symmetry, self.symmetry_folds, self.x, self.y) # O(fc log(fc))
+        if len(spans) > 0:                                                                              # O(1)
+            self.paint_mask_step(paint_action, layer, *masks.from_spans(spans))                         # O(b)
+
+        return paint_action                                                                             # O(1)
+
+    def paint_polyline(self, layer: Layer, points: list[tuple[int, int]]) -> PaintAction:
+        """
+        Paint a stroke along the lines joining consecutive points, as a single action.
+        Every cell the lines between the centres of the points cross is found with raster.polyline_cells, which walks
+        raster.segment_cells as the window does between pointer positions, so a scripted stroke paints the cells
+        a drag through the same centres does. The brush footprints centred on them are painted with paint_stroke.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - points: The (x, y) grid squares the stroke goes through, in order
+            Type: List of tuples of 2 integers
+
+        Returns:
+        - PaintAction: The paint action that was performed
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(ln log(ln) + s), Where l is the length of the lines, n is the brush size and s is the number of squares covered
+        - Best case: O(n^2), Where n is the brush size
+            Happens when there is a single point
+        """
+        return self.paint_stroke(layer, raster.polyline_cells(points))                                  # O(ln log(ln) + s)
+
+    def paint_spans(self, layer: Layer, spans: list[tuple[int, int, int]]) -> PaintAction:
+        """
+        Paint the squares of the spans, clipped to the grid, as a single action that records each run of squares
+        that changed in one step, undone and redone with erase_span and paint_span.
+        Used by the shape tools, whose spans come from raster.py.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - spans: Disjoint (y, x_start, x_end) spans, inclusive
+            Type: List of tuples of 3 integers
+
+        Returns:
+        - PaintAction: The paint action that was performed, with one PaintSpanStep per run of consecutive squares that changed
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(s + k), Where s is the number of spans and k is the number of squares they cover
+        - Best case: O(s), Where s is the number of spans
+            Happens when every span is outside the grid
+        """
+        paint_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        for width, start, end in raster.clip_spans(spans, self.x, self.y):                              # O(s)
+            columns = self.paint_span(layer, width, start, end)                                         # O(n), Where n is the length of the span
+            if len(columns) == 0:                                                                       # O(1)
+                continue                                                                                # O(1)
+            breaks = np.flatnonzero(np.diff(columns) != 1) + 1                                          # O(n), Where a run of consecutive columns ends
+            firsts = columns[np.concatenate(([0], breaks))].tolist()                                    # O(r), Where r is the number of runs
+            lasts = columns[np.concatenate((breaks - 1, [len(columns) - 1]))].tolist()                  # O(r)
+            for first, last in zip(firsts, lasts):                                                      # O(r)
+                paint_action.add_step(PaintSpanStep(width, range(first, last + 1), layer))              # O(1)
+
+        return paint_action                                                                             # O(1)
+
+    def paint_rectangle(self, layer: Layer, x0: int, y0: int, x1: int, y1: int, filled: bool = True) -> PaintAction:
+        """
+        Paint the rectangle with corners (x0, y0) and (x1, y1), both included, filled or as a one square wide outline.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - x0: The x coordinate of a corner, in any order with x1
+            Type: Integer
+        - y0: The y coordinate of that corner, in any order with y1
+            Type: Integer
+        - x1: The x coordinate of the opposite corner
+            Type: Integer
+        - y1: The y coordinate of the opposite corner
+            Type: Integer
+        - filled: Whether to paint every square of the rectangle, or only its outline (see raster.outline_spans)
+            Type: Boolean
+
+        Returns:
+        - PaintAction: The paint action that was performed, as paint_spans records it
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(k), Where k is the number of squares covered
+        - Best case: O(h), Where h is the height of the rectangle
+            Happens when the rectangle is outlined, or outside the grid
+        """
+        spans = raster.rectangle_spans(x0, y0, x1, y1)                                                  # O(h)
+        if filled == False:                                                                             # O(1)
+            spans = raster.outline_spans(spans)                                                         # O(h)
+        return self.paint_spans(layer, spans)                                                           # O(k)
+
+    def paint_ellipse(self, layer: Layer, x0: int, y0: int, x1: int, y1: int, filled: bool = True) -> PaintAction:
+        """
+        Paint the ellipse inscribed in the box with corners (x0, y0) and (x1, y1), filled or as a one square wide outline.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - x0: The x coordinate of a corner of the box, in any order with x1
+            Type: Integer
+        - y0: The y coordinate of that corner, in any order with y1
+            Type: Integer
+        - x1: The x coordinate of the opposite corner
+            Type: Integer
+        - y1: The y coordinate of the opposite corner
+            Type: Integer
+        - filled: Whether to paint every square of the ellipse, or only its outline (see raster.outline_spans)
+            Type: Boolean
+
+        Returns:
+        - PaintAction: The paint action that was performed, as paint_spans records it
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(k + h), Where k is the number of squares covered and h is the height of the box
+        - Best case: O(h), Where h is the height of the box
+            Happens when the ellipse is outside the grid
+        """
+        spans = raster.ellipse_spans(x0, y0, x1, y1)                                                    # O(h)
+        if filled == False:                                                                             # O(1)
+            spans = raster.outline_spans(spans)                                                         # O(h)
+        return self.paint_spans(layer, spans)                                                           # O(k)
+
+    def paint_line(self, layer: Layer, x0: int, y0: int, x1: int, y1: int, radius: int = 0) -> PaintAction:
+        """
+        Paint the line from (x0, y0) to (x1, y1), thickened by a circle of the radius around every cell of it.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - x0: The x coordinate of the square the line starts at
+            Type: Integer
+        - y0: The y coordinate of that square
+            Type: Integer
+        - x1: The x coordinate of the square the line ends at
+            Type: Integer
+        - y1: The y coordinate of that square
+            Type: Integer
+        - radius: The radius of the circle around every cell of the line (see raster.thick_line_spans), 0 for a one square wide line
+            Type: Integer
+
+        Returns:
+        - PaintAction: The paint action that was performed, as paint_spans records it
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(lr log(lr) + k), Where l is the length of the line, r is the radius and k is the number of squares covered
+        - Best case: O(l), Where l is the length of the line
+            Happens when the radius is 0
+        """
+        return self.paint_spans(layer, raster.thick_line_spans(x0, y0, x1, y1, radius, self.x, self.y))   # O(lr log(lr) + k)
+
+    def flood_fill(self, layer: Layer, x: int, y: int, match: FILL_MATCH_OPTIONS = FILL_MATCH_STATE,
+                   timestamp: float = 0, bg: tuple[int, int, int] = (255, 255, 255)) -> PaintAction:
+        """
+        Paint the region of the grid square at (x, y): every square 4-connected to it through squares
+        that match it, as a single action. The region is found with a scanline search (see fill.py),
+        turned into a mask of the box around it and painted in bulk, whatever the brush, like paint_mask.
+        With LAYOUT_TILES the region is found and painted a chunk at a time instead (see fill.chunked_region),
+        with a MaskStep per chunk, so only the chunks it reaches are labelled.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - x: The x coordinate of the square the fill starts from
+            Type: Integer
+        - y: The y coordinate of the square the fill starts from
+            Type: Integer
+        - match: FILL_MATCH_STATE to match squares whose LayerStores are equal,
+          FILL_MATCH_COLOR to match squares composited to the same colour
+            Type: FILL_MATCH_OPTIONS
+        - timestamp: The time the colours are composited at, for FILL_MATCH_COLOR
+            Type: Float
+        - bg: The colour underneath every grid square, for FILL_MATCH_COLOR
+            Type: Tuple of 3 integers
+
+        Returns:
+        - PaintAction: The paint action that was performed, with a MaskStep holding the squares that changed if any did
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(mn + r log r), Where m is the number of rows, n is the number of columns
+          and r is the number of runs the region is made of
+            Labelling and painting the grid is O(mn) numpy work, except for LAYOUT_OBJECTS where they visit every square
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+            Happens when no square changes
+        - With LAYOUT_TILES: O(kc^2 + e), Where k is the number of chunks the region reaches, c is the chunk size
+          and e is the number of times the search enters a chunk
+        """
+        ids = {}                                                                                        # O(1), Shared by every call, so labels of separate chunks can be compared
+        if match == self.FILL_MATCH_COLOR:                                                              # O(1)
+            labels_of = lambda x, y, width, height: self.color_labels(timestamp, bg, x, y, width, height)   # O(1)
+        else:                                                                                           # O(1)
+            labels_of = lambda x, y, width, height: self.state_labels(x, y, width, height, ids)         # O(1)
+        paint_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        if self.layout == self.LAYOUT_TILES:                                                            # O(1)
+            parts = fill.chunked_region(labels_of, self.x, self.y, self.grid.chunk_size, x, y)          # O(kc^2 + e)
+            for (left, bottom), mask in parts.items():                                                  # O(k)
+                self.paint_mask_step(paint_action, layer, left, bottom, mask)                           # O(c^2)
+            return paint_action                                                                         # O(1)
+        labels = labels_of(0, 0, self.x, self.y)                                                        # O(mnd)
+        inside = np.ascontiguousarray((labels == labels[x, y]).T)                                       # O(mn), Indexed [y, x], a row per y
+        spans = fill.region_spans(inside, x, y)                                                         # O(mn + r log r)
+        if len(spans) > 0:                                                                              # O(1)
+            self.paint_mask_step(paint_action, layer, *masks.from_spans(spans))                         # O(mn)
+
+        return paint_action                                                                             # O(1)
+
+    def state_labels(self, x: int = 0, y: int = 0, width: int = None, height: int = None, ids: dict = None) -> np.ndarray:
+        """
+        Returns an array of shape (width, height) labelling the width x height grid squares starting at (x, y),
+        the whole grid if not given, equal for two squares exactly when their LayerStores are.
+
+        Args:
+        - x, y, width, height: The rectangle of squares to label, which must be inside the grid
+            Type: Integers
+        - ids: The labels given so far, shared between calls whose labels are compared
+            Type: Dictionary
+
+        Returns:
+        - The label of every square
+            Type: numpy.ndarray of int64
+
+        Complexity:
+        - Worst case: O(mnd), Where m and n are the height and width of the rectangle and d is the number of layers in a square
+            Happens with LAYOUT_OBJECTS, where every store is keyed (see shared_store.store_key)
+        - Best case: O(mn), Where m and n are the height and width of the rectangle
+            Happens with LAYOUT_TILES, which only labels the chunks the rectangle crosses (see TiledLayerArray.state_labels).
+            Any other layout labels its whole arrays directly in O(mn) for the whole grid (see LayerArray.state_labels)
+        """
+        width = self.x - x if width is None else width                                                  # O(1)
+        height = self.y - y if height is None else height                                               # O(1)
+        ids = {} if ids is None else ids                                                                # O(1)
+        if self.layout == self.LAYOUT_TILES:                                                            # O(1)
+            return self.grid.state_labels(ids, x, y, width, height)                                     # O(mn)
+        if self.layout != self.LAYOUT_OBJECTS:                                                          # O(1)
+            return self.grid.state_labels(ids)[x:x + width, y:y + height]                               # O(mn)
+        labels = np.zeros((width, height), dtype=np.int64)                                              # O(mn)
+        for length in range(width):                                                                     # O(n)
+            for row in range(height):                                                                   # O(m)
+                labels[length, row] = ids.setdefault(store_key(self.grid[x + length][y + row]), len(ids))   # O(d)
+        return labels                                                                                   # O(1)
+
+    def color_labels(self, timestamp: float, bg: tuple[int, int, int], x: int = 0, y: int = 0,
+                     width: int = None, height: int = None) -> np.ndarray:
+        """
+        Returns an array of shape (width, height) labelling the width x height grid squares starting at (x, y),
+        the whole grid if not given, with the colour each is composited to, packed as 0xRRGGBB.
+
+        Args:
+        - timestamp: Used for layers that change over time (Such as rainbow and sparkle)
+            Type: Float
+        - bg: The colour underneath every grid square
+            Type: Tuple of 3 integers
+        - x, y, width, height: The rectangle of squares to label, which must be inside the grid
+            Type: Integers
+
+        Returns:
+        - The packed colour of every square
+            Type: numpy.ndarray of int64
+
+        Complexity:
+        - Worst case: O(mnd), Where m and n are the height and width of the rectangle and d is the number of layers in a stack
+        - Best case: O(mnd), Where m and n are the height and width of the rectangle and d is the number of layers in a stack
+        """
+        from compositor import Compositor   # Imported here, since compositor imports this module
+        width = self.x - x if width is None else width                                                  # O(1)
+        height = self.y - y if height is None else height                                               # O(1)
+        buffer = Compositor(self, bg, (x, y, width, height)).composite(timestamp).astype(np.int64)       # O(mnd), Indexed [y, x]
+        return (buffer[:, :, 0] << 16 | buffer[:, :, 1] << 8 | buffer[:, :, 2]).T                      # O(mn)
+
+    def clip_box(self, x0: int, y0: int, x1: int, y1: int) -> tuple[int, int, int, int]:
+        """
+        Returns the part inside the grid of the box with corners (x0, y0) and (x1, y1), both included, in any order.
+
+        Returns:
+        - The (x, y, width, height) of the part, with a width or height of 0 if the box is outside the grid
+            Type: Tuple of 4 integers
+
+        Complexity:
+        - Worst case: O(1)
+        - Best case: O(1)
+        """
+        left, right = max(min(x0, x1), 0), min(max(x0, x1), self.x - 1)                                 # O(1)
+        bottom, top = max(min(y0, y1), 0), min(max(y0, y1), self.y - 1)                                 # O(1)
+        return left, bottom, max(right - left + 1, 0), max(top - bottom + 1, 0)                         # O(1)
+
+    def read_block(self, x: int, y: int, width: int, height: int) -> Block:
+        """
+        Returns a copy of the width x height grid squares starting at (x, y), which must be inside the grid.
+        With any other layout than LAYOUT_OBJECTS the layer array copies its arrays directly (see LayerArray.read_block).
+
+        Complexity:
+        - Worst case: O(kd), Where k is the number of squares and d is the number of layers in a square
+            Happens with LAYOUT_OBJECTS, where every store is keyed (see shared_store.store_key)
+        - Best case: O(k log k), Where k is the number of squares
+        """
+        if self.layout != self.LAYOUT_OBJECTS:                                                          # O(1)
+            return self.grid.read_block(x, y, width, height)                                            # O(k log k)
+        keys = {}                                                                                       # O(1), Maps a key to its label, in order of labels
+        labels = np.zeros((width, height), dtype=np.int64)                                              # O(k)
+        for dx in range(width):                                                                         # O(n)
+            for dy in range(height):                                                                    # O(m)
+                labels[dx, dy] = keys.setdefault(store_key(self.grid[x + dx][y + dy]), len(keys))       # O(d)
+        return self.block_type.from_keys(list(keys), labels)                                            # O(k)
+
+    def write_block(self, x: int, y: int, block: Block, before: Block = None) -> list[tuple[int, int]]:
+        """
+        Sets the grid squares starting at (x, y) to the states of the block, which must fit inside the grid, and records the changes.
+        Only the squares whose state changes are touched with LAYOUT_OBJECTS, each given a new LayerStore.
+
+        Args:
+        - x: The x coordinate of the square the block's square (0, 0) goes to
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+        - block: The states to write
+            Type: Block Object of the grid's block_type
+        - before: What the squares hold now, read if not given
+            Type: Block Object
+
+        Returns:
+        - The (x, y) coordinates of the grid squares that changed
+            Type: List of tuples of 2 integers
+
+        Complexity:
+        - Worst case: O(kd), Where k is the number of squares of the block and d is the number of layers in a square
+        - Best case: O(k log k), Where k is the number of squares of the block
+            Happens when no square changes
+        """
+        if before is None:                                                                              # O(1)
+            before = self.read_block(x, y, block.width, block.height)                                   # O(kd)
+        changed = block.differs(before)                                                                 # O(k)
+        xs, ys = np.nonzero(changed)                                                                    # O(k)
+        if len(xs) == 0:                                                                                # O(1)
+            return []                                                                                   # O(1)
+        squares = list(zip((xs + x).tolist(), (ys + y).tolist()))                                       # O(c), Where c is the number of squares that change
+        if self.layout != self.LAYOUT_OBJECTS:                                                          # O(1)
+            self.grid.write_block(x, y, block)                                                          # O(k log k)
+        else:                                                                                           # O(1)
+            keys, labels = block.to_keys()                                                              # O(k log k)
+            for (length, width), label in zip(squares, labels[changed].tolist()):                       # O(c)
+                store_type = type(self.grid[length][width])                                             # O(1)
+                self.grid[length][width] = store_from_key(store_type, keys[label], self.parity)         # O(d)
+        layer_list = get_layers()                                                                       # O(1)
+        for index, held in before.layer_squares(changed, x, y).items():                                 # O(lk + cd), Where l is the number of distinct layers
+            self.coverage.remove_squares(layer_list[index], held)                                       # O(c)
+        for index, held in block.layer_squares(changed, x, y).items():                                  # O(lk + cd)
+            self.coverage.add_squares(layer_list[index], held)                                          # O(c)
+        self.mark_mask_changed(changed, x, y)                                                           # O(k)
+        return squares                                                                                  # O(1)
+
+    def replace_block(self, x: int, y: int, block: Block) -> PaintAction:
+        """
+        write_block as a single action, recorded as one BlockStep holding the squares before and after.
+
+        Complexity:
+        - Worst case: O(kd), Where k is the number of squares of the block and d is the number of layers in a square
+        - Best case: O(k log k), Where k is the number of squares of the block
+        """
+        paint_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        before = self.read_block(x, y, block.width, block.height)                                       # O(kd)
+        if len(self.write_block(x, y, block, before)) > 0:                                              # O(kd)
+            paint_action.add_step(BlockStep((x, y), before, block))                                     # O(1)
+        return paint_action                                                                             # O(1)
+
+    def copy(self, x0: int, y0: int, x1: int, y1: int) -> Block:
+        """
+        Returns a copy of the grid squares in the box with corners (x0, y0) and (x1, y1), both included,
+        in any order and clipped to the grid.
+
+        Args:
+        - x0: The x coordinate of a corner of the box
+            Type: Integer
+        - y0: The y coordinate of that corner
+            Type: Integer
+        - x1: The x coordinate of the opposite corner
+            Type: Integer
+        - y1: The y coordinate of the opposite corner
+            Type: Integer
+
+        Returns:
+        - The squares, empty if the box is outside the grid
+            Type: Block Object of the grid's block_type
+
+        Complexity:
+        - Worst case: O(kd), Where k is the number of squares copied and d is the number of layers in a square
+        - Best case: O(k log k), Where k is the number of squares copied
+        """
+        x, y, width, height = self.clip_box(x0, y0, x1, y1)                                             # O(1)
+        if width == 0 or height == 0:                                                                   # O(1)
+            return self.block_type.empty(width, height)                                                 # O(1)
+        return self.read_block(x, y, width, height)                                                     # O(kd)
+
+    def cut(self, x0: int, y0: int, x1: int, y1: int) -> tuple[Block, PaintAction]:
+        """
+        copy, then clear the squares copied as a single action.
+
+        Returns:
+        - The squares, as copy returns them, and the action that cleared them
+            Type: Tuple of a Block Object and a PaintAction Object
+
+        Complexity:
+        - Worst case: O(kd), Where k is the number of squares cut and d is the number of layers in a square
+        - Best case: O(k log k), Where k is the number of squares cut
+        """
+        x, y, width, height = self.clip_box(x0, y0, x1, y1)                                             # O(1)
+        block = self.copy(x0, y0, x1, y1)                                                               # O(kd)
+        return block, self.replace_block(x, y, self.block_type.empty(width, height))                    # O(kd)
+
+    def paste(self, block: Block, x: int, y: int, mirror_x: bool = False, mirror_y: bool = False) -> PaintAction:
+        """
+        Sets the grid squares from (x, y) onwards to the squares of the block, clipped to the grid, as a single action.
+        The whole block is written in bulk, and recorded as one step however many squares it holds.
+
+        Args:
+        - block: Squares copied from a grid of the same draw style
+            Type: Block Object
+        - x: The x coordinate of the square the block's square (0, 0) is pasted to
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+        - mirror_x: Whether to paste the block's columns in reverse order
+            Type: Boolean
+        - mirror_y: Whether to paste the block's rows in reverse order
+            Type: Boolean
+
+        Returns:
+        - PaintAction: The paint action that was performed, with a BlockStep if any square changed
+            Type: PaintAction Object
+
+        Raises:
+        - ValueError: If the block was copied from a grid of another draw style
+
+        Complexity:
+        - Worst case: O(kd), Where k is the number of squares pasted and d is the number of layers in a square
+        - Best case: O(1)
+            Happens when the block is pasted outside the grid
+        """
+        if not isinstance(block, self.block_type):                                                      # O(1)
+            raise ValueError(f"A {type(block).__name__} cannot be pasted into a {self.draw_style} grid.")
+        left, bottom = max(x, 0), max(y, 0)                                                             # O(1)
+        width = min(x + block.width, self.x) - left                                                     # O(1)
+        height = min(y + block.height, self.y) - bottom                                                 # O(1)
+        if width <= 0 or height <= 0:                                                                   # O(1)
+            return self.add_action_grid(origin = 'paint')                                               # O(1)
+        if mirror_x == True or mirror_y == True:                                                        # O(1)
+            block = block.mirrored(mirror_x, mirror_y)                                                  # O(k)
+        if width != block.width or height != block.height:                                              # O(1)
+            block = block.crop(left - x, bottom - y, width, height)                                     # O(k)
+        return self.replace_block(left, bottom, block)                                                  # O(kd)
+
+    def paint_span(self, layer: Layer, y: int, start: int, end: int) -> np.ndarray:
+        """
+        Adds the layer to the grid squares from (start, y) to (end, y), inclusive, and records the changes.
+        The span is painted as a one row mask with paint_masked.
+
+        Args:
+        - layer: The layer to be added
+            Type: Layer Object
+        - y: The row of the span
+            Type: Integer
+        - start: The x coordinate of the first grid square
+            Type: Integer
+        - end: The x coordinate of the last grid square
+            Type: Integer
+
+        Returns:
+        - The x coordinates of the grid squares that changed, from left to right
+            Type: numpy.ndarray of integers
+
+        Complexity:
+        - Worst case: O(n), Where n is the length of the span
+        - Best case: O(n), Where n is the length of the span
+        """
+        changed = self.paint_masked(layer, np.ones((end - start + 1, 1), dtype=bool), start, y)        # O(n)
+        return np.flatnonzero(changed) + start                                                          # O(n)
+
+    def erase_span(self, layer: Layer, y: int, start: int, end: int) -> np.ndarray:
+        """
+        Erases the layer from the grid squares from (start, y) to (end, y), inclusive, and records the changes.
+        The span is erased as a one row mask with erase_masked.
+
+        Args:
+        - layer: The layer to be erased
+            Type: Layer Object
+        - y: The row of the span
+            Type: Integer
+        - start: The x coordinate of the first grid square
+            Type: Integer
+        - end: The x coordinate of the last grid square
+            Type: Integer
+
+        Returns:
+        - The x coordinates of the grid squares that changed, from left to right
+            Type: numpy.ndarray of integers
+
+        Complexity:
+        - Worst case: O(n), Where n is the length of the span
+        - Best case: O(n), Where n is the length of the span
+        """
+        erased = self.erase_masked(layer, np.ones((end - start + 1, 1), dtype=bool), start, y)         # O(n)
+        return np.flatnonzero(erased >= 0) + start                                                      # O(n)
+
+    def paint_masked(self, layer: Layer, mask: np.ndarray, x: int = 0, y: int = 0) -> np.ndarray:
+        """
+        Adds the layer to every grid square selected by the mask, placed with its square (0, 0) at (x, y), and records the changes.
+        With any other layout than LAYOUT_OBJECTS the layer array adds to every selected square at once (see LayerArray.add_mask).
+        With LAYOUT_OBJECTS only the stores are visited one at a time, filling in the same masks.
+        Either way the changes are recorded from those masks in bulk.
+
+        Args:
+        - layer: The layer to be added
+            Type: Layer Object
+        - mask: Array of shape (width, height), inside the grid from (x, y) onwards, True for the squares to add the layer to
+            Type: numpy.ndarray of bool
+        - x: The x coordinate of the grid square the mask's square (0, 0) selects
+            Type: Integer
+        - y: The y coordinate of that grid square
+            Type: Integer
+
+        Returns:
+        - A mask of the same shape, True for the grid squares that changed
+            Type: numpy.ndarray of bool
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+            A few numpy operations over the mask, except for LAYOUT_OBJECTS where every square selected is visited
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        if self.layout != self.LAYOUT_OBJECTS:                                                          # O(1)
+            changed, replaced = self.grid.add_mask(mask, layer, x, y)                                   # O(mn)
+        else:                                                                                           # O(1)
+            changed, replaced = self.add_objects_mask(layer, mask, x, y)                                # O(mn)
+        if replaced is not None:                                                                        # O(1)
+            self.record_erased(replaced, x, y, False)                                                   # O(mn)
+        self.coverage.add_mask(layer, changed, x, y)                                                    # O(mn)
+        self.mark_mask_changed(changed, x, y)                                                           # O(mn)
+        return changed                                                                                  # O(1)
+
+    def add_objects_mask(self, layer: Layer, mask: np.ndarray, x: int, y: int) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        LayerArray.add_mask for LAYOUT_OBJECTS: adds the layer to the store of every grid square selected by the mask,
+        placed with its square (0, 0) at (x, y), without recording anything.
+
+        Returns:
+        - A mask of the same shape, True for the grid squares that changed, and with DRAW_STYLE_SET the index
+          of the active layer each changed square replaced, -1 where there was none (None with any other draw style)
+            Type: Tuple of a numpy.ndarray of bool and a numpy.ndarray of int16 or None
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+            Every square selected is visited
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        changed = np.zeros(mask.shape, dtype=bool)                                                      # O(mn)
+        replaced = np.full(mask.shape, -1, dtype=np.int16) if self.draw_style == self.DRAW_STYLE_SET else None   # O(mn)
+        for dx, dy in zip(*(axis.tolist() for axis in np.nonzero(mask))):                               # O(k), Where k is the number of squares selected
+            store = self.grid[x + dx][y + dy]                                                           # O(1)
+            target = store.erase_target(layer) if replaced is not None else None                        # O(1), The active layer the new one replaces
+            if store.add(layer) == True:                                                                # O(1)
+                changed[dx, dy] = True                                                                  # O(1)
+                if target is not None:                                                                  # O(1)
+                    replaced[dx, dy] = target.index                                                     # O(1)
+        return changed, replaced                                                                        # O(1)
+
+    def erase_masked(self, layer: Layer, mask: np.ndarray, x: int = 0, y: int = 0) -> np.ndarray:
+        """
+        Erases the layer from every grid square selected by the mask, placed with its square (0, 0) at (x, y), and records the changes.
+        With any other layout than LAYOUT_OBJECTS the layer array erases from every selected square at once (see LayerArray.erase_mask).
+
+        Args:
+        - layer: The layer to be erased
+            Type: Layer Object
+        - mask: Array of shape (width, height), inside the grid from (x, y) onwards, True for the squares to erase from
+            Type: numpy.ndarray of bool
+        - x: The x coordinate of the grid square the mask's square (0, 0) selects
+            Type: Integer
+        - y: The y coordinate of that grid square
+            Type: Integer
+
+        Returns:
+        - An array of the same shape holding the index of the layer erased from each grid square (see erase_target),
+          -1 where the square did not change
+            Type: numpy.ndarray of int16
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+            A few numpy operations over the mask, except for LAYOUT_OBJECTS where every square selected is visited
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        if self.layout != self.LAYOUT_OBJECTS:                                                          # O(1)
+            changed, erased = self.grid.erase_mask(mask, layer, x, y)                                   # O(mn)
+            self.record_erased(erased, x, y)                                                            # O(mn)
+            return erased                                                                               # O(1)
+        erased = np.full(mask.shape, -1, dtype=np.int16)                                                # O(mn)
+        for dx, dy in zip(*(axis.tolist() for axis in np.nonzero(mask))):                               # O(k), Where k is the number of squares selected
+            target = self.erase_target(layer, x + dx, y + dy)                                           # O(1)
+            if self.erase_square(layer, x + dx, y + dy) == True:                                        # O(1)
+                erased[dx, dy] = target.index                                                           # O(1)
+        return erased                                                                                   # O(1)
+
+    def record_erased(self, erased: np.ndarray, x: int, y: int, mark: bool = True) -> None:
+        """
+        Updates the coverage index and records the changes for grid squares the layer array erased layers from in bulk,
+        one masked update of the index per layer erased.
+
+        Args:
+        - erased: For each grid square from (x, y) onwards, the index of the layer erased from it, -1 where none was
+            Type: numpy.ndarray of int16
+        - x: The x coordinate of the grid square erased[0, 0] is for
+            Type: Integer
+        - y: The y coordinate of that grid square
+            Type: Integer
+        - mark: Whether to record the changes, left to the caller if False
+            Type: Boolean
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(lmn), Where l is the number of distinct layers erased and m and n are the height and width of the array
+        - Best case: O(mn), Where m and n are the height and width of the array
+        """
+        held = np.bincount(erased.ravel() + 1)                                                          # O(mn), Squares per layer index, shifted past -1
+        layer_list = get_layers()                                                                       # O(1)
+        for index in np.flatnonzero(held[1:]).tolist():                                                 # O(l)
+            self.coverage.remove_mask(layer_list[index], erased == index, x, y)                         # O(mn)
+        if mark == True:                                                                                # O(1)
+            self.mark_mask_changed(erased >= 0, x, y)                                                   # O(mn)
+
+    def check_mask(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Returns the mask as a bool array, raising ValueError if it is not the size of the grid.
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(1)
+            Happens when the mask is a bool array already
+        """
+        mask = np.asarray(mask, dtype=bool)                                 # O(mn)
+        if mask.shape != (self.x, self.y):                                  # O(1)
+            raise ValueError(f"The mask has shape {mask.shape}, but the grid has shape {(self.x, self.y)}.")
+        return mask                                                         # O(1)
+
+    def paint_mask(self, layer: Layer, mask: np.ndarray) -> PaintAction:
+        """
+        Paint the layer onto every grid square selected by the mask, as a single action, whatever the brush.
+        The mask is cut down to the box around its selected squares and painted with paint_masked,
+        and the squares that changed are recorded as a mask in one step.
+        Masks can be made with the generators in masks.py.
+
+        Args:
+        - layer: The layer to be painted
+            Type: Layer Object
+        - mask: Array of shape (x, y), indexed like the grid, True for the squares to paint
+            Type: numpy.ndarray of bool
+
+        Returns:
+        - PaintAction: The paint action that was performed, with a MaskStep holding the squares that changed if any did
+            Type: PaintAction Object
+
+        Raises:
+        - ValueError: If the mask is not the size of the grid
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+            A few numpy operations over the grid, except for LAYOUT_OBJECTS where every square selected is visited
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        x, y, mask = masks.crop(self.check_mask(mask))                                                  # O(mn)
+        paint_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        self.paint_mask_step(paint_action, layer, x, y, mask)                                           # O(mn)
+        return paint_action                                                                             # O(1)
+
+    def paint_mask_step(self, paint_action: PaintAction, layer: Layer, x: int, y: int, mask: np.ndarray) -> None:
+        """
+        Paints the layer onto the grid squares selected by the mask placed at (x, y) with paint_masked,
+        recording the squares that changed in the action as one MaskStep, cut down to the box around them.
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        changed_x, changed_y, changed = masks.crop(self.paint_masked(layer, mask, x, y))                # O(mn)
+        if changed.size > 0:                                                                            # O(1)
+            paint_action.add_step(MaskStep((x + changed_x, y + changed_y), changed.copy(), layer))      # O(mn)
+
+    def erase_mask(self, layer: Layer, mask: np.ndarray) -> PaintAction:
+        """
+        Erase the layer from every grid square selected by the mask, as a single action, whatever the brush.
+        The mask is cut down to the box around its selected squares and erased with erase_masked,
+        and the layer erased from each square is recorded in one step.
+
+        Args:
+        - layer: The layer to be erased
+            Type: Layer Object
+        - mask: Array of shape (x, y), indexed like the grid, True for the squares to erase from
+            Type: numpy.ndarray of bool
+
+        Returns:
+        - PaintAction: The erase action that was performed, with a MaskEraseStep if any square changed
+            Type: PaintAction Object
+
+        Raises:
+        - ValueError: If the mask is not the size of the grid
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        x, y, mask = masks.crop(self.check_mask(mask))                                                  # O(mn)
+        erase_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        erased = self.erase_masked(layer, mask, x, y)                                                   # O(mn)
+        changed_x, changed_y, changed = masks.crop(erased >= 0)                                         # O(mn)
+        if changed.size > 0:                                                                            # O(1)
+            box = erased[changed_x:changed_x + changed.shape[0], changed_y:changed_y + changed.shape[1]]   # O(1), A view
+            erase_action.add_step(MaskEraseStep((x + changed_x, y + changed_y), box.copy()))            # O(mn)
+        return erase_action                                                                             # O(1)
+
+    def paint_square(self, layer: Layer, x: int, y: int) -> bool:
+        """
+        Adds the layer to the single grid square at (x, y) and records the change.
+
+        Args:
+        - layer: The layer to be added
+            Type: Layer Object
+        - x: The x coordinate of the grid square
+            Type: Integer
+        - y: The y coordinate of the grid square
+            Type: Integer
+
+        Returns:
+        - Boolean value of True if the grid square was changed
+            Type: Boolean
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:                          # O(1)
+            replaced = self.erase_target(layer, x, y)                       # O(1), The active layer the new one replaces
+        else:                                                               # O(1)
+            replaced = None                                                 # O(1)
+        if self.layout != self.LAYOUT_OBJECTS:                              # O(1)
+            changed = self.grid.add(x, y, layer)                            # O(1)
+        else:                                                               # O(1)
+            changed = self.grid[x][y].add(layer)                            # O(1)
+        if changed == True:                                                 # O(1)
+            if replaced is not None:                                        # O(1)
+                self.coverage.remove(replaced, x, y)                        # O(1)
+            self.coverage.add(layer, x, y)                                  # O(1)
+            self.mark_changed(x, y)                                         # O(1)
+            return True                                                     # O(1)
+        return False                                                        # O(1)
+
+    def erase_square(self, layer: Layer, x: int, y: int) -> bool:
+        """
+        Erases the layer from the single grid square at (x, y) and records the change.
+
+        Args:
+        - layer: The layer to be erased
+            Type: Layer Object
+        - x: The x coordinate of the grid square
+            Type: Integer
+        - y: The y coordinate of the grid square
+            Type: Integer
+
+        Returns:
+        - Boolean value of True if the grid square was changed
+            Type: Boolean
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        erased = self.erase_target(layer, x, y)                             # O(1)
+        if self.layout != self.LAYOUT_OBJECTS:                              # O(1)
+            changed = self.grid.erase(x, y, layer)                          # O(1)
+        else:                                                               # O(1)
+            changed = self.grid[x][y].erase(layer)                          # O(1)
+        if changed == True:                                                 # O(1)
+            self.coverage.remove(erased, x, y)                              # O(1)
+            self.mark_changed(x, y)                                         # O(1)
+            return True                                                     # O(1)
+        return False                                                        # O(1)
+
+    def erase_target(self, layer: Layer, x: int, y: int) -> Layer | None:
+        """
+        Returns the layer erase_square(layer, x, y) would remove, or None if it would not change the square.
+        This is the active layer for SET, the first layer of the sequence for ADD, and the layer itself for SEQUENCE if it is enabled.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.layout != self.LAYOUT_OBJECTS:                              # O(1)
+            return self.grid.erase_target(x, y, layer)                      # O(1)
+        return self.grid[x][y].erase_target(layer)                          # O(1)
+
+    def erase(self, layer: Layer, x: int, y: int) -> PaintAction:
+        """
+        The eraser brush: erases the layer from the grid squares the brush covers, like paint,
+        skipping squares the coverage index says do not hold the layer.
+        In an ADD grid erasing removes the first layer of each such square, as AdditiveLayerStore.erase does.
+
+        Args:
+        - layer: The layer to be erased
+            Type: Layer Object
+        - x: The x coordinate of the centre of the brush
+            Type: Integer
+        - y: The y coordinate of the centre of the brush
+            Type: Integer
+
+        Returns:
+        - PaintAction: The erase action that was performed, made of EraseSteps
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(n^2), Where n is the brush size
+        - Best case: O(n), Where n is the brush size
+            Happens when the brush is mostly outside the grid
+        """
+        erase_action = self.add_action_grid(origin = 'paint')                                           # O(1)
+        for width, start, end in brush.clipped_spans(self.brush_shape, self.brush_size, x, y, self.x, self.y):    # O(n), One span per row
+            for length in range(start, end + 1):                                                        # O(n)
+                if self.coverage.holds(layer, length, width) == True:                                   # O(1)
+                    self.erase_step(erase_action, layer, length, width)                                 # O(1)
+        return erase_action                                                                             # O(1)
 
-        Both best and worst are the same since the number of operations is dependent on the brush size
+    def erase_everywhere(self, layer: Layer) -> PaintAction:
         """
-        paint_action = self.add_action_grid(origin = 'paint')                                                                        # O(1)
-        for length in range(x - self.brush_size, x + self.brush_size + 1):                                                      # O(n) Where n is the brush size
-            for width in range(y - self.brush_size, y + self.brush_size + 1):                                                   # O(n) Where n is the brush size
-                if 0 <= length < self.x and 0 <= width < self.y and (abs(x - length) + abs(y - width)) <= self.brush_size:      # O(1)
-                    if self.grid[length][width].add(layer) == True:                                                             # O(1)
-                        paint_action.add_step(self.add_action_grid(length = length, width = width, layer = layer))                   # O(1)
+        Erases the layer from every grid square holding it, visiting only those squares.
+        In an ADD grid erasing removes the first layer of each such square, as AdditiveLayerStore.erase does.
 
-        return paint_action                                                                                                     # O(1)
+        Args:
+        - layer: The layer to be erased
+            Type: Layer Object
+
+        Returns:
+        - PaintAction: The erase action that was performed, made of EraseSteps
+            Type: PaintAction Object
+
+        Complexity:
+        - Worst case: O(k + pt), Where k is the number of squares holding the layer, p is the number of coverage tiles
+          holding it and t is the number of squares of a tile
+            The squares are found by scanning only the coverage tiles holding the layer, and p is at most k
+        - Best case: O(1)
+            Happens when no square holds the layer
+        """
+        erase_action = self.add_action_grid(origin = 'paint')              # O(1)
+        for length, width in self.coverage.cells(layer):                    # O(k + pt)
+            self.erase_step(erase_action, layer, length, width)             # O(1)
+        return erase_action                                                 # O(1)
+
+    def erase_step(self, erase_action: PaintAction, layer: Layer, x: int, y: int) -> None:
+        """
+        Erases the layer from the grid square at (x, y), recording the layer that was removed in the action.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        erased = self.erase_target(layer, x, y)                             # O(1)
+        if self.erase_square(layer, x, y) == True:                          # O(1)
+            erase_action.add_step(EraseStep((x, y), erased))                # O(1)
+
+    def special_coverage(self) -> None:
+        """
+        Updates the coverage index for special on a SEQUENCE grid, which disables one layer of every square holding any.
+        The layer is looked up from the squares' bitmasks in SequenceLayerStore.special_table, a tile of the index at a time,
+        so no square is visited.
+
+        Complexity:
+        - Worst case: O(lpt), Where l is the number of layers held, p is the number of tiles of the index and t is the number of squares of a tile
+        - Best case: O(1)
+            Happens when no square holds a layer
+        """
+        layer_list = get_layers()                                           # O(1)
+        table = SequenceLayerStore.special_table.table                      # O(1)
+        for x, y, held in self.coverage.bitmasks():                         # O(p)
+            removed = held ^ table[held]                                    # O(t)
+            for index in range(len(layer_list)):                            # O(l)
+                selected = (removed >> np.uint32(index)) & 1 == 1           # O(t)
+                if selected.any():                                          # O(t)
+                    self.coverage.remove_mask(layer_list[index], selected, x, y)   # O(t)
+
+    def mark_changed(self, x: int, y: int) -> None:
+        """
+        Records that the grid square at (x, y) has changed, by stamping it with a new epoch and adding it to the change feed.
+        Once the feed holds more entries than there are stored versions it is dropped, since scanning the versions is then cheaper.
+
+        Args:
+        - x: The x coordinate of the grid square
+            Type: Integer
+        - y: The y coordinate of the grid square
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.epoch += 1                                                     # O(1)
+        self.versions[x, y] = self.epoch                                    # O(1)
+        self.change_feed.append(x * self.y + y)                             # O(1)
+        if len(self.change_feed) > min(self.x * self.y, self.versions.size):    # O(1)
+            self.change_feed = []                                           # O(1)
+            self.feed_start = self.epoch                                    # O(1)
+
+    def mark_mask_changed(self, changed: np.ndarray, x: int = 0, y: int = 0) -> None:
+        """
+        mark_changed for every grid square selected by the mask, placed with its square (0, 0) at (x, y),
+        stamping the versions with a masked numpy operation. The squares take their epochs in the order np.nonzero
+        lists them, the order they are added to the change feed in, and are only listed when they fit in the feed,
+        which is dropped otherwise.
+
+        Args:
+        - changed: Array of shape (width, height), True for the grid squares that changed
+            Type: numpy.ndarray of bool
+        - x: The x coordinate of the grid square the mask's square (0, 0) selects
+            Type: Integer
+        - y: The y coordinate of that grid square
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        count = int(np.count_nonzero(changed))                              # O(mn)
+        if count == 0:                                                      # O(1)
+            return                                                          # O(1)
+        epochs = np.cumsum(changed, dtype=np.int64).reshape(changed.shape) + self.epoch    # O(mn), Row major, as np.nonzero lists them
+        self.epoch += count                                                 # O(1)
+        width, height = changed.shape                                       # O(1)
+        if self.layout == self.LAYOUT_TILES:                                # O(1)
+            self.versions.stamp(changed, x, y, epochs)                      # O(mn)
+        else:                                                               # O(1)
+            np.copyto(self.versions[x:x + width, y:y + height], epochs, where=changed)   # O(mn)
+        if len(self.change_feed) + count > min(self.x * self.y, self.versions.size):    # O(1)
+            self.change_feed = []                                           # O(1)
+            self.feed_start = self.epoch                                    # O(1)
+            return                                                          # O(1)
+        xs, ys = np.nonzero(changed)                                        # O(mn)
+        self.change_feed.extend(((xs + x) * self.y + ys + y).tolist())      # O(k), Where k is the number of squares that changed
+
+    def mark_all_changed(self) -> None:
+        """
+        Records that every grid square has changed, by moving the changed_all watermark to a new epoch.
+        The versions are left as they are, a square's version is the newer of its stamp and the watermark (see version).
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.epoch += 1                                                     # O(1)
+        self.changed_all = self.epoch                                       # O(1)
+        self.change_feed = []                                               # O(1)
+        self.feed_start = self.epoch                                        # O(1)
+
+    def version(self, x: int, y: int) -> int:
+        """
+        Returns the epoch the grid square at (x, y) last changed at.
+
+        Args:
+        - x: The x coordinate of the grid square
+            Type: Integer
+        - y: The y coordinate of the grid square
+            Type: Integer
+
+        Returns:
+        - The newer of the square's stamp and the changed_all watermark
+            Type: Integer
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return max(int(self.versions[x, y]), self.changed_all)              # O(1)
+
+    def changes_since(self, epoch: int, region: tuple[int, int, int, int] = None) -> set[tuple[int, int]]:
+        """
+        Returns the grid squares that have changed after the given epoch.
+        With LAYOUT_TILES, squares of chunks that were never painted are left out (see untouched_changed_since).
+        When the changed_all watermark is newer than the epoch every square changed, and the versions are not read.
+
+        Args:
+        - epoch: A value of self.epoch that was saved earlier
+            Type: Integer
+        - region: The (x, y, width, height) of the squares to report, every square of the grid if not given
+            Type: Tuple of 4 integers
+
+        Returns:
+        - The (x, y) coordinates of every grid square of the region changed since that epoch
+            Type: Set of tuples of 2 integers
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the region
+            Happens when the epoch is older than the change feed, so the versions of the region have to be scanned
+        - Best case: O(k), Where k is the number of changes made since the epoch
+            Happens when the epoch is still covered by the change feed
+        """
+        left, bottom, width, height = (0, 0, self.x, self.y) if region is None else region   # O(1)
+        if epoch >= self.feed_start:                                        # O(1)
+            changes = {divmod(square, self.y) for square in self.change_feed[epoch - self.feed_start:]}   # O(k)
+            if region is None:                                              # O(1)
+                return changes                                              # O(1)
+            return {(x, y) for x, y in changes if left <= x < left + width and bottom <= y < bottom + height}   # O(k)
+        if self.changed_all > epoch:                                        # O(1)
+            epoch = -1                                                      # O(1), Every stamped square is newer
+        if self.layout == self.LAYOUT_TILES:                                # O(1)
+            return self.versions.newer_than(epoch, left, bottom, width, height)   # O(p), Where p is the number of squares in painted chunks of the region
+        found = np.argwhere(self.versions[left:left + width, bottom:bottom + height] > epoch)   # O(mn)
+        return set(zip((found[:, 0] + left).tolist(), (found[:, 1] + bottom).tolist()))   # O(k)
+
+    def untouched_changed_since(self, epoch: int) -> bool:
+        """
+        Returns true if the squares of chunks that were never painted have changed after the given epoch.
+        They all show untouched_layers, and can only change all together (such as with special).
+        Always false unless the layout is LAYOUT_TILES, since changes_since reports every square otherwise.
+
+        Args:
+        - epoch: A value of self.epoch that was saved earlier
+            Type: Integer
+
+        Returns:
+        - Boolean value of True if the untouched squares changed
+            Type: Boolean
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.layout == self.LAYOUT_TILES and self.changed_all > epoch    # O(1)
+
+    def untouched_layers(self) -> list[Layer]:
+        """
+        Returns the visible layers of the squares of chunks that were never painted, with LAYOUT_TILES.
+
+        Returns:
+        - The layers every square of a chunk that was never painted applies
+            Type: List of Layer Objects
+
+        Complexity:
+        - Worst case: O(1)
+            A square that was never painted holds at most one layer
+        - Best case: O(1)
+            A square that was never painted holds at most one layer
+        """
+        return self.grid.untouched.visible_layers(0, 0)                     # O(1)
+
+    def drain_changes(self) -> set[tuple[int, int]]:
+        """
+        Returns the grid squares changed since the previous call to drain_changes, and empties the feed for the next call.
+
+        Returns:
+        - The (x, y) coordinates of every grid square changed since the last drain
+            Type: Set of tuples of 2 integers
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(k), Where k is the number of changes made since the last drain
+        """
+        changes = self.changes_since(self.drained_epoch)                    # O(k) / O(mn)
+        self.drained_epoch = self.epoch                                     # O(1)
+        return changes                                                      # O(1)
     
     def add_action_grid(self, origin: str = None, length: int = None, width: int = None, layer: Layer = None) -> None:
         """
         A function to to add either a paint action or a paint step to the paint action list.
 
         Args:
-        - origin: a string that indicates whether to return a paint action/paint step or paint action with special enabled
+        - origin: a string that indicates whether to return a paint action/paint step/erase step or paint action with special enabled
             Type: String
         - length: the length of the grid square to be painted
             Type: Integer
@@ -190,18 +1450,24 @@ class Grid:
         - PaintStep: a paint step object
             Type: PaintStep
 
+                OR
+
+        - EraseStep: an erase step object, when origin is 'erase'
+            Type: EraseStep
+
         Complexity:
         - Worst case: O(1)
             Number of operations is constant and doesnt rely on the size of the input
         - Best case: O(1)
             Number of operations is constant and doesnt rely on the size of the input
 
-        Both best and worst happen when the origin is either 'special', 'paint' or 'step'
+        Both best and worst happen when the origin is either 'special', 'paint', 'erase' or 'step'
         """
-        from action import PaintStep, PaintAction                       # O(1)
         if origin == 'special':                                         # O(1)
             return PaintAction(is_special=True)                         # O(1)
         elif origin == 'paint':                                         # O(1)
             return PaintAction()                                        # O(1)
+        elif origin == 'erase':                                         # O(1)
+            return EraseStep((length, width), layer)                    # O(1)
         else:                                                           # O(1)
             return PaintStep((length, width), layer)                    # O(1)
\ No newline at end of file
@@ -0,0 +1,479 @@
+"""
+Per-layer coverage index.
+
+Grid keeps a CoverageIndex of which squares hold each layer, updated by every paint,
+erase and special that goes through the grid, so questions such as "which squares hold
+red" or "how much of the canvas is sparkle" are answered without visiting every square.
+Only painted layers are recorded: the invert or black that special shows in a SET grid
+is not. Changes made directly to a square's LayerStore bypass the index.
+
+Each layer's coverage is split into tile_size x tile_size numpy arrays counting how many
+times every square holds it, so bulk operations update it with a few masked additions
+rather than a square at a time. A tile is created when a square in it first holds the
+layer and dropped when the last one stops, so on every layout the index costs memory,
+and its queries cost time, in proportion to the tiles the layer covers rather than to the grid.
+"""
+
+from __future__ import annotations
+import numpy as np
+from layer_util import Layer
+from tiles import CHUNK_SIZE
+
+class CoverageIndex:
+    """
+    Which squares of a width x height grid hold each layer.
+    - tiles: Maps a layer index to a dict from (x // tile_size, y // tile_size) to the array counting
+      the times each square of that tile holds the layer (more than once only in an ADD grid).
+      Only tiles with a square holding the layer are kept, and only layers with such a tile.
+    - tile_totals: Maps a layer index to a dict from the key of each of its tiles to the number of squares of it holding the layer.
+    - totals: Maps a layer index to the number of squares holding the layer.
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int = CHUNK_SIZE, dtype: type = np.uint8) -> None:
+        """
+        Initialises an index where no square holds any layer.
+
+        Args:
+        - width: The number of columns of the grid
+            Type: Integer
+        - height: The number of rows of the grid
+            Type: Integer
+        - tile_size: The width and height of a tile
+            Type: Integer
+        - dtype: The type of the counts, wide enough for the most times a square can hold a layer
+            Type: numpy unsigned integer type
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            No array is allocated until a layer is recorded
+        - Best case: O(1)
+            No array is allocated until a layer is recorded
+        """
+        self.width = width                                                                  # O(1)
+        self.height = height                                                                # O(1)
+        self.tile_size = tile_size                                                          # O(1)
+        self.dtype = dtype                                                                  # O(1)
+        self.tiles = {}                                                                     # O(1)
+        self.tile_totals = {}                                                               # O(1)
+        self.totals = {}                                                                    # O(1)
+
+    def tile_shape(self) -> tuple[int, int]:
+        """
+        Returns the shape of every tile's array.
+        """
+        return (self.tile_size, self.tile_size)
+
+    def tile_key(self, x: int, y: int) -> tuple[int, int]:
+        """
+        Returns the key of the tile holding the square at (x, y).
+        """
+        return (x // self.tile_size, y // self.tile_size)
+
+    def tile(self, index: int, key: tuple[int, int], create: bool = False) -> np.ndarray | None:
+        """
+        Returns the counts of a layer's tile.
+
+        Args:
+        - index: The index of the layer
+            Type: Integer
+        - key: The key of the tile
+            Type: Tuple of 2 integers
+        - create: Whether to create the tile, with every count 0, if it does not exist yet
+            Type: Boolean
+
+        Returns:
+        - The counts, or None if the tile does not exist and create is False
+            Type: numpy.ndarray
+
+        Complexity:
+        - Worst case: O(t), Where t is the number of squares of a tile
+            Happens when the tile is created
+        - Best case: O(1)
+            Happens when the tile exists already
+        """
+        tiles = self.tiles.get(index)                                                       # O(1)
+        if tiles is None:                                                                   # O(1)
+            if create == False:                                                             # O(1)
+                return None                                                                 # O(1)
+            tiles = self.tiles[index] = {}                                                  # O(1)
+            self.tile_totals[index] = {}                                                    # O(1)
+            self.totals[index] = 0                                                          # O(1)
+        counts = tiles.get(key)                                                             # O(1)
+        if counts is None and create == True:                                               # O(1)
+            counts = tiles[key] = np.zeros(self.tile_shape(), dtype=self.dtype)             # O(t)
+            self.tile_totals[index][key] = 0                                                # O(1)
+        return counts                                                                       # O(1)
+
+    def parts(self, x: int, y: int, width: int, height: int) -> list[tuple[int, int, int, int]]:
+        """
+        Splits the width x height squares starting at (x, y) along tile borders.
+
+        Returns:
+        - One (x, y, width, height) rectangle per tile the squares cross
+            Type: List of tuples of 4 integers
+
+        Complexity:
+        - Worst case: O(mn / t + 1), Where m and n are the height and width of the rectangle and t is the number of squares of a tile
+        - Best case: O(1)
+            Happens when the rectangle is inside one tile
+        """
+        size = self.tile_size                                                               # O(1)
+        parts = []                                                                          # O(1)
+        part_x = x                                                                          # O(1)
+        while part_x < x + width:                                                           # O(n / c), Where c is the tile size
+            part_width = min(x + width, part_x - part_x % size + size) - part_x             # O(1), To the next tile border
+            part_y = y                                                                      # O(1)
+            while part_y < y + height:                                                      # O(m / c)
+                part_height = min(y + height, part_y - part_y % size + size) - part_y       # O(1)
+                parts.append((part_x, part_y, part_width, part_height))                     # O(1)
+                part_y += part_height                                                       # O(1)
+            part_x += part_width                                                            # O(1)
+        return parts                                                                        # O(1)
+
+    def local(self, x: int, y: int) -> tuple[int, int]:
+        """
+        Returns the position of the square at (x, y) in its tile.
+        """
+        return (x % self.tile_size, y % self.tile_size)
+
+    def count_held(self, index: int, key: tuple[int, int], delta: int) -> None:
+        """
+        Adds delta to the number of squares of a layer's tile holding the layer, and drops the tile once none do,
+        and the layer once none of its tiles are left.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        self.totals[index] += delta                                                         # O(1)
+        self.tile_totals[index][key] += delta                                               # O(1)
+        if self.tile_totals[index][key] == 0:                                               # O(1)
+            del self.tiles[index][key]                                                      # O(1)
+            del self.tile_totals[index][key]                                                # O(1)
+            if len(self.tiles[index]) == 0:                                                 # O(1)
+                del self.tiles[index]                                                       # O(1)
+                del self.tile_totals[index]                                                 # O(1)
+                del self.totals[index]                                                      # O(1)
+
+    def held(self) -> list[tuple[int, dict[tuple[int, int], np.ndarray]]]:
+        """
+        Returns the index and the tiles of every layer some square holds.
+        """
+        return list(self.tiles.items())
+
+    def add(self, layer: Layer, x: int, y: int) -> None:
+        """
+        Records that the square at (x, y) holds the layer once more.
+
+        Complexity:
+        - Worst case: O(t), Where t is the number of squares of a tile
+            Happens when the tile is created
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        key = self.tile_key(x, y)                                                           # O(1)
+        counts = self.tile(layer.index, key, True)                                          # O(t)
+        local = self.local(x, y)                                                            # O(1)
+        if counts[local] == 0:                                                              # O(1)
+            self.count_held(layer.index, key, 1)                                            # O(1)
+        counts[local] += 1                                                                  # O(1)
+
+    def remove(self, layer: Layer, x: int, y: int) -> None:
+        """
+        Records that the square at (x, y) holds the layer once less.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        key = self.tile_key(x, y)                                                           # O(1)
+        counts = self.tiles[layer.index][key]                                               # O(1)
+        local = self.local(x, y)                                                            # O(1)
+        counts[local] -= 1                                                                  # O(1)
+        if counts[local] == 0:                                                              # O(1)
+            self.count_held(layer.index, key, -1)                                           # O(1), Drops the tile if it was its last square
+
+    def add_mask(self, layer: Layer, mask: np.ndarray, x: int = 0, y: int = 0) -> None:
+        """
+        Records that each square selected by the mask holds the layer once more.
+
+        Args:
+        - layer: The layer the squares hold
+            Type: Layer Object
+        - mask: Array of shape (width, height) of a rectangle of the grid, True for the squares that hold the layer once more
+            Type: numpy.ndarray of bool
+        - x: The x coordinate of the square mask[0, 0] stands for
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(k + pt), Where k is the number of squares of the mask, p is the number of tiles created and t is the number of squares of a tile
+            A few masked numpy operations over each tile the mask crosses
+        - Best case: O(k), Where k is the number of squares of the mask
+        """
+        for part_x, part_y, width, height in self.parts(x, y, mask.shape[0], mask.shape[1]):    # O(k / t + 1)
+            selected = mask[part_x - x:part_x - x + width, part_y - y:part_y - y + height]  # O(1), A view
+            if not selected.any():                                                          # O(t)
+                continue                                                                    # O(1)
+            key = self.tile_key(part_x, part_y)                                             # O(1)
+            local_x, local_y = self.local(part_x, part_y)                                   # O(1)
+            counts = self.tile(layer.index, key, True)[local_x:local_x + width, local_y:local_y + height]   # O(t)
+            self.count_held(layer.index, key, int(np.count_nonzero(selected & (counts == 0))))    # O(t)
+            np.add(counts, 1, out=counts, where=selected)                                   # O(t)
+
+    def remove_mask(self, layer: Layer, mask: np.ndarray, x: int = 0, y: int = 0) -> None:
+        """
+        Records that each square selected by the mask holds the layer once less.
+
+        Args:
+        - layer: The layer the squares hold
+            Type: Layer Object
+        - mask: Array of shape (width, height) of a rectangle of the grid, True for the squares that hold the layer once less
+            Type: numpy.ndarray of bool
+        - x: The x coordinate of the square mask[0, 0] stands for
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(k + t), Where k is the number of squares of the mask and t is the number of squares of a tile
+            A few masked numpy operations over each tile the mask crosses
+        - Best case: O(k), Where k is the number of squares of the mask
+        """
+        for part_x, part_y, width, height in self.parts(x, y, mask.shape[0], mask.shape[1]):    # O(k / t + 1)
+            selected = mask[part_x - x:part_x - x + width, part_y - y:part_y - y + height]  # O(1), A view
+            if not selected.any():                                                          # O(t)
+                continue                                                                    # O(1)
+            key = self.tile_key(part_x, part_y)                                             # O(1)
+            local_x, local_y = self.local(part_x, part_y)                                   # O(1)
+            counts = self.tiles[layer.index][key][local_x:local_x + width, local_y:local_y + height]   # O(1), A view
+            np.subtract(counts, 1, out=counts, where=selected)                              # O(t)
+            cleared = int(np.count_nonzero(selected & (counts == 0)))                       # O(t)
+            if cleared > 0:                                                                 # O(1)
+                self.count_held(layer.index, key, -cleared)                                 # O(1), Drops the tile if it was its last squares
+
+    def update_cells(self, layer: Layer, xs: np.ndarray, ys: np.ndarray, delta: int) -> None:
+        """
+        Adds delta to the number of times each of the squares holds the layer, once per time it is listed.
+
+        Args:
+        - layer: The layer the squares hold
+            Type: Layer Object
+        - xs: The x coordinate of each square
+            Type: numpy.ndarray of integers
+        - ys: The y coordinate of each square
+            Type: numpy.ndarray of integers
+        - delta: 1 or -1
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(k log k + pt), Where k is the number of squares, p is the number of tiles created and t is the number of squares of a tile
+            The squares are sorted by tile and position to count repeats
+        - Best case: O(k log k), Where k is the number of squares
+        """
+        if len(xs) == 0:                                                                    # O(1)
+            return                                                                          # O(1)
+        height = self.tile_size                                                             # O(1)
+        tiles_x, tiles_y = xs // self.tile_size, ys // self.tile_size                       # O(k)
+        keys = tiles_x * (self.height // self.tile_size + 1) + tiles_y                      # O(k)
+        order = np.argsort(keys, kind="stable")                                             # O(k log k)
+        keys, xs, ys = keys[order], xs[order] % self.tile_size, ys[order] % self.tile_size  # O(k)
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))                                  # O(k)
+        groups = [
+            ((int(tiles_x[order[start]]), int(tiles_y[order[start]])), group_xs, group_ys)
+            for start, group_xs, group_ys in zip(starts.tolist(), np.split(xs, starts[1:]), np.split(ys, starts[1:]))
+        ]                                                                                   # O(k)
+        for key, group_xs, group_ys in groups:                                              # O(p)
+            counts = self.tile(layer.index, key, delta > 0)                                 # O(t)
+            flat = counts.reshape(-1)                                                       # O(1), A view
+            positions, repeats = np.unique(group_xs * height + group_ys, return_counts=True)   # O(k log k)
+            before = flat[positions].astype(np.int64)                                       # O(k)
+            after = before + delta * repeats                                                # O(k)
+            flat[positions] = after                                                         # O(k)
+            if delta > 0:                                                                   # O(1)
+                self.count_held(layer.index, key, int(np.count_nonzero(before == 0)))       # O(k)
+            else:                                                                           # O(1)
+                cleared = int(np.count_nonzero(after == 0))                                 # O(k)
+                if cleared > 0:                                                             # O(1)
+                    self.count_held(layer.index, key, -cleared)                             # O(1)
+
+    def add_squares(self, layer: Layer, squares: list[tuple[int, int]]) -> None:
+        """
+        Records that each of the squares holds the layer once more.
+
+        Complexity:
+        - Worst case: O(k log k), Where k is the number of squares
+        - Best case: O(k log k), Where k is the number of squares
+        """
+        cells = np.array(squares, dtype=np.int64).reshape(-1, 2)                            # O(k)
+        self.update_cells(layer, cells[:, 0], cells[:, 1], 1)                               # O(k log k)
+
+    def remove_squares(self, layer: Layer, squares: list[tuple[int, int]]) -> None:
+        """
+        Records that each of the squares holds the layer once less.
+
+        Complexity:
+        - Worst case: O(k log k), Where k is the number of squares
+        - Best case: O(k log k), Where k is the number of squares
+        """
+        cells = np.array(squares, dtype=np.int64).reshape(-1, 2)                            # O(k)
+        self.update_cells(layer, cells[:, 0], cells[:, 1], -1)                              # O(k log k)
+
+    def holds(self, layer: Layer, x: int, y: int) -> bool:
+        """
+        Returns true if the square at (x, y) holds the layer.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        counts = self.tile(layer.index, self.tile_key(x, y))                                # O(1)
+        return counts is not None and counts[self.local(x, y)] > 0                          # O(1)
+
+    def count(self, layer: Layer) -> int:
+        """
+        Returns the number of squares holding the layer.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.totals.get(layer.index, 0)                                              # O(1)
+
+    def fraction(self, layer: Layer) -> float:
+        """
+        Returns the fraction of the grid's squares holding the layer.
+        """
+        return self.count(layer) / (self.width * self.height)
+
+    def cell_arrays(self, layer: Layer) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the x and y coordinates of every square holding the layer, in no particular order.
+
+        Complexity:
+        - Worst case: O(pt), Where p is the number of tiles with a square holding the layer and t is the number of squares of a tile
+            Only those tiles are kept, so p is at most the number of squares returned
+        - Best case: O(1)
+            Happens when no square holds the layer
+        """
+        xs, ys = [], []                                                                     # O(1)
+        tile_width, tile_height = self.tile_shape()                                         # O(1)
+        if self.count(layer) == 0:                                                          # O(1)
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)                 # O(1)
+        for (tile_x, tile_y), counts in self.tiles[layer.index].items():                    # O(p)
+            found_xs, found_ys = np.nonzero(counts)                                         # O(t)
+            xs.append(found_xs + tile_x * tile_width)                                       # O(t)
+            ys.append(found_ys + tile_y * tile_height)                                      # O(t)
+        return np.concatenate(xs), np.concatenate(ys)                                       # O(pt)
+
+    def cells(self, layer: Layer) -> list[tuple[int, int]]:
+        """
+        Returns the (x, y) coordinates of every square holding the layer, in no particular order.
+
+        Complexity:
+        - Worst case: O(pt), Where p is the number of tiles with a square holding the layer and t is the number of squares of a tile
+        - Best case: O(1)
+            Happens when no square holds the layer
+        """
+        xs, ys = self.cell_arrays(layer)                                                    # O(pt)
+        return list(zip(xs.tolist(), ys.tolist()))                                          # O(k), Where k is the number of squares holding the layer
+
+    def bounding_box(self, layer: Layer) -> tuple[int, int, int, int] | None:
+        """
+        Returns the smallest box containing every square holding the layer.
+
+        Args:
+        - layer: The layer to look up
+            Type: Layer Object
+
+        Returns:
+        - (min x, min y, max x, max y), all inclusive, or None if no square holds the layer
+            Type: Tuple of 4 integers
+
+        Complexity:
+        - Worst case: O(pt), Where p is the number of tiles with a square holding the layer and t is the number of squares of a tile
+            Each tile is reduced to the columns and rows holding the layer
+        - Best case: O(1)
+            Happens when no square holds the layer
+        """
+        if self.count(layer) == 0:                                                          # O(1)
+            return None                                                                     # O(1)
+        tile_width, tile_height = self.tile_shape()                                         # O(1)
+        box = None                                                                          # O(1)
+        for (tile_x, tile_y), counts in self.tiles[layer.index].items():                    # O(p)
+            columns = np.flatnonzero(counts.any(axis=1)) + tile_x * tile_width              # O(t)
+            rows = np.flatnonzero(counts.any(axis=0)) + tile_y * tile_height                # O(t)
+            found = (int(columns[0]), int(rows[0]), int(columns[-1]), int(rows[-1]))        # O(1)
+            if box is None:                                                                 # O(1)
+                box = found                                                                 # O(1)
+            else:                                                                           # O(1)
+                box = (min(box[0], found[0]), min(box[1], found[1]), max(box[2], found[2]), max(box[3], found[3]))   # O(1)
+        return box                                                                          # O(1)
+
+    def bitmasks(self) -> list[tuple[int, int, np.ndarray]]:
+        """
+        Returns the bitmask of the layers held by every square, where bit i is LAYERS[i], a tile at a time.
+
+        Returns:
+        - The x and y coordinates of the first square of each tile holding any layer, and the bitmasks of its squares inside the grid
+            Type: List of tuples of 2 integers and a numpy.ndarray of uint32
+
+        Complexity:
+        - Worst case: O(lpt), Where l is the number of layers held, p is the number of tiles and t is the number of squares of a tile
+        - Best case: O(1)
+            Happens when no square holds a layer
+        """
+        tile_width, tile_height = self.tile_shape()                                         # O(1)
+        bits = {}                                                                           # O(1), Maps a tile's key to its bitmasks
+        for index, tiles in self.held():                                                    # O(l)
+            for key, counts in tiles.items():                                               # O(p)
+                held = bits.get(key)                                                        # O(1)
+                if held is None:                                                            # O(1)
+                    held = bits[key] = np.zeros(counts.shape, dtype=np.uint32)              # O(t)
+                held |= (counts > 0).astype(np.uint32) << np.uint32(index)                  # O(t)
+        return [
+            (tile_x * tile_width, tile_y * tile_height, held[:self.width - tile_x * tile_width, :self.height - tile_y * tile_height])
+            for (tile_x, tile_y), held in bits.items()
+        ]                                                                                   # O(p)
+
+    @property
+    def squares(self) -> dict[int, dict[tuple[int, int], int]]:
+        """
+        Returns the whole index as plain Python: a dict from a layer index to a dict from (x, y) to the number
+        of times that square holds the layer, for layers some square holds. Meant for tests and debugging.
+
+        Complexity:
+        - Worst case: O(lpt), Where l is the number of layers held, p is the number of tiles and t is the number of squares of a tile
+        - Best case: O(1)
+            Happens when no square holds a layer
+        """
+        squares = {}                                                                        # O(1)
+        tile_width, tile_height = self.tile_shape()                                         # O(1)
+        for index, tiles in self.held():                                                    # O(l)
+            held = squares[index] = {}                                                      # O(1)
+            for (tile_x, tile_y), counts in tiles.items():                                  # O(p)
+                xs, ys = np.nonzero(counts)                                                 # O(t)
+                for x, y, count in zip(xs.tolist(), ys.tolist(), counts[xs, ys].tolist()):  # O(t)
+                    held[(x + tile_x * tile_width, y + tile_y * tile_height)] = count       # O(1)
+        return squares                                                                      # O(1)
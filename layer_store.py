@@ -1,10 +1,11 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from layer_util import Layer, get_layers
+import numpy as np
+import layer_util
+from layer_util import Layer, get_layers, apply_layers_batch
 import layers
-from data_structures.stack_adt import ArrayStack
-from data_structures.array_sorted_list import ArraySortedList, ListItem
-from data_structures.queue_adt import CircularQueue
+from pipeline import PipelineCache
+from data_structures.queue_adt import GrowableCircularDeque
 from data_structures.bset import BSet
 
 class LayerStore(ABC):
@@ -35,6 +36,13 @@ class LayerStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def erase_target(self, layer: Layer) -> Layer | None:
+        """
+        Returns the layer erase(layer) would remove, or None if it would not change the store.
+        """
+        pass
+
     @abstractmethod
     def special(self):
         """
@@ -42,18 +50,64 @@ class LayerStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def applied_layers(self) -> list[Layer]:
+        """
+        Returns the layers get_color applies, in the order it applies them.
+        """
+        pass
+
+    def visible_layers(self) -> list[Layer]:
+        """
+        Returns the suffix of applied_layers that starts at the topmost constant layer.
+        Everything before it is hidden, since constant layers ignore the colour underneath.
+        """
+        return self.applied_layers()
+
+    def get_colors(self, starts: np.ndarray, timestamp, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Batched get_color: returns the colours this store shows at many positions at once.
+        starts is an (N, 3) integer array and xs, ys are length N integer arrays.
+        """
+        return apply_layers_batch(self.visible_layers(), np.asarray(starts, dtype=np.int64), timestamp, xs, ys)
+
+    def is_time_dependent(self) -> bool:
+        """
+        Returns true if the colour of this square can change without the store changing.
+        """
+        return any(layer.time_dependent for layer in self.visible_layers())
+
+class SpecialParity:
+    """
+    Whether special has been applied to a whole grid an odd number of times.
+    For SetLayerStore and AdditiveLayerStore special is its own inverse, so every store of a grid
+    shares one SpecialParity and combines it with its own special state whenever it is read or written.
+    Applying special to the whole grid then only has to toggle the parity.
+    """
+
+    def __init__(self) -> None:
+        self.active = False
+
+    def toggle(self) -> None:
+        self.active = not self.active
+
 class SetLayerStore(LayerStore):
     """
     Set layer store. A single layer can be stored at a time (or nothing at all)
     - add: Set the single layer.
     - erase: Remove the single layer. Ignore what is currently selected.
     - special: Invert the colour output.
+    Special is active when the store's own status (own_special) differs from the parity of its grid.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, parity: SpecialParity = None) -> None:
         """
         Initlaises active layer to None and special mode status to False
 
+        Args:
+        - parity: The special parity of the grid the store belongs to, a parity of its own if not given
+            Type: SpecialParity Object
+
         Returns:
         - None
 
@@ -66,7 +120,19 @@ class SetLayerStore(LayerStore):
         Both best and worst happen when the variables are initialised since there is no other option
         """
         self.active_layer = None                                                                    # O(1)
-        self.special_mode_status = False                                                            # O(1)
+        self.parity = SpecialParity() if parity is None else parity                                 # O(1)
+        self.own_special = self.parity.active                                                       # O(1)
+
+    @property
+    def special_mode_status(self) -> bool:
+        """
+        Returns true if special is active, combining the store's own status with its grid's parity.
+        """
+        return self.own_special != self.parity.active
+
+    @special_mode_status.setter
+    def special_mode_status(self, status: bool) -> None:
+        self.own_special = status != self.parity.active
 
     def add(self, layer: Layer) -> bool:
         """
@@ -154,6 +220,18 @@ class SetLayerStore(LayerStore):
             return True                                                                             # O(1)
         return False                                                                                # O(1)
 
+    def erase_target(self, layer: Layer) -> Layer | None:
+        """
+        Returns the active layer, which erase removes whatever layer it is given
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.active_layer                                                                    # O(1)
+
     def special(self) -> None:
         """
         Activates the special mode for the current grid square by changing the special mode status to the opposite of what it currently is
@@ -167,7 +245,27 @@ class SetLayerStore(LayerStore):
         - Best case: O(1)
             Number of operations is constant and doesnt rely on the size of the input
         """
-        self.special_mode_status = not self.special_mode_status                                     # O(1)
+        self.own_special = not self.own_special                                                     # O(1)
+
+    def applied_layers(self) -> list[Layer]:
+        """
+        Returns the layers get_color applies, in the order it applies them
+
+        Returns:
+        - The active layer followed by invert when special is active, or black when special is active without a layer
+            Type: List of Layer Objects
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.active_layer == None:                                                               # O(1)
+            return [layers.black] if self.special_mode_status == True else []                       # O(1)
+        if self.special_mode_status == True:                                                        # O(1)
+            return [self.active_layer, layers.invert]                                               # O(1)
+        return [self.active_layer]                                                                  # O(1)
 
 class AdditiveLayerStore(LayerStore):
     """
@@ -175,26 +273,72 @@ class AdditiveLayerStore(LayerStore):
     - add: Add a new layer to be added last.
     - erase: Remove the first layer that was added. Ignore what is currently selected.
     - special: Reverse the order of current layers (first becomes last, etc.)
+
+    The layer sequence is compiled into a pipeline the first time it is drawn after a change,
+    shared by every store with the same sequence through AdditiveLayerStore.pipelines.
+    Only the layers from the topmost constant layer onwards are compiled, since it hides everything before it.
+
+    Special never moves the layers: the sequence is reversed when the store's own flag (flipped)
+    differs from the parity of its grid, and then layers are added at the front of the deque and erased from its rear.
+    Layers are numbered by where they were added: the front of the deque is number front_number, and
+    rear_number is one past its rear. constants holds the numbers of the constant layers front first,
+    so the topmost one is at its rear, or at its front when the sequence is reversed. It stays None
+    until the first constant layer is added, since most squares never hold one.
     """
 
-    def __init__(self) -> None:
+    pipelines = PipelineCache()
+
+    def __init__(self, parity: SpecialParity = None) -> None:
         """
-        Initialises a queue to store the layers added
+        Initialises a deque to store the layers added, which holds up to the number of layers * 100 layers.
+        The deque starts with room for a couple of layers and grows as they are added.
+
+        Args:
+        - parity: The special parity of the grid the store belongs to, a parity of its own if not given
+            Type: SpecialParity Object
 
         Returns:
         - None
 
         Complexity:
-        - Worst case: O(n) Where n is the length of the queue to be initialised which is the number of layers * 100
-        - Best case: O(n) Where n is the length of the queue to be initialised which is the number of layers * 100
+        - Worst case: O(1)
+            The deque is initialised with a constant capacity
+        - Best case: O(1)
+            The deque is initialised with a constant capacity
+        """
+        self.layer_sequence = GrowableCircularDeque(len(get_layers()) * 100)                        # O(1)
+        self.parity = SpecialParity() if parity is None else parity                                 # O(1)
+        self.flipped = self.parity.active                                                           # O(1)
+        self.pipeline = None                                                                        # O(1), Compiled lazily by get_color
+        self.pipeline_reversed = False                                                              # O(1), Whether the pipeline was compiled reversed
+        self.front_number = 0                                                                       # O(1)
+        self.rear_number = 0                                                                        # O(1)
+        self.constants = None                                                                       # O(1), Allocated by the first constant layer added
 
-        Both best and worst happen when the queue is initialised since there is no other option
+    @property
+    def reversed(self) -> bool:
+        """
+        Returns true if the layer sequence is applied from the rear of the deque to its front.
+        """
+        return self.flipped != self.parity.active
+
+    def constant_numbers(self) -> GrowableCircularDeque:
+        """
+        Returns the deque of the numbers of the constant layers, allocating it if this is the first constant layer.
+        """
+        if self.constants is None:                                                                  # O(1)
+            self.constants = GrowableCircularDeque(len(get_layers()) * 100)                         # O(1)
+        return self.constants                                                                       # O(1)
+
+    def has_constants(self) -> bool:
+        """
+        Returns true if the layer sequence holds a constant layer.
         """
-        self.layer_sequence = CircularQueue(len(get_layers()) * 100)                                # O(n) Where n is the length of the queue
+        return self.constants is not None and self.constants.is_empty() == False
 
     def add(self, layer: Layer) -> bool:
         """
-        Adds a layer to the layer sequence queue
+        Adds a layer to the end of the layer sequence
 
         Args:
         - layer: The layer to be added to the queue
@@ -205,15 +349,23 @@ class AdditiveLayerStore(LayerStore):
             Type: Boolean
 
         Complexity:
-        - Worst case: O(1)
-            Number of operations is constant and doesnt rely on the size of the input
+        - Worst case: O(m), Where m is the number of layers in the layer sequence queue
+            Happens when the deque's array is full and has to grow, which is amortised O(1)
         - Best case: O(1)
-            Number of operations is constant and doesnt rely on the size of the input
-
-        Both best and worst happen when either the layer is added to the queue or the queue is full
+            Happens when either the layer is added to the deque without growing or the deque is full
         """
         if self.layer_sequence.is_full() == False:                                                  # O(1)
-            self.layer_sequence.append(layer)                                                       # O(1)
+            if self.reversed == True:                                                               # O(1)
+                self.layer_sequence.append_front(layer)                                             # O(1)
+                self.front_number -= 1                                                              # O(1)
+                if layer.is_constant == True:                                                       # O(1)
+                    self.constant_numbers().append_front(self.front_number)                         # O(1)
+            else:                                                                                   # O(1)
+                self.layer_sequence.append(layer)                                                   # O(1)
+                if layer.is_constant == True:                                                       # O(1)
+                    self.constant_numbers().append(self.rear_number)                                # O(1)
+                self.rear_number += 1                                                               # O(1)
+            self.pipeline = None                                                                    # O(1)
             return True                                                                             # O(1)
         else:                                                                                       # O(1)
             return False                                                                            # O(1)
@@ -237,21 +389,20 @@ class AdditiveLayerStore(LayerStore):
             Type: Tuple of 3 integers
 
         Complexity:
-        - Worst case: O(mn), Where n is the length of the layer sequence, and m is the timestamp of the layers that are animated
-            Will only happen if one of the layers being applied is sparkle or rainbow.
-        - Best case: O(n), Where n is the length of the layer sequence
-            Will only occur when the sparkle or rainbow layer is not present in the layer sequence or the layer sequence is empty
-        """
-        for _ in range(len(self.layer_sequence)):                                                   # O(n) Where n is the length of the layer sequence
-            layer_to_apply = self.layer_sequence.serve()                                            # O(1)
-            start = layer_to_apply.apply(start, timestamp, x, y)                                    # O(1) / O(m) Where m is the timestamp for the sparkle layer
-            self.layer_sequence.append(layer_to_apply)                                              # O(1)
-
-        return start                                                                                # O(1)
+        - Worst case: O(n), Where n is the length of the layer sequence
+            Happens on the first call after the layer sequence changed or was reversed, since it has to be compiled
+        - Best case: O(s), Where s is the number of steps in the compiled pipeline
+            Runs of colour table layers (such as lighten, invert and black) take a single step,
+            and layers before the topmost constant layer are skipped
+        """
+        if self.pipeline is None or self.pipeline_reversed != self.reversed:                        # O(1)
+            self.pipeline = self.pipelines.get_stack(self.visible_layers())                         # O(n) Where n is the length of the layer sequence
+            self.pipeline_reversed = self.reversed                                                  # O(1)
+        return self.pipeline(start, timestamp, x, y)                                                # O(s)
         
     def erase(self, layer: Layer) -> bool:
         """
-        Erases the first layer that was addede to the layer sequence queue
+        Erases the first layer of the layer sequence
 
         Args:
         - layer: The layer to be removed from the grid square
@@ -262,47 +413,200 @@ class AdditiveLayerStore(LayerStore):
             Type: Boolean
 
         Complexity:
-        - Worst case: O(1)
-            Number of operations is constant and doesnt rely on the size of the input
+        - Worst case: O(m), Where m is the number of layers in the layer sequence queue
+            Happens when the deque's array is mostly empty and shrinks, which is amortised O(1)
         - Best case: O(1)
-            Number of operations is constant and doesnt rely on the size of the input
-
-        Both best and worst happen when either a layer is removed from the queue or the queue is empty
+            Happens when either a layer is removed from the deque without shrinking or the deque is empty
         """
         if self.layer_sequence.is_empty() == False:                                                 # O(1)
-            self.layer_sequence.serve()                                                             # O(1)
+            if self.reversed == True:                                                               # O(1)
+                self.layer_sequence.serve_rear()                                                    # O(1)
+                self.rear_number -= 1                                                               # O(1)
+                if self.has_constants() == True and self.constants.peek_rear() == self.rear_number:    # O(1)
+                    self.constants.serve_rear()                                                     # O(1)
+            else:                                                                                   # O(1)
+                self.layer_sequence.serve()                                                         # O(1)
+                if self.has_constants() == True and self.constants.peek() == self.front_number:        # O(1)
+                    self.constants.serve()                                                          # O(1)
+                self.front_number += 1                                                              # O(1)
+            self.pipeline = None                                                                    # O(1)
             return True                                                                             # O(1)
         return False                                                                                # O(1)
 
+    def erase_target(self, layer: Layer) -> Layer | None:
+        """
+        Returns the first layer of the layer sequence, which erase removes whatever layer it is given
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.layer_sequence.is_empty() == True:                                                  # O(1)
+            return None                                                                             # O(1)
+        if self.reversed == True:                                                                   # O(1)
+            return self.layer_sequence.peek_rear()                                                  # O(1)
+        return self.layer_sequence.peek()                                                           # O(1)
+
     def special(self) -> None:
         """
-        Reverses the order of layers in the layer sequence queue so that the layer are applied backwards
+        Reverses the order of layers in the layer sequence so that the layer are applied backwards
 
         Returns:
         - None
 
         Complexity:
-        - Worst case: O(nm), Where n is the number of layers in the program and m is the number of layers in the layer sequence queue
-            Happens when there is at least one layer in the layer sequence queue
-        - Best case: O(n), Where n is the number of layers in the program
-            Happens when there are no layers in the layer sequence queue
+        - Worst case: O(1)
+            Only the direction the deque is read in changes, the layers stay where they are
+        - Best case: O(1)
+            Only the direction the deque is read in changes, the layers stay where they are
+        """
+        self.flipped = not self.flipped                                                             # O(1)
+
+    def applied_layers(self) -> list[Layer]:
+        """
+        Returns the layers get_color applies, in the order it applies them
+
+        Returns:
+        - The layers in the layer sequence, from its first layer to its last
+            Type: List of Layer Objects
+
+        Complexity:
+        - Worst case: O(n), Where n is the length of the layer sequence
+        - Best case: O(n), Where n is the length of the layer sequence
+
+        The layers are read by index from the deque's array, so the deque is left as it was.
         """
-        temp_layer_stack = ArrayStack(len(get_layers()) * 100)                                      # O(n) Where n is the number of layers in the program
+        sequence = self.layer_sequence                                                              # O(1)
+        array, front = sequence.array, sequence.front                                               # O(1)
+        result = [array[(front + i) % len(array)] for i in range(len(sequence))]                    # O(n) Where n is the length of the layer sequence
+        if self.reversed == True:                                                                   # O(1)
+            result.reverse()                                                                        # O(n)
+        return result                                                                               # O(1)
 
-        for _ in range(len(self.layer_sequence)):                                                   # O(m) Where m is the number of layers in the layer sequence queue
-            temp_layer_stack.push(self.layer_sequence.serve())                                      # O(1)
+    @property
+    def top_constant(self) -> int | None:
+        """
+        Returns the position of the topmost constant layer in applied_layers, None if there is none.
 
-        for _ in range(len(temp_layer_stack)):                                                      # O(m) Where m is the number of layers in the layer sequence queue
-            self.layer_sequence.append(temp_layer_stack.pop())                                      # O(1)
+        Complexity:
+        - Worst case: O(1)
+            The constant layers nearest both ends of the deque are tracked by add and erase
+        - Best case: O(1)
+            The constant layers nearest both ends of the deque are tracked by add and erase
+        """
+        if self.has_constants() == False:                                                           # O(1)
+            return None                                                                             # O(1)
+        if self.reversed == True:                                                                   # O(1)
+            return self.rear_number - 1 - self.constants.peek()                                     # O(1)
+        return self.constants.peek_rear() - self.front_number                                       # O(1)
+
+    def visible_layers(self) -> list[Layer]:
+        """
+        Returns the layers from the topmost constant layer onwards, which are the only ones that affect the colour
+
+        Returns:
+        - The visible suffix of the layer sequence
+            Type: List of Layer Objects
+
+        Complexity:
+        - Worst case: O(n), Where n is the length of the layer sequence
+        - Best case: O(n), Where n is the length of the layer sequence
+        """
+        layers = self.applied_layers()                                                              # O(n) Where n is the length of the layer sequence
+        top = self.top_constant                                                                     # O(1)
+        if top is None:                                                                             # O(1)
+            return layers                                                                           # O(1)
+        return layers[top:]                                                                         # O(n)
     
+class SequenceSpecialTable:
+    """
+    Maps every bitmask of enabled layers (bit i enables LAYERS[i]) to the bitmask SequenceLayerStore.special leaves behind.
+    special sorts the enabled layers by name, drops the last one if there is an even number of them
+    and disables the middle-most one, so with k layers enabled it disables the ((k - 1) // 2)th by name.
+    - table: Array of 2^n uint32 bitmasks, where n is one more than the highest registered layer index.
+    The table is rebuilt whenever a layer is registered.
+    """
+
+    def __init__(self) -> None:
+        self.registry_version = None
+        self._table = None
+
+    @property
+    def table(self) -> np.ndarray:
+        """
+        Returns the transition table, rebuilding it if a layer was registered since it was built.
+        """
+        if self.registry_version != layer_util.registry_version:                                    # O(1)
+            self.rebuild()                                                                          # O(n 2^n)
+        return self._table                                                                          # O(1)
+
+    def rebuild(self) -> None:
+        """
+        Builds the transition table from the registered layers.
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(n 2^n), Where n is the number of layers in the program
+            One vectorised pass over every bitmask for each layer, in name order
+        - Best case: O(n 2^n), Where n is the number of layers in the program
+        """
+        self.registry_version = layer_util.registry_version                                         # O(1)
+        self._table = build_special_table(get_layers())                                             # O(n 2^n)
+
+    def __getitem__(self, mask: int) -> int:
+        return int(self.table[mask])
+
+def build_special_table(layer_list) -> np.ndarray:
+    """
+    Returns the SequenceLayerStore.special transition table of every bitmask of the given layers.
+
+    Args:
+    - layer_list: The registered layers, with None for unused indices
+        Type: ArrayR or list of Layer Objects
+
+    Returns:
+    - table[mask] is mask with its middle-most layer by name disabled
+        Type: Numpy array of uint32
+
+    Complexity:
+    - Worst case: O(n 2^n), Where n is the number of layers
+    - Best case: O(n 2^n), Where n is the number of layers
+    """
+    registered = [layer for layer in layer_list if layer is not None]                               # O(n)
+    size = 1 << max((layer.index + 1 for layer in registered), default=0)                           # O(n)
+    masks = np.arange(size, dtype=np.uint32)                                                        # O(2^n)
+    counts = np.zeros(size, dtype=np.int64)                                                         # O(2^n)
+    for layer in registered:                                                                        # O(n)
+        counts += (masks >> layer.index) & 1                                                        # O(2^n)
+    target = (counts - 1) // 2                                                                      # O(2^n), Position by name of the layer to disable
+    table = masks.copy()                                                                            # O(2^n)
+    seen = np.zeros(size, dtype=np.int64)                                                           # O(2^n)
+    for layer in sorted(registered, key=lambda layer: (layer.name, layer.index)):                   # O(n log n)
+        enabled = ((masks >> layer.index) & 1).astype(bool)                                         # O(2^n)
+        table[enabled & (seen == target)] &= ~np.uint32(1 << layer.index)                           # O(2^n)
+        seen += enabled                                                                             # O(2^n)
+    return table                                                                                    # O(1)
+
 class SequenceLayerStore(LayerStore):
     """
     Sequence layer store. Layers are either 'enabled' or 'disabled'.
     - add: 'Enables' the layer.
     - erase: 'Disables' the layer.
     - special: Order all the active layers lexiographically and 'disable' the centre one.
+
+    The enabled layers are compiled into a pipeline per bitmask, shared by every store through SequenceLayerStore.pipelines.
+    top_constant is one more than the index of the highest enabled constant layer (0 if there is none),
+    and only the layers from there upwards are compiled, since it hides every layer below it.
+    special looks the bitmask up in SequenceLayerStore.special_table rather than sorting the enabled layers.
     """
 
+    pipelines = PipelineCache()
+    special_table = SequenceSpecialTable()
+
     def __init__(self) -> None:
         """
         Initialises a set to store the layers added
@@ -319,6 +623,7 @@ class SequenceLayerStore(LayerStore):
         Both best and worst happen when the set is initialised since there is no other option
         """
         self.set = BSet()                                                                           # O(1)
+        self.top_constant = 0                                                                       # O(1)
 
     def add(self, layer: Layer) -> bool:
         """
@@ -343,6 +648,8 @@ class SequenceLayerStore(LayerStore):
         if layer.index + 1 in self.set:                                                             # O(1)
             return False                                                                            # O(1)
         self.set.add(layer.index + 1)                                                               # O(1)
+        if layer.is_constant == True and layer.index + 1 > self.top_constant:                       # O(1)
+            self.top_constant = layer.index + 1                                                     # O(1)
         return True                                                                                 # O(1)
     
     def get_color(self, start: tuple[int, int, int], timestamp: int, x: int, y: int) -> tuple[int, int, int]:
@@ -364,17 +671,12 @@ class SequenceLayerStore(LayerStore):
             Type: Tuple of 3 integers
 
         Complexity:
-        - Worst case: O(mn), Where n is the length of the layer sequence, and m is the timestamp of the layers that are animated
-            Will only happen if one of the layers being applied is sparkle or rainbow.
-        - Best case: O(n), Where n is the length of the layer sequence
-            Will only occur when the sparkle or ranbow layer is not present in the layer sequence or the set of layers is empty
+        - Worst case: O(n), Where n is the number of enabled layers
+            Happens when the pipeline for the set of layers is already compiled
+        - Best case: O(1)
+            Happens when the set of layers is empty and its pipeline is already compiled
         """
-        for layer in get_layers():                                                                  # O(n) Where n is the number of layers in the program
-            if layer != None:                                                                       # O(1)
-                if (layer.index + 1) in self.set:                                                   # O(1)
-                    start = layer.apply(start, timestamp, x, y)                                     # Best case: O(1) Worst case: O(m) Where m is the timestamp for the sparkle layer
-
-        return start                                                                                # O(1)
+        return self.pipelines.get(self.visible_mask())(start, timestamp, x, y)                      # O(n) Where n is the number of enabled layers
 
     def erase(self, layer: Layer) -> bool:
         """
@@ -399,8 +701,24 @@ class SequenceLayerStore(LayerStore):
         if (layer.index + 1) not in self.set:                                                       # O(1)
             return False                                                                            # O(1)
         self.set.remove(layer.index + 1)                                                            # O(1)
+        if layer.index + 1 == self.top_constant:                                                    # O(1)
+            self.top_constant = int.bit_length(self.set.elems & self.pipelines.constant_mask)       # O(1)
         return True                                                                                 # O(1)
 
+    def erase_target(self, layer: Layer) -> Layer | None:
+        """
+        Returns the given layer if it is enabled, since erase only disables that layer
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if (layer.index + 1) in self.set:                                                           # O(1)
+            return layer                                                                            # O(1)
+        return None                                                                                 # O(1)
+
     def special(self) -> None:
         """
         Arranges the enabled layers lexigraphically and disables the middle-most layer
@@ -409,25 +727,59 @@ class SequenceLayerStore(LayerStore):
         - None
 
         Complexity:
-        - Worst case: O(n log m), Where n is number of layers in the program and m is the number of layers in the temporary sorted list array
-            Happens when at least one layer is enabled
-        - Best case: O(n), Where n is the length of the temporary sorted list array
-            Happens when there are no layers enabled
+        - Worst case: O(1)
+            The new bitmask is looked up in special_table (which is rebuilt first if a layer was registered)
+        - Best case: O(1)
+            The new bitmask is looked up in special_table
         """
-        temp_list = ArraySortedList(len(get_layers()))                                              # O(n) Where n is the number of layers
+        removed = self.set.elems ^ self.special_table[self.set.elems]                               # O(1)
+        if removed != 0:                                                                            # O(1)
+            self.erase(get_layers()[removed.bit_length() - 1])                                      # O(1)
 
-        for layer in get_layers():                                                                  # O(n) Where n is the number of layers in the program
-            if layer != None:                                                                       # O(1)
-                if (layer.index + 1) in self.set:                                                   # O(1)
-                    temp_list.add(ListItem(layer, layer.name))                                      # O(log m) Where n is the length of the sorted list array
+    def applied_layers(self) -> list[Layer]:
+        """
+        Returns the layers get_color applies, in the order it applies them
 
-        if temp_list.is_empty() == True:                                                            # O(1)
-            return None                                                                             # O(1)
-        elif len(temp_list) == 1:                                                                   # O(1)
-            self.erase(temp_list[0].value)                                                          # O(1)
-            return None                                                                             # O(1)
-        
-        if len(temp_list) % 2 == 0:                                                                 # O(1)
-            temp_list.delete_at_index(len(temp_list) - 1)                                           # O(m) Where n is the length of the sorted list array
+        Returns:
+        - The enabled layers, in the order they were registered
+            Type: List of Layer Objects
 
-        self.erase(temp_list[len(temp_list) // 2].value)                                            # O(1)
\ No newline at end of file
+        Complexity:
+        - Worst case: O(n), Where n is the number of enabled layers
+        - Best case: O(1)
+            Happens when the set of layers is empty
+        """
+        return list(self.pipelines.get(self.set.elems).layers)                                      # O(n) Where n is the number of enabled layers
+
+    def visible_mask(self) -> int:
+        """
+        Returns the bitmask of the enabled layers from the topmost constant layer upwards
+
+        Returns:
+        - The enabled layers that affect the colour, as a bitmask where bit i is LAYERS[i]
+            Type: Integer
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.top_constant == 0:                                                                  # O(1)
+            return self.set.elems                                                                   # O(1)
+        return self.set.elems >> (self.top_constant - 1) << (self.top_constant - 1)                 # O(1)
+
+    def visible_layers(self) -> list[Layer]:
+        """
+        Returns the enabled layers from the topmost constant layer upwards, which are the only ones that affect the colour
+
+        Returns:
+        - The visible enabled layers, in the order they were registered
+            Type: List of Layer Objects
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of visible layers
+        - Best case: O(1)
+            Happens when no layer is visible
+        """
+        return list(self.pipelines.get(self.visible_mask()).layers)                                 # O(n) Where n is the number of visible layers
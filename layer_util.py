@@ -6,10 +6,13 @@ No need to edit unless adding new features.
 
 from __future__ import annotations
 from dataclasses import dataclass, field
+import numpy as np
 from data_structures.referential_array import ArrayR
 
 LAYERS: ArrayR[Layer] = ArrayR(20)
 cur_layer_index = 0
+# Bumped by every registration, so caches built from LAYERS know to rebuild.
+registry_version = 0
 
 @dataclass
 class Layer:
@@ -18,12 +21,44 @@ class Layer:
     apply: function
     name: str = field(init=False)
     bg: tuple[int, int, int] | None = None
+    time_dependent: bool = True
+    position_dependent: bool = True
+    color_dependent: bool = True
+    channelwise: bool = False
+    batch: function | None = None
 
     def __post_init__(self):
         if hasattr(self.apply, "__bg__"):
             self.bg = self.apply.__bg__
+        if hasattr(self.apply, "__batch__"):
+            self.batch = self.apply.__batch__
         self.name = self.apply.__name__
 
+    @property
+    def is_constant(self) -> bool:
+        """True if the layer always outputs the same colour."""
+        return not (self.time_dependent or self.position_dependent or self.color_dependent)
+
+    @property
+    def is_color_table(self) -> bool:
+        """True if the layer is the same lookup table of 0-255 values for every square and frame."""
+        return not (self.time_dependent or self.position_dependent) and (self.channelwise or not self.color_dependent)
+
+    def apply_batch(self, colors: np.ndarray, timestamp, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Applies the layer to many squares at once.
+
+        colors is an (N, 3) integer array and xs, ys are length N integer arrays.
+        Returns a new (N, 3) integer array, using the layer's batch kernel if it
+        has one and falling back to calling apply once per square otherwise.
+        """
+        if self.batch is not None:
+            return self.batch(colors, timestamp, xs, ys)
+        return np.array([
+            self.apply(tuple(color), timestamp, x, y)
+            for color, x, y in zip(colors.tolist(), xs.tolist(), ys.tolist())
+        ], dtype=np.int64).reshape(-1, 3)
+
 class background(object):
     """Simple decorator to add a __bg__ property to a layer
 
@@ -43,19 +78,71 @@ class background(object):
         func.__bg__ = self.val
         return layer
 
-def register(func):
+class batch(object):
+    """Simple decorator to add a __batch__ kernel to a layer
+
+    The kernel takes the same arguments as apply, except that color is an
+    (N, 3) integer array and x, y are length N integer arrays. It returns a
+    new (N, 3) integer array and must not modify its inputs.
+
+    Usage:  @register
+            @batch(my_special_layer_kernel)
+            def my_special_layer(...):
+    """
+    def __init__(self, kernel):
+        self.kernel = kernel
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            layer.batch = self.kernel
+        else:
+            layer.__batch__ = self.kernel
+        return layer
+
+def apply_layers_batch(layers, colors: np.ndarray, timestamp, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    Applies a sequence of layers, in order, to many squares at once.
+    See Layer.apply_batch for the array shapes.
+    """
+    for layer in layers:
+        colors = layer.apply_batch(colors, timestamp, xs, ys)
+    return colors
+
+def register(func=None, *, timestamp: bool = True, position: bool = True, color: bool = True, channelwise: bool = False):
     """
     Layer register function.
 
     Usage:  @register
             def my_special_layer(...):
 
+    Layers are assumed to depend on every argument. Declare the ones they
+    ignore so that renderers can cache their results:
+
+    Usage:  @register(timestamp=False, position=False)
+            def my_colour_filter(...):
+
+    - timestamp: False if the output never changes over time.
+    - position: False if the output is the same for every x and y.
+    - color: False if the output ignores the colour underneath (a constant layer).
+    - channelwise: True if each output channel is a function of the same input
+      channel alone, so that the layer can be fused into lookup tables.
+
     In order to actually confirm this registration,
     you'll need to import the file containing the layer definition
     """
-    global cur_layer_index
-    LAYERS[cur_layer_index] = Layer(cur_layer_index, func)
+    if func is None:
+        return lambda func: register(func, timestamp=timestamp, position=position, color=color, channelwise=channelwise)
+    global cur_layer_index, registry_version
+    LAYERS[cur_layer_index] = Layer(
+        cur_layer_index, func,
+        time_dependent=timestamp,
+        position_dependent=position,
+        color_dependent=color,
+        channelwise=channelwise,
+    )
     cur_layer_index += 1
+    registry_version += 1
     return LAYERS[cur_layer_index-1]
 
 def get_layers():
@@ -1,72 +1,187 @@
 """
 All layers are defined here.
+
+Each layer also has a batch kernel, which applies it to many squares at once
+(see layer_util.batch).
 """
 
 import colorsys
-from layer_util import background, register
+import numpy as np
+from layer_util import background, batch, register
 
-@register
+class HueTable(object):
+    """Hue to RGB table for rainbow, whose lightness and saturation are fixed at 0.6.
+
+    An instance is a batch kernel for rainbow, and table.grid evaluates it over
+    a whole rectangle of squares at once.
+
+    Usage:  HueTable()      Exact: evaluates colorsys.hls_to_rgb with the same floating
+                            point operations, so it matches rainbow exactly.
+            HueTable(360)   Looks each hue up in a table of 360 evenly spaced hues.
+                            Each channel is within HueTable(360).max_error of rainbow.
+    """
+    # colorsys.hls_to_rgb with l = s = 0.6
+    M2 = 0.6+0.6-(0.6*0.6)
+    M1 = 2.0*0.6 - M2
+    # Steepest change of a channel per unit of hue, 255 * (M2 - M1) * 6.
+    MAX_SLOPE = 255 * (M2 - M1) * 6
+
+    def __init__(self, resolution: int | None = None):
+        self.resolution = resolution
+        if resolution is not None:
+            self.table = self.exact(np.arange(resolution) / resolution)
+
+    @property
+    def max_error(self) -> int:
+        """Largest difference from rainbow in any channel."""
+        if self.resolution is None:
+            return 0
+        # The looked up hue is at most half a step away, and truncating to an integer adds up to 1.
+        return int(self.MAX_SLOPE / (2 * self.resolution)) + 1
+
+    @classmethod
+    def exact(cls, hue: np.ndarray) -> np.ndarray:
+        """The colours of an array of hues, as an array with an extra axis of 3 channels."""
+        return (255 * np.stack([
+            cls.channel(hue+colorsys.ONE_THIRD),
+            cls.channel(hue),
+            cls.channel(hue-colorsys.ONE_THIRD),
+        ], axis=-1)).astype(np.int64)
+
+    @classmethod
+    def channel(cls, hue: np.ndarray) -> np.ndarray:
+        # colorsys._v, evaluated over an array of hues.
+        m1, m2 = cls.M1, cls.M2
+        hue = hue % 1.0
+        return np.where(hue < colorsys.ONE_SIXTH, m1 + (m2-m1)*hue*6.0,
+            np.where(hue < 0.5, m2,
+            np.where(hue < colorsys.TWO_THIRD, m1 + (m2-m1)*(colorsys.TWO_THIRD-hue)*6.0, m1)))
+
+    def lookup(self, hue: np.ndarray) -> np.ndarray:
+        """The colours of an array of hues in [0, 1), as an array with an extra axis of 3 channels."""
+        if self.resolution is None:
+            return self.exact(hue)
+        return self.table[np.rint(hue * self.resolution).astype(np.int64) % self.resolution]
+
+    def __call__(self, color, timestamp, x, y):
+        return self.lookup((timestamp/20 + x/20 + y/20) % 1)
+
+    def grid(self, timestamp, width: int, height: int, x0: int = 0, y0: int = 0) -> np.ndarray:
+        """The colours of the width x height squares from (x0, y0), as an array indexed [x, y, channel]."""
+        xs = np.arange(x0, x0 + width)
+        ys = np.arange(y0, y0 + height)
+        return self.lookup(((timestamp/20 + xs/20)[:, None] + (ys/20)[None, :]) % 1)
+
+@register(color=False)
 @background(200, 0, 120)
+@batch(HueTable())
 def rainbow(color, timestamp, x, y):
     return tuple(
         int(255*x)
         for x in colorsys.hls_to_rgb((timestamp/20 + x/20 + y/20)%1, 0.6, 0.6)
     )
 
-@register
+def _constant_batch(value):
+    def kernel(color, timestamp, x, y):
+        return np.tile(np.array(value, dtype=np.int64), (len(color), 1))
+    return kernel
+
+@register(timestamp=False, position=False, color=False)
 @background(170, 170, 170)
+@batch(_constant_batch((0, 0, 0)))
 def black(color, timestamp, x, y):
     return (0, 0, 0)
 
-@register
+def _lighten_batch(color, timestamp, x, y):
+    return np.minimum(255, color + 40)
+
+@register(timestamp=False, position=False, channelwise=True)
 @background(240, 240, 240)
+@batch(_lighten_batch)
 def lighten(color, timestamp, x, y):
     return tuple(
         min(255, x + 40)
         for x in color
     )
 
-@register
+def _invert_batch(color, timestamp, x, y):
+    return 255 - color
+
+@register(timestamp=False, position=False, channelwise=True)
 @background(0, 255, 255)
+@batch(_invert_batch)
 def invert(color, timestamp, x, y):
     return tuple(
         255 - c
         for c in color
     )
 
-@register
+@register(timestamp=False, position=False, color=False)
 @background(255, 0, 0)
+@batch(_constant_batch((255, 0, 0)))
 def red(color, timestamp, x, y):
     return (255, 0, 0)
 
-@register
+@register(timestamp=False, position=False, color=False)
 @background(0, 255, 0)
+@batch(_constant_batch((0, 255, 0)))
 def green(color, timestamp, x, y):
     return (0, 255, 0)
 
-@register
+@register(timestamp=False, position=False, color=False)
 @background(0, 0, 255)
+@batch(_constant_batch((0, 0, 255)))
 def blue(color, timestamp, x, y):
     return (0, 0, 255)
 
+# Sparkle steps a linear congruential generator 10 to 26 times. Since one step is the
+# affine map other -> (a * other + c) mod 2^31, n steps are too: _LCG_JUMPS[n] holds
+# its (a, c), so n steps cost a single multiply-add.
+_LCG_MULTIPLIER = 1103515245
+_LCG_INCREMENT = 12345
+_LCG_MODULUS = 1 << 31
+_LCG_MAX_STEPS = 10 + 16
+
+def _lcg_jumps(max_steps):
+    jumps = [(1, 0)]
+    for _ in range(max_steps):
+        a, c = jumps[-1]
+        jumps.append(((_LCG_MULTIPLIER * a) % _LCG_MODULUS, (_LCG_MULTIPLIER * c + _LCG_INCREMENT) % _LCG_MODULUS))
+    return jumps
+
+_LCG_JUMPS = _lcg_jumps(_LCG_MAX_STEPS)
+_LCG_JUMP_A = np.array([a for a, _ in _LCG_JUMPS], dtype=np.int64)
+_LCG_JUMP_C = np.array([c for _, c in _LCG_JUMPS], dtype=np.int64)
+
+def _sparkle_batch(color, timestamp, x, y):
+    ts = ((timestamp + x/3 + y/5) * 3).astype(np.int64)
+    steps = 10 + (ts * 31 % 17)
+    a, c = _LCG_JUMP_A[steps], _LCG_JUMP_C[steps]
+    other = (a * x + c) % _LCG_MODULUS
+    other = (a * (other + y) + c) % _LCG_MODULUS
+    other = (other & ((1 << 31)-1)) >> 16
+    return np.where((other/(1 << 15) < 0.1)[:, None], _lighten_batch(color, timestamp, x, y), _darken_batch(color, timestamp, x, y))
+
 @register
 @background(100, 170, 255)
+@batch(_sparkle_batch)
 def sparkle(color, timestamp, x, y):
     ts = int((timestamp + x/3 + y/5) * 3)
-    other = x
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
+    a, c = _LCG_JUMPS[10 + (ts * 31 % 17)]
+    other = (a * x + c) % _LCG_MODULUS
     other += y
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    ts = int((timestamp + x/10 + y/20) * 3)
+    other = (a * other + c) % _LCG_MODULUS
     other = (other & ((1 << 31)-1)) >> 16
     if other/(1 << 15) < 0.1:
         return lighten.apply(color, timestamp, x, y)
     return darken.apply(color, timestamp, x, y)
 
-@register
+def _darken_batch(color, timestamp, x, y):
+    return np.maximum(0, color - 40)
+
+@register(timestamp=False, position=False, channelwise=True)
 @background(30, 30, 30)
+@batch(_darken_batch)
 def darken(color, timestamp, x, y):
     return tuple(
         max(0, x - 40)
@@ -1,11 +1,15 @@
+import time
 import arcade
+import pyglet
 import arcade.key as keys
-import math
+from PIL import Image
 from grid import Grid
+from compositor import Compositor
 from layer_util import get_layers, Layer
 from layers import lighten
 from undo import UndoTracker
 from replay import ReplayTracker
+import raster
 
 __author__ = "Shlok Arjun Marathe"
 
@@ -25,6 +29,47 @@ class MyWindow(arcade.Window):
 
     BG = [255, 255, 255]
 
+    # What a click in the drawing panel does: paint with the brush, flood fill the region under it,
+    # or draw a shape from where the mouse is pressed to where it is released. Selected with TOOL_KEYS.
+    # O switches shapes between filled and outlined, and lines are as thick as the brush.
+    # The select tool drags out a rectangle, which Ctrl+C copies and Ctrl+X cuts. Ctrl+V switches to
+    # the paste tool, where a click pastes the copy with its lower left corner there, mirrored
+    # left to right or top to bottom when switched on with H or V.
+    TOOL_BRUSH = "BRUSH"
+    TOOL_FILL = "FILL"
+    TOOL_LINE = "LINE"
+    TOOL_RECTANGLE = "RECTANGLE"
+    TOOL_ELLIPSE = "ELLIPSE"
+    TOOL_SELECT = "SELECT"
+    TOOL_PASTE = "PASTE"
+    TOOL_SHAPES = (
+        TOOL_LINE,
+        TOOL_RECTANGLE,
+        TOOL_ELLIPSE
+    )
+    TOOL_KEYS = {
+        keys.B: TOOL_BRUSH,
+        keys.F: TOOL_FILL,
+        keys.L: TOOL_LINE,
+        keys.R: TOOL_RECTANGLE,
+        keys.E: TOOL_ELLIPSE,
+        keys.S: TOOL_SELECT,
+    }
+    FILL_MATCH = Grid.FILL_MATCH_STATE
+
+    # Pointer positions are buffered as they arrive and painted once per frame, in on_update, as one
+    # stroke through all of them, so a high-rate pointer costs one paint per frame rather than one per event.
+    # The buffer is also flushed by the next event after it has waited MAX_POINTER_LATENCY seconds, and by
+    # a flush scheduled on the clock that long after its first position, so the end of a movement isn't left
+    # waiting when updates are slower than that and no more events come. The clock runs in the same loop as
+    # drawing, so a frame that takes longer than that to draw still delays it.
+    # A latency of 0 paints every position as soon as it arrives.
+    MAX_POINTER_LATENCY = 1 / 30
+
+    # M cycles the brush through the grid's symmetries, and N adds a fold to radial symmetry,
+    # back to the fewest after the most.
+    SYMMETRY_ORDER = Grid.SYMMETRY_OPTIONS
+
     # SCAFFOLD PART
     # Unless you're adding new features, you shouldn't need to touch this.
 
@@ -40,6 +85,9 @@ class MyWindow(arcade.Window):
         self.y_timer = 0
         self.enable_ui = True
         self.replay_timer = 0
+        # Pointer positions received, and strokes they were painted in (see MAX_POINTER_LATENCY).
+        self.pointer_events = 0
+        self.paint_batches = 0
         self.on_init()
 
     def reset(self) -> None:
@@ -51,13 +99,36 @@ class MyWindow(arcade.Window):
         self.dragging = None
         self.prev_drawn = None
         self.prev_pos = None
+        self.pointer_queue = []
+        self.pointer_queued_at = 0
         self.draw_size = 2
+        self.tool = self.TOOL_BRUSH
+        self.shape_filled = True
+        self.shape_start = None
+        self.selection = None
+        self.clipboard = None
+        self.paste_mirror_x = False
+        self.paste_mirror_y = False
 
         # Visual calculations
         self.DRAW_PANEL = self.SCREEN_WIDTH - self.SIDEBAR_WIDTH
         self.GRID_SQ_WIDTH = self.DRAW_PANEL / self.GRID_SIZE_X
         self.GRID_SQ_HEIGHT = self.SCREEN_HEIGHT / self.GRID_SIZE_Y
         self.LAYER_BUTTON_SIZE = self.SIDEBAR_WIDTH / 2
+        # Grid texture, rewritten from the compositor's framebuffer every frame.
+        self.grid_texture = arcade.Texture(
+            f"grid-{self.GRID_SIZE_X}x{self.GRID_SIZE_Y}",
+            Image.new("RGBA", (self.GRID_SIZE_X, self.GRID_SIZE_Y), (*self.BG, 255)),
+            hit_box_algorithm="None",
+        )
+        self.grid_sprite = arcade.Sprite(texture=self.grid_texture)
+        self.grid_sprite.center_x = self.DRAW_PANEL / 2
+        self.grid_sprite.center_y = self.SCREEN_HEIGHT / 2
+        self.grid_sprite.width = self.DRAW_PANEL
+        self.grid_sprite.height = self.SCREEN_HEIGHT
+        self.grid_sprites = arcade.SpriteList()
+        self.grid_sprites.append(self.grid_sprite)
+        self.compositor = Compositor(self.grid, self.BG)
         # Action button sprites
         self.action_buttons = arcade.SpriteList()
         self.draw_mode_button = arcade.Sprite(
@@ -125,15 +196,26 @@ class MyWindow(arcade.Window):
         # UI - Draw Modes / Action buttons
         self.action_buttons.draw()
         # Grid
-        for x in range(self.GRID_SIZE_X):
-            for y in range(self.GRID_SIZE_Y):
-                arcade.draw_lrtb_rectangle_filled(
-                    self.GRID_SQ_WIDTH * x,
-                    self.GRID_SQ_WIDTH * (x+1),
-                    self.GRID_SQ_HEIGHT * (y+1),
-                    self.GRID_SQ_HEIGHT * y,
-                    self.grid[x][y].get_color(self.BG[:], self.timestamp, x, y),
-                )
+        self.draw_grid()
+        if self.selection is not None:
+            x0, y0, x1, y1 = self.selection
+            arcade.draw_lrtb_rectangle_outline(
+                min(x0, x1) * self.GRID_SQ_WIDTH, (max(x0, x1) + 1) * self.GRID_SQ_WIDTH,
+                (max(y0, y1) + 1) * self.GRID_SQ_HEIGHT, min(y0, y1) * self.GRID_SQ_HEIGHT,
+                (0, 0, 0), border_width=2,
+            )
+
+    def draw_grid(self) -> None:
+        """Composite the grid and blit it as a single texture."""
+        if self.compositor.grid is not self.grid:
+            self.compositor = Compositor(self.grid, self.BG)
+        buffer = self.compositor.composite(self.timestamp)
+        # Buffer row 0 is the bottom of the grid, image row 0 is the top.
+        self.grid_texture.image = Image.fromarray(buffer[::-1]).convert("RGBA")
+        atlas = self.ctx.default_atlas
+        atlas.add(self.grid_texture)
+        atlas.update_texture_image(self.grid_texture)
+        self.grid_sprites.draw(pixelated=True)
 
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int) -> None:
         """Called when the mouse buttons are pressed."""
@@ -181,12 +263,42 @@ class MyWindow(arcade.Window):
             yend = 2 * self.LAYER_BUTTON_SIZE
             if xstart <= x < xend and yend <= y < ystart:
                 self.on_special()
+        elif self.tool == self.TOOL_FILL:
+            if not self.enable_ui or self.selected_layer_index == -1:
+                return
+            px = int(x // self.GRID_SQ_WIDTH)
+            py = int(y // self.GRID_SQ_HEIGHT)
+            if 0 <= px < self.GRID_SIZE_X and 0 <= py < self.GRID_SIZE_Y:
+                self.on_fill(get_layers()[self.selected_layer_index], px, py)
+        elif self.tool in self.TOOL_SHAPES:
+            if self.enable_ui and self.selected_layer_index != -1:
+                self.shape_start = (int(x // self.GRID_SQ_WIDTH), int(y // self.GRID_SQ_HEIGHT))
+        elif self.tool == self.TOOL_SELECT:
+            if self.enable_ui:
+                self.shape_start = (int(x // self.GRID_SQ_WIDTH), int(y // self.GRID_SQ_HEIGHT))
+        elif self.tool == self.TOOL_PASTE:
+            if self.enable_ui and self.clipboard is not None:
+                self.on_paste(int(x // self.GRID_SQ_WIDTH), int(y // self.GRID_SQ_HEIGHT))
         else:
             self.dragging = True
-            self.try_draw(x, y)
+            self.queue_pointer(x, y)
+            self.flush_pointer()
 
     def on_mouse_release(self, x: int, y: int, button: int, modifiers: int):
         """Called when the mouse buttons are released."""
+        self.flush_pointer()
+        if self.shape_start is not None and self.tool == self.TOOL_SELECT:
+            # Selections may end outside the grid, they are clipped when copied.
+            self.selection = (*self.shape_start, int(x // self.GRID_SQ_WIDTH), int(y // self.GRID_SQ_HEIGHT))
+            self.shape_start = None
+        if self.shape_start is not None:
+            # Shapes may end outside the grid, they are clipped when painted.
+            self.on_shape(
+                get_layers()[self.selected_layer_index],
+                self.shape_start[0], self.shape_start[1],
+                int(x // self.GRID_SQ_WIDTH), int(y // self.GRID_SQ_HEIGHT),
+            )
+            self.shape_start = None
         self.dragging = False
         self.prev_drawn = None
         self.prev_pos = None
@@ -199,7 +311,7 @@ class MyWindow(arcade.Window):
             return
         if x > self.DRAW_PANEL:
             return
-        self.try_draw(x, y)
+        self.queue_pointer(x, y)
 
     def on_key_press(self, symbol: int, modifiers: int) -> None:
         """Called when a keyboard key is pressed."""
@@ -213,41 +325,90 @@ class MyWindow(arcade.Window):
         if self.y_pressed:
             self.on_redo()
             self.y_timer = 0.5
+        if symbol in self.TOOL_KEYS:
+            self.tool = self.TOOL_KEYS[symbol]
+            self.shape_start = None
+        if symbol == keys.O:
+            self.shape_filled = not self.shape_filled
+        if modifiers & keys.MOD_CTRL and self.selection is not None:
+            if symbol == keys.C:
+                self.on_copy(*self.selection)
+            elif symbol == keys.X:
+                self.on_cut(*self.selection)
+        if symbol == keys.V and modifiers & keys.MOD_CTRL:
+            if self.clipboard is not None:
+                self.tool = self.TOOL_PASTE
+        elif symbol == keys.V:
+            self.paste_mirror_y = not self.paste_mirror_y
+        if symbol == keys.H:
+            self.paste_mirror_x = not self.paste_mirror_x
+        if symbol == keys.M:
+            self.on_next_symmetry()
+        if symbol == keys.N:
+            self.on_next_symmetry_folds()
 
     def on_key_release(self, symbol: int, modifiers: int) -> None:
         """Called when a keyboard key is released."""
         self.z_pressed = False
         self.y_pressed = False
 
-    def try_draw(self, x, y) -> None:
-        """Attempt to draw at a position, but safely fail if an invalid square."""
+    def queue_pointer(self, x, y) -> None:
+        """Buffer a pointer position to be drawn by flush_pointer, flushing if the oldest buffered one has waited long enough."""
+        now = time.perf_counter()
+        if len(self.pointer_queue) == 0:
+            self.pointer_queued_at = now
+            if self.MAX_POINTER_LATENCY > 0:
+                pyglet.clock.schedule_once(self.flush_pointer_late, self.MAX_POINTER_LATENCY)
+        self.pointer_queue.append((x, y))
+        self.pointer_events += 1
+        if now - self.pointer_queued_at >= self.MAX_POINTER_LATENCY:
+            self.flush_pointer()
+
+    def flush_pointer_late(self, delta_time) -> None:
+        """Called by the clock MAX_POINTER_LATENCY seconds after a position is buffered while none were."""
+        self.flush_pointer()
+
+    def flush_pointer(self) -> None:
+        """Draw every buffered pointer position as one stroke."""
+        if len(self.pointer_queue) == 0:
+            return
+        pyglet.clock.unschedule(self.flush_pointer_late)
+        positions = self.pointer_queue
+        self.pointer_queue = []
+        self.paint_batches += 1
+        self.try_draw(positions)
+
+    @property
+    def events_per_batch(self) -> float:
+        """The average number of pointer positions painted by each stroke, 1 when nothing is coalesced."""
+        return self.pointer_events / max(self.paint_batches, 1)
+
+    def try_draw(self, positions) -> None:
+        """Attempt to draw through the positions, in order, but safely skip invalid squares."""
         if self.selected_layer_index == -1:
             return
         layer = get_layers()[self.selected_layer_index]
-        if self.prev_pos is not None:
-            # Try draw in increments of 0.5 to avoid skipping squares.
-            mhat_dist = abs(x - self.prev_pos[0]) + abs(y - self.prev_pos[1])
-            increment = 0.5
-            points_to_draw = []
-            for d in range(1, math.ceil(mhat_dist/increment)+1):
-                distance = min(d * increment / mhat_dist, 1)
-                nx = distance * (x - self.prev_pos[0]) + self.prev_pos[0]
-                ny = distance * (y - self.prev_pos[1]) + self.prev_pos[1]
-                nx_pos = int(nx // self.GRID_SQ_WIDTH)
-                ny_pos = int(ny // self.GRID_SQ_HEIGHT)
-                points_to_draw.append((nx_pos, ny_pos))
-        else:
-            x_pos = int(x // self.GRID_SQ_WIDTH)
-            y_pos = int(y // self.GRID_SQ_HEIGHT)
-            points_to_draw = [
-                (x_pos, y_pos)
-            ]
-        for px, py in points_to_draw:
-            if self.prev_drawn is None or (px, py) != self.prev_drawn:
-                if 0 <= px < self.GRID_SIZE_X and 0 <= py < self.GRID_SIZE_Y:
-                    self.on_paint(layer, px, py)
-                    self.prev_drawn = (px, py)
-        self.prev_pos = (x, y)
+        stroke = []
+        for x, y in positions:
+            if self.prev_pos is not None:
+                # Every square the pointer's path crosses since the previous position, so a fast movement doesn't skip any.
+                points_to_draw = raster.segment_cells(
+                    self.prev_pos[0] / self.GRID_SQ_WIDTH, self.prev_pos[1] / self.GRID_SQ_HEIGHT,
+                    x / self.GRID_SQ_WIDTH, y / self.GRID_SQ_HEIGHT
+                )
+            else:
+                points_to_draw = [
+                    (int(x // self.GRID_SQ_WIDTH), int(y // self.GRID_SQ_HEIGHT))
+                ]
+            for px, py in points_to_draw:
+                if self.prev_drawn is None or (px, py) != self.prev_drawn:
+                    if 0 <= px < self.GRID_SIZE_X and 0 <= py < self.GRID_SIZE_Y:
+                        stroke.append((px, py))
+                        self.prev_drawn = (px, py)
+            self.prev_pos = (x, y)
+        # The whole movement is painted as one stroke, a single undo and replay entry.
+        if len(stroke) > 0:
+            self.on_paint_stroke(layer, stroke)
 
     def start_replay(self) -> None:
         """Begin the replay mode."""
@@ -259,6 +420,7 @@ class MyWindow(arcade.Window):
     def on_update(self, delta_time) -> None:
         """Movement and game logic."""
         self.timestamp += delta_time
+        self.flush_pointer()
         if self.z_pressed:
             self.z_timer -= delta_time
             if self.z_timer <= 0:
@@ -349,6 +511,157 @@ class MyWindow(arcade.Window):
         self.undo_tracker.add_action(paint_action)                      # O(1)
         self.replay_tracker.add_action(paint_action)                    # O(1)
 
+    def on_paint_stroke(self, layer: Layer, points: list[tuple[int, int]]) -> None:
+        """
+        Called when the mouse is dragged across grid squares, which should paint the vicinity of every one of them.
+
+        Args:
+        - layer: The layer to paint on.
+            Type: Layer
+        - points: The x and y positions of the squares along the drag.
+            Type: list of tuples of 2 ints
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(pn log(pn) + s), where p is the number of points, n is the size of the brush and s is the number of squares covered
+        - Best case: O(n^2), where n is the size of the brush
+
+        Both best and worst happen when the paint_stroke method is called, which paints the union of the footprints once
+        """
+        paint_action = self.grid.paint_stroke(layer, points)            # O(pn log(pn) + s)
+        self.undo_tracker.add_action(paint_action)                      # O(1)
+        self.replay_tracker.add_action(paint_action)                    # O(1)
+
+    def on_fill(self, layer: Layer, px: int, py: int) -> None:
+        """
+        Called when a grid square is clicked on with the fill tool, which should paint the region around it.
+
+        Args:
+        - layer: The layer to paint on.
+            Type: Layer
+        - px: The x position of the square the fill starts from.
+            Type: int
+        - py: The y position of the square the fill starts from.
+            Type: int
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mn + r log r), where m and n are the dimensions of the grid and r is the number of runs of the region
+        - Best case: O(mn), where m and n are the dimensions of the grid
+
+        Both best and worst happen when the flood_fill method is called, which labels the whole grid first
+        """
+        paint_action = self.grid.flood_fill(layer, px, py, self.FILL_MATCH, self.timestamp, self.BG)    # O(mn + r log r)
+        self.undo_tracker.add_action(paint_action)                      # O(1)
+        self.replay_tracker.add_action(paint_action)                    # O(1)
+
+    def on_shape(self, layer: Layer, px0: int, py0: int, px1: int, py1: int) -> None:
+        """
+        Called when the mouse is released with a shape tool, which should paint the shape between the two squares.
+
+        Args:
+        - layer: The layer to paint on.
+            Type: Layer
+        - px0: The x position of the square the mouse was pressed on.
+            Type: int
+        - py0: The y position of the square the mouse was pressed on.
+            Type: int
+        - px1: The x position of the square the mouse was released on.
+            Type: int
+        - py1: The y position of the square the mouse was released on.
+            Type: int
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(lr log(lr) + k), where l is the length of a line, r is the size of the brush and k is the number of squares covered
+        - Best case: O(h), where h is the height of the shape
+
+        Both best and worst depend on the tool: rectangles and ellipses are O(h + k), lines also merge the brush along them
+        """
+        if self.tool == self.TOOL_LINE:                                 # O(1)
+            paint_action = self.grid.paint_line(layer, px0, py0, px1, py1, self.grid.brush_size)   # O(lr log(lr) + k)
+        elif self.tool == self.TOOL_RECTANGLE:                          # O(1)
+            paint_action = self.grid.paint_rectangle(layer, px0, py0, px1, py1, self.shape_filled)  # O(h + k)
+        else:                                                           # O(1)
+            paint_action = self.grid.paint_ellipse(layer, px0, py0, px1, py1, self.shape_filled)    # O(h + k)
+        self.undo_tracker.add_action(paint_action)                      # O(1)
+        self.replay_tracker.add_action(paint_action)                    # O(1)
+
+    def on_copy(self, px0: int, py0: int, px1: int, py1: int) -> None:
+        """
+        Called when the selection is copied, which should keep the squares between the two corners in the clipboard.
+
+        Args:
+        - px0: The x position of a corner of the selection.
+            Type: int
+        - py0: The y position of that corner.
+            Type: int
+        - px1: The x position of the opposite corner.
+            Type: int
+        - py1: The y position of the opposite corner.
+            Type: int
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(kd), where k is the number of squares selected and d is the number of layers in a square
+        - Best case: O(k log k), where k is the number of squares selected
+        """
+        self.clipboard = self.grid.copy(px0, py0, px1, py1)             # O(kd)
+
+    def on_cut(self, px0: int, py0: int, px1: int, py1: int) -> None:
+        """
+        Called when the selection is cut, which should copy it to the clipboard and clear it as one action.
+
+        Args:
+        - px0: The x position of a corner of the selection.
+            Type: int
+        - py0: The y position of that corner.
+            Type: int
+        - px1: The x position of the opposite corner.
+            Type: int
+        - py1: The y position of the opposite corner.
+            Type: int
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(kd), where k is the number of squares selected and d is the number of layers in a square
+        - Best case: O(k log k), where k is the number of squares selected
+        """
+        self.clipboard, paint_action = self.grid.cut(px0, py0, px1, py1)   # O(kd)
+        self.undo_tracker.add_action(paint_action)                      # O(1)
+        self.replay_tracker.add_action(paint_action)                    # O(1)
+
+    def on_paste(self, px: int, py: int) -> None:
+        """
+        Called when a grid square is clicked on with the paste tool, which should paste the clipboard there as one action.
+
+        Args:
+        - px: The x position of the square the clipboard's lower left corner is pasted to.
+            Type: int
+        - py: The y position of that square.
+            Type: int
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(kd), where k is the number of squares pasted and d is the number of layers in a square
+        - Best case: O(1), when the clipboard is pasted outside the grid
+        """
+        paint_action = self.grid.paste(self.clipboard, px, py, self.paste_mirror_x, self.paste_mirror_y)   # O(kd)
+        self.undo_tracker.add_action(paint_action)                      # O(1)
+        self.replay_tracker.add_action(paint_action)                    # O(1)
+
     def on_undo(self) -> None:
         """
         Called when an undo is requested.
@@ -391,8 +704,8 @@ class MyWindow(arcade.Window):
         Complexity:
         - Worst case: O(mno log p), Where m is the number of rows, n is the number of columns, o is the number of layers in the program and p is the number of layers in the sorted list array
             Will only occur when the layer store being used is the SequenceLayerStore and there is at least one layer in the set
-        - Best case: O(mn), Where m is the number of rows and n is the number of columns
-            Will only occur when the layer store being used is the SetLayerStore
+        - Best case: O(1)
+            Will only occur when the layer store being used is the SetLayerStore or AdditiveLayerStore, see Grid.special
         """
         special = self.grid.special()                                   # O(mno log p), Where m is the number of rows, n is the number of columns, o is the number of layers in the program and p is the number of layers in the sorted list array
         self.undo_tracker.add_action(special)                           # O(1)
@@ -458,6 +771,40 @@ class MyWindow(arcade.Window):
         """
         self.grid.decrease_brush_size()                                 # O(1)
 
+    def on_next_symmetry(self) -> None:
+        """
+        Called when the next symmetry is requested, which the brush then paints strokes with.
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            There is a constant number of symmetries
+        - Best case: O(1)
+            There is a constant number of symmetries
+        """
+        order = self.SYMMETRY_ORDER                                                             # O(1)
+        self.grid.symmetry = order[(order.index(self.grid.symmetry) + 1) % len(order)]          # O(1)
+
+    def on_next_symmetry_folds(self) -> None:
+        """
+        Called when another fold of radial symmetry is requested, going back to the fewest after the most.
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.grid.symmetry_folds >= Grid.MAX_SYMMETRY_FOLDS:                                 # O(1)
+            self.grid.symmetry_folds = Grid.MIN_SYMMETRY_FOLDS                                  # O(1)
+        else:                                                                                   # O(1)
+            self.grid.symmetry_folds += 1                                                       # O(1)
+
 def main():
     """ Main function """
     window = MyWindow()
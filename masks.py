@@ -0,0 +1,200 @@
+"""
+Procedural masks for Grid.paint_mask and Grid.erase_mask.
+
+Every generator returns a bool array of shape (width, height), indexed [x, y] like the grid,
+True for the squares selected, built with a few numpy operations over the whole grid:
+- checkerboard: alternating size x size cells.
+- stripes: bands of the given thickness repeating every period squares, vertical, horizontal or diagonal.
+- radial: concentric rings around a centre, just a disc when the period is larger than the grid.
+- noise: each square selected independently with the given density, reproducible from a seed.
+crop cuts a mask down to the part holding its selected squares, and from_spans builds the part
+holding the squares of horizontal spans, such as a flood fill's region.
+"""
+
+from __future__ import annotations
+import numpy as np
+
+VERTICAL = "VERTICAL"
+HORIZONTAL = "HORIZONTAL"
+DIAGONAL = "DIAGONAL"
+DIRECTIONS = (
+    VERTICAL,
+    HORIZONTAL,
+    DIAGONAL
+)
+
+def _coordinates(width: int, height: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the x and y coordinate of every square, as arrays that broadcast to shape (width, height).
+    """
+    return np.arange(width)[:, None], np.arange(height)[None, :]
+
+def checkerboard(width: int, height: int, size: int = 1) -> np.ndarray:
+    """
+    Returns a checkerboard of size x size cells, with the cell holding (0, 0) selected.
+
+    Args:
+    - width: The number of columns
+        Type: Integer
+    - height: The number of rows
+        Type: Integer
+    - size: The width and height of a cell
+        Type: Integer
+
+    Returns:
+    - The mask
+        Type: numpy.ndarray of bool
+
+    Complexity:
+    - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+    - Best case: O(mn), Where m is the number of rows and n is the number of columns
+    """
+    xs, ys = _coordinates(width, height)                                                    # O(m + n)
+    return (xs // size + ys // size) % 2 == 0                                               # O(mn)
+
+def stripes(width: int, height: int, period: int = 2, thickness: int = 1, direction: str = VERTICAL) -> np.ndarray:
+    """
+    Returns stripes thickness squares thick, repeating every period squares, the first starting at (0, 0).
+
+    Args:
+    - width: The number of columns
+        Type: Integer
+    - height: The number of rows
+        Type: Integer
+    - period: The distance from the start of a stripe to the start of the next
+        Type: Integer
+    - thickness: The thickness of a stripe
+        Type: Integer
+    - direction: VERTICAL for stripes along columns, HORIZONTAL along rows, DIAGONAL along x + y
+        Type: DIRECTIONS
+
+    Returns:
+    - The mask
+        Type: numpy.ndarray of bool
+
+    Complexity:
+    - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+    - Best case: O(mn), Where m is the number of rows and n is the number of columns
+    """
+    xs, ys = _coordinates(width, height)                                                    # O(m + n)
+    if direction == VERTICAL:                                                               # O(1)
+        position = np.broadcast_to(xs, (width, height))                                     # O(1), A view
+    elif direction == HORIZONTAL:                                                           # O(1)
+        position = np.broadcast_to(ys, (width, height))                                     # O(1), A view
+    elif direction == DIAGONAL:                                                             # O(1)
+        position = xs + ys                                                                  # O(mn)
+    else:                                                                                   # O(1)
+        raise ValueError(f"Unknown stripe direction {direction}.")
+    return position % period < thickness                                                    # O(mn)
+
+def radial(width: int, height: int, period: int, thickness: int = None, x: float = None, y: float = None) -> np.ndarray:
+    """
+    Returns rings around (x, y) thickness squares thick, repeating every period squares outwards,
+    the first a disc at the centre. A square is in a ring by the distance of its centre from (x, y).
+
+    Args:
+    - width: The number of columns
+        Type: Integer
+    - height: The number of rows
+        Type: Integer
+    - period: The distance from the start of a ring to the start of the next
+        Type: Integer
+    - thickness: The thickness of a ring, half the period if not given
+        Type: Integer
+    - x: The x coordinate of the centre, the middle of the grid if not given
+        Type: Float
+    - y: The y coordinate of the centre, the middle of the grid if not given
+        Type: Float
+
+    Returns:
+    - The mask
+        Type: numpy.ndarray of bool
+
+    Complexity:
+    - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+    - Best case: O(mn), Where m is the number of rows and n is the number of columns
+    """
+    if thickness is None:                                                                   # O(1)
+        thickness = period / 2                                                              # O(1)
+    if x is None:                                                                           # O(1)
+        x = (width - 1) / 2                                                                 # O(1)
+    if y is None:                                                                           # O(1)
+        y = (height - 1) / 2                                                                # O(1)
+    xs, ys = _coordinates(width, height)                                                    # O(m + n)
+    distance = np.hypot(xs - x, ys - y)                                                     # O(mn)
+    return distance % period < thickness                                                    # O(mn)
+
+def noise(width: int, height: int, density: float = 0.5, seed: int = None) -> np.ndarray:
+    """
+    Returns a mask with each square selected independently with probability density.
+
+    Args:
+    - width: The number of columns
+        Type: Integer
+    - height: The number of rows
+        Type: Integer
+    - density: The probability a square is selected
+        Type: Float
+    - seed: Seeds the random generator, so the same seed gives the same mask
+        Type: Integer
+
+    Returns:
+    - The mask
+        Type: numpy.ndarray of bool
+
+    Complexity:
+    - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+    - Best case: O(mn), Where m is the number of rows and n is the number of columns
+    """
+    return np.random.default_rng(seed).random((width, height)) < density                    # O(mn)
+
+def crop(mask: np.ndarray) -> tuple[int, int, np.ndarray]:
+    """
+    Returns the smallest part of a mask holding every selected square, and where it starts,
+    so bulk operations and the undo steps that record them only cover that part.
+
+    Args:
+    - mask: Any mask, indexed [x, y]
+        Type: numpy.ndarray of bool
+
+    Returns:
+    - The x and y coordinates of the part's square (0, 0) in the mask, and the part, a view of the mask
+      of shape (0, 0) at (0, 0) if no square is selected
+        Type: Tuple of 2 integers and a numpy.ndarray of bool
+
+    Complexity:
+    - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+    - Best case: O(mn), Where m is the number of rows and n is the number of columns
+    """
+    columns = np.flatnonzero(mask.any(axis=1))                                              # O(mn)
+    if len(columns) == 0:                                                                   # O(1)
+        return 0, 0, mask[:0, :0]                                                           # O(1)
+    rows = np.flatnonzero(mask.any(axis=0))                                                 # O(mn)
+    x, y = int(columns[0]), int(rows[0])                                                    # O(1)
+    return x, y, mask[x:int(columns[-1]) + 1, y:int(rows[-1]) + 1]                          # O(1)
+
+def from_spans(spans: list[tuple[int, int, int]]) -> tuple[int, int, np.ndarray]:
+    """
+    Returns a mask of the box around the squares of the spans, True for those squares, and where the box starts.
+    Each row is filled by a cumulative sum over +1 where a span starts and -1 one past where it ends.
+
+    Args:
+    - spans: Disjoint (y, x_start, x_end) spans, inclusive, at least one
+        Type: List of tuples of 3 integers
+
+    Returns:
+    - The x and y coordinates of the box's first square, and the mask of the box, indexed [x, y]
+        Type: Tuple of 2 integers and a numpy.ndarray of bool
+
+    Complexity:
+    - Worst case: O(mn + s), Where m and n are the height and width of the box and s is the number of spans
+    - Best case: O(mn + s), Where m and n are the height and width of the box and s is the number of spans
+    """
+    rows, starts, ends = np.array(spans, dtype=np.int64).reshape(-1, 3).T                   # O(s)
+    x, y = int(starts.min()), int(rows.min())                                               # O(s)
+    width, height = int(ends.max()) - x + 1, int(rows.max()) - y + 1                        # O(s)
+    edges = np.zeros((height, width + 1), dtype=np.int8)                                    # O(mn), A row per y
+    np.add.at(edges, (rows - y, starts - x), 1)                                             # O(s), Spans meeting end to start cancel out
+    np.add.at(edges, (rows - y, ends - x + 1), -1)                                          # O(s)
+    inside = np.cumsum(edges, axis=1, dtype=np.int8)[:, :width] > 0                         # O(mn)
+    return x, y, np.ascontiguousarray(inside.T)                                             # O(mn)
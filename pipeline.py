@@ -0,0 +1,327 @@
+"""
+Compiled layer pipelines.
+
+A Pipeline applies a fixed list of layers in one call. SequenceLayerStore keeps one
+per bitmask in a PipelineCache, so every grid square with the same enabled layers
+shares it and get_color only visits the layers that are actually enabled.
+AdditiveLayerStore does the same for each sequence of layers.
+
+While compiling, every run of consecutive colour table layers (constant layers and
+channelwise layers such as lighten, darken and invert) is fused into a single
+ColorTable, or folded into a single Constant when the run contains a constant layer.
+Colour tables assume channels stay within 0-255, which the built-in layers guarantee.
+"""
+
+from __future__ import annotations
+import numpy as np
+import layer_util
+from layer_util import Layer, LAYERS, apply_layers_batch
+
+class Constant:
+    """
+    A pipeline step that outputs the same colour whatever it is given.
+    """
+
+    def __init__(self, color: tuple[int, int, int]) -> None:
+        self.color = tuple(color)
+
+    def __call__(self, color: tuple[int, int, int], timestamp: float, x: int, y: int) -> tuple[int, int, int]:
+        return self.color
+
+    def apply_batch(self, colors: np.ndarray, timestamp: float, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        return np.tile(np.array(self.color, dtype=np.int64), (len(colors), 1))
+
+    def then(self, table: ColorTable) -> Constant:
+        """
+        Returns the constant produced by applying a colour table after this one.
+        """
+        return Constant(table(self.color, 0, 0, 0))
+
+class ColorTable:
+    """
+    A pipeline step that looks each channel up in its own table of 256 entries.
+    - tables: Array of shape (3, 256), where tables[c][v] is the output for value v in channel c.
+    """
+
+    def __init__(self, tables: np.ndarray) -> None:
+        self.tables = np.asarray(tables, dtype=np.int64)
+        self.red, self.green, self.blue = self.tables.tolist()
+
+    def __call__(self, color: tuple[int, int, int], timestamp: float, x: int, y: int) -> tuple[int, int, int]:
+        return (self.red[color[0]], self.green[color[1]], self.blue[color[2]])
+
+    def apply_batch(self, colors: np.ndarray, timestamp: float, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        return self.tables[np.arange(3), colors]
+
+    def then(self, table: ColorTable) -> ColorTable:
+        """
+        Returns the single table equivalent to applying this table and then the given one.
+        """
+        return ColorTable(table.tables[np.arange(3)[:, None], self.tables])
+
+_layer_steps = {}
+
+def color_table_step(layer: Layer) -> Constant | ColorTable:
+    """
+    Returns the Constant or ColorTable equivalent to a colour table layer, building it on first use.
+
+    Args:
+    - layer: A layer whose is_color_table is True
+        Type: Layer Object
+
+    Returns:
+    - The equivalent pipeline step
+        Type: Constant or ColorTable Object
+
+    Complexity:
+    - Worst case: O(p), Where p is the cost of applying the layer 256 times
+        Happens the first time the layer is converted
+    - Best case: O(1)
+        Happens when the layer has been converted already
+    """
+    cached = _layer_steps.get(id(layer.apply))                                              # O(1)
+    if cached is not None and cached[0] is layer.apply:                                     # O(1)
+        return cached[1]                                                                    # O(1)
+    if layer.is_constant == True:                                                           # O(1)
+        step = Constant(layer.apply((0, 0, 0), 0, 0, 0))                                    # O(1)
+    else:                                                                                   # O(1)
+        step = ColorTable(np.array([
+            layer.apply((value, value, value), 0, 0, 0) for value in range(256)
+        ]).T)                                                                               # O(p)
+    _layer_steps[id(layer.apply)] = (layer.apply, step)                                     # O(1)
+    return step                                                                             # O(1)
+
+def fuse_layers(layers: list[Layer]) -> list:
+    """
+    Replaces every run of consecutive colour table layers with a single ColorTable or Constant step.
+
+    Args:
+    - layers: The layers to apply, in order
+        Type: List of Layer Objects
+
+    Returns:
+    - Equivalent steps, each either a Layer, ColorTable or Constant
+        Type: List
+
+    Complexity:
+    - Worst case: O(n), Where n is the number of layers
+        Once every colour table layer has been converted before
+    - Best case: O(n), Where n is the number of layers
+    """
+    steps = []                                                                              # O(1)
+    fused = None                                                                            # O(1), The ColorTable or Constant for the current run
+    for layer in layers:                                                                    # O(n)
+        if layer.is_color_table == False:                                                   # O(1)
+            if fused is not None:                                                           # O(1)
+                steps.append(fused)                                                         # O(1)
+                fused = None                                                                # O(1)
+            steps.append(layer)                                                             # O(1)
+            continue                                                                        # O(1)
+        step = color_table_step(layer)                                                      # O(1)
+        if fused is None or isinstance(step, Constant):                                     # O(1)
+            fused = step                                                                    # O(1), A constant hides the rest of the run
+        else:                                                                               # O(1)
+            fused = fused.then(step)                                                        # O(1)
+    if fused is not None:                                                                   # O(1)
+        steps.append(fused)                                                                 # O(1)
+    return steps                                                                            # O(1)
+
+class Pipeline:
+    """
+    A list of layers, compiled into a single callable.
+    - layers: The layers applied, in order.
+    - steps: What is actually applied, with runs of colour table layers fused.
+    - uniform: True if no layer depends on the timestamp or position, so every square starting
+      from the same colour ends up the same colour.
+    """
+
+    def __init__(self, layers: list[Layer]) -> None:
+        """
+        Compiles the given layers.
+
+        Args:
+        - layers: The layers to apply, in order
+            Type: List of Layer Objects
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers
+        - Best case: O(n), Where n is the number of layers
+        """
+        self.layers = list(layers)                                                          # O(n)
+        self.steps = fuse_layers(self.layers)                                               # O(n)
+        self.applies = tuple(
+            step.apply if isinstance(step, Layer) else step
+            for step in self.steps
+        )                                                                                   # O(n)
+        self.uniform = not any(
+            layer.time_dependent or layer.position_dependent
+            for layer in self.layers
+        )                                                                                   # O(n)
+
+    def __call__(self, color: tuple[int, int, int], timestamp: float, x: int, y: int) -> tuple[int, int, int]:
+        """
+        Applies every layer to a single grid square, with the same arguments as Layer.apply.
+
+        Complexity:
+        - Worst case: O(np), Where n is the number of steps and p is the cost of a layer
+        - Best case: O(1)
+            Happens when the pipeline is empty
+        """
+        for apply in self.applies:                                                          # O(n)
+            color = apply(color, timestamp, x, y)                                           # O(p)
+        return color                                                                        # O(1)
+
+    def apply_batch(self, colors: np.ndarray, timestamp: float, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Applies every layer to many grid squares at once, with the same arguments as Layer.apply_batch.
+
+        Complexity:
+        - Worst case: O(na), Where n is the number of steps and a is the number of squares
+        - Best case: O(a), Where a is the number of squares
+        """
+        return apply_layers_batch(self.steps, colors, timestamp, xs, ys)                    # O(na)
+
+class PipelineCache:
+    """
+    Maps a bitmask of layer indices (bit i enables LAYERS[i]), or a sequence of layers, to its compiled Pipeline.
+    - hits: Number of lookups that found a compiled pipeline.
+    - misses: Number of lookups that had to compile one.
+    - constant_mask: Bitmask of the registered constant layers.
+    The cache is emptied whenever a layer is registered, or once it holds MAX_PIPELINES pipelines.
+    """
+
+    MAX_PIPELINES = 4096
+
+    def __init__(self) -> None:
+        """
+        Initialises an empty cache.
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers in the program
+        - Best case: O(n), Where n is the number of layers in the program
+        """
+        self.clear()                                                                        # O(n), Where n is the number of layers in the program
+
+    def __len__(self) -> int:
+        """
+        Returns the number of compiled pipelines.
+        """
+        return len(self.pipelines)
+
+    def get(self, mask: int) -> Pipeline:
+        """
+        Returns the pipeline for a bitmask, compiling it on the first lookup.
+
+        Args:
+        - mask: Bit i is set if LAYERS[i] is enabled
+            Type: Integer
+
+        Returns:
+        - The pipeline applying the enabled layers in index order
+            Type: Pipeline Object
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers in the program
+            Happens when the mask has not been compiled yet
+        - Best case: O(1)
+            Happens when the mask has been compiled already
+        """
+        pipeline = self.lookup(mask)                                                        # O(1)
+        if pipeline is None:                                                                # O(1)
+            pipeline = self.store(mask, [
+                layer
+                for layer in LAYERS
+                if layer is not None and (mask >> layer.index) & 1
+            ])                                                                              # O(n)
+        return pipeline                                                                     # O(1)
+
+    def get_stack(self, layers: list[Layer]) -> Pipeline:
+        """
+        Returns the pipeline for a sequence of layers, compiling it on the first lookup.
+
+        Args:
+        - layers: The layers to apply, in order
+            Type: List of Layer Objects
+
+        Returns:
+        - The pipeline applying the layers in order
+            Type: Pipeline Object
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers
+        - Best case: O(n), Where n is the number of layers
+            Building the key is linear even when the sequence has been compiled already
+        """
+        key = tuple(layer.index for layer in layers)                                        # O(n)
+        pipeline = self.lookup(key)                                                         # O(n), Hashing the key
+        if pipeline is None:                                                                # O(1)
+            pipeline = self.store(key, layers)                                              # O(n)
+        return pipeline                                                                     # O(1)
+
+    def lookup(self, key: int | tuple[int, ...]) -> Pipeline | None:
+        """
+        Returns the compiled pipeline for a key, or None, and counts the hit or miss.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        if self.registry_version != layer_util.registry_version:                            # O(1)
+            self.clear()                                                                    # O(n), Where n is the number of layers in the program
+        pipeline = self.pipelines.get(key)                                                  # O(1)
+        if pipeline is not None:                                                            # O(1)
+            self.hits += 1                                                                  # O(1)
+        else:                                                                               # O(1)
+            self.misses += 1                                                                # O(1)
+        return pipeline                                                                     # O(1)
+
+    def store(self, key: int | tuple[int, ...], layers: list[Layer]) -> Pipeline:
+        """
+        Compiles the layers and caches the pipeline under the key.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers
+        - Best case: O(n), Where n is the number of layers
+        """
+        if len(self.pipelines) >= self.MAX_PIPELINES:                                       # O(1)
+            self.pipelines = {}                                                             # O(1)
+        pipeline = Pipeline(layers)                                                         # O(n)
+        self.pipelines[key] = pipeline                                                      # O(1)
+        return pipeline                                                                     # O(1)
+
+    @property
+    def constant_mask(self) -> int:
+        """
+        Returns the bitmask of the registered constant layers, rebuilding it if a layer was registered since.
+        """
+        if self.registry_version != layer_util.registry_version:                            # O(1)
+            self.clear()                                                                    # O(n)
+        return self._constant_mask                                                          # O(1)
+
+    def clear(self) -> None:
+        """
+        Empties the cache, resets the counters and rereads the registered layers.
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers in the program
+        - Best case: O(n), Where n is the number of layers in the program
+        """
+        self.pipelines = {}                                                                 # O(1)
+        self.hits = 0                                                                       # O(1)
+        self.misses = 0                                                                     # O(1)
+        self.registry_version = layer_util.registry_version                                 # O(1)
+        self._constant_mask = 0                                                             # O(1)
+        for layer in LAYERS:                                                                # O(n)
+            if layer is not None and layer.is_constant == True:                             # O(1)
+                self._constant_mask |= 1 << layer.index                                     # O(1)
@@ -0,0 +1,249 @@
+"""
+Integer rasterization of lines and shapes in grid cell space.
+
+A line between two cells is walked one step at a time along its major axis (the axis it moves further
+along), with the minor coordinate computed from the step in exact integer arithmetic, DDA style.
+Each step emits one cell, so every cell is emitted exactly once and consecutive cells are 8-connected,
+like Bresenham's algorithm. Halves are rounded away from the start, and a line is always computed from
+its lower end, so its cells are the same whichever end it is walked from. Used by the line shape tool,
+whose lines are drawn one cell thick along the major axis rather than through every cell they cross.
+
+Strokes are instead traversed cell by cell as Amanatides and Woo do, between two points anywhere in cell space:
+the next vertical and next horizontal cell border the segment reaches are kept, and it steps across whichever
+it reaches first. This finds exactly the cells the segment crosses, each 4-connected to the next, where snapping
+both ends to cells first and drawing a line between them can cut corners the segment goes through.
+It is the one rasterizer of strokes: the window walks it between pointer positions divided by the size
+of a cell, and polyline_cells, used by scripted strokes, between the centres of the given cells.
+Which border comes first is decided by cross-multiplying the distances to them rather than by summing
+fractions of the segment, so for cell centres, which are halves, the arithmetic is exact.
+
+Shapes are rasterized straight to horizontal spans, (y, x_start, x_end) inclusive, like brush stencils:
+- Rectangles and ellipses are given by the two corners of their bounding box, in any order.
+  An ellipse covers the squares whose centres lie inside the ellipse inscribed in the box's outer edges.
+- A filled shape has one span per row, and its outline is the squares of it with a 4-neighbour outside it.
+- A thick line is a circular brush of the given radius along the cells of the line (see brush.stroke_spans).
+"""
+
+from __future__ import annotations
+import math
+import brush
+
+def _round_div(numerator: int, denominator: int) -> int:
+    """
+    Returns numerator / denominator rounded to the nearest integer, halves away from zero, for a positive denominator.
+
+    Complexity:
+    - Worst case: O(1)
+    - Best case: O(1)
+    """
+    if numerator >= 0:                                                                      # O(1)
+        return (2 * numerator + denominator) // (2 * denominator)                           # O(1)
+    return -((-2 * numerator + denominator) // (2 * denominator))                           # O(1)
+
+def line_cells(x0: int, y0: int, x1: int, y1: int) -> list[tuple[int, int]]:
+    """
+    Returns the cells of the line from (x0, y0) to (x1, y1), both ends included.
+
+    Args:
+    - x0: The x coordinate of the first cell
+        Type: Integer
+    - y0: The y coordinate of the first cell
+        Type: Integer
+    - x1: The x coordinate of the last cell
+        Type: Integer
+    - y1: The y coordinate of the last cell
+        Type: Integer
+
+    Returns:
+    - One (x, y) cell per step along the major axis, from (x0, y0) to (x1, y1), each 8-connected to the next
+        Type: List of tuples of 2 integers
+
+    Complexity:
+    - Worst case: O(n), Where n is max(|x1 - x0|, |y1 - y0|)
+    - Best case: O(1)
+        Happens when both ends are the same cell
+    """
+    if (x1, y1) < (x0, y0):                                                                 # O(1)
+        return line_cells(x1, y1, x0, y0)[::-1]                                             # O(n), Walked from the same end either way, so ties round alike
+    dx = x1 - x0                                                                            # O(1)
+    dy = y1 - y0                                                                            # O(1)
+    steps = max(abs(dx), abs(dy))                                                           # O(1)
+    if steps == 0:                                                                          # O(1)
+        return [(x0, y0)]                                                                   # O(1)
+    if abs(dx) == steps:                                                                    # O(1), x is the major axis
+        return [(x0 + i, y0 + _round_div(i * dy, steps)) for i in range(steps + 1)]        # O(n)
+    sign = 1 if dy > 0 else -1                                                              # O(1)
+    return [(x0 + _round_div(i * dx, steps), y0 + sign * i) for i in range(steps + 1)]     # O(n)
+
+def segment_cells(x0: float, y0: float, x1: float, y1: float) -> list[tuple[int, int]]:
+    """
+    Returns the cells the segment from (x0, y0) to (x1, y1) crosses, in cell units, where cell (i, j) covers
+    i <= x < i + 1 and j <= y < j + 1, walked with the Amanatides-Woo traversal.
+    The segment reaches its k-th vertical border at (first_x + k) / |dx| of its length, and its horizontal
+    borders likewise, so the nearer one is found by comparing (first_x + k) * |dy| with (first_y + l) * |dx|.
+
+    Args:
+    - x0: The x coordinate of the start of the segment
+        Type: Float
+    - y0: The y coordinate of the start of the segment
+        Type: Float
+    - x1: The x coordinate of the end of the segment
+        Type: Float
+    - y1: The y coordinate of the end of the segment
+        Type: Float
+
+    Returns:
+    - The cells in the order the segment crosses them, from the cell holding (x0, y0) to the cell holding (x1, y1),
+      each 4-connected to the next. Where the segment goes exactly through a corner it steps along x first
+        Type: List of tuples of 2 integers
+
+    Complexity:
+    - Worst case: O(n), Where n is the number of cells crossed, |x1 - x0| + |y1 - y0| + 1 at most
+    - Best case: O(1)
+        Happens when both ends are in the same cell
+    """
+    x, y = math.floor(x0), math.floor(y0)                                                   # O(1)
+    end_x, end_y = math.floor(x1), math.floor(y1)                                           # O(1)
+    dx, dy = x1 - x0, y1 - y0                                                               # O(1)
+    step_x = 1 if dx > 0 else -1                                                            # O(1)
+    step_y = 1 if dy > 0 else -1                                                            # O(1)
+    # How far along each axis the start is from the first border the segment reaches.
+    next_x = (x + 1 - x0) if dx > 0 else (x0 - x)                                           # O(1)
+    next_y = (y + 1 - y0) if dy > 0 else (y0 - y)                                           # O(1)
+    cells = [(x, y)]                                                                        # O(1)
+    for _ in range(abs(end_x - x) + abs(end_y - y)):                                        # O(n), One border crossed per step
+        # The walk never steps past the last cell along either axis, which also covers segments along an axis.
+        if end_y == y or (end_x != x and next_x * abs(dy) <= next_y * abs(dx)):             # O(1)
+            x += step_x                                                                     # O(1)
+            next_x += 1                                                                     # O(1)
+        else:                                                                               # O(1)
+            y += step_y                                                                     # O(1)
+            next_y += 1                                                                     # O(1)
+        cells.append((x, y))                                                                # O(1)
+    return cells                                                                            # O(1)
+
+def polyline_cells(points: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Returns the cells crossed by the segments joining the centres of consecutive cells, found with segment_cells
+    like the window finds the cells between pointer positions, without repeating the cell where two segments meet.
+
+    Args:
+    - points: The (x, y) cells the polyline goes through, in order
+        Type: List of tuples of 2 integers
+
+    Returns:
+    - The cells of every segment in order, each 4-connected to the next, each segment's first cell dropped after the first segment
+        Type: List of tuples of 2 integers
+
+    Complexity:
+    - Worst case: O(n), Where n is the total of |x1 - x0| + |y1 - y0| over the segments
+    - Best case: O(p), Where p is the number of points
+        Happens when consecutive points are neighbouring cells
+    """
+    if len(points) == 0:                                                                    # O(1)
+        return []                                                                           # O(1)
+    cells = [tuple(points[0])]                                                              # O(1)
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):                                      # O(p)
+        cells.extend(segment_cells(x0 + 0.5, y0 + 0.5, x1 + 0.5, y1 + 0.5)[1:])             # O(n)
+    return cells                                                                            # O(1)
+
+def clip_spans(spans: list[tuple[int, int, int]], width: int, height: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the parts of the spans inside a width x height grid.
+
+    Complexity:
+    - Worst case: O(s), Where s is the number of spans
+    - Best case: O(s), Where s is the number of spans
+    """
+    clipped = []                                                                            # O(1)
+    for y, start, end in spans:                                                             # O(s)
+        start, end = max(start, 0), min(end, width - 1)                                     # O(1)
+        if 0 <= y < height and start <= end:                                                # O(1)
+            clipped.append((y, start, end))                                                 # O(1)
+    return clipped                                                                          # O(1)
+
+def rectangle_spans(x0: int, y0: int, x1: int, y1: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the spans of the filled rectangle with corners (x0, y0) and (x1, y1), both included.
+
+    Complexity:
+    - Worst case: O(h), Where h is the height of the rectangle
+    - Best case: O(h), Where h is the height of the rectangle
+    """
+    left, right = min(x0, x1), max(x0, x1)                                                  # O(1)
+    return [(y, left, right) for y in range(min(y0, y1), max(y0, y1) + 1)]                  # O(h)
+
+def ellipse_spans(x0: int, y0: int, x1: int, y1: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the spans of the filled ellipse inscribed in the box with corners (x0, y0) and (x1, y1), both included.
+    Coordinates are doubled so the centre and the semi-axes are integers, and each row is solved exactly with isqrt,
+    so the ellipse is symmetric about both of its axes.
+
+    Args:
+    - x0: The x coordinate of a corner of the bounding box
+        Type: Integer
+    - y0: The y coordinate of that corner
+        Type: Integer
+    - x1: The x coordinate of the opposite corner
+        Type: Integer
+    - y1: The y coordinate of the opposite corner
+        Type: Integer
+
+    Returns:
+    - At most one (y, x_start, x_end) span per row of the box, from the lowest row up
+        Type: List of tuples of 3 integers
+
+    Complexity:
+    - Worst case: O(h), Where h is the height of the box
+    - Best case: O(h), Where h is the height of the box
+    """
+    left, right = min(x0, x1), max(x0, x1)                                                  # O(1)
+    bottom, top = min(y0, y1), max(y0, y1)                                                  # O(1)
+    centre_x, centre_y = left + right, bottom + top                                         # O(1), Doubled
+    a, b = right - left + 1, top - bottom + 1                                               # O(1), Doubled semi-axes, to the outer edges of the box
+    spans = []                                                                              # O(1)
+    for y in range(bottom, top + 1):                                                        # O(h)
+        dy = 2 * y - centre_y                                                               # O(1), Doubled
+        half = math.isqrt(a * a * (b * b - dy * dy) // (b * b))                             # O(1), The largest doubled |dx| inside the ellipse
+        start, end = -((half - centre_x) // 2), (centre_x + half) // 2                      # O(1), The x with |2x - centre_x| <= half
+        if start <= end:                                                                    # O(1)
+            spans.append((y, start, end))                                                   # O(1)
+    return spans                                                                            # O(1)
+
+def outline_spans(spans: list[tuple[int, int, int]]) -> list[tuple[int, int, int]]:
+    """
+    Returns the outline of a filled shape given as at most one span per row: the squares of the shape
+    with a 4-neighbour outside it. Rows away from the shape's edges keep a span at each end.
+
+    Complexity:
+    - Worst case: O(h), Where h is the number of rows of the shape
+    - Best case: O(h), Where h is the number of rows of the shape
+    """
+    rows = {y: (start, end) for y, start, end in spans}                                     # O(h)
+    outline = []                                                                            # O(1)
+    for y, start, end in spans:                                                             # O(h)
+        below, above = rows.get(y - 1), rows.get(y + 1)                                     # O(1)
+        if below is None or above is None:                                                  # O(1), The whole row is on the edge
+            outline.append((y, start, end))                                                 # O(1)
+            continue                                                                        # O(1)
+        inner_start = max(start + 1, below[0], above[0])                                    # O(1), The squares with all 4 neighbours in the shape
+        inner_end = min(end - 1, below[1], above[1])                                        # O(1)
+        if inner_start > inner_end:                                                         # O(1)
+            outline.append((y, start, end))                                                 # O(1)
+        else:                                                                               # O(1)
+            if start < inner_start:                                                         # O(1)
+                outline.append((y, start, inner_start - 1))                                 # O(1)
+            if inner_end < end:                                                             # O(1)
+                outline.append((y, inner_end + 1, end))                                     # O(1)
+    return outline                                                                          # O(1)
+
+def thick_line_spans(x0: int, y0: int, x1: int, y1: int, radius: int, width: int, height: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the spans of a circular brush of the radius along the line from (x0, y0) to (x1, y1), clipped to a width x height grid.
+
+    Complexity:
+    - Worst case: O(lr log(lr)), Where l is the length of the line and r is the radius
+    - Best case: O(r), Where r is the radius
+        Happens when both ends are the same cell
+    """
+    return brush.stroke_spans(brush.CIRCLE, radius, line_cells(x0, y0, x1, y1), width, height)   # O(lr log(lr))
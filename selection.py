@@ -0,0 +1,356 @@
+"""
+Blocks of grid squares, for copy, cut and paste.
+
+A Block holds the state of a width x height rectangle of squares, apart from any grid,
+in a compact format for its draw style:
+- SetBlock: the active layer of each square as a uint8 (0 for none, otherwise layer
+  index + 1), and whether special is active as a bool.
+- SequenceBlock: the enabled layers of each square as a uint32 bitmask, where bit i enables LAYERS[i].
+- AdditiveBlock: the layer sequence of each non-empty square as bytes of layer indices, front first.
+Square (dx, dy) of a block is dx columns and dy rows from its corner with the lowest coordinates.
+Blocks are not changed once made: crop and mirrored return new blocks.
+
+The states of a block can also be listed as LayerStore keys (see shared_store.store_key),
+with a label per square indexing the list. Blocks are read from and written to stores that
+are not arrays that way, and blocks read in parts (such as from chunks) are put together that way.
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import numpy as np
+
+class Block(ABC):
+    """
+    The state of a width x height rectangle of grid squares.
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+
+    @classmethod
+    @abstractmethod
+    def empty(cls, width: int, height: int) -> Block:
+        """
+        Returns a block of squares holding no layers.
+        """
+        pass
+
+    @classmethod
+    @abstractmethod
+    def from_keys(cls, keys: list[tuple], labels: np.ndarray) -> Block:
+        """
+        Returns the block whose square (dx, dy) is in the state keys[labels[dx, dy]].
+
+        Args:
+        - keys: LayerStore keys, see shared_store.store_key
+            Type: List of tuples
+        - labels: Array of shape (width, height) of indices into keys
+            Type: numpy.ndarray of integers
+        """
+        pass
+
+    @abstractmethod
+    def to_keys(self) -> tuple[list[tuple], np.ndarray]:
+        """
+        Returns the distinct states of the block as LayerStore keys, and an array of shape (width, height)
+        giving the index of the key of every square, the inverse of from_keys.
+        """
+        pass
+
+    @abstractmethod
+    def crop(self, dx: int, dy: int, width: int, height: int) -> Block:
+        """
+        Returns the width x height part of the block starting at square (dx, dy).
+        """
+        pass
+
+    @abstractmethod
+    def mirrored(self, mirror_x: bool, mirror_y: bool) -> Block:
+        """
+        Returns the block with its columns in reverse order if mirror_x, and its rows in reverse order if mirror_y.
+        """
+        pass
+
+    @abstractmethod
+    def differs(self, other: Block) -> np.ndarray:
+        """
+        Returns an array of shape (width, height), True where the square differs from the same square of a block of the same size.
+        """
+        pass
+
+    @abstractmethod
+    def layer_squares(self, selected: np.ndarray, x: int = 0, y: int = 0) -> dict[int, list[tuple[int, int]]]:
+        """
+        Returns the selected squares holding each layer, grouped by layer so a CoverageIndex can be updated a layer at a time.
+        The black or invert special shows in a SET square are not painted, so they are left out.
+
+        Args:
+        - selected: Array of shape (width, height), True for the squares to include
+            Type: numpy.ndarray of bool
+        - x: Added to the x coordinate of every square returned
+            Type: Integer
+        - y: Added to the y coordinate of every square returned
+            Type: Integer
+
+        Returns:
+        - Maps a layer index to the (x + dx, y + dy) squares holding it, once per time each holds it
+            Type: Dictionary of lists of tuples of 2 integers
+        """
+        pass
+
+    def repeated(self, width: int, height: int) -> Block:
+        """
+        Returns a width x height block with every square in the state of square (0, 0).
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the new block
+        - Best case: O(mn), Where m and n are the height and width of the new block
+        """
+        keys, labels = self.to_keys()                                                       # O(1), For a single square
+        return self.from_keys([keys[labels[0, 0]]], np.zeros((width, height), dtype=np.int64))   # O(mn)
+
+    @classmethod
+    def assemble(cls, width: int, height: int, parts: list[tuple[int, int, Block]]) -> Block:
+        """
+        Returns the width x height block made of the parts, each placed with its square (0, 0) at (dx, dy).
+        The parts must cover the whole block.
+
+        Complexity:
+        - Worst case: O(mn + s), Where m and n are the height and width of the block and s is the number of states in the parts
+        - Best case: O(mn + s), Where m and n are the height and width of the block and s is the number of states in the parts
+        """
+        key_labels = {}                                                                     # O(1), Maps a key to its label, in order of labels
+        labels = np.zeros((width, height), dtype=np.int64)                                  # O(mn)
+        for dx, dy, part in parts:                                                          # O(p), Where p is the number of parts
+            part_keys, part_labels = part.to_keys()                                         # O(k), Where k is the number of squares of the part
+            relabel = np.array([key_labels.setdefault(key, len(key_labels)) for key in part_keys], dtype=np.int64)   # O(s)
+            labels[dx:dx + part.width, dy:dy + part.height] = relabel[part_labels]          # O(k)
+        return cls.from_keys(list(key_labels), labels)                                      # O(mn)
+
+class ArrayBlock(Block):
+    """
+    A Block whose squares are held in arrays of shape (width, height), named by fields.
+    """
+
+    fields = ()
+
+    def __init__(self, width: int, height: int, **arrays: np.ndarray) -> None:
+        super().__init__(width, height)
+        for name in self.fields:
+            setattr(self, name, arrays[name])
+
+    def crop(self, dx: int, dy: int, width: int, height: int) -> ArrayBlock:
+        """
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the part
+        - Best case: O(mn), Where m and n are the height and width of the part
+        """
+        return type(self)(width, height, **{name: getattr(self, name)[dx:dx + width, dy:dy + height].copy() for name in self.fields})   # O(mn)
+
+    def mirrored(self, mirror_x: bool, mirror_y: bool) -> ArrayBlock:
+        """
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        steps = (-1 if mirror_x == True else 1, -1 if mirror_y == True else 1)              # O(1)
+        return type(self)(self.width, self.height, **{name: getattr(self, name)[::steps[0], ::steps[1]].copy() for name in self.fields})   # O(mn)
+
+    def differs(self, other: ArrayBlock) -> np.ndarray:
+        """
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        different = np.zeros((self.width, self.height), dtype=bool)                         # O(mn)
+        for name in self.fields:                                                            # O(1)
+            different |= getattr(self, name) != getattr(other, name)                        # O(mn)
+        return different                                                                    # O(1)
+
+class SetBlock(ArrayBlock):
+    """
+    SetLayerStore states.
+    - active: 0 for no layer, otherwise the active layer's index + 1.
+    - special: Whether special is active.
+    """
+
+    fields = ("active", "special")
+
+    @classmethod
+    def empty(cls, width: int, height: int) -> SetBlock:
+        return cls(width, height, active=np.zeros((width, height), dtype=np.uint8), special=np.zeros((width, height), dtype=bool))
+
+    @classmethod
+    def from_keys(cls, keys: list[tuple], labels: np.ndarray) -> SetBlock:
+        """
+        Complexity:
+        - Worst case: O(mn + s), Where m and n are the height and width of the block and s is the number of keys
+        - Best case: O(mn + s), Where m and n are the height and width of the block and s is the number of keys
+        """
+        active = np.array([0 if key[0] is None else key[0] + 1 for key in keys], dtype=np.uint8)   # O(s)
+        special = np.array([key[1] for key in keys], dtype=bool)                            # O(s)
+        return cls(labels.shape[0], labels.shape[1], active=active[labels], special=special[labels])   # O(mn)
+
+    def to_keys(self) -> tuple[list[tuple], np.ndarray]:
+        """
+        Complexity:
+        - Worst case: O(mn log(mn)), Where m and n are the height and width of the block
+        - Best case: O(mn log(mn)), Where m and n are the height and width of the block
+        """
+        states, labels = np.unique(self.active.astype(np.int64) * 2 + self.special, return_inverse=True)   # O(mn log(mn))
+        keys = [(None if state // 2 == 0 else state // 2 - 1, bool(state % 2)) for state in states.tolist()]   # O(s)
+        return keys, labels.reshape(self.width, self.height)                                # O(1)
+
+    def layer_squares(self, selected: np.ndarray, x: int = 0, y: int = 0) -> dict[int, list[tuple[int, int]]]:
+        """
+        Complexity:
+        - Worst case: O(lmn), Where l is the number of distinct layers selected and m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+            Happens when no selected square holds a layer
+        """
+        squares = {}                                                                        # O(1)
+        for active in np.unique(self.active[selected]).tolist():                            # O(l)
+            if active != 0:                                                                 # O(1)
+                xs, ys = np.nonzero(selected & (self.active == active))                     # O(mn)
+                squares[active - 1] = list(zip((xs + x).tolist(), (ys + y).tolist()))       # O(k), Where k is the number of squares holding it
+        return squares                                                                      # O(1)
+
+class SequenceBlock(ArrayBlock):
+    """
+    SequenceLayerStore states.
+    - masks: Bit i is set if LAYERS[i] is enabled.
+    """
+
+    fields = ("masks",)
+
+    @classmethod
+    def empty(cls, width: int, height: int) -> SequenceBlock:
+        return cls(width, height, masks=np.zeros((width, height), dtype=np.uint32))
+
+    @classmethod
+    def from_keys(cls, keys: list[tuple], labels: np.ndarray) -> SequenceBlock:
+        """
+        Complexity:
+        - Worst case: O(mn + s), Where m and n are the height and width of the block and s is the number of keys
+        - Best case: O(mn + s), Where m and n are the height and width of the block and s is the number of keys
+        """
+        masks = np.array([key[0] for key in keys], dtype=np.uint32)                         # O(s)
+        return cls(labels.shape[0], labels.shape[1], masks=masks[labels])                   # O(mn)
+
+    def to_keys(self) -> tuple[list[tuple], np.ndarray]:
+        """
+        Complexity:
+        - Worst case: O(mn log(mn)), Where m and n are the height and width of the block
+        - Best case: O(mn log(mn)), Where m and n are the height and width of the block
+        """
+        masks, labels = np.unique(self.masks, return_inverse=True)                          # O(mn log(mn))
+        return [(mask,) for mask in masks.tolist()], labels.reshape(self.width, self.height)   # O(s)
+
+    def layer_squares(self, selected: np.ndarray, x: int = 0, y: int = 0) -> dict[int, list[tuple[int, int]]]:
+        """
+        Complexity:
+        - Worst case: O(lmn), Where l is the number of distinct layers selected and m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+            Happens when no selected square holds a layer
+        """
+        squares = {}                                                                        # O(1)
+        held = int(np.bitwise_or.reduce(self.masks[selected], initial=0))                   # O(mn), Every layer any selected square holds
+        for index in range(held.bit_length()):                                              # O(l)
+            if (held >> index) & 1:                                                         # O(1)
+                xs, ys = np.nonzero(selected & ((self.masks >> index) & 1).astype(bool))    # O(mn)
+                squares[index] = list(zip((xs + x).tolist(), (ys + y).tolist()))            # O(k), Where k is the number of squares holding it
+        return squares                                                                      # O(1)
+
+class AdditiveBlock(Block):
+    """
+    AdditiveLayerStore states.
+    - stacks: Maps (dx, dy) to the layer sequence of that square, as bytes of layer indices, front first.
+      Squares with no layers have no entry.
+    """
+
+    def __init__(self, width: int, height: int, stacks: dict[tuple[int, int], bytes]) -> None:
+        super().__init__(width, height)
+        self.stacks = stacks
+
+    @classmethod
+    def empty(cls, width: int, height: int) -> AdditiveBlock:
+        return cls(width, height, {})
+
+    @classmethod
+    def from_keys(cls, keys: list[tuple], labels: np.ndarray) -> AdditiveBlock:
+        """
+        Complexity:
+        - Worst case: O(mn + kd), Where m and n are the height and width of the block,
+          k is the number of non-empty squares and d is the number of layers in a sequence
+        - Best case: O(mn), Where m and n are the height and width of the block
+            Happens when every square is empty
+        """
+        stacks = [bytes(key) for key in keys]                                               # O(sd), Where s is the number of keys
+        filled = np.array([len(stack) > 0 for stack in stacks], dtype=bool)                 # O(s)
+        squares = np.argwhere(filled[labels]).tolist()                                      # O(mn)
+        return cls(labels.shape[0], labels.shape[1], {(dx, dy): stacks[labels[dx, dy]] for dx, dy in squares})   # O(k)
+
+    def to_keys(self) -> tuple[list[tuple], np.ndarray]:
+        """
+        Complexity:
+        - Worst case: O(mn + kd), Where m and n are the height and width of the block,
+          k is the number of non-empty squares and d is the number of layers in a sequence
+        - Best case: O(mn), Where m and n are the height and width of the block
+            Happens when every square is empty
+        """
+        key_labels = {(): 0}                                                                # O(1)
+        labels = np.zeros((self.width, self.height), dtype=np.int64)                        # O(mn)
+        for (dx, dy), stack in self.stacks.items():                                         # O(k)
+            labels[dx, dy] = key_labels.setdefault(tuple(stack), len(key_labels))           # O(d)
+        return list(key_labels), labels                                                     # O(s)
+
+    def crop(self, dx: int, dy: int, width: int, height: int) -> AdditiveBlock:
+        """
+        Complexity:
+        - Worst case: O(k), Where k is the number of non-empty squares
+        - Best case: O(k), Where k is the number of non-empty squares
+        """
+        return AdditiveBlock(width, height, {
+            (x - dx, y - dy): stack
+            for (x, y), stack in self.stacks.items()
+            if dx <= x < dx + width and dy <= y < dy + height
+        })                                                                                  # O(k)
+
+    def mirrored(self, mirror_x: bool, mirror_y: bool) -> AdditiveBlock:
+        """
+        Complexity:
+        - Worst case: O(k), Where k is the number of non-empty squares
+        - Best case: O(k), Where k is the number of non-empty squares
+        """
+        return AdditiveBlock(self.width, self.height, {
+            (self.width - 1 - x if mirror_x == True else x, self.height - 1 - y if mirror_y == True else y): stack
+            for (x, y), stack in self.stacks.items()
+        })                                                                                  # O(k)
+
+    def differs(self, other: AdditiveBlock) -> np.ndarray:
+        """
+        Complexity:
+        - Worst case: O(mn + kd), Where m and n are the height and width of the block,
+          k is the number of non-empty squares of either block and d is the number of layers in a sequence
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        different = np.zeros((self.width, self.height), dtype=bool)                         # O(mn)
+        for square in self.stacks.keys() | other.stacks.keys():                             # O(k)
+            if self.stacks.get(square, b"") != other.stacks.get(square, b""):               # O(d)
+                different[square] = True                                                    # O(1)
+        return different                                                                    # O(1)
+
+    def layer_squares(self, selected: np.ndarray, x: int = 0, y: int = 0) -> dict[int, list[tuple[int, int]]]:
+        """
+        Complexity:
+        - Worst case: O(kd), Where k is the number of non-empty squares and d is the number of layers in a sequence
+        - Best case: O(k), Where k is the number of non-empty squares
+            Happens when no non-empty square is selected
+        """
+        squares = {}                                                                        # O(1)
+        for (dx, dy), stack in self.stacks.items():                                         # O(k)
+            if selected[dx, dy]:                                                            # O(1)
+                for index in stack:                                                         # O(d)
+                    squares.setdefault(index, []).append((x + dx, y + dy))                  # O(1)
+        return squares                                                                      # O(1)
@@ -0,0 +1,543 @@
+"""
+Hash-consed layer stores.
+
+A SharedLayerArray keeps one LayerStore per distinct state rather than one per grid
+square. Every square holds the id of its state, and squares in the same state share
+the same store, which is never changed once it is interned. Writing to a square forks:
+the operation is applied to a fresh copy of its state, and the result is interned,
+so it is shared with every other square that reaches the same state.
+
+The state of a store is identified by its key:
+- SetLayerStore: the index of the active layer (None if there is none) and whether special is active.
+- SequenceLayerStore: the bitmask of enabled layers.
+- AdditiveLayerStore: the indices of the layer sequence, front first.
+
+Transitions between states are cached too, so painting a layer over a region of squares
+in the same state only forks once.
+"""
+
+from __future__ import annotations
+import numpy as np
+from layer_util import Layer, get_layers
+from layer_store import LayerStore, SetLayerStore, AdditiveLayerStore, SequenceLayerStore, SpecialParity
+from array_store import LayerArray
+from selection import Block, SetBlock, SequenceBlock, AdditiveBlock
+from pipeline import Pipeline
+
+def store_key(store: LayerStore) -> tuple:
+    """
+    Returns the key of a store's state, which is equal for two stores exactly when they behave the same.
+
+    Args:
+    - store: The store
+        Type: SetLayerStore, AdditiveLayerStore or SequenceLayerStore Object
+
+    Returns:
+    - A hashable key
+        Type: Tuple
+
+    Complexity:
+    - Worst case: O(m), Where m is the number of layers in an additive store
+    - Best case: O(1)
+        Happens for a set or sequence store
+    """
+    if isinstance(store, SetLayerStore):                                                    # O(1)
+        active = None if store.active_layer is None else store.active_layer.index           # O(1)
+        return (active, store.special_mode_status)                                          # O(1)
+    if isinstance(store, SequenceLayerStore):                                               # O(1)
+        return (store.set.elems,)                                                           # O(1)
+    return tuple(layer.index for layer in store.applied_layers())                           # O(m)
+
+def store_from_key(store_type: type[LayerStore], key: tuple, parity: SpecialParity = None) -> LayerStore:
+    """
+    Returns a new store whose state has the given key.
+
+    Args:
+    - store_type: The type of the store
+        Type: SetLayerStore, AdditiveLayerStore or SequenceLayerStore
+    - key: A key returned by store_key
+        Type: Tuple
+    - parity: The special parity of the grid a set or additive store belongs to, a parity of its own if not given
+        Type: SpecialParity Object
+
+    Returns:
+    - A new store in that state
+        Type: LayerStore Object
+
+    Complexity:
+    - Worst case: O(m), Where m is the number of layers in the state
+    - Best case: O(1)
+        Happens for a set store
+    """
+    layer_list = get_layers()                                                               # O(1)
+    store = store_type() if store_type is SequenceLayerStore else store_type(parity)       # O(1)
+    if store_type is SetLayerStore:                                                         # O(1)
+        if key[0] is not None:                                                              # O(1)
+            store.add(layer_list[key[0]])                                                   # O(1)
+        store.special_mode_status = key[1]                                                  # O(1)
+    elif store_type is SequenceLayerStore:                                                  # O(1)
+        for layer in layer_list:                                                            # O(n), Where n is the number of layers in the program
+            if layer is not None and (key[0] >> layer.index) & 1:                           # O(1)
+                store.add(layer)                                                            # O(1)
+    else:                                                                                   # O(1)
+        for index in key:                                                                   # O(m)
+            store.add(layer_list[index])                                                    # O(1)
+    return store                                                                            # O(1)
+
+class SharedLayerArray(LayerArray):
+    """
+    A LayerArray whose squares share one store per distinct state.
+    - ids: Array of shape (width, height), the state id of every square.
+    - states: The interned store of every state id (None until it is first needed), which must not be changed.
+    - state_keys: The key (see store_key) of every state id.
+    - counts: Array of the number of squares in each state.
+    - transitions: Maps (state id, operation, layer index) to (state id, whether the store changed).
+    - distinct_states: The number of states at least one square is in.
+    Ids of states no square is in are reclaimed once they outnumber the live ones.
+    """
+
+    MIN_COMPACT = 64
+
+    def __init__(self, store_type: type[LayerStore], width: int, height: int) -> None:
+        """
+        Initialises every square in the empty state.
+
+        Args:
+        - store_type: The LayerStore of every square
+            Type: SetLayerStore, AdditiveLayerStore or SequenceLayerStore
+        - width: The number of columns
+            Type: Integer
+        - height: The number of rows
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        super().__init__(width, height)                                                     # O(1)
+        self.store_type = store_type                                                        # O(1)
+        self.replaces = store_type is SetLayerStore                                         # O(1)
+        self.block_type = {SetLayerStore: SetBlock, SequenceLayerStore: SequenceBlock, AdditiveLayerStore: AdditiveBlock}[store_type]   # O(1)
+        self.ids = np.zeros((width, height), dtype=np.int32)                                # O(mn)
+        self.clear_states()                                                                 # O(1)
+        self.intern(store_type())                                                           # O(1)
+        self.counts[0] = width * height                                                     # O(1)
+        self.distinct_states = 1                                                            # O(1)
+
+    def clear_states(self) -> None:
+        """
+        Forgets every interned state and transition.
+        """
+        self.states = []
+        self.state_keys = []
+        self.keys = {}
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.pipelines = []
+        self.transitions = {}
+
+    @property
+    def sharing_ratio(self) -> float:
+        """
+        Returns the average number of squares sharing each distinct state.
+        """
+        return self.width * self.height / self.distinct_states
+
+    def intern(self, store: LayerStore, key: tuple = None) -> int:
+        """
+        Returns the id of the store's state, interning the store as that state if it is new.
+
+        Args:
+        - store: A store that is not changed afterwards, or None to build it from the key when it is needed
+            Type: LayerStore Object
+        - key: The key of the store's state, computed if not given
+            Type: Tuple
+
+        Returns:
+        - The id of its state
+            Type: Integer
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in an additive store
+        - Best case: O(1)
+            Happens for a set or sequence store
+        """
+        if key is None:                                                                     # O(1)
+            key = store_key(store)                                                          # O(m)
+        state = self.keys.get(key)                                                          # O(m), Hashing the key
+        if state is None:                                                                   # O(1)
+            state = self.keys[key] = len(self.states)                                       # O(1)
+            self.states.append(store)                                                       # O(1)
+            self.state_keys.append(key)                                                     # O(1)
+            self.pipelines.append(None)                                                     # O(1)
+            if state >= len(self.counts):                                                   # O(1)
+                self.counts = np.concatenate([self.counts, np.zeros(max(1, len(self.counts)), dtype=np.int64)])    # O(s), Amortised O(1)
+        return state                                                                        # O(1)
+
+    def store(self, state: int) -> LayerStore:
+        """
+        Returns the interned store of a state, building it from its key the first time it is needed.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the state
+            Happens the first time the store is needed
+        - Best case: O(1)
+            Happens when the store has been built already
+        """
+        if self.states[state] is None:                                                      # O(1)
+            self.states[state] = store_from_key(self.store_type, self.state_keys[state])    # O(m)
+        return self.states[state]                                                           # O(1)
+
+    def additive_transition(self, state: int, operation: str, layer: Layer) -> tuple[int, bool]:
+        """
+        Adds or erases a layer of an additive state by working on its key, which is its layer sequence,
+        so no store has to be built. The store of the new state is built when it is first needed.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the state
+            Copying and hashing the key, both done in C
+        - Best case: O(1)
+            Happens when nothing changes
+        """
+        key = self.state_keys[state]                                                        # O(1)
+        if operation == "add":                                                              # O(1)
+            if len(key) >= len(get_layers()) * 100:                                         # O(1), The capacity of AdditiveLayerStore
+                return (state, False)                                                       # O(1)
+            key = key + (layer.index,)                                                      # O(m)
+        else:                                                                               # O(1)
+            if len(key) == 0:                                                               # O(1)
+                return (state, False)                                                       # O(1)
+            key = key[1:]                                                                   # O(m)
+        state = self.keys.get(key)                                                          # O(m), Hashing the key
+        if state is None:                                                                   # O(1)
+            state = self.intern(None, key)                                                  # O(1)
+        return (state, True)                                                                # O(1)
+
+    def transition(self, state: int, operation: str, layer: Layer | None) -> tuple[int, bool]:
+        """
+        Returns the state a square forks into when the operation is applied to it, and whether the store changed.
+
+        Args:
+        - state: The state id of the square
+            Type: Integer
+        - operation: "add", "erase" or "special"
+            Type: String
+        - layer: The layer to add or erase, None for special
+            Type: Layer Object
+
+        Returns:
+        - The new state id, and whether the store changed
+            Type: Tuple of Integer and Boolean
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the state
+            Happens the first time the operation is applied to the state
+        - Best case: O(1)
+            Happens when the transition has been cached
+        """
+        key = (state, operation, None if layer is None else layer.index)                    # O(1)
+        result = self.transitions.get(key)                                                  # O(1)
+        if result is None and self.store_type is AdditiveLayerStore and layer is not None:  # O(1)
+            result = self.transitions[key] = self.additive_transition(state, operation, layer)  # O(m)
+        elif result is None:                                                                # O(1)
+            store = store_from_key(self.store_type, self.state_keys[state])                 # O(m)
+            if operation == "special":                                                      # O(1)
+                store.special()                                                             # O(m)
+                changed = True                                                              # O(1)
+            else:                                                                           # O(1)
+                changed = getattr(store, operation)(layer)                                  # O(1)
+            result = self.transitions[key] = (self.intern(store), changed)                  # O(m)
+        return result                                                                       # O(1)
+
+    def move(self, x: int, y: int, state: int) -> None:
+        """
+        Moves the square at (x, y) into the given state.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        old = self.ids[x, y]                                                                # O(1)
+        self.counts[old] -= 1                                                               # O(1)
+        if self.counts[old] == 0:                                                           # O(1)
+            self.distinct_states -= 1                                                       # O(1)
+        if self.counts[state] == 0:                                                         # O(1)
+            self.distinct_states += 1                                                       # O(1)
+        self.counts[state] += 1                                                             # O(1)
+        self.ids[x, y] = state                                                              # O(1)
+
+    def apply(self, x: int, y: int, operation: str, layer: Layer | None) -> bool:
+        """
+        Applies the operation to the square at (x, y), forking it into its new state.
+
+        Complexity:
+        - Worst case: O(mn + s), Where m is the number of rows, n is the number of columns and s is the number of states
+            Happens when the ids of dead states are reclaimed, which is amortised over the writes that created them
+        - Best case: O(1)
+            Happens when the transition has been cached
+        """
+        state, changed = self.transition(int(self.ids[x, y]), operation, layer)             # O(d), Where d is the number of layers in the state
+        if changed == True:                                                                 # O(1)
+            self.move(x, y, state)                                                          # O(1)
+            self.compact()                                                                  # O(1) amortised
+        return changed                                                                      # O(1)
+
+    def apply_mask(self, mask: np.ndarray, operation: str, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Applies the operation to every square selected by the mask, forking each distinct state among them once.
+
+        Args:
+        - mask: Array of shape (width, height), True for the squares to apply the operation to
+            Type: numpy.ndarray of bool
+        - operation: "add" or "erase"
+            Type: String
+        - layer: The layer to add or erase
+            Type: Layer Object
+        - x: The x coordinate of the square the mask's square (0, 0) selects
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+
+        Returns:
+        - A mask of the squares that changed, and an array of the same shape holding the index of the
+          erase_target of the layer before the operation for each of them, -1 where none was or nothing changed
+            Type: Tuple of a numpy.ndarray of bool and a numpy.ndarray of int16
+
+        Complexity:
+        - Worst case: O(mn + k log k + sd), Where m and n are the height and width of the mask, k is the number of squares selected,
+          s is the number of distinct states selected and d is the number of layers in a state
+        - Best case: O(mn + k log k), Where m and n are the height and width of the mask and k is the number of squares selected
+            Happens when every transition has been cached
+        """
+        width, height = mask.shape                                                          # O(1)
+        ids = self.ids[x:x + width, y:y + height]                                           # O(1), A view
+        xs, ys = np.nonzero(mask)                                                           # O(mn)
+        old = ids[xs, ys]                                                                   # O(k)
+        states, inverse = np.unique(old, return_inverse=True)                               # O(k log k)
+        forked = np.empty(len(states), dtype=np.int32)                                      # O(s)
+        targets = np.empty(len(states), dtype=np.int16)                                     # O(s)
+        for i, state in enumerate(states.tolist()):                                         # O(s)
+            new_state, changes = self.transition(state, operation, layer)                   # O(d)
+            forked[i] = new_state if changes == True else state                             # O(1)
+            target = self.store(state).erase_target(layer)                                  # O(d)
+            targets[i] = -1 if target is None else target.index                             # O(1)
+        new = forked[inverse]                                                               # O(k)
+        moved = np.flatnonzero(new != old)                                                  # O(k)
+        xs, ys = xs[moved], ys[moved]                                                       # O(c), Where c is the number of squares that change
+        ids[xs, ys] = new[moved]                                                            # O(c)
+        self.counts -= np.bincount(old[moved], minlength=len(self.counts))                  # O(c + S), Where S is the number of states
+        self.counts += np.bincount(new[moved], minlength=len(self.counts))                  # O(c + S)
+        self.distinct_states = int(np.count_nonzero(self.counts))                           # O(S)
+        self.compact()                                                                      # O(mn + S)
+        changed = np.zeros(mask.shape, dtype=bool)                                          # O(mn)
+        changed[xs, ys] = True                                                              # O(c)
+        before = np.full(mask.shape, -1, dtype=np.int16)                                    # O(mn)
+        before[xs, ys] = targets[inverse[moved]]                                            # O(c)
+        return changed, before                                                              # O(1)
+
+    def add_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        LayerArray.add_mask, moving every selected square to the state adding the layer forks from its own.
+
+        Complexity:
+        - Worst case: O(mn + k log k + sd), Where m and n are the height and width of the mask, k is the number of squares selected,
+          s is the number of distinct states selected and d is the number of layers in a state
+        - Best case: O(mn + k log k), Where m and n are the height and width of the mask and k is the number of squares selected
+            Happens when every transition has been cached
+        """
+        changed, replaced = self.apply_mask(mask, "add", layer, x, y)                       # O(mn + k log k + sd)
+        return changed, replaced if self.replaces == True else None                         # O(1)
+
+    def erase_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        LayerArray.erase_mask, moving every selected square to the state erasing the layer forks from its own.
+
+        Complexity:
+        - Worst case: O(mn + k log k + sd), Where m and n are the height and width of the mask, k is the number of squares selected,
+          s is the number of distinct states selected and d is the number of layers in a state
+        - Best case: O(mn + k log k), Where m and n are the height and width of the mask and k is the number of squares selected
+            Happens when every transition has been cached
+        """
+        return self.apply_mask(mask, "erase", layer, x, y)                                  # O(mn + k log k + sd)
+
+    def add(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        LayerStore.add for the square at (x, y), moving it to the state that forks from its own.
+
+        Complexity:
+        - Worst case: O(mn + s), Where m is the number of rows, n is the number of columns and s is the number of states
+            Happens when the ids of dead states are reclaimed, which is amortised over the writes that created them
+        - Best case: O(1)
+            Happens when the transition has been cached
+        """
+        return self.apply(x, y, "add", layer)                                               # O(mn + s)
+
+    def erase(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        LayerStore.erase for the square at (x, y), moving it to the state that forks from its own.
+
+        Complexity:
+        - Worst case: O(mn + s), Where m is the number of rows, n is the number of columns and s is the number of states
+            Happens when the ids of dead states are reclaimed, which is amortised over the writes that created them
+        - Best case: O(1)
+            Happens when the transition has been cached
+        """
+        return self.apply(x, y, "erase", layer)                                             # O(mn + s)
+
+    def erase_target(self, x: int, y: int, layer: Layer) -> Layer | None:
+        """
+        LayerStore.erase_target for the square at (x, y), read from the store of its state.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the state
+            Happens the first time the state's store is needed
+        - Best case: O(1)
+            Happens when the state's store has been built already
+        """
+        return self.store(int(self.ids[x, y])).erase_target(layer)                          # O(m)
+
+    def special_square(self, x: int, y: int) -> None:
+        """
+        LayerStore.special for the square at (x, y) alone, moving it to the state that forks from its own.
+
+        Complexity:
+        - Worst case: O(mn + s), Where m is the number of rows, n is the number of columns and s is the number of states
+            Happens when the ids of dead states are reclaimed, which is amortised over the writes that created them
+        - Best case: O(1)
+            Happens when the transition has been cached
+        """
+        self.apply(x, y, "special", None)                                                   # O(mn + s)
+
+    def special(self) -> None:
+        """
+        Applies special to every square, forking each distinct state once.
+
+        Complexity:
+        - Worst case: O(mn + sd), Where m is the number of rows, n is the number of columns,
+          s is the number of distinct states and d is the number of layers in a state
+        - Best case: O(mn + s), Where m is the number of rows, n is the number of columns and s is the number of distinct states
+        """
+        live = np.flatnonzero(self.counts)                                                  # O(s)
+        forked = np.arange(len(self.counts), dtype=np.int32)                                # O(s)
+        for state in live.tolist():                                                         # O(s)
+            forked[state] = self.transition(state, "special", None)[0]                      # O(d)
+        self.ids = forked[self.ids]                                                         # O(mn)
+        self.counts = np.bincount(self.ids.ravel(), minlength=len(self.counts)).astype(np.int64)  # O(mn)
+        self.distinct_states = int(np.count_nonzero(self.counts))                           # O(s)
+        self.compact()                                                                      # O(mn)
+
+    def compact(self) -> None:
+        """
+        Reclaims the ids of states no square is in, once there are more of them than live states (and at least MIN_COMPACT).
+
+        Complexity:
+        - Worst case: O(mn + s), Where m is the number of rows, n is the number of columns and s is the number of states
+            Happens when the ids are reclaimed
+        - Best case: O(1)
+            Happens when there are no more dead states than live ones
+        """
+        if len(self.states) - self.distinct_states <= max(self.distinct_states, self.MIN_COMPACT):   # O(1)
+            return                                                                          # O(1)
+        live = np.flatnonzero(self.counts)                                                  # O(s)
+        states = [(self.states[state], self.state_keys[state]) for state in live.tolist()]  # O(s)
+        renumber = np.zeros(len(self.counts), dtype=np.int32)                               # O(s)
+        renumber[live] = np.arange(len(live), dtype=np.int32)                               # O(s)
+        self.ids = renumber[self.ids]                                                       # O(mn)
+        counts = self.counts[live]                                                          # O(s)
+        self.clear_states()                                                                 # O(1)
+        for store, key in states:                                                           # O(s)
+            self.intern(store, key)                                                         # O(d), Hashing the key
+        self.counts[:len(counts)] = counts                                                  # O(s)
+
+    def applied_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        LayerStore.applied_layers for the square at (x, y), read from the store of its state.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the state
+        - Best case: O(m), Where m is the number of layers in the state
+        """
+        return self.store(int(self.ids[x, y])).applied_layers()                             # O(m)
+
+    def visible_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        LayerStore.visible_layers for the square at (x, y), read from the store of its state.
+
+        Complexity:
+        - Worst case: O(m), Where m is the number of layers in the state
+        - Best case: O(m), Where m is the number of layers in the state
+        """
+        return self.store(int(self.ids[x, y])).visible_layers()                             # O(m)
+
+    def pipeline(self, x: int, y: int) -> Pipeline:
+        """
+        Returns the compiled visible layers of the square at (x, y), compiled once per state.
+
+        Complexity:
+        - Worst case: O(d), Where d is the number of layers in the state
+            Happens the first time the state is drawn
+        - Best case: O(1)
+            Happens when the state has been compiled already
+        """
+        state = int(self.ids[x, y])                                                         # O(1)
+        if self.pipelines[state] is None:                                                   # O(1)
+            self.pipelines[state] = Pipeline(self.store(state).visible_layers())            # O(d)
+        return self.pipelines[state]                                                        # O(1)
+
+    def state_labels(self, ids: dict) -> np.ndarray:
+        """
+        Labels every square with its state id, since every state is interned once (see LayerArray.state_labels).
+
+        Complexity:
+        - Worst case: O(mn), Where m is the number of rows and n is the number of columns
+        - Best case: O(mn), Where m is the number of rows and n is the number of columns
+        """
+        return self.ids.astype(np.int64)                                                    # O(mn)
+
+    def read_block(self, x: int, y: int, width: int, height: int) -> Block:
+        """
+        Copies the squares from the keys of the states they are in.
+
+        Complexity:
+        - Worst case: O(mn log(mn) + sd), Where m and n are the height and width of the block,
+          s is the number of distinct states in it and d is the number of layers in a state
+        - Best case: O(mn log(mn)), Where m and n are the height and width of the block
+        """
+        states, labels = np.unique(self.ids[x:x + width, y:y + height], return_inverse=True)   # O(mn log(mn))
+        keys = [self.state_keys[state] for state in states.tolist()]                        # O(s)
+        return self.block_type.from_keys(keys, labels.reshape(width, height))               # O(mn + sd)
+
+    def write_block(self, x: int, y: int, block: Block) -> None:
+        """
+        Moves the squares into the states of the block, interning each distinct state of the block once.
+        The stores of new states are built when they are first needed.
+
+        Complexity:
+        - Worst case: O(mn log(mn) + sd + S), Where m and n are the height and width of the block, s is the number of
+          distinct states in it, d is the number of layers in a state and S is the number of states of the grid
+        - Best case: O(mn log(mn) + S), Where m and n are the height and width of the block and S is the number of states of the grid
+        """
+        keys, labels = block.to_keys()                                                      # O(mn log(mn) + sd)
+        states = np.array([self.intern(None, key) for key in keys], dtype=np.int32)         # O(sd)
+        region = self.ids[x:x + block.width, y:y + block.height]                            # O(1), A view
+        self.counts -= np.bincount(region.ravel(), minlength=len(self.counts))              # O(mn + S)
+        region[...] = states[labels]                                                        # O(mn)
+        self.counts += np.bincount(region.ravel(), minlength=len(self.counts))              # O(mn + S)
+        self.distinct_states = int(np.count_nonzero(self.counts))                           # O(S)
+        self.compact()                                                                      # O(mn + S)
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes held by the state ids of the squares and the count of every state.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        return self.ids.nbytes + self.counts.nbytes                                         # O(1)
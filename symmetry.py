@@ -0,0 +1,161 @@
+"""
+Symmetric painting.
+
+A symmetry mode is a set of transforms about the centre of the grid, the identity among them,
+and a stroke painted with it covers the union of its footprint under every transform:
+- NONE: the footprint alone.
+- HORIZONTAL: mirrored left to right, x -> width - 1 - x.
+- VERTICAL: mirrored top to bottom, y -> height - 1 - y.
+- BOTH: mirrored both ways, which also rotates it half a turn.
+- RADIAL: rotated by every multiple of a full turn / folds.
+
+The footprint is transformed whole, as spans from brush.py, rather than by painting the brush again
+at every transformed centre, so each square is painted once however many copies cover it and the
+brush shape is transformed with the stroke. Transforms that map grid squares onto grid squares
+(the mirrors, and quarter turns of a grid whose centre allows them) move each square exactly.
+Any other rotation keeps the square each footprint square moves nearest to, and fills the gaps rounding
+leaves between them by sampling backwards: every square next to a moved square is rotated back onto the
+footprint and kept if it lands inside.
+"""
+
+from __future__ import annotations
+import math
+import numpy as np
+
+NONE = "NONE"
+HORIZONTAL = "HORIZONTAL"
+VERTICAL = "VERTICAL"
+BOTH = "BOTH"
+RADIAL = "RADIAL"
+MODES = (
+    NONE,
+    HORIZONTAL,
+    VERTICAL,
+    BOTH,
+    RADIAL
+)
+
+# Offsets of the 3 x 3 neighbourhood, the squares a rotated square's true position can round to.
+_NEIGHBOURS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+_MIDDLE = 4     # The index of (0, 0) in _NEIGHBOURS
+
+def transforms(mode: str, folds: int = 2) -> list[np.ndarray]:
+    """
+    Returns the linear part of every transform of a symmetry mode, the identity first.
+
+    Args:
+    - mode: One of MODES
+        Type: String
+    - folds: The number of rotated copies with RADIAL, at least 1
+        Type: Integer
+
+    Returns:
+    - One 2 x 2 matrix per copy, acting on (x, y) relative to the centre
+        Type: List of numpy.ndarray
+
+    Complexity:
+    - Worst case: O(f), Where f is the number of folds
+    - Best case: O(1)
+        Happens with any mode other than RADIAL
+    """
+    if mode == NONE:                                                                        # O(1)
+        scales = [(1, 1)]                                                                   # O(1)
+    elif mode == HORIZONTAL:                                                                # O(1)
+        scales = [(1, 1), (-1, 1)]                                                          # O(1)
+    elif mode == VERTICAL:                                                                  # O(1)
+        scales = [(1, 1), (1, -1)]                                                          # O(1)
+    elif mode == BOTH:                                                                      # O(1)
+        scales = [(1, 1), (-1, 1), (1, -1), (-1, -1)]                                       # O(1)
+    elif mode == RADIAL:                                                                    # O(1)
+        if folds < 1:                                                                       # O(1)
+            raise ValueError(f"Radial symmetry needs at least 1 fold, not {folds}.")
+        matrices = []                                                                       # O(1)
+        for k in range(folds):                                                              # O(f)
+            angle = 2 * math.pi * k / folds                                                 # O(1)
+            cos, sin = math.cos(angle), math.sin(angle)                                     # O(1)
+            matrices.append(np.array([[cos, -sin], [sin, cos]]))                            # O(1)
+        return matrices                                                                     # O(1)
+    else:                                                                                   # O(1)
+        raise ValueError(f"Unknown symmetry mode {mode}.")
+    return [np.diag(scale).astype(float) for scale in scales]                               # O(1)
+
+def _cells(spans: list[tuple[int, int, int]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the x and y coordinates of every square of the spans.
+    """
+    rows = np.array([row for row, _, _ in spans])                                           # O(s)
+    starts = np.array([start for _, start, _ in spans])                                     # O(s)
+    lengths = np.array([end - start + 1 for _, start, end in spans])                        # O(s)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)   # O(c)
+    return np.repeat(starts, lengths) + offsets, np.repeat(rows, lengths)                    # O(c)
+
+def _round(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the nearest integers, halves rounded up, so rounding doesn't depend on the sign.
+    """
+    return np.floor(values + 0.5).astype(np.int64)                                          # O(n)
+
+def symmetric_spans(spans: list[tuple[int, int, int]], mode: str, folds: int, width: int, height: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the union of the squares of the spans under every transform of a symmetry mode,
+    about the centre of a width x height grid, clipped to the grid.
+
+    Args:
+    - spans: Disjoint (y, x_start, x_end) spans inside the grid, inclusive, as from brush.stroke_spans
+        Type: List of tuples of 3 integers
+    - mode: One of MODES
+        Type: String
+    - folds: The number of rotated copies with RADIAL
+        Type: Integer
+    - width: The number of columns of the grid
+        Type: Integer
+    - height: The number of rows of the grid
+        Type: Integer
+
+    Returns:
+    - Disjoint, non adjacent (y, x_start, x_end) spans, inclusive, sorted by row then by x_start
+        Type: List of tuples of 3 integers
+
+    Complexity:
+    - Worst case: O(fc log(fc)), Where f is the number of copies and c is the number of squares of the spans
+        Every copy has as many squares as the footprint, which are sorted together to merge them
+    - Best case: O(1)
+        Happens when there are no spans
+    """
+    if len(spans) == 0:                                                                     # O(1)
+        return []                                                                           # O(1)
+    spans = sorted(spans)                                                                   # O(s log s)
+    xs, ys = _cells(spans)                                                                  # O(c)
+    points = np.stack([xs, ys], axis=1).astype(float)                                       # O(c)
+    centre = np.array([(width - 1) / 2, (height - 1) / 2])                                  # O(1)
+    # A square is inside the footprint when it is inside the last span starting at or before it.
+    starts = np.array([row * width + start for row, start, _ in spans])                     # O(s)
+    ends = np.array([row * width + end for row, _, end in spans])                           # O(s)
+
+    copies = []                                                                             # O(1)
+    for matrix in transforms(mode, folds):                                                  # O(f)
+        moved = (points - centre) @ matrix.T + centre                                       # O(c)
+        exact = np.allclose(matrix, np.round(matrix)) and np.allclose(moved[0], np.round(moved[0]))    # O(1)
+        if exact:                                                                           # O(1)
+            # Whole squares move onto whole squares, one for one.
+            candidates = _round(moved)                                                      # O(c)
+        else:                                                                               # O(1)
+            # The moved squares are kept, and the squares next to them if they rotate back into the footprint.
+            candidates = (_round(moved)[:, None, :] + _NEIGHBOURS[None, :, :]).reshape(-1, 2)  # O(c)
+            moved_square = np.arange(len(candidates)) % len(_NEIGHBOURS) == _MIDDLE         # O(c)
+            back = _round((candidates - centre) @ matrix + centre)                          # O(c), The inverse of a rotation is its transpose
+            flat = np.clip(back[:, 1], 0, height - 1) * width + np.clip(back[:, 0], 0, width - 1)    # O(c)
+            span = np.maximum(np.searchsorted(starts, flat, side="right") - 1, 0)           # O(c log s)
+            inside = (back[:, 0] >= 0) & (back[:, 0] < width) & (back[:, 1] >= 0) & (back[:, 1] < height)   # O(c)
+            inside &= (starts[span] <= flat) & (flat <= ends[span])                         # O(c)
+            candidates = candidates[moved_square | inside]                                  # O(c)
+        keep = (candidates[:, 0] >= 0) & (candidates[:, 0] < width) & (candidates[:, 1] >= 0) & (candidates[:, 1] < height)  # O(c)
+        copies.append(candidates[keep, 1] * width + candidates[keep, 0])                    # O(c)
+
+    flat = np.unique(np.concatenate(copies))                                                # O(fc log(fc))
+    rows, columns = np.divmod(flat, width)                                                  # O(fc)
+    # A span ends wherever the next square isn't the next one along the same row.
+    breaks = np.flatnonzero((np.diff(flat) != 1) | (np.diff(rows) != 0)) + 1                # O(fc)
+    firsts = np.concatenate(([0], breaks))                                                  # O(k), Where k is the number of spans
+    lasts = np.concatenate((breaks - 1, [len(flat) - 1]))                                   # O(k)
+    return list(zip(rows[firsts].tolist(), columns[firsts].tolist(), columns[lasts].tolist()))    # O(k)
@@ -0,0 +1,39 @@
+import unittest
+from ed_utils.decorators import number
+
+from layer_store import AdditiveLayerStore
+from layer_util import get_layers
+from layers import rainbow, black, lighten, invert
+
+class TestAddCapacity(unittest.TestCase):
+
+    @number("14.1")
+    def test_grows_to_cap(self):
+        s = AdditiveLayerStore()
+        self.assertLessEqual(len(s.layer_sequence.array), 2)
+        cap = len(get_layers()) * 100
+        for i in range(cap):
+            self.assertTrue(s.add((rainbow, black, lighten)[i % 3]))
+        self.assertEqual(len(s.layer_sequence.array), cap)
+        self.assertFalse(s.add(invert))
+        self.assertEqual(len(s.applied_layers()), cap)
+
+    @number("14.2")
+    def test_fifo_across_resizes(self):
+        s = AdditiveLayerStore()
+        expected = []
+        sequence = [rainbow, black, lighten, invert]
+        for i in range(300):
+            layer = sequence[i % 4]
+            s.add(layer)
+            expected.append(layer)
+            if i % 3 == 2:
+                s.erase(rainbow)
+                expected.pop(0)
+        self.assertEqual(s.applied_layers(), expected)
+        s.special()
+        self.assertEqual(s.applied_layers(), expected[::-1])
+        while s.erase(rainbow):
+            expected.pop()
+        self.assertEqual(expected, [])
+        self.assertLessEqual(len(s.layer_sequence.array), 2)
@@ -0,0 +1,123 @@
+import unittest
+import random
+from ed_utils.decorators import number
+
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore, SpecialParity
+from compositor import Compositor, composite_reference
+from grid import Grid
+from layers import black, red, lighten, rainbow, invert, sparkle, darken
+
+class TestOcclusion(unittest.TestCase):
+
+    BG = (100, 100, 100)
+
+    def assert_colors_match(self, store):
+        expected = (100, 100, 100)
+        for layer in store.applied_layers():
+            expected = layer.apply(expected, 2, 3, 4)
+        self.assertEqual(store.get_color(self.BG, 2, 3, 4), expected)
+
+    @number("11.1")
+    def test_additive_top_constant(self):
+        s = AdditiveLayerStore()
+        s.add(rainbow)
+        s.add(sparkle)
+        self.assertIsNone(s.top_constant)
+        s.add(black)
+        s.add(lighten)
+        self.assertEqual(s.visible_layers(), [black, lighten])
+        self.assertEqual(s.applied_layers(), [rainbow, sparkle, black, lighten])
+        self.assertFalse(s.is_time_dependent())
+        self.assert_colors_match(s)
+        # Erasing the hidden layers keeps black on top.
+        s.erase(rainbow)
+        s.erase(rainbow)
+        self.assertEqual(s.visible_layers(), [black, lighten])
+        # Erasing black itself uncovers nothing, since everything below was served already.
+        s.erase(rainbow)
+        self.assertIsNone(s.top_constant)
+        self.assertEqual(s.visible_layers(), [lighten])
+        self.assert_colors_match(s)
+
+    @number("11.2")
+    def test_additive_special(self):
+        s = AdditiveLayerStore()
+        for layer in [red, rainbow, invert, sparkle]:
+            s.add(layer)
+        self.assertEqual(s.visible_layers(), [red, rainbow, invert, sparkle])
+        s.special()
+        # Reversed: red is now last, so it hides everything.
+        self.assertEqual(s.applied_layers(), [sparkle, invert, rainbow, red])
+        self.assertEqual(s.visible_layers(), [red])
+        self.assert_colors_match(s)
+        s.special()
+        self.assertEqual(s.visible_layers(), [red, rainbow, invert, sparkle])
+        self.assert_colors_match(s)
+
+    @number("11.3")
+    def test_sequence_top_constant(self):
+        s = SequenceLayerStore()
+        for layer in [rainbow, black, sparkle, red, darken]:
+            s.add(layer)
+        self.assertEqual(s.top_constant, red.index + 1)
+        # Layers apply in index order, so red hides rainbow and black but not sparkle.
+        self.assertEqual(s.visible_layers(), [red, sparkle, darken])
+        self.assert_colors_match(s)
+        s.erase(red)
+        self.assertEqual(s.visible_layers(), [black, sparkle, darken])
+        self.assert_colors_match(s)
+        s.erase(black)
+        self.assertEqual(s.top_constant, 0)
+        self.assertEqual(s.visible_layers(), s.applied_layers())
+        self.assert_colors_match(s)
+        # Erasing a hidden layer leaves the history intact.
+        s.add(red)
+        s.erase(rainbow)
+        s.add(rainbow)
+        self.assertEqual(s.applied_layers(), [rainbow, red, sparkle, darken])
+        self.assertEqual(s.visible_layers(), [red, sparkle, darken])
+
+    @number("11.4")
+    def test_set_unchanged(self):
+        s = SetLayerStore()
+        s.add(black)
+        self.assertEqual(s.visible_layers(), s.applied_layers())
+
+    @number("11.5")
+    def test_compositor_hidden_animation(self):
+        for draw_style in [Grid.DRAW_STYLE_ADD, Grid.DRAW_STYLE_SEQUENCE]:
+            grid = Grid(draw_style, 5, 5)
+            grid.paint(rainbow, 2, 2)
+            compositor = Compositor(grid, self.BG)
+            compositor.composite(0)
+            self.assertIn((2, 2), compositor.square_stacks)
+            grid.paint(red, 2, 2)
+            compositor.composite(1)
+            self.assertNotIn((2, 2), compositor.square_stacks)
+            grid.erase_square(red, 2, 2)
+            compositor.composite(2)
+            # Sequence erases red and uncovers rainbow; additive serves rainbow from the front and keeps red.
+            self.assertEqual((2, 2) in compositor.square_stacks, draw_style == Grid.DRAW_STYLE_SEQUENCE)
+            for timestamp in [3, 4.5]:
+                self.assertTrue((compositor.composite(timestamp) == composite_reference(grid, self.BG, timestamp)).all())
+
+    @number("11.6")
+    def test_additive_top_constant_tracked(self):
+        # Adds and erases at both ends of the deque, with special applied to the store and to its grid.
+        rng = random.Random(11)
+        parity = SpecialParity()
+        s = AdditiveLayerStore(parity)
+        for _ in range(2000):
+            choice = rng.random()
+            if choice < 0.5:
+                s.add(rng.choice([black, red, lighten, rainbow, invert, sparkle, darken]))
+            elif choice < 0.8:
+                s.erase(red)
+            elif choice < 0.9:
+                s.special()
+            else:
+                parity.toggle()
+            layers = s.applied_layers()
+            constants = [i for i, layer in enumerate(layers) if layer.is_constant]
+            self.assertEqual(s.top_constant, constants[-1] if constants else None)
+            self.assertEqual(s.visible_layers(), layers[constants[-1]:] if constants else layers)
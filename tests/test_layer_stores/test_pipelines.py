@@ -0,0 +1,86 @@
+import unittest
+from ed_utils.decorators import number
+
+import layer_util
+from layer_store import SequenceLayerStore
+from pipeline import Pipeline, PipelineCache
+from layers import black, lighten, rainbow, invert, sparkle, darken
+
+class TestPipelines(unittest.TestCase):
+
+    @number("10.1")
+    def test_pipeline(self):
+        pipeline = Pipeline([invert, lighten])
+        self.assertEqual(pipeline((100, 0, 250), 0, 0, 0), (195, 255, 45))
+        self.assertEqual(Pipeline([])((1, 2, 3), 0, 0, 0), (1, 2, 3))
+
+    @number("10.2")
+    def test_shared_by_mask(self):
+        cache = PipelineCache()
+        mask = (1 << black.index) | (1 << rainbow.index) | (1 << sparkle.index)
+        pipeline = cache.get(mask)
+        self.assertEqual(pipeline.layers, [rainbow, black, sparkle])
+        self.assertIs(cache.get(mask), pipeline)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 1, 1))
+        cache.get(0)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 2))
+
+    @number("10.3")
+    def test_registry_invalidation(self):
+        cache = PipelineCache()
+        pipeline = cache.get(1 << lighten.index)
+        cache.get(1 << lighten.index)
+        layer_util.registry_version += 1
+        self.assertIsNot(cache.get(1 << lighten.index), pipeline)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 1, 1))
+
+    @number("10.4")
+    def test_store_uses_cache(self):
+        SequenceLayerStore.pipelines.clear()
+        stores = [SequenceLayerStore() for _ in range(10)]
+        for store in stores:
+            store.add(invert)
+            store.add(black)
+        for i, store in enumerate(stores):
+            self.assertEqual(store.get_color((10, 10, 10), 0, i, i), (255, 255, 255))
+        self.assertEqual((SequenceLayerStore.pipelines.misses, SequenceLayerStore.pipelines.hits), (1, 9))
+        self.assertEqual(stores[0].applied_layers(), [black, invert])
+
+    @number("10.5")
+    def test_fuse_layers(self):
+        from pipeline import fuse_layers, ColorTable, Constant
+        from layers import red, green
+        steps = fuse_layers([lighten, invert, darken, rainbow, lighten, red, invert, sparkle, green])
+        self.assertEqual([type(step) for step in steps], [ColorTable, type(rainbow), Constant, type(sparkle), Constant])
+        self.assertEqual(steps[2].color, (0, 255, 255))
+        self.assertEqual(steps[0]((0, 100, 250), 0, 0, 0), (175, 75, 0))
+
+    @number("10.6")
+    def test_fused_matches_layers(self):
+        import random
+        import numpy as np
+        from layer_util import get_layers, apply_layers_batch
+        from layer_store import AdditiveLayerStore
+        rng = random.Random(2)
+        layers = [layer for layer in get_layers() if layer is not None]
+        colors = np.array([[rng.randrange(256) for _ in range(3)] for _ in range(50)])
+        xs = np.arange(50)
+        ys = np.arange(50)[::-1].copy()
+        for depth in [1, 2, 5, 30, 2000]:
+            stack = [rng.choice(layers) for _ in range(depth)]
+            pipeline = Pipeline(stack)
+            for color, x, y in zip(colors.tolist(), xs.tolist(), ys.tolist()):
+                expected = tuple(color)
+                for layer in stack:
+                    expected = layer.apply(expected, 2.5, x, y)
+                self.assertEqual(pipeline(tuple(color), 2.5, x, y), expected)
+            np.testing.assert_array_equal(
+                pipeline.apply_batch(colors, 2.5, xs, ys),
+                apply_layers_batch(stack, colors, 2.5, xs, ys),
+            )
+        # Deep additive stacks of colour table layers collapse to one step.
+        store = AdditiveLayerStore()
+        for i in range(2000):
+            store.add([lighten, invert, darken][i % 3])
+        self.assertEqual(store.get_color((10, 20, 30), 0, 0, 0), Pipeline(store.applied_layers())((10, 20, 30), 0, 0, 0))
+        self.assertEqual(len(store.pipeline.steps), 1)
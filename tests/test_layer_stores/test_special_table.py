@@ -0,0 +1,80 @@
+import unittest
+from ed_utils.decorators import number
+
+from dataclasses import dataclass
+import random
+import numpy as np
+import layer_util
+from layer_util import get_layers
+from layer_store import SequenceLayerStore, SequenceSpecialTable, build_special_table
+from data_structures.array_sorted_list import ArraySortedList, ListItem
+from grid import Grid
+from layers import rainbow, black, lighten, invert, red, green, blue, sparkle, darken
+
+def sorted_list_special(mask, layer_list):
+    """
+    The bitmask SequenceLayerStore.special used to leave behind, by sorting the enabled layers
+    in an ArraySortedList and disabling the middle-most one.
+    """
+    temp_list = ArraySortedList(len(layer_list))
+    for layer in layer_list:
+        if layer is not None and (mask >> layer.index) & 1:
+            temp_list.add(ListItem(layer, layer.name))
+    if temp_list.is_empty():
+        return mask
+    if len(temp_list) % 2 == 0 and len(temp_list) > 1:
+        temp_list.delete_at_index(len(temp_list) - 1)
+    return mask & ~(1 << temp_list[len(temp_list) // 2].value.index)
+
+@dataclass
+class NamedLayer:
+    index: int
+    name: str
+
+class TestSpecialTable(unittest.TestCase):
+
+    @number("17.1")
+    def test_exhaustive(self):
+        table = SequenceLayerStore.special_table.table
+        layer_list = get_layers()
+        self.assertEqual(len(table), 1 << 9)
+        for mask in range(len(table)):
+            self.assertEqual(int(table[mask]), sorted_list_special(mask, layer_list), mask)
+
+    @number("17.2")
+    def test_other_names(self):
+        # Names sorted in a different order than the indices.
+        names = ["layer%02d" % i for i in range(12)]
+        random.Random(17).shuffle(names)
+        layer_list = [NamedLayer(i, name) for i, name in enumerate(names)] + [None] * 8
+        table = build_special_table(layer_list)
+        self.assertEqual(len(table), 1 << 12)
+        for mask in range(len(table)):
+            self.assertEqual(int(table[mask]), sorted_list_special(mask, layer_list), mask)
+
+    @number("17.3")
+    def test_rebuilt_on_registration(self):
+        special_table = SequenceSpecialTable()
+        table = special_table.table
+        self.assertIs(special_table.table, table)
+        layer_util.registry_version += 1
+        self.assertIsNot(special_table.table, table)
+        self.assertTrue(np.array_equal(special_table.table, table))
+
+    @number("17.4")
+    def test_grid_gather(self):
+        rng = random.Random(4)
+        layers = [rainbow, black, lighten, invert, red, green, blue, sparkle, darken]
+        objects = Grid(Grid.DRAW_STYLE_SEQUENCE, 7, 6, Grid.LAYOUT_OBJECTS)
+        arrays = Grid(Grid.DRAW_STYLE_SEQUENCE, 7, 6, Grid.LAYOUT_ARRAYS)
+        for _ in range(200):
+            layer, x, y = rng.choice(layers), rng.randrange(7), rng.randrange(6)
+            objects.paint_square(layer, x, y)
+            arrays.paint_square(layer, x, y)
+        for _ in range(4):
+            objects.special()
+            arrays.special()
+            for x in range(7):
+                for y in range(6):
+                    self.assertEqual(arrays[x][y].applied_layers(), objects[x][y].applied_layers())
+                    self.assertEqual(objects[x][y].top_constant, int.bit_length(objects[x][y].set.elems & SequenceLayerStore.pipelines.constant_mask))
@@ -0,0 +1,91 @@
+import unittest
+from ed_utils.decorators import number
+
+import numpy as np
+import brush
+from grid import Grid
+from action import MaskStep
+from layers import red, blue
+
+class TestBrush(unittest.TestCase):
+
+    INSIDE = {
+        brush.DIAMOND: lambda dx, dy, r: abs(dx) + abs(dy) <= r,
+        brush.SQUARE: lambda dx, dy, r: abs(dx) <= r and abs(dy) <= r,
+        brush.CIRCLE: lambda dx, dy, r: dx * dx + dy * dy <= r * r,
+    }
+
+    def covered(self, spans):
+        return {(x, y) for y, start, end in spans for x in range(start, end + 1)}
+
+    def painted(self, action):
+        """
+        The squares a paint changed, from the MaskStep it records them in.
+        """
+        if len(action.steps) == 0:
+            return set()
+        self.assertEqual(len(action.steps), 1)
+        self.assertIsInstance(action.steps[0], MaskStep)
+        x, y = action.steps[0].affected_corner
+        return {(x + dx, y + dy) for dx, dy in np.argwhere(action.steps[0].affected_mask).tolist()}
+
+    @number("19.1")
+    def test_stencils(self):
+        for shape, inside in self.INSIDE.items():
+            for radius in range(13):
+                spans = brush.stencil(shape, radius)
+                self.assertIs(brush.stencil(shape, radius), spans)
+                expected = {
+                    (dx, dy)
+                    for dx in range(-radius, radius + 1)
+                    for dy in range(-radius, radius + 1)
+                    if inside(dx, dy, radius)
+                }
+                self.assertEqual(self.covered(spans), expected, (shape, radius))
+        with self.assertRaises(ValueError):
+            brush.stencil("STAR", 2)
+
+    @number("19.2")
+    def test_clipping(self):
+        for shape, inside in self.INSIDE.items():
+            for x, y in [(0, 0), (6, 3), (9, 7), (-3, 4), (12, 12)]:
+                spans = brush.clipped_spans(shape, 4, x, y, 10, 8)
+                expected = {
+                    (i, j)
+                    for i in range(10)
+                    for j in range(8)
+                    if inside(i - x, j - y, 4)
+                }
+                self.assertEqual(self.covered(spans), expected, (shape, x, y))
+
+    @number("19.3")
+    def test_paint_shapes(self):
+        for shape, inside in self.INSIDE.items():
+            grid = Grid(Grid.DRAW_STYLE_SET, 20, 15)
+            grid.brush_shape = shape
+            grid.brush_size = 6
+            action = grid.paint(red, 3, 10)
+            expected = {(x, y) for x in range(20) for y in range(15) if inside(x - 3, y - 10, 6)}
+            self.assertEqual(self.painted(action), expected)
+            for x in range(20):
+                for y in range(15):
+                    self.assertEqual(grid[x][y].applied_layers(), [red] if (x, y) in expected else [])
+            # The eraser brush uses the same stencil.
+            grid.paint(blue, 19, 0)
+            grid.brush_size = 2
+            erased = grid.erase(red, 3, 10)
+            self.assertEqual(
+                {step.affected_grid_square for step in erased.steps},
+                {(x, y) for x, y in expected if inside(x - 3, y - 10, 2)},
+            )
+
+    @number("19.4")
+    def test_large_radius(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 300, 200, Grid.LAYOUT_ARRAYS)
+        grid.brush_shape = Grid.BRUSH_SHAPE_CIRCLE
+        grid.brush_size = 250
+        action = grid.paint(red, 150, 100)
+        # The whole disk is recorded as one mask, not a step per square.
+        self.assertEqual(len(action.steps), 1)
+        self.assertEqual(int(action.steps[0].affected_mask.sum()), 300 * 200)
+        self.assertEqual(grid.coverage.count(red), 300 * 200)
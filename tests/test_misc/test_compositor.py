@@ -0,0 +1,84 @@
+import unittest
+from ed_utils.decorators import number
+
+import numpy as np
+from compositor import Compositor, composite_reference
+from layers import rainbow, sparkle, black, lighten, invert
+from grid import Grid
+
+class TestCompositor(unittest.TestCase):
+
+    BG = (255, 255, 255)
+
+    def paint_grid(self, draw_style: str) -> Grid:
+        grid = Grid(draw_style, 7, 5)
+        grid.paint(rainbow, 1, 1)
+        grid.paint(black, 5, 3)
+        grid.paint(sparkle, 3, 2)
+        grid.paint(lighten, 6, 0)
+        grid.paint(invert, 0, 4)
+        return grid
+
+    @number("7.1")
+    def test_matches_get_color(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grid = self.paint_grid(draw_style)
+            compositor = Compositor(grid, self.BG)
+            for timestamp in [0, 1.25, 7]:
+                buffer = compositor.composite(timestamp)
+                self.assertEqual(buffer.shape, (5, 7, 3))
+                self.assertEqual(buffer.dtype, np.uint8)
+                for x in range(grid.x):
+                    for y in range(grid.y):
+                        self.assertEqual(
+                            tuple(buffer[y, x]),
+                            grid[x][y].get_color(self.BG, timestamp, x, y),
+                        )
+                np.testing.assert_array_equal(buffer, composite_reference(grid, self.BG, timestamp))
+
+    @number("7.2")
+    def test_buffer_reused(self):
+        grid = self.paint_grid(Grid.DRAW_STYLE_SET)
+        compositor = Compositor(grid, self.BG)
+        first = compositor.composite(0)
+        self.assertIs(compositor.composite(3), first)
+        grid.special()
+        np.testing.assert_array_equal(compositor.composite(3), composite_reference(grid, self.BG, 3))
+
+    @number("7.3")
+    def test_layer_metadata(self):
+        import layers
+        from layer_util import Layer
+        self.assertTrue(rainbow.time_dependent and rainbow.position_dependent)
+        self.assertFalse(rainbow.color_dependent)
+        self.assertTrue(sparkle.time_dependent and sparkle.position_dependent and sparkle.color_dependent)
+        for layer in [layers.lighten, layers.darken, layers.invert]:
+            self.assertFalse(layer.time_dependent or layer.position_dependent)
+            self.assertTrue(layer.color_dependent)
+        for layer in [layers.black, layers.red, layers.green, layers.blue]:
+            self.assertFalse(layer.time_dependent or layer.position_dependent or layer.color_dependent)
+        self.assertEqual(black.bg, (170, 170, 170))
+        # Undeclared layers depend on everything.
+        plain = Layer(-1, lambda color, timestamp, x, y: color)
+        self.assertTrue(plain.time_dependent and plain.position_dependent and plain.color_dependent)
+
+    @number("7.4")
+    def test_static_cache(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 6, 6)
+        grid.paint(black, 1, 1)
+        grid.paint(rainbow, 4, 4)
+        compositor = Compositor(grid, self.BG)
+        compositor.composite(0)
+        self.assertEqual(set(compositor.square_stacks), {
+            (x, y) for x in range(6) for y in range(6) if abs(x - 4) + abs(y - 4) <= 2
+        })
+        # Static squares are not re-evaluated, so an untracked change is invisible...
+        grid[0][5].add(black)
+        self.assertEqual(tuple(compositor.composite(1)[5, 0]), self.BG)
+        # ...until the grid reports it.
+        grid.mark_changed(0, 5)
+        np.testing.assert_array_equal(compositor.composite(2), composite_reference(grid, self.BG, 2))
+        grid.erase_square(rainbow, 4, 4)
+        np.testing.assert_array_equal(compositor.composite(3), composite_reference(grid, self.BG, 3))
+        self.assertNotIn((4, 4), compositor.square_stacks)
+        self.assertIn((4, 5), compositor.square_stacks)
@@ -0,0 +1,123 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+from collections import Counter
+from grid import Grid
+from undo import UndoTracker
+from layers import rainbow, black, lighten, invert, red, green, blue, sparkle, darken
+
+class TestCoverage(unittest.TestCase):
+
+    LAYERS = [rainbow, black, lighten, invert, red, green, blue, sparkle, darken]
+
+    def held_layers(self, grid, x, y):
+        """
+        The layers painted into a square, found by looking at the square itself.
+        """
+        if grid.draw_style == Grid.DRAW_STYLE_SET:
+            active = grid.erase_target(red, x, y)
+            return Counter([] if active is None else [active.index])
+        return Counter(layer.index for layer in grid[x][y].applied_layers())
+
+    def assert_index_matches(self, grid):
+        expected = {}
+        for x in range(grid.x):
+            for y in range(grid.y):
+                for index, count in self.held_layers(grid, x, y).items():
+                    expected.setdefault(index, {})[(x, y)] = count
+        self.assertEqual(grid.coverage.squares, expected)
+
+    @number("18.1")
+    def test_matches_scan(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            for draw_style in Grid.DRAW_STYLE_OPTIONS:
+                rng = random.Random(18)
+                grid = Grid(draw_style, 6, 5, layout)
+                tracker = UndoTracker()
+                for _ in range(150):
+                    op = rng.random()
+                    layer = rng.choice(self.LAYERS)
+                    x, y = rng.randrange(6), rng.randrange(5)
+                    if op < 0.4:
+                        tracker.add_action(grid.paint(layer, x, y))
+                    elif op < 0.55:
+                        grid.erase_square(layer, x, y)
+                    elif op < 0.7:
+                        tracker.add_action(grid.erase(layer, x, y))
+                    elif op < 0.75:
+                        tracker.add_action(grid.erase_everywhere(layer))
+                    elif op < 0.8:
+                        tracker.add_action(grid.special())
+                    else:
+                        tracker.undo(grid)
+                    self.assert_index_matches(grid)
+
+    @number("18.2")
+    def test_queries(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 10, 8)
+        grid.brush_size = 0
+        self.assertEqual(grid.coverage.count(red), 0)
+        self.assertIsNone(grid.coverage.bounding_box(red))
+        for x, y in [(2, 3), (7, 1), (4, 6)]:
+            grid.paint(red, x, y)
+        grid.paint(red, 2, 3)
+        grid.paint(sparkle, 0, 0)
+        self.assertEqual(grid.coverage.count(red), 3)
+        self.assertEqual(sorted(grid.coverage.cells(red)), [(2, 3), (4, 6), (7, 1)])
+        self.assertEqual(grid.coverage.bounding_box(red), (2, 1, 7, 6))
+        self.assertEqual(grid.coverage.fraction(sparkle), 1 / 80)
+        self.assertTrue(grid.coverage.holds(red, 2, 3))
+        self.assertFalse(grid.coverage.holds(red, 0, 0))
+
+    @number("18.3")
+    def test_erase_everywhere(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 10, 10)
+        grid.paint(red, 3, 3)
+        grid.paint(blue, 4, 3)
+        before = {(x, y): grid[x][y].applied_layers() for x in range(10) for y in range(10)}
+        action = grid.erase_everywhere(red)
+        self.assertEqual(len(action.steps), 13)
+        self.assertEqual(grid.coverage.count(red), 0)
+        self.assertEqual(grid.coverage.count(blue), 13)
+        self.assertEqual(grid[3][3].applied_layers(), [blue])
+        action.undo_apply(grid)
+        self.assertEqual({(x, y): grid[x][y].applied_layers() for x in range(10) for y in range(10)}, before)
+        action.redo_apply(grid)
+        self.assertEqual(grid.coverage.count(red), 0)
+
+    @number("18.4")
+    def test_eraser_brush(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 10, 10)
+        grid.brush_size = 1
+        grid.paint(red, 2, 2)
+        grid.paint(blue, 6, 6)
+        grid.brush_size = 5
+        # Only the squares holding red are erased; blue is left alone even under the brush.
+        action = grid.erase(red, 3, 3)
+        self.assertEqual(sorted(step.affected_grid_square for step in action.steps), [(1, 2), (2, 1), (2, 2), (2, 3), (3, 2)])
+        self.assertEqual(grid.coverage.count(blue), 5)
+        self.assertEqual(grid.coverage.count(red), 0)
+        action.undo_apply(grid)
+        self.assertEqual(grid[2][2].applied_layers(), [red])
+
+    @number("18.5")
+    def test_tiles_follow_painted_area(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_ADD, 300, 200, layout)
+            grid.brush_size = 0
+            grid.paint(red, 150, 100)
+            # One tile, whatever the layout, not an array the size of the grid.
+            self.assertEqual(list(grid.coverage.tiles[red.index]), [(150 // 64, 100 // 64)])
+            self.assertEqual(grid.coverage.cells(red), [(150, 100)])
+            grid.brush_size = 70
+            action = grid.paint(blue, 150, 100)
+            painted = {(x // 64, y // 64) for x, y in grid.coverage.cells(blue)}
+            self.assertEqual(set(grid.coverage.tiles[blue.index]), painted)
+            self.assertEqual(sum(grid.coverage.tile_totals[blue.index].values()), grid.coverage.count(blue))
+            # Tiles, and then the layer, are dropped as soon as no square holds it.
+            grid.erase_everywhere(red)
+            self.assertNotIn(red.index, grid.coverage.tiles)
+            action.undo_apply(grid)
+            self.assertEqual(grid.coverage.tiles, {})
+            self.assertEqual(grid.coverage.count(blue), 0)
@@ -0,0 +1,175 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+import numpy as np
+import fill
+import masks
+from grid import Grid
+from action import MaskStep
+from shared_store import store_key
+from layers import rainbow, black, lighten, invert, red, green, blue, sparkle, darken
+
+class TestFill(unittest.TestCase):
+
+    LAYERS = [rainbow, black, lighten, invert, red, green, blue, sparkle, darken]
+
+    def reference_region(self, same, x, y):
+        """
+        The 4-connected region holding (x, y), one square at a time.
+        """
+        height, width = same.shape
+        if not same[y, x]:
+            return set()
+        region = {(x, y)}
+        queue = [(x, y)]
+        while queue:
+            cx, cy = queue.pop()
+            for nx, ny in [(cx - 1, cy), (cx + 1, cy), (cx, cy - 1), (cx, cy + 1)]:
+                if 0 <= nx < width and 0 <= ny < height and same[ny, nx] and (nx, ny) not in region:
+                    region.add((nx, ny))
+                    queue.append((nx, ny))
+        return region
+
+    def scribble(self, grids, rng, operations):
+        for _ in range(operations):
+            op = rng.random()
+            layer = rng.choice(self.LAYERS[:3])
+            x, y = rng.randrange(grids[0].x), rng.randrange(grids[0].y)
+            for grid in grids:
+                if op < 0.7:
+                    grid.paint_square(layer, x, y)
+                elif op < 0.85:
+                    grid.erase_square(layer, x, y)
+                elif op < 0.95:
+                    grid[x][y].special()
+            if op >= 0.95:
+                for grid in grids:
+                    grid.special()
+
+    def painted(self, action):
+        """
+        The squares a fill changed, from the MaskStep it records them in.
+        """
+        if len(action.steps) == 0:
+            return set()
+        self.assertEqual(len(action.steps), 1)
+        self.assertIsInstance(action.steps[0], MaskStep)
+        x, y = action.steps[0].affected_corner
+        return {(x + dx, y + dy) for dx, dy in np.argwhere(action.steps[0].affected_mask).tolist()}
+
+    def partition(self, labels):
+        """
+        Relabels an array by order of first appearance, so two labellings of the same partition compare equal.
+        """
+        first = {}
+        return [first.setdefault(label, len(first)) for label in labels.ravel().tolist()]
+
+    @number("22.1")
+    def test_region_spans(self):
+        rng = np.random.default_rng(22)
+        for density in [0.3, 0.55, 0.7, 1.0]:
+            for _ in range(10):
+                same = rng.random((13, 17)) < density
+                x, y = int(rng.integers(17)), int(rng.integers(13))
+                spans = fill.region_spans(same, x, y)
+                covered = [(i, row) for row, start, end in spans for i in range(start, end + 1)]
+                self.assertEqual(len(covered), len(set(covered)))
+                self.assertEqual(set(covered), self.reference_region(same, x, y))
+                self.assertEqual(spans, sorted(spans))
+
+    @number("22.2")
+    def test_state_labels(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grids = [Grid(draw_style, 11, 9, layout) for layout in Grid.LAYOUT_OPTIONS]
+            self.scribble(grids, random.Random(2), 150)
+            objects = grids[0]
+            keys = np.empty((11, 9), dtype=object)
+            for x in range(11):
+                for y in range(9):
+                    keys[x, y] = store_key(objects[x][y])
+            for grid in grids:
+                self.assertEqual(self.partition(grid.state_labels()), self.partition(keys), (grid.layout, draw_style))
+
+    @number("22.3")
+    def test_fill_matches_reference(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grids = [Grid(draw_style, 12, 10, layout) for layout in Grid.LAYOUT_OPTIONS]
+            rng = random.Random(3)
+            self.scribble(grids, rng, 60)
+            for _ in range(4):
+                layer = rng.choice(self.LAYERS)
+                x, y = rng.randrange(12), rng.randrange(10)
+                labels = grids[0].state_labels()
+                region = self.reference_region((labels == labels[x, y]).T, x, y)
+                actions = [grid.flood_fill(layer, x, y) for grid in grids]
+                for grid, action in zip(grids, actions):
+                    painted = self.painted(action)
+                    self.assertTrue(painted <= region)
+                    if draw_style != Grid.DRAW_STYLE_SET:
+                        self.assertEqual(painted, region)
+                    for i in range(12):
+                        for j in range(10):
+                            self.assertEqual(grid[i][j].applied_layers(), grids[0][i][j].applied_layers(), (grid.layout, draw_style))
+                    self.assertEqual(grid.coverage.squares, grids[0].coverage.squares)
+
+    @number("22.4")
+    def test_match_color(self):
+        def two_reds():
+            # Two states showing the same colour, red once and red twice, side by side.
+            grid = Grid(Grid.DRAW_STYLE_ADD, 10, 6, Grid.LAYOUT_TILES)
+            grid.brush_size = 0
+            for y in range(6):
+                for x in range(4):
+                    grid.paint(red, x, y)
+                for x in range(4, 8):
+                    grid.paint(red, x, y)
+                    grid.paint(red, x, y)
+            return grid
+        grid = two_reds()
+        self.assertEqual(len(self.painted(grid.flood_fill(blue, 0, 0))), 24)
+        self.assertEqual(grid[4][0].applied_layers(), [red, red])
+        grid = two_reds()
+        by_color = grid.flood_fill(blue, 0, 0, Grid.FILL_MATCH_COLOR, 0, (255, 255, 255))
+        self.assertEqual(len(self.painted(by_color)), 48)
+        self.assertEqual(grid[7][5].applied_layers(), [red, red, blue])
+        self.assertEqual(grid[8][5].applied_layers(), [])
+
+    @number("22.5")
+    def test_large_maze(self):
+        # A serpentine corridor over 4000 rows is one region of 4000 runs, far past any recursion limit.
+        same = np.zeros((4000, 2000), dtype=bool)
+        same[0::2, :] = True
+        same[1::4, -1] = True
+        same[3::4, 0] = True
+        spans = fill.region_spans(same, 0, 0)
+        self.assertEqual(sum(end - start + 1 for _, start, end in spans), int(same.sum()))
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 300, 200, Grid.LAYOUT_ARRAYS)
+        action = grid.flood_fill(red, 150, 100)
+        self.assertEqual(len(self.painted(action)), 300 * 200)
+        self.assertEqual(grid.coverage.count(red), 300 * 200)
+        action.undo_apply(grid)
+        self.assertEqual(grid.coverage.count(red), 0)
+        action.redo_apply(grid)
+        self.assertEqual(grid.coverage.count(red), 300 * 200)
+        # The region's spans make the mask it is painted with, over the box around them.
+        x, y, region = masks.from_spans([(2, 1, 3), (3, 4, 4), (3, 5, 6), (4, 2, 2)])
+        self.assertEqual((x, y), (1, 2))
+        self.assertEqual({(x + dx, y + dy) for dx, dy in np.argwhere(region).tolist()},
+                         {(1, 2), (2, 2), (3, 2), (4, 3), (5, 3), (6, 3), (2, 4)})
+
+    @number("22.6")
+    def test_chunked_region(self):
+        rng = np.random.default_rng(6)
+        for density in [0.45, 0.6, 0.8]:
+            for chunk_size in [3, 5, 64]:
+                same = rng.random((23, 29)) < density
+                labels = same.T.astype(np.int64)
+                labels_of = lambda x, y, width, height: labels[x:x + width, y:y + height]
+                x, y = int(rng.integers(29)), int(rng.integers(23))
+                parts = fill.chunked_region(labels_of, 29, 23, chunk_size, x, y)
+                found = {(left + dx, bottom + dy) for (left, bottom), mask in parts.items() for dx, dy in np.argwhere(mask).tolist()}
+                # Squares labelled like the seed, whether or not it is inside.
+                expected = self.reference_region(same == same[y, x], x, y)
+                self.assertEqual(found, expected)
+                self.assertTrue(all(left % chunk_size == 0 and bottom % chunk_size == 0 for left, bottom in parts))
@@ -0,0 +1,86 @@
+import unittest
+from ed_utils.decorators import number
+
+import numpy as np
+from action import PaintStep
+from compositor import Compositor, composite_reference
+from layers import red, green, black
+from grid import Grid
+
+class TestGridChanges(unittest.TestCase):
+
+    @number("8.1")
+    def test_paint_feed(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+        grid.brush_size = 1
+        epoch = grid.epoch
+        grid.paint(red, 2, 2)
+        self.assertEqual(grid.changes_since(epoch), {(2, 2), (1, 2), (3, 2), (2, 1), (2, 3)})
+        after_first = grid.epoch
+        # Repainting the same layer changes nothing.
+        grid.paint(red, 2, 2)
+        self.assertEqual(grid.changes_since(after_first), set())
+        grid.paint(green, 0, 0)
+        self.assertEqual(grid.changes_since(after_first), {(0, 0), (1, 0), (0, 1)})
+        self.assertTrue(epoch < grid.version(2, 2) <= after_first)
+        self.assertEqual(grid.version(0, 0), grid.epoch - 2)
+
+    @number("8.2")
+    def test_steps_and_special(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 4, 3)
+        self.assertEqual(grid.drain_changes(), set())
+        PaintStep((1, 1), red).redo_apply(grid)
+        PaintStep((3, 2), red).undo_apply(grid)
+        self.assertEqual(grid.drain_changes(), {(1, 1)})
+        PaintStep((1, 1), red).undo_apply(grid)
+        self.assertEqual(grid.drain_changes(), {(1, 1)})
+        self.assertEqual(grid.drain_changes(), set())
+        grid.special()
+        self.assertEqual(grid.drain_changes(), {(x, y) for x in range(4) for y in range(3)})
+        self.assertEqual(grid.version(2, 2), grid.epoch)
+
+    @number("8.3")
+    def test_feed_overflow(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 2, 2)
+        grid.brush_size = 0
+        epoch = grid.epoch
+        for _ in range(3):
+            grid.paint(black, 0, 0)
+            grid.paint(black, 1, 1)
+        # The feed was dropped, so the versions are scanned instead.
+        self.assertGreater(grid.feed_start, epoch)
+        self.assertEqual(grid.changes_since(epoch), {(0, 0), (1, 1)})
+        self.assertEqual(grid.changes_since(grid.epoch - 1), {(1, 1)})
+
+    @number("8.4")
+    def test_compositor_update(self):
+        bg = (255, 255, 255)
+        grid = Grid(Grid.DRAW_STYLE_ADD, 6, 6)
+        compositor = Compositor(grid, bg)
+        np.testing.assert_array_equal(compositor.update(0), composite_reference(grid, bg, 0))
+        grid.paint(red, 1, 1)
+        grid.paint(black, 4, 4)
+        np.testing.assert_array_equal(compositor.update(0), composite_reference(grid, bg, 0))
+        grid.special()
+        np.testing.assert_array_equal(compositor.update(0), composite_reference(grid, bg, 0))
+
+    @number("8.5")
+    def test_special_watermark(self):
+        for layout in [Grid.LAYOUT_OBJECTS, Grid.LAYOUT_ARRAYS, Grid.LAYOUT_TILES]:
+            with self.subTest(layout=layout):
+                grid = Grid(Grid.DRAW_STYLE_SET, 5, 4, layout)
+                grid.brush_size = 0
+                grid.paint(red, 1, 1)
+                before = grid.epoch
+                grid.special()
+                # The versions are not stamped, the watermark stands for every square.
+                self.assertLessEqual(grid.versions[1, 1], before)
+                self.assertEqual(grid.version(3, 3), grid.epoch)
+                after = grid.epoch
+                grid.paint(green, 4, 3)
+                self.assertEqual(grid.changes_since(after), {(4, 3)})
+                self.assertEqual(grid.version(4, 3), grid.epoch)
+                self.assertEqual(grid.version(0, 0), after)
+                if layout != Grid.LAYOUT_TILES:
+                    self.assertEqual(len(grid.changes_since(before)), 20)
+                self.assertEqual(grid.untouched_changed_since(before), layout == Grid.LAYOUT_TILES)
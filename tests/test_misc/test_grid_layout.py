@@ -0,0 +1,185 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+from grid import Grid
+from array_store import SetLayerArray, AdditiveLayerArray, SequenceLayerArray
+from layer_store import SequenceLayerStore
+from layer_util import get_layers
+from layers import rainbow, black, lighten, invert, red, green, blue, sparkle, darken
+from tests.test_misc import test_undo, test_replay, test_window, test_compositor, test_grid_changes
+from tests.test_layer_stores import test_set_layer, test_add_layer, test_seq_layer
+
+class ArrayLayout:
+    """
+    Runs the tests of the class it is mixed into with every Grid using LAYOUT_ARRAYS.
+    """
+
+    LAYOUT = Grid.LAYOUT_ARRAYS
+
+    def setUp(self):
+        self.previous_layout = Grid.DEFAULT_LAYOUT
+        Grid.DEFAULT_LAYOUT = self.LAYOUT
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        Grid.DEFAULT_LAYOUT = self.previous_layout
+
+class TestUndoArrays(ArrayLayout, test_undo.TestUndo):
+    pass
+
+class TestReplayArrays(ArrayLayout, test_replay.TestReplay):
+    pass
+
+class TestWindowArrays(ArrayLayout, test_window.TestGrid):
+    pass
+
+class TestCompositorArrays(ArrayLayout, test_compositor.TestCompositor):
+    pass
+
+class TestGridChangesArrays(ArrayLayout, test_grid_changes.TestGridChanges):
+    pass
+
+class TileLayout(ArrayLayout):
+    """
+    Runs the tests of the class it is mixed into with every Grid using LAYOUT_TILES.
+    """
+
+    LAYOUT = Grid.LAYOUT_TILES
+
+class TestUndoTiles(TileLayout, test_undo.TestUndo):
+    pass
+
+class TestReplayTiles(TileLayout, test_replay.TestReplay):
+    pass
+
+class TestWindowTiles(TileLayout, test_window.TestGrid):
+    pass
+
+class TestCompositorTiles(TileLayout, test_compositor.TestCompositor):
+    pass
+
+class TestGridChangesTiles(TileLayout, test_grid_changes.TestGridChanges):
+    pass
+
+class SharedLayout(ArrayLayout):
+    """
+    Runs the tests of the class it is mixed into with every Grid using LAYOUT_SHARED.
+    """
+
+    LAYOUT = Grid.LAYOUT_SHARED
+
+class TestUndoShared(SharedLayout, test_undo.TestUndo):
+    pass
+
+class TestReplayShared(SharedLayout, test_replay.TestReplay):
+    pass
+
+class TestWindowShared(SharedLayout, test_window.TestGrid):
+    pass
+
+class TestCompositorShared(SharedLayout, test_compositor.TestCompositor):
+    pass
+
+class TestGridChangesShared(SharedLayout, test_grid_changes.TestGridChanges):
+    pass
+
+class CellStores:
+    """
+    Runs the layer store tests of the class it is mixed into against a LayerCell of a 1x1 LayerArray.
+    """
+
+    def setUp(self):
+        self.patched = [
+            (test_set_layer, "SetLayerStore", lambda: SetLayerArray(1, 1)[0][0]),
+            (test_add_layer, "AdditiveLayerStore", lambda: AdditiveLayerArray(1, 1)[0][0]),
+            (test_seq_layer, "SequenceLayerStore", lambda: SequenceLayerArray(1, 1)[0][0]),
+        ]
+        self.originals = [getattr(module, name) for module, name, _ in self.patched]
+        for module, name, factory in self.patched:
+            setattr(module, name, factory)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        for (module, name, _), original in zip(self.patched, self.originals):
+            setattr(module, name, original)
+
+class TestSetLayerCells(CellStores, test_set_layer.TestSetLayer):
+    pass
+
+class TestAddLayerCells(CellStores, test_add_layer.TestAddLayer):
+    pass
+
+class TestSeqLayerCells(CellStores, test_seq_layer.TestSeqLayer):
+    pass
+
+class TestGridLayout(unittest.TestCase):
+
+    LAYERS = [rainbow, black, lighten, invert, red, green, blue, sparkle, darken]
+
+    @number("12.1")
+    def test_matches_objects(self):
+        for layout in [Grid.LAYOUT_ARRAYS, Grid.LAYOUT_TILES, Grid.LAYOUT_SHARED]:
+            self.check_matches_objects(layout)
+
+    def check_matches_objects(self, layout):
+        rng = random.Random(12)
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            objects = Grid(draw_style, 6, 5, Grid.LAYOUT_OBJECTS)
+            arrays = Grid(draw_style, 6, 5, layout)
+            if layout == Grid.LAYOUT_TILES:
+                arrays.grid.chunk_size = arrays.versions.chunk_size = 4
+            for _ in range(400):
+                x, y = rng.randrange(6), rng.randrange(5)
+                layer = rng.choice(self.LAYERS)
+                op = rng.random()
+                if op < 0.55:
+                    self.assertEqual(arrays.paint_square(layer, x, y), objects.paint_square(layer, x, y))
+                elif op < 0.85:
+                    self.assertEqual(arrays.erase_square(layer, x, y), objects.erase_square(layer, x, y))
+                elif op < 0.95:
+                    arrays[x][y].special()
+                    objects[x][y].special()
+                else:
+                    arrays.special()
+                    objects.special()
+                for x in range(6):
+                    for y in range(5):
+                        self.assertEqual(arrays[x][y].applied_layers(), objects[x][y].applied_layers())
+                        self.assertEqual(arrays[x][y].visible_layers(), objects[x][y].visible_layers())
+                        self.assertEqual(arrays[x][y].get_color((20, 130, 250), 1.5, x, y), objects[x][y].get_color((20, 130, 250), 1.5, x, y))
+
+    @number("12.2")
+    def test_sequence_special(self):
+        for mask in range(1 << 9):
+            store = SequenceLayerStore()
+            for layer in get_layers():
+                if layer is not None and (mask >> layer.index) & 1:
+                    store.add(layer)
+            store.special()
+            cells = SequenceLayerArray(1, 2)
+            cells.masks[0, 0] = cells.masks[0, 1] = mask
+            cells.special_square(0, 0)
+            self.assertEqual(int(cells.masks[0, 0]), store.set.elems, mask)
+            cells.special()
+            self.assertEqual(int(cells.masks[0, 1]), store.set.elems, mask)
+
+    @number("12.3")
+    def test_cells(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 3, 4, Grid.LAYOUT_ARRAYS)
+        self.assertEqual((len(grid.grid), len(grid[0])), (3, 4))
+        with self.assertRaises(IndexError):
+            grid[3]
+        with self.assertRaises(IndexError):
+            grid[0][4]
+        grid.paint_square(red, 1, 2)
+        grid.paint_square(lighten, 1, 2)
+        self.assertEqual(grid[1][2].get_color((0, 0, 0), 0, 1, 2), (255, 40, 40))
+        # Empty squares hold nothing.
+        self.assertEqual(len(grid.grid.sequences), 1)
+        grid.erase_square(red, 1, 2)
+        grid.erase_square(red, 1, 2)
+        self.assertEqual(len(grid.grid.sequences), 0)
+        self.assertFalse(grid.erase_square(red, 1, 2))
@@ -0,0 +1,110 @@
+import unittest
+from ed_utils.decorators import number
+
+import colorsys
+import random
+import numpy as np
+from layer_util import Layer, get_layers, apply_layers_batch
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+from layers import rainbow, sparkle, invert, black, lighten, darken
+
+class TestLayerBatch(unittest.TestCase):
+
+    def random_squares(self, n: int, seed: int = 0):
+        rng = random.Random(seed)
+        colors = np.array([[rng.randrange(256) for _ in range(3)] for _ in range(n)], dtype=np.int64)
+        xs = np.array([rng.randrange(200) for _ in range(n)], dtype=np.int64)
+        ys = np.array([rng.randrange(200) for _ in range(n)], dtype=np.int64)
+        return colors, xs, ys
+
+    def assertMatchesScalar(self, layer: Layer, colors, timestamp, xs, ys):
+        expected = [
+            layer.apply(tuple(color), timestamp, x, y)
+            for color, x, y in zip(colors.tolist(), xs.tolist(), ys.tolist())
+        ]
+        self.assertEqual(layer.apply_batch(colors, timestamp, xs, ys).tolist(), [list(c) for c in expected])
+
+    @number("9.1")
+    def test_builtin_kernels(self):
+        colors, xs, ys = self.random_squares(500)
+        for layer in get_layers():
+            if layer is None:
+                break
+            self.assertIsNotNone(layer.batch, layer.name)
+            for timestamp in [0, 0.35, 7, 123.456]:
+                self.assertMatchesScalar(layer, colors, timestamp, xs, ys)
+
+    @number("9.2")
+    def test_fallback(self):
+        def swap(color, timestamp, x, y):
+            return (color[2], color[1], x % 256)
+        layer = Layer(-1, swap)
+        self.assertIsNone(layer.batch)
+        colors, xs, ys = self.random_squares(50, seed=3)
+        self.assertMatchesScalar(layer, colors, 4, xs, ys)
+        self.assertEqual(layer.apply_batch(colors[:0], 4, xs[:0], ys[:0]).shape, (0, 3))
+
+    @number("9.3")
+    def test_store_get_colors(self):
+        colors, xs, ys = self.random_squares(100, seed=5)
+        stores = [SetLayerStore(), AdditiveLayerStore(), SequenceLayerStore()]
+        for store in stores:
+            for layer in [rainbow, invert, sparkle, lighten, darken]:
+                store.add(layer)
+            store.special()
+            result = store.get_colors(colors, 3.5, xs, ys)
+            for i in range(len(xs)):
+                self.assertEqual(tuple(result[i]), store.get_color(tuple(colors[i].tolist()), 3.5, int(xs[i]), int(ys[i])))
+        self.assertEqual(apply_layers_batch([black, lighten], colors, 0, xs, ys).tolist(), [[40, 40, 40]] * 100)
+
+    @number("9.4")
+    def test_sparkle_matches_loop(self):
+        def sparkle_loop(color, timestamp, x, y):
+            # The original sparkle, which steps the generator one iteration at a time.
+            ts = int((timestamp + x/3 + y/5) * 3)
+            other = x
+            for _ in range(10 + (ts * 31 % 17)):
+                other = (1103515245 * other + 12345) % (1 << 31)
+            other += y
+            for _ in range(10 + (ts * 31 % 17)):
+                other = (1103515245 * other + 12345) % (1 << 31)
+            other = (other & ((1 << 31)-1)) >> 16
+            return lighten.apply(color, timestamp, x, y) if other/(1 << 15) < 0.1 else darken.apply(color, timestamp, x, y)
+
+        color = (100, 20, 250)
+        for timestamp in [0, 0.1, 2.5, 17, -3.3]:
+            for x in range(64):
+                for y in range(64):
+                    self.assertEqual(sparkle.apply(color, timestamp, x, y), sparkle_loop(color, timestamp, x, y))
+            xs = np.repeat(np.arange(64), 64)
+            ys = np.tile(np.arange(64), 64)
+            expected = [sparkle_loop(color, timestamp, int(x), int(y)) for x, y in zip(xs, ys)]
+            colors = np.tile(np.array(color), (len(xs), 1))
+            self.assertEqual(sparkle.apply_batch(colors, timestamp, xs, ys).tolist(), [list(c) for c in expected])
+
+    @number("9.5")
+    def test_hue_table(self):
+        from layers import HueTable
+        xs = np.repeat(np.arange(40), 30)
+        ys = np.tile(np.arange(30), 40)
+        colors = np.zeros((len(xs), 3), dtype=np.int64)
+        for timestamp in [0, 0.013, 5.5]:
+            expected = np.array([rainbow.apply((0, 0, 0), timestamp, int(x), int(y)) for x, y in zip(xs, ys)])
+            exact = HueTable()
+            self.assertEqual(exact.max_error, 0)
+            np.testing.assert_array_equal(exact(colors, timestamp, xs, ys), expected)
+            np.testing.assert_array_equal(exact.grid(timestamp, 40, 30).reshape(-1, 3), expected)
+            for resolution in [20, 64, 360, 4096]:
+                table = HueTable(resolution)
+                error = np.abs(table(colors, timestamp, xs, ys) - expected).max()
+                self.assertLessEqual(error, table.max_error)
+                np.testing.assert_array_equal(
+                    table.grid(timestamp, 10, 10, 30, 20).reshape(-1, 3),
+                    table(colors[:100], timestamp, np.repeat(np.arange(30, 40), 10), np.tile(np.arange(20, 30), 10)),
+                )
+        # The bound holds for every hue, not just the ones the grid lands on.
+        hues = np.linspace(0, 1, 100001)[:-1]
+        expected = np.array([[int(255*c) for c in colorsys.hls_to_rgb(h, 0.6, 0.6)] for h in hues])
+        for resolution in [64, 360, 1024]:
+            table = HueTable(resolution)
+            self.assertLessEqual(np.abs(table.lookup(hues) - expected).max(), table.max_error)
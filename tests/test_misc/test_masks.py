@@ -0,0 +1,126 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+import numpy as np
+import masks
+from grid import Grid
+from action import MaskStep, MaskEraseStep
+from layers import rainbow, lighten, red, green, blue
+
+class TestMasks(unittest.TestCase):
+
+    LAYERS = [rainbow, lighten, red, green, blue]
+
+    def scribble(self, grids, rng, operations):
+        for _ in range(operations):
+            layer = rng.choice(self.LAYERS)
+            x, y = rng.randrange(grids[0].x), rng.randrange(grids[0].y)
+            paint = rng.random() < 0.8
+            for grid in grids:
+                if paint:
+                    grid.paint_square(layer, x, y)
+                else:
+                    grid.erase_square(layer, x, y)
+
+    def squares_of(self, step, selected):
+        x, y = step.affected_corner
+        return {(x + dx, y + dy) for dx, dy in np.argwhere(selected).tolist()}
+
+    def layers_of(self, grid):
+        return [[grid[x][y].applied_layers() for y in range(grid.y)] for x in range(grid.x)]
+
+    @number("25.1")
+    def test_generators(self):
+        board = masks.checkerboard(6, 4, 2)
+        self.assertEqual(board.shape, (6, 4))
+        self.assertTrue(board[0, 0] and board[1, 1] and not board[2, 0] and board[2, 2])
+        self.assertEqual(masks.stripes(5, 3, 3, 1).tolist(), [[True] * 3, [False] * 3, [False] * 3, [True] * 3, [False] * 3])
+        self.assertEqual(masks.stripes(2, 4, 2, 1, masks.HORIZONTAL)[1].tolist(), [True, False, True, False])
+        self.assertEqual(masks.stripes(3, 3, 3, 1, masks.DIAGONAL).sum(), 3)
+        with self.assertRaises(ValueError):
+            masks.stripes(3, 3, direction="UP")
+        disc = masks.radial(9, 9, 100, 3)
+        self.assertEqual({(x, y) for x, y in np.argwhere(disc).tolist()}, {(x, y) for x in range(9) for y in range(9) if (x - 4) ** 2 + (y - 4) ** 2 < 9})
+        rings = masks.radial(9, 9, 4, 2, 0, 0)
+        self.assertTrue(rings[0, 0] and rings[1, 1] and not rings[2, 0] and rings[4, 0])
+        self.assertTrue(np.array_equal(masks.noise(20, 10, 0.3, 5), masks.noise(20, 10, 0.3, 5)))
+        self.assertFalse(masks.noise(20, 10, 0, 5).any())
+
+    @number("25.2")
+    def test_paint_mask(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            # Tiled grids are 70 wide, so masks cross chunk borders, and the last chunks overhang the grid.
+            grids = [Grid(draw_style, 70, 13, layout) for layout in Grid.LAYOUT_OPTIONS]
+            self.scribble(grids, random.Random(25), 300)
+            mask = masks.noise(70, 13, 0.4, 1) | masks.checkerboard(70, 13, 3)
+            for grid in grids:
+                before = self.layers_of(grid)
+                action = grid.paint_mask(red, mask)
+                # Every change is held in a single step, as a mask of the box around the squares that changed.
+                self.assertEqual(len(action.steps), 1)
+                self.assertIsInstance(action.steps[0], MaskStep)
+                changed = self.squares_of(action.steps[0], action.steps[0].affected_mask)
+                self.assertEqual(changed, {
+                    (x, y) for x in range(70) for y in range(13) if before[x][y] != grid[x][y].applied_layers()
+                })
+                self.assertTrue(changed <= {(x, y) for x, y in np.argwhere(mask).tolist()})
+            for grid in grids:
+                self.assertEqual(self.layers_of(grid), self.layers_of(grids[0]), (draw_style, grid.layout))
+                self.assertEqual(grid.coverage.squares, grids[0].coverage.squares, (draw_style, grid.layout))
+
+            erase = masks.stripes(70, 13, 4, 2, masks.DIAGONAL)
+            for grid in grids:
+                before = self.layers_of(grid)
+                targets = [[grid.erase_target(red, x, y) for y in range(13)] for x in range(70)]
+                action = grid.erase_mask(red, erase)
+                self.assertEqual(len(action.steps), 1)
+                self.assertIsInstance(action.steps[0], MaskEraseStep)
+                erased = action.steps[0].affected_layers
+                self.assertEqual(self.squares_of(action.steps[0], erased >= 0), {
+                    (x, y) for x in range(70) for y in range(13) if before[x][y] != grid[x][y].applied_layers()
+                })
+                x0, y0 = action.steps[0].affected_corner
+                for dx, dy in np.argwhere(erased >= 0).tolist():
+                    self.assertEqual(erased[dx, dy], targets[x0 + dx][y0 + dy].index)
+            for grid in grids:
+                self.assertEqual(self.layers_of(grid), self.layers_of(grids[0]), (draw_style, grid.layout))
+                self.assertEqual(grid.coverage.squares, grids[0].coverage.squares, (draw_style, grid.layout))
+
+    @number("25.3")
+    def test_undo(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 20, 20, layout)
+            grid.paint_mask(blue, masks.radial(20, 20, 100, 5))
+            painted = self.layers_of(grid)
+            action = grid.paint_mask(green, masks.checkerboard(20, 20))
+            self.assertEqual(grid.coverage.count(green), 200)
+            self.assertEqual(int(action.steps[0].affected_mask.sum()), 200)
+            # Painting again changes nothing, so lists nothing.
+            self.assertEqual(grid.paint_mask(green, masks.checkerboard(20, 20)).steps, [])
+            action.undo_apply(grid)
+            self.assertEqual(grid.coverage.count(green), 0)
+            self.assertEqual(self.layers_of(grid), painted)
+            action.redo_apply(grid)
+            self.assertEqual(grid.coverage.count(green), 200)
+            action.undo_apply(grid)
+            held = grid.coverage.count(blue)
+            erase = grid.erase_mask(blue, np.ones((20, 20), dtype=bool))
+            self.assertEqual(int((erase.steps[0].affected_layers == blue.index).sum()), held)
+            self.assertEqual(grid.coverage.count(blue), 0)
+            erase.undo_apply(grid)
+            self.assertEqual(grid.coverage.count(blue), held)
+            self.assertEqual(self.layers_of(grid), painted)
+            erase.redo_apply(grid)
+            self.assertEqual(grid.coverage.count(blue), 0)
+
+    @number("25.4")
+    def test_mask_shape(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 4, Grid.LAYOUT_ARRAYS)
+        with self.assertRaises(ValueError):
+            grid.paint_mask(red, np.ones((4, 5), dtype=bool))
+        # Anything numpy can read as a grid-sized array of truth values is a mask.
+        action = grid.paint_mask(red, [[1, 0, 0, 0]] * 5)
+        self.assertEqual(action.steps[0].affected_corner, (0, 0))
+        self.assertEqual(action.steps[0].affected_mask.tolist(), [[True]] * 5)
+        self.assertEqual(masks.crop(np.zeros((3, 3), dtype=bool))[2].shape, (0, 0))
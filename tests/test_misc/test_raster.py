@@ -0,0 +1,90 @@
+import unittest
+from ed_utils.decorators import number
+
+import math
+import random
+import numpy as np
+import raster
+from grid import Grid
+from layers import red
+
+class TestRaster(unittest.TestCase):
+
+    @number("21.1")
+    def test_line_cells(self):
+        self.assertEqual(raster.line_cells(3, 4, 3, 4), [(3, 4)])
+        self.assertEqual(raster.line_cells(0, 0, 4, 0), [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)])
+        self.assertEqual(raster.line_cells(0, 0, -3, -3), [(0, 0), (-1, -1), (-2, -2), (-3, -3)])
+        self.assertEqual(raster.line_cells(0, 0, 2, 5), [(0, 0), (0, 1), (1, 2), (1, 3), (2, 4), (2, 5)])
+        rng = random.Random(21)
+        for _ in range(300):
+            x0, y0, x1, y1 = (rng.randrange(-40, 40) for _ in range(4))
+            cells = raster.line_cells(x0, y0, x1, y1)
+            self.assertEqual(cells[0], (x0, y0))
+            self.assertEqual(cells[-1], (x1, y1))
+            self.assertEqual(len(cells), max(abs(x1 - x0), abs(y1 - y0)) + 1)
+            self.assertEqual(len(set(cells)), len(cells))
+            for (ax, ay), (bx, by) in zip(cells, cells[1:]):
+                self.assertEqual(max(abs(bx - ax), abs(by - ay)), 1)
+            # Every cell is the nearest one to the ideal line along the major axis.
+            for cx, cy in cells:
+                if abs(x1 - x0) >= abs(y1 - y0) and x1 != x0:
+                    self.assertLessEqual(abs(cy - (y0 + (cx - x0) * (y1 - y0) / (x1 - x0))), 0.5)
+                elif y1 != y0:
+                    self.assertLessEqual(abs(cx - (x0 + (cy - y0) * (x1 - x0) / (y1 - y0))), 0.5)
+            # The same cells whichever end the line is walked from.
+            self.assertEqual(raster.line_cells(x1, y1, x0, y0), cells[::-1])
+
+    @number("21.2")
+    def test_polyline(self):
+        self.assertEqual(raster.polyline_cells([]), [])
+        self.assertEqual(raster.polyline_cells([(1, 1)]), [(1, 1)])
+        self.assertEqual(
+            raster.polyline_cells([(0, 0), (2, 0), (2, 2), (2, 2)]),
+            [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2)],
+        )
+        # Between centres, as the window walks between pointer positions: a diagonal goes through corners, x first.
+        self.assertEqual(raster.polyline_cells([(0, 0), (2, 2)]), [(0, 0), (1, 0), (1, 1), (2, 1), (2, 2)])
+        self.assertEqual(raster.polyline_cells([(0, 0), (3, 1)]), raster.segment_cells(0.5, 0.5, 3.5, 1.5))
+
+    @number("21.3")
+    def test_paint_polyline(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 12, 12)
+        grid.brush_size = 0
+        action = grid.paint_polyline(red, [(1, 1), (8, 1), (8, 6), (1, 1)])
+        cells = raster.polyline_cells([(1, 1), (8, 1), (8, 6), (1, 1)])
+        # The closing cell is painted once, even though the polyline comes back to it.
+        self.assertEqual(len(action.steps), 1)
+        x, y = action.steps[0].affected_corner
+        self.assertEqual({(x + dx, y + dy) for dx, dy in np.argwhere(action.steps[0].affected_mask).tolist()}, set(cells))
+        self.assertEqual(grid[1][1].applied_layers(), [red])
+
+    @number("21.4")
+    def test_segment_cells(self):
+        def crossed(x0, y0, x1, y1):
+            # The cell under the middle of every piece the segment's border crossings cut it into.
+            ts = {0.0, 1.0}
+            for start, end in [(x0, x1), (y0, y1)]:
+                if start != end:
+                    for border in range(math.floor(min(start, end)) + 1, math.ceil(max(start, end))):
+                        ts.add((border - start) / (end - start))
+            ts = sorted(ts)
+            return {
+                (math.floor(x0 + (x1 - x0) * (a + b) / 2), math.floor(y0 + (y1 - y0) * (a + b) / 2))
+                for a, b in zip(ts, ts[1:]) if b > a
+            }
+
+        self.assertEqual(raster.segment_cells(0.5, 0.5, 0.9, 0.2), [(0, 0)])
+        # Snapping the ends to (0, 0) and (2, 1) first draws (1, 0) or (1, 1), but the segment crosses both.
+        self.assertEqual(raster.segment_cells(0.2, 0.4, 2.9, 1.6), [(0, 0), (1, 0), (1, 1), (2, 1)])
+        self.assertEqual(raster.segment_cells(3.5, 0.5, 0.5, 0.5), [(3, 0), (2, 0), (1, 0), (0, 0)])
+        rng = random.Random(214)
+        for _ in range(300):
+            x0, y0, x1, y1 = (rng.uniform(-20, 20) for _ in range(4))
+            cells = raster.segment_cells(x0, y0, x1, y1)
+            self.assertEqual(cells[0], (math.floor(x0), math.floor(y0)))
+            self.assertEqual(cells[-1], (math.floor(x1), math.floor(y1)))
+            self.assertEqual(len(set(cells)), len(cells))
+            for (ax, ay), (bx, by) in zip(cells, cells[1:]):
+                self.assertEqual(abs(bx - ax) + abs(by - ay), 1)
+            self.assertEqual(set(cells), crossed(x0, y0, x1, y1))
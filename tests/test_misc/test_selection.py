@@ -0,0 +1,138 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+from grid import Grid
+from action import BlockStep
+from selection import SetBlock, AdditiveBlock
+from layers import rainbow, black, lighten, red, green, blue
+
+class TestSelection(unittest.TestCase):
+
+    LAYERS = [rainbow, black, lighten, red, green, blue]
+
+    def scribble(self, grids, rng, operations):
+        for _ in range(operations):
+            op = rng.random()
+            layer = rng.choice(self.LAYERS)
+            x, y = rng.randrange(grids[0].x), rng.randrange(grids[0].y)
+            for grid in grids:
+                if op < 0.75:
+                    grid.paint_square(layer, x, y)
+                elif op < 0.9:
+                    grid.erase_square(layer, x, y)
+                elif op < 0.97 and grid.draw_style == Grid.DRAW_STYLE_SET:
+                    # Going around the grid bypasses the coverage index, which only SET's special leaves alone.
+                    grid[x][y].special()
+            if op >= 0.97:
+                for grid in grids:
+                    grid.special()
+
+    def layers_of(self, grid):
+        return [[grid[x][y].applied_layers() for y in range(grid.y)] for x in range(grid.x)]
+
+    def scanned_coverage(self, grid):
+        # What the coverage index should hold, from the squares themselves.
+        squares = {}
+        for x in range(grid.x):
+            for y in range(grid.y):
+                layers = grid[x][y].applied_layers()
+                if grid.draw_style == Grid.DRAW_STYLE_SET:
+                    # Erase removes the active layer whatever it is given, and special is not painted.
+                    active = grid[x][y].erase_target(red)
+                    layers = [] if active is None else [active]
+                for layer in layers:
+                    held = squares.setdefault(layer.index, {})
+                    held[(x, y)] = held.get((x, y), 0) + 1
+        return squares
+
+    @number("24.1")
+    def test_copy_paste(self):
+        # Tiled grids are 70 wide, so blocks cross chunk borders.
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grids = [Grid(draw_style, 70, 20, layout) for layout in Grid.LAYOUT_OPTIONS]
+            rng = random.Random(24)
+            self.scribble(grids, rng, 300)
+            for grid in grids:
+                block = grid.copy(66, 18, 55, 2)
+                self.assertEqual((block.width, block.height), (12, 17))
+                before = self.layers_of(grid)
+                grid.paste(block, 10, 1, mirror_x=True, mirror_y=True)
+                for dx in range(12):
+                    for dy in range(17):
+                        self.assertEqual(grid[10 + 11 - dx][1 + 16 - dy].applied_layers(), before[55 + dx][2 + dy])
+                self.assertEqual(grid.coverage.squares, self.scanned_coverage(grid), (draw_style, grid.layout))
+            for grid in grids:
+                self.assertEqual(self.layers_of(grid), self.layers_of(grids[0]), (draw_style, grid.layout))
+
+    @number("24.2")
+    def test_undo_redo_replay(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            for layout in Grid.LAYOUT_OPTIONS:
+                grid = Grid(draw_style, 30, 12, layout)
+                replayed = Grid(draw_style, 30, 12, layout)
+                rng = random.Random(7)
+                self.scribble([grid, replayed], rng, 200)
+                before = self.layers_of(grid)
+                action = grid.paste(grid.copy(0, 0, 9, 11), 15, 0, mirror_x=True)
+                self.assertEqual(len(action.steps), 1)
+                self.assertIsInstance(action.steps[0], BlockStep)
+                after = self.layers_of(grid)
+
+                action.undo_apply(grid)
+                self.assertEqual(self.layers_of(grid), before)
+                self.assertEqual(grid.coverage.squares, self.scanned_coverage(grid), (draw_style, layout))
+                action.redo_apply(grid)
+                self.assertEqual(self.layers_of(grid), after)
+                self.assertEqual(grid.coverage.squares, self.scanned_coverage(grid), (draw_style, layout))
+
+                action.redo_apply(replayed)
+                self.assertEqual(self.layers_of(replayed), after)
+                self.assertEqual(replayed.coverage.squares, grid.coverage.squares)
+
+    @number("24.3")
+    def test_cut(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10, layout)
+            for x in range(10):
+                for y in range(10):
+                    grid.paint_square(red, x, y)
+            grid.paint_square(blue, 3, 4)
+            block, action = grid.cut(2, 2, -5, 4)
+            self.assertIsInstance(block, AdditiveBlock)
+            self.assertEqual((block.width, block.height), (3, 3))
+            held = block.layer_squares(block.differs(AdditiveBlock.empty(3, 3)), 0, 2)
+            self.assertEqual(sorted(held[red.index]), [(x, y) for x in range(3) for y in range(2, 5)])
+            self.assertEqual(grid.copy(3, 4, 3, 4).width, 1)
+            for x in range(10):
+                for y in range(10):
+                    self.assertEqual(grid[x][y].applied_layers(), [] if x <= 2 and 2 <= y <= 4 else ([red, blue] if (x, y) == (3, 4) else [red]))
+            self.assertEqual(grid.coverage.count(red), 91)
+            action.undo_apply(grid)
+            self.assertEqual(grid.coverage.count(red), 100)
+            # Outside the grid, nothing is pasted.
+            self.assertEqual(grid.paste(block, 10, 0).steps, [])
+            self.assertEqual(grid.copy(20, 20, 30, 30).width, 0)
+
+    @number("24.4")
+    def test_paste_clipped(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            source = Grid(Grid.DRAW_STYLE_SET, 4, 4, layout)
+            for x in range(4):
+                for y in range(4):
+                    source.paint_square(self.LAYERS[(x + y) % 4], x, y)
+            source[1][1].special()
+            block = source.copy(0, 0, 3, 3)
+            self.assertIsInstance(block, SetBlock)
+            grid = Grid(Grid.DRAW_STYLE_SET, 5, 5, layout)
+            grid.special()
+            grid.paste(block, 3, -1)
+            for x in range(5):
+                for y in range(5):
+                    if x >= 3 and y <= 2:
+                        self.assertEqual(grid[x][y].applied_layers(), source[x - 3][y + 1].applied_layers())
+                    else:
+                        self.assertEqual(grid[x][y].applied_layers(), [black])
+            self.assertEqual(grid.coverage.squares, self.scanned_coverage(grid))
+            with self.assertRaises(ValueError):
+                Grid(Grid.DRAW_STYLE_SEQUENCE, 5, 5, layout).paste(block, 0, 0)
@@ -0,0 +1,94 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+import raster
+from grid import Grid
+from action import PaintSpanStep
+from layers import red, green, blue
+
+class TestShapes(unittest.TestCase):
+
+    def covered(self, spans):
+        cells = [(x, y) for y, start, end in spans for x in range(start, end + 1)]
+        self.assertEqual(len(cells), len(set(cells)))
+        return set(cells)
+
+    def random_box(self, rng):
+        return rng.randrange(-5, 20), rng.randrange(-5, 20), rng.randrange(-5, 20), rng.randrange(-5, 20)
+
+    @number("23.1")
+    def test_ellipse(self):
+        rng = random.Random(23)
+        for _ in range(200):
+            x0, y0, x1, y1 = self.random_box(rng)
+            left, right, bottom, top = min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)
+            a, b = (right - left + 1) / 2, (top - bottom + 1) / 2
+            cx, cy = (left + right) / 2, (bottom + top) / 2
+            expected = {
+                (x, y)
+                for x in range(left, right + 1)
+                for y in range(bottom, top + 1)
+                if ((x - cx) / a) ** 2 + ((y - cy) / b) ** 2 <= 1
+            }
+            self.assertEqual(self.covered(raster.ellipse_spans(x0, y0, x1, y1)), expected, (x0, y0, x1, y1))
+        self.assertEqual(raster.ellipse_spans(3, 3, 3, 3), [(3, 3, 3)])
+        self.assertEqual(raster.ellipse_spans(0, 0, 1, 1), [(0, 0, 1), (1, 0, 1)])
+
+    @number("23.2")
+    def test_outline(self):
+        rng = random.Random(2)
+        for _ in range(200):
+            box = self.random_box(rng)
+            for filled in [raster.rectangle_spans(*box), raster.ellipse_spans(*box)]:
+                inside = self.covered(filled)
+                expected = {
+                    (x, y)
+                    for x, y in inside
+                    if not {(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)} <= inside
+                }
+                self.assertEqual(self.covered(raster.outline_spans(filled)), expected)
+
+    @number("23.3")
+    def test_paint_shapes(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 20, 12, layout)
+            grid.paint_square(blue, 0, 0)
+            # Goes past the left and top edges, which are clipped rather than outlined.
+            action = grid.paint_rectangle(red, -3, 4, 8, 15, filled=False)
+            expected = {(x, y) for x in range(0, 9) for y in range(4, 12) if x == 8 or y == 4}
+            self.assertEqual({(x, y) for x in range(20) for y in range(12) if red in grid[x][y].applied_layers()}, expected)
+            self.assertTrue(all(isinstance(step, PaintSpanStep) for step in action.steps))
+            self.assertEqual(len(action.steps), 8)
+            self.assertEqual(grid.coverage.count(red), len(expected))
+            action.undo_apply(grid)
+            self.assertEqual(grid.coverage.count(red), 0)
+            self.assertEqual(grid[0][0].applied_layers(), [blue])
+            action.redo_apply(grid)
+            self.assertEqual(grid.coverage.count(red), len(expected))
+
+            # A square that already held the layer splits the span into two runs, undone without touching it.
+            grid.paint_square(green, 5, 0)
+            action = grid.paint_rectangle(green, 0, 0, 9, 0)
+            self.assertEqual([(step.affected_row, step.affected_columns) for step in action.steps], [(0, range(0, 5)), (0, range(6, 10))])
+            action.undo_apply(grid)
+            self.assertEqual(grid.coverage.cells(green), [(5, 0)])
+            action.redo_apply(grid)
+            self.assertEqual(grid.coverage.count(green), 10)
+
+            action = grid.paint_ellipse(blue, 2, 2, 17, 11)
+            self.assertEqual(
+                {(x, y) for step in action.steps for x, y in [(x, step.affected_row) for x in step.affected_columns]},
+                self.covered(raster.ellipse_spans(2, 2, 17, 11)) - {(0, 0)},
+            )
+
+    @number("23.4")
+    def test_thick_line(self):
+        line = Grid(Grid.DRAW_STYLE_ADD, 30, 20, Grid.LAYOUT_ARRAYS)
+        stroke = Grid(Grid.DRAW_STYLE_ADD, 30, 20, Grid.LAYOUT_ARRAYS)
+        stroke.brush_shape = Grid.BRUSH_SHAPE_CIRCLE
+        stroke.brush_size = 3
+        line.paint_line(red, 2, 17, 27, 1, 3)
+        stroke.paint_stroke(red, raster.line_cells(2, 17, 27, 1))
+        self.assertEqual(line.coverage.squares, stroke.coverage.squares)
+        self.assertEqual(set(line.coverage.squares[red.index].values()), {1})
@@ -0,0 +1,70 @@
+import unittest
+from ed_utils.decorators import number
+
+import numpy as np
+from compositor import Compositor, composite_reference
+from grid import Grid
+from layers import red, black, rainbow, lighten, invert, sparkle
+
+class TestShared(unittest.TestCase):
+
+    BG = (255, 255, 255)
+
+    @number("15.1")
+    def test_sharing(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 40, 30, Grid.LAYOUT_SHARED)
+        shared = grid.grid
+        self.assertEqual((shared.distinct_states, shared.sharing_ratio), (1, 1200))
+        for x in range(20):
+            for y in range(30):
+                grid.paint_square(red, x, y)
+                grid.paint_square(lighten, x, y)
+        self.assertEqual(shared.distinct_states, 2)
+        self.assertEqual(shared.sharing_ratio, 600)
+        # Three states were ever created: empty, red, red and lighten.
+        self.assertEqual(len(shared.states), 3)
+        self.assertEqual(grid[0][0].applied_layers(), [lighten, red])
+        grid.special()
+        self.assertEqual(shared.distinct_states, 2)
+
+    @number("15.2")
+    def test_fork_on_write(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(draw_style, 3, 3, Grid.LAYOUT_SHARED)
+            for x in range(3):
+                grid.paint_square(rainbow, x, 0)
+            self.assertEqual(grid.grid.ids[0, 0], grid.grid.ids[2, 0])
+            grid[1][0].add(black)
+            self.assertEqual(grid[0][0].applied_layers(), [rainbow])
+            self.assertEqual(grid[2][0].applied_layers(), [rainbow])
+            self.assertNotEqual(grid[1][0].applied_layers(), [rainbow])
+            self.assertEqual(grid.grid.counts.sum(), 9)
+
+    @number("15.3")
+    def test_compact(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 4, 4, Grid.LAYOUT_SHARED)
+        layers = [red, black, rainbow, lighten, invert, sparkle]
+        expected = []
+        for i in range(600):
+            grid.paint_square(layers[i % 6], 1, 2)
+            expected.append(layers[i % 6])
+            if i % 2 == 1:
+                grid.erase_square(red, 1, 2)
+                expected.pop(0)
+        shared = grid.grid
+        # Every write forked into a new state, but the dead ones were reclaimed.
+        self.assertEqual(shared.distinct_states, 2)
+        self.assertLessEqual(len(shared.states), 2 * shared.MIN_COMPACT + 2)
+        self.assertEqual(grid[1][2].applied_layers(), expected)
+        self.assertEqual(grid[1][1].applied_layers(), [])
+
+    @number("15.4")
+    def test_compositor_uniform(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 20, 20, Grid.LAYOUT_SHARED)
+        grid.brush_size = 5
+        grid.paint(red, 4, 4)
+        grid.paint(rainbow, 15, 15)
+        grid.special()
+        compositor = Compositor(grid, self.BG)
+        for timestamp in [0, 2]:
+            np.testing.assert_array_equal(compositor.composite(timestamp), composite_reference(grid, self.BG, timestamp))
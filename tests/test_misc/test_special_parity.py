@@ -0,0 +1,116 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+from grid import Grid
+from layers import rainbow, black, lighten, invert, red, green, blue, sparkle, darken
+
+class ReferenceSquare:
+    """
+    What a SET or ADD square holds, applying special eagerly: the active layer and special status for SET,
+    the layer sequence for ADD.
+    """
+
+    def __init__(self, draw_style):
+        self.draw_style = draw_style
+        self.layers = []
+        self.special_status = False
+
+    def add(self, layer):
+        if self.draw_style == Grid.DRAW_STYLE_SET:
+            changed = self.layers != [layer]
+            self.layers = [layer]
+            return changed
+        self.layers.append(layer)
+        return True
+
+    def erase(self):
+        if len(self.layers) == 0:
+            return False
+        self.layers.pop(0)
+        return True
+
+    def special(self):
+        if self.draw_style == Grid.DRAW_STYLE_SET:
+            self.special_status = not self.special_status
+        else:
+            self.layers.reverse()
+
+    def applied_layers(self):
+        if self.draw_style == Grid.DRAW_STYLE_SET and self.special_status == True:
+            return self.layers + [invert] if len(self.layers) > 0 else [black]
+        return self.layers
+
+class TestSpecialParity(unittest.TestCase):
+
+    LAYERS = [rainbow, black, lighten, invert, red, green, blue, sparkle, darken]
+
+    @number("16.1")
+    def test_matches_reference(self):
+        for layout in [Grid.LAYOUT_OBJECTS, Grid.LAYOUT_ARRAYS, Grid.LAYOUT_TILES]:
+            for draw_style in [Grid.DRAW_STYLE_SET, Grid.DRAW_STYLE_ADD]:
+                self.check_matches_reference(layout, draw_style)
+
+    def check_matches_reference(self, layout, draw_style):
+        rng = random.Random(16)
+        grid = Grid(draw_style, 5, 4, layout)
+        reference = [[ReferenceSquare(draw_style) for _ in range(4)] for _ in range(5)]
+        for _ in range(600):
+            x, y = rng.randrange(5), rng.randrange(4)
+            op = rng.random()
+            if op < 0.5:
+                layer = rng.choice(self.LAYERS)
+                self.assertEqual(grid.paint_square(layer, x, y), reference[x][y].add(layer))
+            elif op < 0.8:
+                self.assertEqual(grid.erase_square(red, x, y), reference[x][y].erase())
+            elif op < 0.9:
+                grid[x][y].special()
+                reference[x][y].special()
+            else:
+                grid.special()
+                for column in reference:
+                    for square in column:
+                        square.special()
+            for i in range(5):
+                for j in range(4):
+                    self.assertEqual(grid[i][j].applied_layers(), reference[i][j].applied_layers(), (layout, draw_style))
+                    expected = (20, 130, 250)
+                    for layer in reference[i][j].applied_layers():
+                        expected = layer.apply(expected, 1.5, i, j)
+                    self.assertEqual(grid[i][j].get_color((20, 130, 250), 1.5, i, j), expected)
+
+    @number("16.2")
+    def test_special_touches_no_square(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 3, 3, Grid.LAYOUT_OBJECTS)
+        grid.paint_square(red, 1, 1)
+        grid.paint_square(lighten, 1, 1)
+        sequence = grid[1][1].layer_sequence
+        array, front = sequence.array, sequence.front
+        grid.special()
+        self.assertTrue(grid.parity.active)
+        self.assertIs(grid[1][1].layer_sequence.array, array)
+        self.assertEqual(grid[1][1].layer_sequence.front, front)
+        self.assertEqual(grid[1][1].applied_layers(), [lighten, red])
+        # Painted after the toggle: added last, erased from the front of the reversed sequence.
+        grid.paint_square(blue, 1, 1)
+        self.assertEqual(grid[1][1].applied_layers(), [lighten, red, blue])
+        grid.erase_square(red, 1, 1)
+        self.assertEqual(grid[1][1].applied_layers(), [red, blue])
+        grid.special()
+        self.assertFalse(grid.parity.active)
+        self.assertEqual(grid[1][1].applied_layers(), [blue, red])
+        self.assertEqual(grid[0][0].applied_layers(), [])
+
+    @number("16.3")
+    def test_set_special_after_paint(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 2, 2, Grid.LAYOUT_OBJECTS)
+        grid.special()
+        self.assertEqual(grid[0][0].applied_layers(), [black])
+        grid.paint_square(red, 0, 0)
+        self.assertEqual(grid[0][0].applied_layers(), [red, invert])
+        grid[0][0].special()
+        self.assertFalse(grid[0][0].special_mode_status)
+        self.assertTrue(grid[1][1].special_mode_status)
+        grid.special()
+        self.assertTrue(grid[0][0].special_mode_status)
+        self.assertEqual(grid[1][1].applied_layers(), [])
@@ -0,0 +1,88 @@
+import unittest
+from ed_utils.decorators import number
+
+import random
+import numpy as np
+import brush
+from grid import Grid
+from layers import rainbow, black, lighten, invert, red, green, blue, sparkle, darken
+
+class TestStroke(unittest.TestCase):
+
+    LAYERS = [rainbow, black, lighten, invert, red, green, blue, sparkle, darken]
+
+    def squares(self, grid):
+        return [[grid[x][y].applied_layers() for y in range(grid.y)] for x in range(grid.x)]
+
+    def painted(self, action):
+        """
+        The squares an action changed, from the MaskSteps it records them in.
+        """
+        return {
+            (step.affected_corner[0] + dx, step.affected_corner[1] + dy)
+            for step in action.steps
+            for dx, dy in np.argwhere(step.affected_mask).tolist()
+        }
+
+    def random_grid(self, draw_style, layout, rng):
+        grid = Grid(draw_style, 16, 12, layout)
+        for _ in range(30):
+            grid.paint(rng.choice(self.LAYERS), rng.randrange(16), rng.randrange(12))
+        return grid
+
+    @number("20.1")
+    def test_stroke_spans(self):
+        rng = random.Random(20)
+        for shape in brush.SHAPES:
+            for _ in range(20):
+                points = [(rng.randrange(-3, 14), rng.randrange(-3, 11)) for _ in range(rng.randrange(1, 8))]
+                radius = rng.randrange(4)
+                spans = brush.stroke_spans(shape, radius, points, 11, 8)
+                covered = [(x, y) for y, start, end in spans for x in range(start, end + 1)]
+                expected = {
+                    (i, row)
+                    for x, y in points
+                    for row, start, end in brush.clipped_spans(shape, radius, x, y, 11, 8)
+                    for i in range(start, end + 1)
+                }
+                self.assertEqual(len(covered), len(set(covered)))
+                self.assertEqual(set(covered), expected)
+                # Sorted, and no two spans of a row overlap or touch.
+                for (y1, _, end1), (y2, start2, _) in zip(spans, spans[1:]):
+                    self.assertTrue(y1 < y2 or end1 + 1 < start2)
+
+    @number("20.2")
+    def test_matches_separate_paints(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            for draw_style in [Grid.DRAW_STYLE_SET, Grid.DRAW_STYLE_SEQUENCE]:
+                rng = random.Random(2)
+                stroked = self.random_grid(draw_style, layout, rng)
+                rng = random.Random(2)
+                separate = self.random_grid(draw_style, layout, rng)
+                for _ in range(5):
+                    layer = rng.choice(self.LAYERS)
+                    points = [(rng.randrange(-2, 18), rng.randrange(-2, 14)) for _ in range(6)]
+                    action = stroked.paint_stroke(layer, points)
+                    changed = set()
+                    for x, y in points:
+                        changed |= self.painted(separate.paint(layer, x, y))
+                    self.assertEqual(self.squares(stroked), self.squares(separate), (layout, draw_style))
+                    # The whole stroke is one step, however many footprints it is made of.
+                    self.assertLessEqual(len(action.steps), 1)
+                    self.assertEqual(self.painted(action), changed)
+                    self.assertEqual(stroked.coverage.squares, separate.coverage.squares)
+
+    @number("20.3")
+    def test_additive_once(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10)
+        grid.brush_size = 2
+        action = grid.paint_stroke(red, [(3, 3), (4, 3), (5, 3)])
+        # Every covered square gets the layer once, even where three footprints overlap.
+        self.assertEqual(len(self.painted(action)), 7 + 2 * 5 + 2 * 3)
+        self.assertEqual(grid[4][3].applied_layers(), [red])
+        self.assertEqual(grid.coverage.count(red), 23)
+        action.undo_apply(grid)
+        self.assertEqual(grid.coverage.count(red), 0)
+        self.assertEqual(grid[4][3].applied_layers(), [])
+        action.redo_apply(grid)
+        self.assertEqual(grid[4][3].applied_layers(), [red])
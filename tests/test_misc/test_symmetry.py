@@ -0,0 +1,132 @@
+import unittest
+from ed_utils.decorators import number
+
+import math
+import numpy as np
+import brush
+import symmetry
+from grid import Grid
+from action import MaskStep
+from layers import red, blue
+
+class TestSymmetry(unittest.TestCase):
+
+    def covered(self, spans):
+        return {(x, y) for y, start, end in spans for x in range(start, end + 1)}
+
+    def painted(self, grid):
+        return {(x, y) for x in range(grid.x) for y in range(grid.y) if grid[x][y].applied_layers()}
+
+    def changed(self, action):
+        """
+        The squares an action changed, from the MaskStep it records them in.
+        """
+        self.assertEqual(len(action.steps), 1)
+        self.assertIsInstance(action.steps[0], MaskStep)
+        x, y = action.steps[0].affected_corner
+        return [(x + dx, y + dy) for dx, dy in np.argwhere(action.steps[0].affected_mask).tolist()]
+
+    @number("26.1")
+    def test_mirrors(self):
+        points = [(1, 2), (4, 3), (6, 6)]
+        footprint = self.covered(brush.stroke_spans(brush.CIRCLE, 2, points, 13, 10))
+        mirrors = {
+            Grid.SYMMETRY_NONE: [(False, False)],
+            Grid.SYMMETRY_HORIZONTAL: [(False, False), (True, False)],
+            Grid.SYMMETRY_VERTICAL: [(False, False), (False, True)],
+            Grid.SYMMETRY_BOTH: [(False, False), (True, False), (False, True), (True, True)],
+        }
+        for mode, flips in mirrors.items():
+            expected = {
+                (12 - x if flip_x else x, 9 - y if flip_y else y)
+                for x, y in footprint
+                for flip_x, flip_y in flips
+            }
+            spans = symmetry.symmetric_spans(brush.stroke_spans(brush.CIRCLE, 2, points, 13, 10), mode, 2, 13, 10)
+            self.assertEqual(spans, sorted(spans))
+            self.assertEqual(self.covered(spans), expected, mode)
+            for layout in Grid.LAYOUT_OPTIONS:
+                grid = Grid(Grid.DRAW_STYLE_SET, 13, 10, layout)
+                grid.brush_shape = brush.CIRCLE
+                grid.symmetry = mode
+                action = grid.paint_stroke(red, points)
+                # Each square once, however many copies cover it.
+                self.assertEqual(sorted(self.changed(action)), sorted(expected))
+                self.assertEqual(self.painted(grid), expected, (mode, layout))
+
+    @number("26.2")
+    def test_radial(self):
+        # Quarter turns of a square grid move whole squares onto whole squares.
+        grid = Grid(Grid.DRAW_STYLE_SET, 12, 12)
+        grid.symmetry = Grid.SYMMETRY_RADIAL
+        grid.symmetry_folds = 4
+        grid.brush_shape = brush.SQUARE
+        grid.brush_size = 1
+        grid.paint(red, 2, 4)
+        footprint = self.covered(brush.clipped_spans(brush.SQUARE, 1, 2, 4, 12, 12))
+        expected = set()
+        for x, y in footprint:
+            for _ in range(4):
+                expected.add((x, y))
+                x, y = 11 - y, x
+        self.assertEqual(self.painted(grid), expected)
+
+        # Any other rotation covers the square every square of the footprint rotates nearest to,
+        # and otherwise only squares that rotate back into it.
+        for folds in [3, 5, 7]:
+            grid = Grid(Grid.DRAW_STYLE_SET, 31, 25)
+            grid.symmetry = Grid.SYMMETRY_RADIAL
+            grid.symmetry_folds = folds
+            points = [(20, 12), (22, 14), (25, 15)]
+            grid.paint_stroke(blue, points)
+            footprint = self.covered(brush.stroke_spans(grid.brush_shape, grid.brush_size, points, 31, 25))
+            painted = self.painted(grid)
+            rotations = [(math.cos(2 * math.pi * k / folds), math.sin(2 * math.pi * k / folds)) for k in range(folds)]
+            for cos, sin in rotations:
+                for x, y in footprint:
+                    dx, dy = x - 15, y - 12
+                    rx, ry = math.floor(cos * dx - sin * dy + 15.5), math.floor(sin * dx + cos * dy + 12.5)
+                    if 0 <= rx < 31 and 0 <= ry < 25:
+                        self.assertIn((rx, ry), painted, (folds, x, y))
+            moved = {
+                (math.floor(cos * (x - 15) - sin * (y - 12) + 15.5), math.floor(sin * (x - 15) + cos * (y - 12) + 12.5))
+                for cos, sin in rotations
+                for x, y in footprint
+            }
+            for x, y in painted - moved:
+                dx, dy = x - 15, y - 12
+                self.assertTrue(any(
+                    (math.floor(cos * dx + sin * dy + 15.5), math.floor(-sin * dx + cos * dy + 12.5)) in footprint
+                    for cos, sin in rotations
+                ), (folds, x, y))
+
+    @number("26.3")
+    def test_single_action(self):
+        for layout in Grid.LAYOUT_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10, layout)
+            replayed = Grid(Grid.DRAW_STYLE_ADD, 10, 10, layout)
+            for g in [grid, replayed]:
+                g.symmetry = Grid.SYMMETRY_BOTH
+            # The copies overlap in the middle, where the layer is still only added once.
+            action = grid.paint_stroke(red, [(3, 4), (4, 4)])
+            changed = self.changed(action)
+            for x, y in self.painted(grid):
+                self.assertEqual(grid[x][y].applied_layers(), [red])
+            self.assertEqual(grid.coverage.count(red), len(changed))
+
+            action.redo_apply(replayed)
+            self.assertEqual(self.painted(replayed), self.painted(grid))
+            action.undo_apply(grid)
+            self.assertEqual(self.painted(grid), set())
+            self.assertEqual(grid.coverage.count(red), 0)
+
+    @number("26.4")
+    def test_invalid(self):
+        self.assertEqual(symmetry.symmetric_spans([], Grid.SYMMETRY_BOTH, 2, 5, 5), [])
+        with self.assertRaises(ValueError):
+            symmetry.transforms("SPIRAL")
+        with self.assertRaises(ValueError):
+            symmetry.transforms(Grid.SYMMETRY_RADIAL, 0)
+        # A single fold is no symmetry at all.
+        spans = brush.clipped_spans(brush.DIAMOND, 2, 1, 1, 6, 6)
+        self.assertEqual(symmetry.symmetric_spans(spans, Grid.SYMMETRY_RADIAL, 1, 6, 6), spans)
@@ -0,0 +1,134 @@
+import unittest
+from ed_utils.decorators import number
+
+import time
+import numpy as np
+from compositor import Compositor, composite_reference
+from grid import Grid
+from layers import red, black, rainbow, lighten, invert
+
+class TestTiles(unittest.TestCase):
+
+    BG = (255, 255, 255)
+
+    @number("13.1")
+    def test_huge_canvas(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            start = time.perf_counter()
+            grid = Grid(draw_style, 100000, 100000, Grid.LAYOUT_TILES)
+            self.assertLess(time.perf_counter() - start, 0.1)
+            self.assertEqual((len(grid.grid.chunks), len(grid.versions.chunks)), (0, 0))
+            grid.paint(red, 0, 0)
+            grid.paint(rainbow, 99999, 99999)
+            # Only the chunks painted into were created.
+            self.assertEqual(len(grid.grid.chunks), 2)
+            self.assertEqual(len(grid.versions.chunks), 2)
+            self.assertEqual(grid[0][1].get_color(self.BG, 0, 0, 1), (255, 0, 0))
+            self.assertEqual(grid[50000][50000].get_color(self.BG, 0, 50000, 50000), self.BG)
+            self.assertEqual(grid[50000][50000].applied_layers(), [])
+            # Reading or erasing an untouched square creates nothing.
+            self.assertFalse(grid.erase_square(red, 50000, 50000))
+            self.assertEqual(len(grid.grid.chunks), 2)
+            self.assertEqual(grid.changes_since(0), {
+                (x, y) for x in range(3) for y in range(3) if x + y <= 2
+            } | {
+                (x, y) for x in range(99997, 100000) for y in range(99997, 100000) if 199998 - x - y <= 2
+            })
+
+    @number("13.2")
+    def test_special_untouched(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 200, 100, Grid.LAYOUT_TILES)
+        grid.paint(lighten, 10, 10)
+        grid.special()
+        self.assertEqual(grid[150][90].applied_layers(), [black])
+        # A chunk created after special matches the untouched squares around it.
+        grid.paint_square(red, 150, 90)
+        self.assertEqual(grid[150][90].applied_layers(), [red, invert])
+        self.assertEqual(grid[151][90].applied_layers(), [black])
+        grid.special()
+        self.assertEqual(grid[151][90].applied_layers(), [])
+        self.assertEqual(grid[150][90].applied_layers(), [red])
+
+    @number("13.3")
+    def test_compositor(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(draw_style, 150, 70, Grid.LAYOUT_TILES)
+            compositor = Compositor(grid, self.BG)
+            np.testing.assert_array_equal(compositor.composite(0), composite_reference(grid, self.BG, 0))
+            grid.paint(rainbow, 140, 65)
+            grid.paint(black, 3, 4)
+            np.testing.assert_array_equal(compositor.composite(1), composite_reference(grid, self.BG, 1))
+            grid.special()
+            np.testing.assert_array_equal(compositor.composite(2), composite_reference(grid, self.BG, 2))
+            grid.paint(lighten, 70, 30)
+            np.testing.assert_array_equal(compositor.composite(3), composite_reference(grid, self.BG, 3))
+
+    @number("13.4")
+    def test_compositor_viewport(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 100000, 100000, Grid.LAYOUT_TILES)
+        grid.brush_size = 0
+        grid.paint(rainbow, 50010, 50020)
+        grid.paint(black, 50060, 50000)
+        grid.paint(red, 10, 10)
+        # Only the viewport is allocated and filled, however large the canvas.
+        compositor = Compositor(grid, self.BG, (50000, 50000, 80, 40))
+        buffer = compositor.composite(1)
+        self.assertEqual(buffer.shape, (40, 80, 3))
+        for x, y in [(50010, 50020), (50011, 50020), (50060, 50000), (50079, 50039)]:
+            self.assertEqual(tuple(buffer[y - 50000, x - 50000]), grid[x][y].get_color(self.BG, 1, x, y))
+        self.assertEqual(compositor.animated_positions.keys(), compositor.animated.keys())
+        grid.paint(lighten, 50060, 50000)
+        grid.paint(black, 10, 11)
+        self.assertEqual(tuple(compositor.composite(2)[0, 60]), grid[50060][50000].get_color(self.BG, 2, 50060, 50000))
+        # Moving the viewport evaluates all of it again.
+        compositor.set_viewport(0, 0, 80, 40)
+        buffer = compositor.composite(3)
+        self.assertEqual(tuple(buffer[10, 10]), (255, 0, 0))
+        self.assertEqual(tuple(buffer[11, 10]), (0, 0, 0))
+        self.assertEqual(tuple(buffer[30, 30]), self.BG)
+        small = Grid(Grid.DRAW_STYLE_SEQUENCE, 150, 70, Grid.LAYOUT_TILES)
+        small.paint(rainbow, 60, 30)
+        small.paint(black, 66, 31)
+        compositor = Compositor(small, self.BG, (55, 25, 20, 10))
+        np.testing.assert_array_equal(compositor.composite(4), composite_reference(small, self.BG, 4)[25:35, 55:75])
+        small.special()
+        np.testing.assert_array_equal(compositor.composite(5), composite_reference(small, self.BG, 5)[25:35, 55:75])
+
+    @number("13.5")
+    def test_fill_by_chunk(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 100000, 100000, Grid.LAYOUT_TILES)
+        grid.brush_size = 0
+        # A closed ring across four chunks, filled from inside.
+        for i in range(50):
+            for x, y in [(100 + i, 100), (100 + i, 149), (100, 100 + i), (149, 100 + i)]:
+                grid.paint_square(red, x, y)
+        action = grid.flood_fill(black, 120, 120)
+        self.assertEqual(sum(int(step.affected_mask.sum()) for step in action.steps), 48 * 48)
+        self.assertEqual(len(action.steps), 4)
+        self.assertEqual(len(grid.grid.chunks), 4)
+        self.assertEqual(grid[101][148].applied_layers(), [black])
+        self.assertEqual(grid[150][148].applied_layers(), [])
+        action.undo_apply(grid)
+        self.assertEqual(grid.coverage.count(black), 0)
+
+    @number("13.6")
+    def test_fill_by_chunk_matches_arrays(self):
+        rng = np.random.default_rng(13)
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            for match in Grid.FILL_MATCH_OPTIONS:
+                tiles = Grid(draw_style, 19, 14, Grid.LAYOUT_TILES)
+                tiles.grid.chunk_size = tiles.versions.chunk_size = 4
+                arrays = Grid(draw_style, 19, 14, Grid.LAYOUT_ARRAYS)
+                for grid in [tiles, arrays]:
+                    grid.brush_size = 0
+                for _ in range(120):
+                    x, y = int(rng.integers(19)), int(rng.integers(14))
+                    layer = [red, black, lighten][int(rng.integers(3))]
+                    for grid in [tiles, arrays]:
+                        grid.paint_square(layer, x, y)
+                for _ in range(3):
+                    x, y = int(rng.integers(19)), int(rng.integers(14))
+                    for grid in [tiles, arrays]:
+                        grid.flood_fill(rainbow, x, y, match, 0, self.BG)
+                    np.testing.assert_array_equal(Compositor(tiles, self.BG).composite(0), Compositor(arrays, self.BG).composite(0))
+                    self.assertEqual(tiles.coverage.count(rainbow), arrays.coverage.count(rainbow))
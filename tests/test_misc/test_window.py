@@ -1,6 +1,9 @@
 import unittest
 from ed_utils.decorators import number
 
+import time
+import pyglet
+
 from layers import green, red, blue
 from grid import Grid
 from main import MyWindow
@@ -14,6 +17,26 @@ FakeWindow.on_reset = MyWindow.on_reset
 FakeWindow.on_paint = MyWindow.on_paint
 FakeWindow.on_increase_brush_size = MyWindow.on_increase_brush_size
 FakeWindow.on_decrease_brush_size = MyWindow.on_decrease_brush_size
+FakeWindow.on_fill = MyWindow.on_fill
+FakeWindow.FILL_MATCH = MyWindow.FILL_MATCH
+FakeWindow.BG = MyWindow.BG
+FakeWindow.on_shape = MyWindow.on_shape
+FakeWindow.TOOL_LINE = MyWindow.TOOL_LINE
+FakeWindow.TOOL_RECTANGLE = MyWindow.TOOL_RECTANGLE
+FakeWindow.TOOL_ELLIPSE = MyWindow.TOOL_ELLIPSE
+FakeWindow.on_copy = MyWindow.on_copy
+FakeWindow.on_cut = MyWindow.on_cut
+FakeWindow.on_paste = MyWindow.on_paste
+FakeWindow.on_paint_stroke = MyWindow.on_paint_stroke
+FakeWindow.queue_pointer = MyWindow.queue_pointer
+FakeWindow.flush_pointer = MyWindow.flush_pointer
+FakeWindow.flush_pointer_late = MyWindow.flush_pointer_late
+FakeWindow.try_draw = MyWindow.try_draw
+FakeWindow.events_per_batch = MyWindow.events_per_batch
+FakeWindow.MAX_POINTER_LATENCY = MyWindow.MAX_POINTER_LATENCY
+FakeWindow.on_next_symmetry = MyWindow.on_next_symmetry
+FakeWindow.on_next_symmetry_folds = MyWindow.on_next_symmetry_folds
+FakeWindow.SYMMETRY_ORDER = MyWindow.SYMMETRY_ORDER
 
 class TestGrid(unittest.TestCase):
 
@@ -70,7 +93,7 @@ class TestGrid(unittest.TestCase):
 
         self.assertGridEqual(grid, control_grid)
 
-        # Increase past maximum
+        # Increase to 8, which reaches the far corner
         fw.on_increase_brush_size()
         fw.on_increase_brush_size()
         fw.on_increase_brush_size()
@@ -79,10 +102,208 @@ class TestGrid(unittest.TestCase):
         for x in range(5):
             for y in range(5):
                 control_grid[x][y].add(green)
-        control_grid[4][4].add(blue)
 
         self.assertGridEqual(grid, control_grid)
 
+        # Increase past maximum
+        grid.brush_size = Grid.MAX_BRUSH
+        fw.on_increase_brush_size()
+        self.assertEqual(grid.brush_size, Grid.MAX_BRUSH)
+
+    @number("6.3")
+    def test_fill(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+        control_grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+
+        fw = FakeWindow(grid)
+        fw.on_init()
+        fw.on_reset()
+        fw.timestamp = 0
+
+        fw.on_decrease_brush_size()
+        fw.on_decrease_brush_size()
+        for y in range(5):
+            fw.on_paint(red, 2, y)
+            control_grid[2][y].add(red)
+        # Fills the left of the red wall, and is undone as a whole.
+        fw.on_fill(blue, 0, 3)
+        for x in range(2):
+            for y in range(5):
+                control_grid[x][y].add(blue)
+        self.assertGridEqual(grid, control_grid)
+        fw.undo_tracker.undo(grid)
+        for x in range(2):
+            for y in range(5):
+                control_grid[x][y].erase(blue)
+        self.assertGridEqual(grid, control_grid)
+
+    @number("6.4")
+    def test_shapes(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+        control_grid = Grid(Grid.DRAW_STYLE_SET, 5, 5)
+
+        fw = FakeWindow(grid)
+        fw.on_init()
+        fw.on_reset()
+
+        fw.tool = FakeWindow.TOOL_RECTANGLE
+        fw.shape_filled = True
+        fw.on_shape(red, 4, 4, 0, 0)
+        for x in range(5):
+            for y in range(5):
+                control_grid[x][y].add(red)
+        self.assertGridEqual(grid, control_grid)
+
+        # Outlined, then undone as a whole.
+        fw.tool = FakeWindow.TOOL_ELLIPSE
+        fw.shape_filled = False
+        fw.on_shape(blue, 0, 0, 4, 4)
+        for x, y in [(1, 0), (2, 0), (3, 0), (0, 1), (4, 1), (0, 2), (4, 2), (0, 3), (4, 3), (1, 4), (2, 4), (3, 4)]:
+            control_grid[x][y].add(blue)
+        self.assertGridEqual(grid, control_grid)
+        fw.undo_tracker.undo(grid)
+        for x, y in [(1, 0), (2, 0), (3, 0), (0, 1), (4, 1), (0, 2), (4, 2), (0, 3), (4, 3), (1, 4), (2, 4), (3, 4)]:
+            control_grid[x][y].erase(blue)
+        self.assertGridEqual(grid, control_grid)
+
+        # Lines are as thick as the brush, here a single square.
+        grid.brush_size = 0
+        fw.tool = FakeWindow.TOOL_LINE
+        fw.on_shape(green, 0, 0, 4, 4)
+        for i in range(5):
+            control_grid[i][i].add(green)
+        self.assertGridEqual(grid, control_grid)
+
+    @number("6.5")
+    def test_copy_paste(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 5, 5)
+        control_grid = Grid(Grid.DRAW_STYLE_ADD, 5, 5)
+
+        fw = FakeWindow(grid)
+        fw.on_init()
+        fw.on_reset()
+        for y in range(2):
+            grid.paint_square(red, 0, y)
+            grid.paint_square(blue, 1, y)
+            control_grid[0][y].add(red)
+            control_grid[1][y].add(blue)
+
+        # Pasted mirrored left to right at the top right, then undone as a whole.
+        fw.paste_mirror_x = True
+        fw.paste_mirror_y = False
+        fw.on_copy(0, 0, 1, 1)
+        fw.on_paste(3, 3)
+        for y in range(3, 5):
+            control_grid[3][y].add(blue)
+            control_grid[4][y].add(red)
+        self.assertGridEqual(grid, control_grid)
+        fw.undo_tracker.undo(grid)
+        for y in range(3, 5):
+            control_grid[3][y].erase(blue)
+            control_grid[4][y].erase(red)
+        self.assertGridEqual(grid, control_grid)
+
+        # Cutting keeps the squares in the clipboard.
+        fw.on_cut(1, 0, 1, 1)
+        fw.paste_mirror_x = False
+        fw.on_paste(2, 0)
+        for y in range(2):
+            control_grid[1][y].erase(blue)
+            control_grid[2][y].add(blue)
+        self.assertGridEqual(grid, control_grid)
+
+    @number("6.6")
+    def test_pointer_coalescing(self):
+        def drag(grid, latency, positions):
+            fw = FakeWindow(grid)
+            fw.on_init()
+            fw.on_reset()
+            fw.MAX_POINTER_LATENCY = latency
+            fw.GRID_SQ_WIDTH = fw.GRID_SQ_HEIGHT = 10
+            fw.GRID_SIZE_X, fw.GRID_SIZE_Y = grid.x, grid.y
+            fw.selected_layer_index = red.index
+            fw.prev_pos = fw.prev_drawn = None
+            fw.pointer_queue = []
+            fw.pointer_events = fw.paint_batches = 0
+            for x, y in positions:
+                fw.queue_pointer(x, y)
+            return fw
+
+        # Jumps several squares between events, and leaves and re-enters the grid.
+        positions = [(5, 5), (45, 15), (45, 75), (95, 75), (15, 35), (25, 25)]
+        for layout in Grid.LAYOUT_OPTIONS:
+            grid = Grid(Grid.DRAW_STYLE_SET, 8, 8, layout)
+            grid.brush_size = 0
+            control_grid = Grid(Grid.DRAW_STYLE_SET, 8, 8, layout)
+            control_grid.brush_size = 0
+
+            # Buffered until the frame ends, then painted as one stroke and one undo.
+            fw = drag(grid, 60, positions)
+            self.assertEqual(grid.coverage.count(red), 0)
+            fw.flush_pointer()
+            self.assertEqual((fw.pointer_events, fw.paint_batches, fw.events_per_batch), (6, 1, 6))
+            self.assertEqual(len(fw.undo_tracker.action_sequence), 1)
+
+            # With no latency every event is painted on its own, crossing the same squares.
+            control = drag(control_grid, 0, positions)
+            self.assertEqual((control.pointer_events, control.paint_batches), (6, 6))
+            self.assertGridEqual(grid, control_grid)
+            self.assertEqual(grid.coverage.squares, control_grid.coverage.squares)
+
+            # Every square the pointer's path crosses inside the grid (see raster.segment_cells).
+            self.assertEqual(grid.coverage.count(red), 24)
+            # The positions are the centres of squares, and a scripted stroke through those squares paints the same ones.
+            scripted = Grid(Grid.DRAW_STYLE_SET, 8, 8, layout)
+            scripted.brush_size = 0
+            scripted.paint_polyline(red, [(x // 10, y // 10) for x, y in positions])
+            self.assertEqual(scripted.coverage.squares, grid.coverage.squares)
+            fw.undo_tracker.undo(grid)
+            self.assertEqual(grid.coverage.count(red), 0)
+            fw.flush_pointer()
+            self.assertEqual(fw.paint_batches, 1)
+
+            # With no further events or frames, the flush scheduled on the clock paints what is buffered.
+            late_grid = Grid(Grid.DRAW_STYLE_SET, 8, 8, layout)
+            late_grid.brush_size = 0
+            late = drag(late_grid, 0.01, [(5, 5)])
+            self.assertEqual(late.paint_batches, 0)
+            time.sleep(0.02)
+            pyglet.clock.tick()
+            self.assertEqual(late.paint_batches, 1)
+            self.assertEqual(late_grid.coverage.cells(red), [(0, 0)])
+
+    @number("6.7")
+    def test_symmetry(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 6, 6)
+        control_grid = Grid(Grid.DRAW_STYLE_SET, 6, 6)
+
+        fw = FakeWindow(grid)
+        fw.on_init()
+        fw.on_reset()
+        fw.on_next_symmetry()
+        self.assertEqual(grid.symmetry, Grid.SYMMETRY_HORIZONTAL)
+        for _ in range(len(Grid.SYMMETRY_OPTIONS) - 1):
+            fw.on_next_symmetry()
+        self.assertEqual(grid.symmetry, Grid.SYMMETRY_NONE)
+        grid.symmetry_folds = Grid.MAX_SYMMETRY_FOLDS
+        fw.on_next_symmetry_folds()
+        self.assertEqual(grid.symmetry_folds, Grid.MIN_SYMMETRY_FOLDS)
+
+        # A drag mirrored both ways is painted as one stroke, and undone as a whole.
+        grid.symmetry = Grid.SYMMETRY_BOTH
+        grid.brush_size = 0
+        fw.GRID_SQ_WIDTH = fw.GRID_SQ_HEIGHT = 10
+        fw.GRID_SIZE_X = fw.GRID_SIZE_Y = 6
+        fw.selected_layer_index = blue.index
+        fw.prev_pos = fw.prev_drawn = None
+        fw.try_draw([(5, 5), (25, 5)])
+        for x in [0, 1, 2, 3, 4, 5]:
+            for y in [0, 5]:
+                control_grid[x][y].add(blue)
+        self.assertGridEqual(grid, control_grid)
+        fw.undo_tracker.undo(grid)
+        self.assertGridEqual(grid, Grid(Grid.DRAW_STYLE_SET, 6, 6))
+
     def assertGridEqual(self, grid1: Grid, grid2: Grid):
         for x in range(len(grid1.grid)):
             for y in range(len(grid1[x])):
@@ -0,0 +1,510 @@
+"""
+Chunked, lazily allocated grid storage.
+
+A TiledLayerArray splits the grid into CHUNK_SIZE x CHUNK_SIZE chunks, each a LayerArray
+of the grid's draw style, and only creates a chunk when a square in it is first written.
+Squares of chunks that were never created all hold the same layers as a single untouched
+square, so a canvas costs memory in proportion to its painted area rather than its size,
+and is constructed in constant time.
+
+TileVersions does the same for the grid's change tracking.
+"""
+
+from __future__ import annotations
+import numpy as np
+from layer_util import Layer
+from array_store import LayerArray
+from selection import Block
+from pipeline import Pipeline
+
+CHUNK_SIZE = 64
+
+class TiledLayerArray(LayerArray):
+    """
+    A LayerArray whose squares are stored in lazily created chunks.
+    - chunks: Maps (x // chunk_size, y // chunk_size) to the LayerArray of that chunk.
+    - untouched: A 1x1 LayerArray holding what every square of a chunk that was never created holds.
+    - special_parity: Whether special has been applied to the whole grid an odd number of times.
+    Special on a square with no layers only changes anything for SetLayerArray, where it toggles,
+    so applying special once more to a new chunk when special_parity is set brings it in line with untouched.
+    """
+
+    def __init__(self, chunk_type: type[LayerArray], width: int, height: int, chunk_size: int = CHUNK_SIZE) -> None:
+        """
+        Initialises the grid with no chunks.
+
+        Args:
+        - chunk_type: The LayerArray used for each chunk
+            Type: Subclass of LayerArray
+        - width: The number of columns
+            Type: Integer
+        - height: The number of rows
+            Type: Integer
+        - chunk_size: The width and height of a chunk
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            No chunk is created
+        - Best case: O(1)
+            No chunk is created
+        """
+        super().__init__(width, height)                                                     # O(1)
+        self.chunk_type = chunk_type                                                        # O(1)
+        self.replaces = chunk_type.replaces                                                 # O(1)
+        self.block_type = chunk_type.block_type                                             # O(1)
+        self.chunk_size = chunk_size                                                        # O(1)
+        self.chunks = {}                                                                    # O(1)
+        self.untouched = chunk_type(1, 1)                                                   # O(1)
+        self.special_parity = False                                                         # O(1)
+
+    def chunk(self, x: int, y: int, create: bool = False) -> LayerArray | None:
+        """
+        Returns the chunk holding the square at (x, y).
+
+        Args:
+        - x: The x coordinate of the square
+            Type: Integer
+        - y: The y coordinate of the square
+            Type: Integer
+        - create: Whether to create the chunk if it does not exist yet
+            Type: Boolean
+
+        Returns:
+        - The chunk, or None if it does not exist and create is False
+            Type: LayerArray Object
+
+        Complexity:
+        - Worst case: O(c^2), Where c is the chunk size
+            Happens when the chunk is created
+        - Best case: O(1)
+            Happens when the chunk exists already
+        """
+        key = (x // self.chunk_size, y // self.chunk_size)                                  # O(1)
+        chunk = self.chunks.get(key)                                                        # O(1)
+        if chunk is None and create == True:                                                # O(1)
+            chunk = self.chunks[key] = self.chunk_type(self.chunk_size, self.chunk_size)    # O(c^2)
+            if self.special_parity == True:                                                 # O(1)
+                chunk.special()                                                             # O(c^2)
+        return chunk                                                                        # O(1)
+
+    def add(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        LayerStore.add for the square at (x, y), creating its chunk if needed.
+
+        Complexity:
+        - Worst case: O(c^2), Where c is the chunk size
+            Happens when the chunk is created
+        - Best case: O(1)
+            Happens when the chunk exists already
+        """
+        return self.chunk(x, y, True).add(x % self.chunk_size, y % self.chunk_size, layer)  # O(1)
+
+    def apply_mask(self, operation: str, mask: np.ndarray, layer: Layer, x: int, y: int) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        LayerArray.add_mask or LayerArray.erase_mask, split along chunk borders into one call per chunk with a square selected.
+        Chunks are created as needed by add_mask. Squares of chunks that were never created hold no layers,
+        so erase_mask skips those chunks.
+
+        Args:
+        - operation: "add_mask" or "erase_mask"
+            Type: String
+        - mask, layer, x, y: As for LayerArray.add_mask
+
+        Returns:
+        - As LayerArray.add_mask or LayerArray.erase_mask returns
+            Type: Tuple of a numpy.ndarray of bool and a numpy.ndarray of int16
+
+        Complexity:
+        - Worst case: O(mn + kc^2), Where m and n are the height and width of the mask, k is the number of chunks created and c is the chunk size
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        create = operation == "add_mask"                                                    # O(1)
+        changed = np.zeros(mask.shape, dtype=bool)                                          # O(mn)
+        before = np.full(mask.shape, -1, dtype=np.int16) if create == False or self.replaces == True else None   # O(mn)
+        for part_x, part_y, width, height in self.chunk_parts(x, y, *mask.shape):           # O(mn / c^2 + 1)
+            part = (slice(part_x - x, part_x - x + width), slice(part_y - y, part_y - y + height))   # O(1)
+            if not mask[part].any():                                                        # O(c^2)
+                continue                                                                    # O(1)
+            chunk = self.chunk(part_x, part_y, create)                                      # O(c^2)
+            if chunk is None:                                                               # O(1)
+                continue                                                                    # O(1)
+            part_changed, part_before = getattr(chunk, operation)(
+                mask[part], layer, part_x % self.chunk_size, part_y % self.chunk_size
+            )                                                                               # O(c^2)
+            changed[part] = part_changed                                                    # O(c^2)
+            if before is not None:                                                          # O(1)
+                before[part] = part_before                                                  # O(c^2)
+        return changed, before                                                              # O(1)
+
+    def add_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        LayerArray.add_mask, one chunk at a time, creating the chunks of the selected squares as needed.
+
+        Complexity:
+        - Worst case: O(mn + kc^2), Where m and n are the height and width of the mask, k is the number of chunks created and c is the chunk size
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        return self.apply_mask("add_mask", mask, layer, x, y)                               # O(mn + kc^2)
+
+    def erase_mask(self, mask: np.ndarray, layer: Layer, x: int = 0, y: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        LayerArray.erase_mask, one chunk at a time, skipping chunks that were never created.
+
+        Complexity:
+        - Worst case: O(mn), Where m and n are the height and width of the mask
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        return self.apply_mask("erase_mask", mask, layer, x, y)                             # O(mn)
+
+    def erase(self, x: int, y: int, layer: Layer) -> bool:
+        """
+        LayerStore.erase for the square at (x, y). Squares of chunks that were never created hold no layers, so nothing is erased.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        chunk = self.chunk(x, y)                                                            # O(1)
+        if chunk is None:                                                                   # O(1)
+            return False                                                                    # O(1)
+        return chunk.erase(x % self.chunk_size, y % self.chunk_size, layer)                 # O(1)
+
+    def erase_target(self, x: int, y: int, layer: Layer) -> Layer | None:
+        """
+        LayerStore.erase_target for the square at (x, y). Squares of chunks that were never created hold no layers, so there is none.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        chunk = self.chunk(x, y)                                                            # O(1)
+        if chunk is None:                                                                   # O(1)
+            return None                                                                     # O(1)
+        return chunk.erase_target(x % self.chunk_size, y % self.chunk_size, layer)          # O(1)
+
+    def special_square(self, x: int, y: int) -> None:
+        """
+        LayerStore.special for the square at (x, y), creating its chunk if needed.
+
+        Complexity:
+        - Worst case: O(c^2), Where c is the chunk size
+            Happens when the chunk is created
+        - Best case: O(1)
+            Happens when the chunk exists already
+        """
+        self.chunk(x, y, True).special_square(x % self.chunk_size, y % self.chunk_size)     # O(1)
+
+    def special(self) -> None:
+        """
+        LayerStore.special for every square of the grid.
+
+        Complexity:
+        - Worst case: O(kc^2), Where k is the number of chunks and c is the chunk size
+        - Best case: O(1)
+            Happens when no chunk has been created
+        """
+        for chunk in self.chunks.values():                                                  # O(k)
+            chunk.special()                                                                 # O(c^2)
+        self.untouched.special()                                                            # O(1)
+        self.special_parity = not self.special_parity                                       # O(1)
+
+    def applied_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        LayerStore.applied_layers for the square at (x, y). Squares of chunks that were never created read the untouched square,
+        which has had every grid-wide special applied to it.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers of the square
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        chunk = self.chunk(x, y)                                                            # O(1)
+        if chunk is None:                                                                   # O(1)
+            return self.untouched.applied_layers(0, 0)                                      # O(n)
+        return chunk.applied_layers(x % self.chunk_size, y % self.chunk_size)               # O(n)
+
+    def visible_layers(self, x: int, y: int) -> list[Layer]:
+        """
+        LayerStore.visible_layers for the square at (x, y). Squares of chunks that were never created read the untouched square,
+        which has had every grid-wide special applied to it.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers of the square
+        - Best case: O(1)
+            Happens when the square has no layers
+        """
+        chunk = self.chunk(x, y)                                                            # O(1)
+        if chunk is None:                                                                   # O(1)
+            return self.untouched.visible_layers(0, 0)                                      # O(n)
+        return chunk.visible_layers(x % self.chunk_size, y % self.chunk_size)               # O(n)
+
+    def pipeline(self, x: int, y: int) -> Pipeline:
+        """
+        Returns the compiled visible layers of the square at (x, y), the untouched square's if its chunk was never created.
+
+        Complexity:
+        - Worst case: O(n), Where n is the number of layers of the square
+            Happens when its layers have not been compiled yet
+        - Best case: O(1)
+            Happens when its layers were compiled already
+        """
+        chunk = self.chunk(x, y)                                                            # O(1)
+        if chunk is None:                                                                   # O(1)
+            return self.untouched.pipeline(0, 0)                                            # O(n)
+        return chunk.pipeline(x % self.chunk_size, y % self.chunk_size)                     # O(n)
+
+    def state_labels(self, ids: dict, x: int = 0, y: int = 0, width: int = None, height: int = None) -> np.ndarray:
+        """
+        LayerArray.state_labels for the width x height squares starting at (x, y), the whole grid if not given,
+        labelled one chunk at a time, with the squares of chunks that were never created labelled like untouched.
+        Grid.flood_fill labels a chunk at a time this way, so a fill never labels the whole canvas at once.
+
+        Returns:
+        - The labels, of shape (width, height)
+            Type: numpy.ndarray of int64
+
+        Complexity:
+        - Worst case: O(mn + pc^2), Where m and n are the height and width of the squares,
+          p is the number of chunks they cross and c is the chunk size
+        - Best case: O(mn), Where m and n are the height and width of the squares
+            Happens when none of the chunks they cross has been created
+        """
+        width = self.width - x if width is None else width                                  # O(1)
+        height = self.height - y if height is None else height                              # O(1)
+        labels = np.empty((width, height), dtype=np.int64)                                  # O(mn)
+        for part_x, part_y, part_width, part_height in self.chunk_parts(x, y, width, height):   # O(p), Where p is the number of chunks crossed
+            part = (slice(part_x - x, part_x - x + part_width), slice(part_y - y, part_y - y + part_height))   # O(1)
+            chunk = self.chunk(part_x, part_y)                                              # O(1)
+            if chunk is None:                                                               # O(1)
+                labels[part] = self.untouched.state_labels(ids)[0, 0]                       # O(c^2)
+            else:                                                                           # O(1)
+                local_x, local_y = part_x % self.chunk_size, part_y % self.chunk_size       # O(1)
+                labels[part] = chunk.state_labels(ids)[local_x:local_x + part_width, local_y:local_y + part_height]   # O(c^2)
+        return labels                                                                       # O(1)
+
+    def chunk_parts(self, x: int, y: int, width: int, height: int) -> list[tuple[int, int, int, int]]:
+        """
+        Splits the width x height squares starting at (x, y) along chunk borders.
+
+        Returns:
+        - One (x, y, width, height) rectangle per chunk the squares cross
+            Type: List of tuples of 4 integers
+
+        Complexity:
+        - Worst case: O(mn / c^2 + 1), Where m and n are the height and width of the rectangle and c is the chunk size
+        - Best case: O(1)
+        """
+        parts = []                                                                          # O(1)
+        part_x = x                                                                          # O(1)
+        while part_x < x + width:                                                           # O(n / c)
+            part_width = min(x + width, part_x - part_x % self.chunk_size + self.chunk_size) - part_x   # O(1), To the next chunk border
+            part_y = y                                                                      # O(1)
+            while part_y < y + height:                                                      # O(m / c)
+                part_height = min(y + height, part_y - part_y % self.chunk_size + self.chunk_size) - part_y   # O(1)
+                parts.append((part_x, part_y, part_width, part_height))                     # O(1)
+                part_y += part_height                                                       # O(1)
+            part_x += part_width                                                            # O(1)
+        return parts                                                                        # O(1)
+
+    def read_block(self, x: int, y: int, width: int, height: int) -> Block:
+        """
+        LayerArray.read_block, read from each chunk the squares cross and put together,
+        with the squares of chunks that were never created read like untouched.
+
+        Complexity:
+        - Worst case: O(mn log(mn)), Where m and n are the height and width of the block
+        - Best case: O(mn), Where m and n are the height and width of the block
+            Happens when the squares are in chunks that were never created
+        """
+        parts = []                                                                          # O(1)
+        for part_x, part_y, part_width, part_height in self.chunk_parts(x, y, width, height):   # O(p), Where p is the number of chunks crossed
+            chunk = self.chunk(part_x, part_y)                                              # O(1)
+            if chunk is None:                                                               # O(1)
+                part = self.untouched.read_block(0, 0, 1, 1).repeated(part_width, part_height)   # O(c^2), Where c is the chunk size
+            else:                                                                           # O(1)
+                part = chunk.read_block(part_x % self.chunk_size, part_y % self.chunk_size, part_width, part_height)   # O(c^2)
+            parts.append((part_x - x, part_y - y, part))                                    # O(1)
+        if len(parts) == 1:                                                                 # O(1)
+            return parts[0][2]                                                              # O(1)
+        return self.block_type.assemble(width, height, parts)                               # O(mn log(mn))
+
+    def write_block(self, x: int, y: int, block: Block) -> None:
+        """
+        LayerArray.write_block, written to each chunk the squares cross, creating chunks as needed.
+
+        Complexity:
+        - Worst case: O(mn + kc^2), Where m and n are the height and width of the block, k is the number of chunks created and c is the chunk size
+        - Best case: O(mn), Where m and n are the height and width of the block
+        """
+        for part_x, part_y, part_width, part_height in self.chunk_parts(x, y, block.width, block.height):   # O(p)
+            part = block.crop(part_x - x, part_y - y, part_width, part_height)              # O(c^2)
+            self.chunk(part_x, part_y, True).write_block(part_x % self.chunk_size, part_y % self.chunk_size, part)   # O(c^2)
+
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes held by the arrays of every chunk created.
+
+        Complexity:
+        - Worst case: O(k), Where k is the number of chunks
+        - Best case: O(k), Where k is the number of chunks
+        """
+        return sum(chunk.nbytes() for chunk in self.chunks.values())                        # O(k)
+
+class TileVersions:
+    """
+    The change tracking versions of a grid, stored in lazily created chunks.
+    Indexed like the array Grid.versions otherwise is: versions[x, y] reads or writes a square,
+    and versions[:] = epoch sets every square.
+    - chunks: Maps (x // chunk_size, y // chunk_size) to an int64 array of the versions of that chunk.
+    - base: The version of every square of a chunk that was never written.
+    """
+
+    def __init__(self, width: int, height: int, chunk_size: int = CHUNK_SIZE) -> None:
+        """
+        Initialises the versions of a width x height grid with no chunks, so every square reads version 0.
+
+        Args:
+        - width: The number of columns of the grid
+            Type: Integer
+        - height: The number of rows of the grid
+            Type: Integer
+        - chunk_size: The width and height of a chunk
+            Type: Integer
+
+        Returns:
+        - None
+
+        Complexity:
+        - Worst case: O(1)
+            No chunk is created until a square is written
+        - Best case: O(1)
+            No chunk is created until a square is written
+        """
+        self.width = width                                                                  # O(1)
+        self.height = height                                                                # O(1)
+        self.chunk_size = chunk_size                                                        # O(1)
+        self.chunks = {}                                                                    # O(1)
+        self.base = 0                                                                       # O(1)
+
+    @property
+    def size(self) -> int:
+        """
+        Returns the number of squares whose version is stored.
+        """
+        return len(self.chunks) * self.chunk_size * self.chunk_size
+
+    def __getitem__(self, square: tuple[int, int]) -> int:
+        """
+        Returns the version of a square, base if its chunk was never created.
+
+        Complexity:
+        - Worst case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        - Best case: O(1)
+            Number of operations is constant and doesnt rely on the size of the input
+        """
+        x, y = square                                                                       # O(1)
+        chunk = self.chunks.get((x // self.chunk_size, y // self.chunk_size))               # O(1)
+        if chunk is None:                                                                   # O(1)
+            return self.base                                                                # O(1)
+        return int(chunk[x % self.chunk_size, y % self.chunk_size])                         # O(1)
+
+    def __setitem__(self, square: tuple[int, int] | slice, epoch: int) -> None:
+        """
+        Sets the version of a square, creating its chunk if needed, or of every square when given a slice.
+
+        Complexity:
+        - Worst case: O(kc^2), Where k is the number of chunks and c is the chunk size
+            Happens when every square is set
+        - Best case: O(1)
+            Happens when a square of an existing chunk is set
+        """
+        if isinstance(square, slice):                                                       # O(1)
+            self.base = epoch                                                               # O(1)
+            for chunk in self.chunks.values():                                              # O(k)
+                chunk[:] = epoch                                                            # O(c^2)
+            return                                                                          # O(1)
+        x, y = square                                                                       # O(1)
+        key = (x // self.chunk_size, y // self.chunk_size)                                  # O(1)
+        chunk = self.chunks.get(key)                                                        # O(1)
+        if chunk is None:                                                                   # O(1)
+            chunk = self.chunks[key] = np.full((self.chunk_size, self.chunk_size), self.base, dtype=np.int64)   # O(c^2)
+        chunk[x % self.chunk_size, y % self.chunk_size] = epoch                             # O(1)
+
+    def stamp(self, mask: np.ndarray, x: int, y: int, epochs: np.ndarray) -> None:
+        """
+        Sets the version of every square selected by the mask, placed with its square (0, 0) at (x, y), to its epoch,
+        creating the chunks of the selected squares as needed.
+
+        Args:
+        - mask: Array of shape (width, height), True for the squares to set
+            Type: numpy.ndarray of bool
+        - x: The x coordinate of the square the mask's square (0, 0) selects
+            Type: Integer
+        - y: The y coordinate of that square
+            Type: Integer
+        - epochs: Array of the same shape as the mask, the version of each square
+            Type: numpy.ndarray of int64
+
+        Complexity:
+        - Worst case: O(mn + kc^2), Where m and n are the height and width of the mask, k is the number of chunks created and c is the chunk size
+        - Best case: O(mn), Where m and n are the height and width of the mask
+        """
+        width, height = mask.shape                                                          # O(1)
+        for part_x in range(x - x % self.chunk_size, x + width, self.chunk_size):           # O(n / c + 1)
+            for part_y in range(y - y % self.chunk_size, y + height, self.chunk_size):      # O(m / c + 1)
+                part = (slice(max(part_x - x, 0), part_x - x + self.chunk_size), slice(max(part_y - y, 0), part_y - y + self.chunk_size))   # O(1)
+                selected = mask[part]                                                       # O(1), A view
+                if not selected.any():                                                      # O(c^2)
+                    continue                                                                # O(1)
+                key = (part_x // self.chunk_size, part_y // self.chunk_size)                # O(1)
+                chunk = self.chunks.get(key)                                                # O(1)
+                if chunk is None:                                                           # O(1)
+                    chunk = self.chunks[key] = np.full((self.chunk_size, self.chunk_size), self.base, dtype=np.int64)   # O(c^2)
+                local_x, local_y = max(x - part_x, 0), max(y - part_y, 0)                   # O(1)
+                target = chunk[local_x:local_x + selected.shape[0], local_y:local_y + selected.shape[1]]   # O(1), A view
+                np.copyto(target, epochs[part], where=selected)                             # O(c^2)
+
+    def newer_than(self, epoch: int, x: int = 0, y: int = 0, width: int = None, height: int = None) -> set[tuple[int, int]]:
+        """
+        Returns the squares of the written chunks whose version is newer than the given epoch.
+        Squares of chunks that were never written are not included, they changed if base is newer than the epoch.
+
+        Args:
+        - epoch: A value of Grid.epoch that was saved earlier
+            Type: Integer
+        - x, y, width, height: The rectangle of squares to look in, the whole grid if not given
+            Type: Integers
+
+        Returns:
+        - The (x, y) coordinates of the squares
+            Type: Set of tuples of 2 integers
+
+        Complexity:
+        - Worst case: O(k + pc^2), Where k is the number of chunks, p is the number of them the rectangle crosses and c is the chunk size
+        - Best case: O(k), Where k is the number of chunks
+            Happens when no chunk written crosses the rectangle
+        """
+        width = self.width - x if width is None else width                                  # O(1)
+        height = self.height - y if height is None else height                              # O(1)
+        squares = set()                                                                     # O(1)
+        for (cx, cy), chunk in self.chunks.items():                                         # O(k)
+            left, bottom = cx * self.chunk_size, cy * self.chunk_size                       # O(1)
+            right = min(left + self.chunk_size, x + width, self.width)                      # O(1), Edge chunks reach past the grid
+            top = min(bottom + self.chunk_size, y + height, self.height)                    # O(1)
+            left, bottom = max(left, x), max(bottom, y)                                     # O(1)
+            if left >= right or bottom >= top:                                              # O(1)
+                continue                                                                    # O(1)
+            part = chunk[left % self.chunk_size:left % self.chunk_size + right - left,
+                         bottom % self.chunk_size:bottom % self.chunk_size + top - bottom]  # O(1), A view
+            found = np.argwhere(part > epoch)                                               # O(c^2)
+            squares.update(zip((found[:, 0] + left).tolist(), (found[:, 1] + bottom).tolist()))   # O(c^2)
+        return squares                                                                      # O(1)